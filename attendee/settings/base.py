@@ -207,7 +207,40 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
+    # Raw PCM for per-participant utterances is spooled here instead of in the utterance row
+    "utterance_audio": {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "endpoint_url": os.getenv("AWS_ENDPOINT_URL"),
+            "access_key": os.getenv("AWS_ACCESS_KEY_ID"),
+            "secret_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+            "bucket_name": os.getenv("AWS_UTTERANCE_AUDIO_STORAGE_BUCKET_NAME") or os.getenv("AWS_RECORDING_STORAGE_BUCKET_NAME"),
+            "location": "utterance_audio",
+            "file_overwrite": False,
+        },
+    },
 }
 AWS_S3_SIGNATURE_VERSION = "s3v4"
 AWS_RECORDING_STORAGE_BUCKET_NAME = os.getenv("AWS_RECORDING_STORAGE_BUCKET_NAME")
 CHARGE_CREDITS_FOR_BOTS = os.getenv("CHARGE_CREDITS_FOR_BOTS", "false") == "true"
+# When enabled, bots don't enqueue a celery task per utterance. Instead the run_transcription_worker command claims pending utterances in batches.
+TRANSCRIPTION_WORKER_ENABLED = os.getenv("TRANSCRIPTION_WORKER_ENABLED", "false") == "true"
+# How many messages a bot queues for its websocket server before dropping them, and what it drops: drop_oldest, drop_newest or block (for up to WEBSOCKET_SEND_QUEUE_BLOCK_MS, then drop the newest)
+WEBSOCKET_SEND_QUEUE_MAX_MESSAGES = int(os.getenv("WEBSOCKET_SEND_QUEUE_MAX_MESSAGES", "1000"))
+WEBSOCKET_SEND_QUEUE_OVERFLOW_POLICY = os.getenv("WEBSOCKET_SEND_QUEUE_OVERFLOW_POLICY", "drop_oldest")
+WEBSOCKET_SEND_QUEUE_BLOCK_MS = int(os.getenv("WEBSOCKET_SEND_QUEUE_BLOCK_MS", "20"))
+# When enabled, bots upload the recording file to storage in parts while the meeting is still going, instead of all of it after the meeting ends
+RECORDING_STREAMING_UPLOAD_ENABLED = os.getenv("RECORDING_STREAMING_UPLOAD_ENABLED", "true") == "true"
+# When enabled, mp4 recordings are written as fragmented mp4, which is playable while it's written and doesn't need to be rewritten after the meeting to make it seekable
+RECORDING_FRAGMENTED_MP4_ENABLED = os.getenv("RECORDING_FRAGMENTED_MP4_ENABLED", "false") == "true"
+# When enabled, bots with a GStreamer pipeline lower the video frame rate while the encoder falls behind, and raise it again once it catches up
+GSTREAMER_ADAPTIVE_FRAME_RATE_ENABLED = os.getenv("GSTREAMER_ADAPTIVE_FRAME_RATE_ENABLED", "false") == "true"
+# Where bots on a node cache the media they play, and how big the cache can get before the least recently used files are deleted
+MEDIA_CACHE_DIRECTORY = os.getenv("MEDIA_CACHE_DIRECTORY", "/tmp/attendee-media-cache")
+MEDIA_CACHE_MAX_SIZE_BYTES = int(os.getenv("MEDIA_CACHE_MAX_SIZE_BYTES", str(2 * 1024 * 1024 * 1024)))
+# How long an API key lookup is cached in each process, which bounds how long a revoked key keeps working in other processes, and how many keys each process keeps
+API_KEY_CACHE_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", "5"))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", "10000"))
+# Whether API key lookups are also cached in Redis, shared between processes, and for how long
+API_KEY_CACHE_REDIS_ENABLED = os.getenv("API_KEY_CACHE_REDIS_ENABLED", "true") == "true"
+API_KEY_CACHE_REDIS_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_REDIS_TTL_SECONDS", "300"))
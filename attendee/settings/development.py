@@ -1,6 +1,7 @@
 import os
 
 from .base import *
+from .base import STORAGES
 
 DEBUG = True
 ALLOWED_HOSTS = ["tendee-stripe-hooks.ngrok.io", "localhost"]
@@ -16,6 +17,14 @@ DATABASES = {
     }
 }
 
+# Spool utterance audio to local disk so development doesn't need a bucket for it
+STORAGES["utterance_audio"] = {
+    "BACKEND": "django.core.files.storage.FileSystemStorage",
+    "OPTIONS": {
+        "location": os.getenv("UTTERANCE_AUDIO_STORAGE_LOCAL_PATH", "/tmp/attendee_utterance_audio"),
+    },
+}
+
 # Log more stuff in development
 LOGGING = {
     "version": 1,
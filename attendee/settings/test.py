@@ -1,6 +1,8 @@
 import os
+import tempfile
 
 from .base import *
+from .base import STORAGES
 
 DEBUG = True
 ALLOWED_HOSTS = []
@@ -16,6 +18,17 @@ DATABASES = {
     }
 }
 
+# In-memory stand-in for the utterance audio object store
+STORAGES["utterance_audio"] = {
+    "BACKEND": "django.core.files.storage.InMemoryStorage",
+}
+
+# The bot tests patch FileUploader, so upload recordings with it instead of streaming them
+RECORDING_STREAMING_UPLOAD_ENABLED = False
+
+# Keep each test run's cached media and decoded audio to itself
+MEDIA_CACHE_DIRECTORY = tempfile.mkdtemp(prefix="attendee-test-media-cache-")
+
 
 # Log more stuff in development
 LOGGING = {
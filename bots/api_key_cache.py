@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ApiKey, Project
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "api_key_cache:"
+
+
+def model_to_fields(instance):
+    """The instance's concrete field values as JSON serializable strings, or None where they're null"""
+    return {field.attname: None if field.value_from_object(instance) is None else field.value_to_string(instance) for field in instance._meta.concrete_fields}
+
+
+def model_from_fields(model, fields):
+    """The inverse of model_to_fields, without querying the database"""
+    concrete_fields = model._meta.concrete_fields
+    return model.from_db("default", [field.attname for field in concrete_fields], [None if fields[field.attname] is None else field.to_python(fields[field.attname]) for field in concrete_fields])
+
+
+class ApiKeyCache:
+    """
+    Enabled API keys and their projects, by key hash. Keys are looked up in an LRU in this process first, which keeps
+    them for ttl_seconds, then in Redis, which keeps them for redis_ttl_seconds, and only then in the database.
+    Saving or deleting an API key or saving its project removes it from this process's LRU and from Redis, so a
+    revoked key stops working right away in the process that revoked it and within ttl_seconds everywhere else.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, redis_client=None, redis_ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self._lock = threading.Lock()
+        # Key hash -> (monotonic time it expires at, fields of the api key and its project)
+        self._entries = OrderedDict()
+        self.local_hit_count = 0
+        self.redis_hit_count = 0
+        self.miss_count = 0
+
+    def get(self, key_hash):
+        """The enabled ApiKey with this hash, with its project, or None if there isn't one"""
+        cached = self._get_local(key_hash)
+        if cached is None:
+            cached = self._get_redis(key_hash)
+            if cached is not None:
+                self._put_local(key_hash, cached)
+                with self._lock:
+                    self.redis_hit_count += 1
+        else:
+            with self._lock:
+                self.local_hit_count += 1
+
+        if cached is None:
+            with self._lock:
+                self.miss_count += 1
+            api_key = ApiKey.objects.select_related("project").filter(key_hash=key_hash, disabled_at__isnull=True).first()
+            if api_key is None:
+                return None
+            cached = {"api_key": model_to_fields(api_key), "project": model_to_fields(api_key.project)}
+            self._put_local(key_hash, cached)
+            self._put_redis(key_hash, cached)
+
+        # New instances for every request, since views are free to change them
+        api_key = model_from_fields(ApiKey, cached["api_key"])
+        api_key.project = model_from_fields(Project, cached["project"])
+        return api_key
+
+    def invalidate(self, key_hashes):
+        with self._lock:
+            for key_hash in key_hashes:
+                self._entries.pop(key_hash, None)
+        if self.redis_client and key_hashes:
+            try:
+                self.redis_client.delete(*[REDIS_KEY_PREFIX + key_hash for key_hash in key_hashes])
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Could not remove API keys from the Redis cache: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_local(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            expires_at, cached = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return cached
+
+    def _put_local(self, key_hash, cached):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl_seconds, cached)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_redis(self, key_hash):
+        if not self.redis_client:
+            return None
+        try:
+            value = self.redis_client.get(REDIS_KEY_PREFIX + key_hash)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Could not read API key from the Redis cache: {e}")
+            return None
+        return json.loads(value) if value else None
+
+    def _put_redis(self, key_hash, cached):
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.set(REDIS_KEY_PREFIX + key_hash, json.dumps(cached), ex=self.redis_ttl_seconds)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Could not write API key to the Redis cache: {e}")
+
+
+_api_key_cache = None
+
+
+def get_api_key_cache():
+    global _api_key_cache
+    if _api_key_cache is None:
+        redis_client = None
+        if settings.API_KEY_CACHE_REDIS_ENABLED and os.getenv("REDIS_URL"):
+            redis_client = get_redis_client()
+        _api_key_cache = ApiKeyCache(
+            max_entries=settings.API_KEY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.API_KEY_CACHE_TTL_SECONDS,
+            redis_client=redis_client,
+            redis_ttl_seconds=settings.API_KEY_CACHE_REDIS_TTL_SECONDS,
+        )
+    return _api_key_cache
+
+
+def invalidate_api_keys(key_hashes):
+    # Once now, and again after the transaction commits, in case a request cached the old row in between
+    get_api_key_cache().invalidate(key_hashes)
+    transaction.on_commit(lambda: get_api_key_cache().invalidate(key_hashes))
+
+
+@receiver(post_save, sender=ApiKey)
+@receiver(post_delete, sender=ApiKey)
+def invalidate_cached_api_key(sender, instance, **kwargs):
+    invalidate_api_keys([instance.key_hash])
+
+
+@receiver(post_save, sender=Project)
+def invalidate_cached_project_api_keys(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_api_keys(list(ApiKey.objects.filter(project=instance).values_list("key_hash", flat=True)))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BotsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bots"
+
+    def ready(self):
+        # Connects the signals that remove changed API keys from the cache
+        from . import api_key_cache  # noqa: F401
@@ -2,7 +2,7 @@ import hashlib
 
 from rest_framework import authentication, exceptions
 
-from .models import ApiKey
+from .api_key_cache import get_api_key_cache
 
 
 class ApiKeyAuthentication(authentication.BaseAuthentication):
@@ -20,10 +20,9 @@ class ApiKeyAuthentication(authentication.BaseAuthentication):
 
         api_key = auth_header[1]
 
-        try:
-            key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-            api_key_obj = ApiKey.objects.select_related("project").get(key_hash=key_hash, disabled_at__isnull=True)
-        except ApiKey.DoesNotExist:
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        api_key_obj = get_api_key_cache().get(key_hash)
+        if api_key_obj is None:
             raise exceptions.AuthenticationFailed({"detail": "Invalid or disabled API key"})
 
         # Return (None, api_key_obj) instead of (user, auth)
@@ -0,0 +1,326 @@
+import datetime
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.etree import ElementTree
+
+# Helpers for the benchmark_* management commands, which measure client code against a local stand-in for a remote service.
+
+
+class CountingRequestHandler(BaseHTTPRequestHandler):
+    """Request handler that counts connections and requests, so benchmarks can report how many connections the client opened"""
+
+    # HTTP/1.1 so clients can keep the connection open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, so without this a kept-alive connection waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connection_count += 1
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send_json(self, status_code, body):
+        encoded_body = json.dumps(body).encode()
+        time.sleep(self.server.latency_seconds)
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_self_signed_certificate(directory):
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()).serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(minutes=5)).not_valid_after(now + datetime.timedelta(days=1)).add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False).add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True).sign(key, hashes.SHA256())
+
+    certificate_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(certificate_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return certificate_path, key_path
+
+
+def start_local_server(handler_class, latency_seconds=0, use_tls=False, certificate_directory=None):
+    """
+    Serve handler_class on a random local port from a background thread. Returns the server and its base url.
+    With use_tls, the server uses a throwaway self-signed certificate which the requests library is told to trust.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    server.stats_lock = threading.Lock()
+    server.latency_seconds = latency_seconds
+    server.connection_count = 0
+    server.request_count = 0
+
+    scheme = "http"
+    if use_tls:
+        certificate_path, key_path = write_self_signed_certificate(certificate_directory)
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(certificate_path, key_path)
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+        # Both the requests module and a requests.Session pick this up
+        os.environ["REQUESTS_CA_BUNDLE"] = certificate_path
+        scheme = "https"
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+class S3RequestHandler(CountingRequestHandler):
+    """
+    Just enough of the S3 API for boto3 to put, get and multipart upload objects, with path style urls. Objects are kept in
+    server.s3_objects. server.upload_bytes_per_second limits how fast request bodies are read, across all connections, to stand
+    in for the bot's uplink, and server.failing_upload_part_count fails that many UploadPart requests with a 503.
+    """
+
+    def parse_path(self):
+        path, _, query = self.path.partition("?")
+        bucket, _, key = urllib.parse.unquote(path).lstrip("/").partition("/")
+        return bucket, key, urllib.parse.parse_qs(query, keep_blank_values=True)
+
+    def read_body(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        if not self.server.upload_bytes_per_second:
+            return self.rfile.read(content_length)
+        body = bytearray()
+        while len(body) < content_length:
+            block = self.rfile.read(min(65536, content_length - len(body)))
+            body += block
+            # Every connection shares the uplink
+            with self.server.stats_lock:
+                self.server.uplink_free_at = max(time.monotonic(), self.server.uplink_free_at) + len(block) / self.server.upload_bytes_per_second
+                uplink_free_at = self.server.uplink_free_at
+            time.sleep(max(0, uplink_free_at - time.monotonic()))
+        return bytes(body)
+
+    def send_s3_response(self, status_code, body=b"", headers=None):
+        time.sleep(self.server.latency_seconds)
+        self.send_response(status_code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+
+    def send_xml(self, element_name, fields):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><{element_name}>' + "".join(f"<{name}>{value}</{name}>" for name, value in fields.items()) + f"</{element_name}>"
+        self.send_s3_response(200, body.encode(), {"Content-Type": "application/xml"})
+
+    def do_PUT(self):
+        bucket, key, query = self.parse_path()
+        body = self.read_body()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if "uploadId" not in query:
+            self.server.s3_objects[(bucket, key)] = body
+            self.send_s3_response(200, headers={"ETag": etag})
+            return
+
+        with self.server.stats_lock:
+            should_fail = self.server.failing_upload_part_count > 0
+            if should_fail:
+                self.server.failing_upload_part_count -= 1
+        if should_fail:
+            self.send_s3_response(503, b"<Error><Code>SlowDown</Code></Error>", {"Content-Type": "application/xml"})
+            return
+
+        with self.server.stats_lock:
+            self.server.multipart_uploads[query["uploadId"][0]][int(query["partNumber"][0])] = (etag, body)
+            self.server.uploaded_part_count += 1
+        self.send_s3_response(200, headers={"ETag": etag})
+
+    def do_POST(self):
+        bucket, key, query = self.parse_path()
+        body = self.read_body()
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self.server.multipart_uploads[upload_id] = {}
+            self.send_xml("InitiateMultipartUploadResult", {"Bucket": bucket, "Key": key, "UploadId": upload_id})
+            return
+
+        uploaded_parts = self.server.multipart_uploads.pop(query["uploadId"][0])
+        parts = ElementTree.fromstring(body).findall("{*}Part")
+        self.server.s3_objects[(bucket, key)] = b"".join(uploaded_parts[int(part.findtext("{*}PartNumber"))][1] for part in parts)
+        self.send_xml("CompleteMultipartUploadResult", {"Bucket": bucket, "Key": key, "ETag": '"complete"'})
+
+    def do_DELETE(self):
+        bucket, key, query = self.parse_path()
+        if "uploadId" in query:
+            self.server.multipart_uploads.pop(query["uploadId"][0], None)
+        else:
+            self.server.s3_objects.pop((bucket, key), None)
+        self.send_s3_response(204)
+
+    def do_GET(self):
+        bucket, key, _ = self.parse_path()
+        body = self.server.s3_objects.get((bucket, key))
+        if body is None:
+            self.send_s3_response(404, b"<Error><Code>NoSuchKey</Code></Error>", {"Content-Type": "application/xml"})
+            return
+        self.send_s3_response(200, body, {"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+
+def start_local_s3_server(latency_seconds=0, upload_bytes_per_second=None):
+    """Serve S3RequestHandler on a random local port. Returns the server and the endpoint url to give boto3."""
+    server, endpoint_url = start_local_server(S3RequestHandler, latency_seconds=latency_seconds)
+    server.s3_objects = {}
+    server.multipart_uploads = {}
+    server.uploaded_part_count = 0
+    server.failing_upload_part_count = 0
+    server.upload_bytes_per_second = upload_bytes_per_second
+    server.uplink_free_at = 0
+    return server, endpoint_url
+
+
+class MediaFileRequestHandler(CountingRequestHandler):
+    """
+    Serves the files in server.media_files, by path, with an ETag and, if server.supports_ranges, single byte range requests.
+    server.download_bytes_per_second limits how fast responses are written, across all connections, to stand in for the
+    bot's downlink. server.requested_ranges records the range of every request, or None for the whole file.
+    """
+
+    def etag_for(self, body):
+        # Hashing hundreds of megabytes on every request would swamp what's being measured
+        with self.server.stats_lock:
+            if id(body) not in self.server.media_etags:
+                self.server.media_etags[id(body)] = (body, f'"{hashlib.md5(body).hexdigest()}"')
+            return self.server.media_etags[id(body)][1]
+
+    def do_GET(self):
+        body = self.server.media_files.get(urllib.parse.urlparse(self.path).path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        headers = {"ETag": self.etag_for(body), "Accept-Ranges": "bytes" if self.server.supports_ranges else "none"}
+        range_match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if range_match and self.server.supports_ranges:
+            start = int(range_match.group(1))
+            end = min(int(range_match.group(2) or len(body) - 1), len(body) - 1)
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            self.server.requested_ranges.append((start, end))
+            body = body[start : end + 1]
+        else:
+            status_code = 200
+            self.server.requested_ranges.append(None)
+
+        time.sleep(self.server.latency_seconds)
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for offset in range(0, len(body), 65536):
+                block = body[offset : offset + 65536]
+                if self.server.download_bytes_per_second:
+                    # Every connection shares the downlink
+                    with self.server.stats_lock:
+                        self.server.downlink_free_at = max(time.monotonic(), self.server.downlink_free_at) + len(block) / self.server.download_bytes_per_second
+                        downlink_free_at = self.server.downlink_free_at
+                    time.sleep(max(0, downlink_free_at - time.monotonic()))
+                self.wfile.write(block)
+                with self.server.stats_lock:
+                    self.server.bytes_sent += len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading
+            pass
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+
+
+def start_local_media_server(latency_seconds=0, download_bytes_per_second=None, supports_ranges=True):
+    """Serve MediaFileRequestHandler on a random local port. Returns the server and its base url."""
+    server, base_url = start_local_server(MediaFileRequestHandler, latency_seconds=latency_seconds)
+    server.media_files = {}
+    # id of a file's bytes -> the bytes, kept so the id isn't reused, and its ETag
+    server.media_etags = {}
+    server.supports_ranges = supports_ranges
+    server.download_bytes_per_second = download_bytes_per_second
+    server.downlink_free_at = 0
+    server.bytes_sent = 0
+    server.requested_ranges = []
+    return server, base_url
+
+
+# Stands in for ffmpeg and the RTMP server behind it: reads stdin at most bytes_per_second and appends what it read to a
+# file. The first dropped_connection_count connections end after exit_after_bytes, like a server that drops them.
+THROTTLED_PIPE_SINK = """
+import os, sys, time
+output_path, bytes_per_second, exit_after_bytes, dropped_connection_count = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+if os.path.exists(output_path) and open(output_path, "rb").read().count(b"FLV") >= dropped_connection_count:
+    exit_after_bytes = 0
+total = 0
+with open(output_path, "ab") as output:
+    while exit_after_bytes == 0 or total < exit_after_bytes:
+        data = sys.stdin.buffer.read1(4096)
+        if not data:
+            break
+        output.write(data)
+        output.flush()
+        total += len(data)
+        time.sleep(len(data) / bytes_per_second)
+"""
+
+
+def throttled_pipe_sink_command(output_path, bytes_per_second, exit_after_bytes=0, dropped_connection_count=1):
+    return [sys.executable, "-c", THROTTLED_PIPE_SINK, output_path, str(bytes_per_second), str(exit_after_bytes), str(dropped_connection_count)]
+
+
+def flv_header():
+    return b"FLV\x01\x05\x00\x00\x00\x09" + bytes(4)
+
+
+def flv_tag(tag_type, timestamp_ms, body):
+    header = bytes([tag_type]) + len(body).to_bytes(3, "big") + (timestamp_ms & 0xFFFFFF).to_bytes(3, "big") + bytes([timestamp_ms >> 24]) + bytes(3)
+    return header + body + (len(header) + len(body)).to_bytes(4, "big")
+
+
+def flv_stream_start():
+    """The FLV header, onMetaData and the AVC and AAC sequence headers, like flvmux starts its output with"""
+    return flv_header() + flv_tag(18, 0, b"\x02\x00\x0aonMetaData") + flv_tag(9, 0, b"\x17\x00\x00\x00\x00avcC") + flv_tag(8, 0, b"\xaf\x00\x12\x10")
+
+
+def flv_frame(timestamp_ms, is_keyframe, frame_size=2000):
+    """One H.264 video frame and the AAC audio that goes with it"""
+    video_body = bytes([0x17 if is_keyframe else 0x27, 1, 0, 0, 0]) + bytes(frame_size)
+    return flv_tag(9, timestamp_ms, video_body) + flv_tag(8, timestamp_ms, b"\xaf\x01" + bytes(100))
+
+
+def flv_gop(timestamp_ms, frame_count=30, frame_size=2000):
+    """A keyframe, then inter frames, with audio, a frame every 33 ms"""
+    return b"".join(flv_frame(timestamp_ms + frame_index * 33, frame_index == 0, frame_size) for frame_index in range(frame_count))
@@ -1,31 +1,104 @@
+import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from django.db import close_old_connections
+
+from bots.media_cache import get_media_cache
 from bots.utils import mp3_to_pcm
 
+from .pcm_cache import PcmCache
 from .text_to_speech import generate_audio_from_text
 
+logger = logging.getLogger(__name__)
+
 
 class AudioOutputManager:
     SAMPLE_RATE = 44100
+    # Audio media requests decoded or synthesized at the same time
+    PREPARE_CONCURRENCY = 2
 
     def __init__(
         self,
         currently_playing_audio_media_request_finished_callback,
         play_raw_audio_callback,
         sleep_time_between_chunks_seconds,
+        currently_playing_audio_media_request_failed_to_play_callback=None,
+        pcm_cache=None,
     ):
+        """
+        Plays audio media requests. Decoding a media blob or synthesizing speech happens on a thread pool, ahead of
+        playback for requests passed to prepare_audio_media_request, and the PCM is kept in the node's PcmCache.
+        """
         self.currently_playing_audio_media_request = None
         self.currently_playing_audio_media_request_started_at = None
         self.currently_playing_audio_media_request_duration_ms = None
         self.currently_playing_audio_media_request_finished_callback = currently_playing_audio_media_request_finished_callback
+        self.currently_playing_audio_media_request_failed_to_play_callback = currently_playing_audio_media_request_failed_to_play_callback
+        self.currently_playing_audio_media_request_error = None
         self.play_raw_audio_callback = play_raw_audio_callback
         self.currently_playing_audio_media_request_raw_audio_pcm_bytes = None
         self.audio_thread = None
         self.stop_audio_thread = False
         self.sleep_time_between_chunks_seconds = sleep_time_between_chunks_seconds
 
-    def _play_audio_chunks(self, audio_data, chunk_size):
+        self.pcm_cache = pcm_cache or PcmCache(get_media_cache())
+        self.text_to_speech_clients = {}
+        self.prepare_executor = ThreadPoolExecutor(max_workers=self.PREPARE_CONCURRENCY, thread_name_prefix="audio_output_prepare")
+        # Media request id -> future of (pcm bytes, duration in ms)
+        self.prepared_audio = {}
+
+    def prepare_audio_media_request(self, audio_media_request):
+        """Start decoding or synthesizing the request's audio, if that hasn't started already"""
+        if audio_media_request.id not in self.prepared_audio:
+            # Load the media blob here, so the thread pool only queries the database for text-to-speech credentials
+            audio_media_request.media_blob
+            self.prepared_audio[audio_media_request.id] = self.prepare_executor.submit(self._prepare_audio, audio_media_request)
+        return self.prepared_audio[audio_media_request.id]
+
+    def _prepare_audio(self, audio_media_request):
+        # Runs on the thread pool, which has its own database connections
+        close_old_connections()
+        try:
+            if audio_media_request.media_blob:
+                # Handle raw audio blob case
+                media_blob = audio_media_request.media_blob
+                pcm = self.pcm_cache.get_or_create(PcmCache.media_blob_key(media_blob, self.SAMPLE_RATE), lambda: mp3_to_pcm(media_blob.blob, sample_rate=self.SAMPLE_RATE))
+                return pcm, media_blob.duration_ms
+
+            # Handle text-to-speech case
+            pcm = self.pcm_cache.get_or_create(
+                PcmCache.text_to_speech_key(audio_media_request.text_to_speak, audio_media_request.text_to_speech_settings, self.SAMPLE_RATE),
+                lambda: generate_audio_from_text(
+                    text=audio_media_request.text_to_speak,
+                    settings=audio_media_request.text_to_speech_settings,
+                    sample_rate=self.SAMPLE_RATE,
+                    bot=audio_media_request.bot,
+                    text_to_speech_clients=self.text_to_speech_clients,
+                )[0],
+            )
+            bytes_per_sample = 2
+            return pcm, int((len(pcm) / bytes_per_sample / self.SAMPLE_RATE) * 1000)
+        finally:
+            close_old_connections()
+
+    def _play_audio_chunks(self, prepared_audio, chunk_size):
+        while not prepared_audio.done():
+            if self.stop_audio_thread:
+                return
+            wait([prepared_audio], timeout=0.1)
+        try:
+            audio_data, duration_ms = prepared_audio.result()
+        except Exception as e:
+            logger.info(f"Error preparing audio: {e}")
+            self.currently_playing_audio_media_request_error = e
+            return
+
+        self.currently_playing_audio_media_request_raw_audio_pcm_bytes = audio_data
+        self.currently_playing_audio_media_request_duration_ms = duration_ms
+        self.currently_playing_audio_media_request_started_at = time.time()
+
         for i in range(0, len(audio_data), chunk_size):
             if self.stop_audio_thread:
                 break
@@ -44,30 +117,20 @@ class AudioOutputManager:
         # Stop any existing audio playback
         self._stop_audio_thread()
 
-        if audio_media_request.media_blob:
-            # Handle raw audio blob case
-            self.currently_playing_audio_media_request_raw_audio_pcm_bytes = mp3_to_pcm(audio_media_request.media_blob.blob, sample_rate=self.SAMPLE_RATE)
-            self.currently_playing_audio_media_request_duration_ms = audio_media_request.media_blob.duration_ms
-        else:
-            # Handle text-to-speech case
-            audio_blob, duration_ms = generate_audio_from_text(
-                text=audio_media_request.text_to_speak,
-                settings=audio_media_request.text_to_speech_settings,
-                sample_rate=self.SAMPLE_RATE,
-                bot=audio_media_request.bot,
-            )
-            self.currently_playing_audio_media_request_raw_audio_pcm_bytes = audio_blob
-            self.currently_playing_audio_media_request_duration_ms = duration_ms
+        prepared_audio = self.prepare_audio_media_request(audio_media_request)
+        del self.prepared_audio[audio_media_request.id]
 
         self.currently_playing_audio_media_request = audio_media_request
-        self.currently_playing_audio_media_request_started_at = time.time()
+        # Set once the audio is ready and starts playing
+        self.currently_playing_audio_media_request_started_at = None
+        self.currently_playing_audio_media_request_error = None
 
         bytes_per_sample = 2
-        # Start audio playback in a new thread
+        # Start audio playback in a new thread, which waits for the audio to be ready
         self.audio_thread = threading.Thread(
             target=self._play_audio_chunks,
             args=(
-                self.currently_playing_audio_media_request_raw_audio_pcm_bytes,
+                prepared_audio,
                 self.SAMPLE_RATE * bytes_per_sample,
             ),
         )
@@ -85,9 +148,21 @@ class AudioOutputManager:
         self._stop_audio_thread()
         self.currently_playing_audio_media_request = None
         self.currently_playing_audio_media_request_started_at = None
+        self.currently_playing_audio_media_request_error = None
 
     def monitor_currently_playing_audio_media_request(self):
+        if self.currently_playing_audio_media_request and self.currently_playing_audio_media_request_error:
+            temp_currently_playing_audio_media_request = self.currently_playing_audio_media_request
+            self.clear_currently_playing_audio_media_request()
+            if self.currently_playing_audio_media_request_failed_to_play_callback:
+                self.currently_playing_audio_media_request_failed_to_play_callback(temp_currently_playing_audio_media_request)
+            return
+
         if self.currently_playing_audio_media_request_is_finished():
             temp_currently_playing_audio_media_request = self.currently_playing_audio_media_request
             self.clear_currently_playing_audio_media_request()
             self.currently_playing_audio_media_request_finished_callback(temp_currently_playing_audio_media_request)
+
+    def cleanup(self):
+        self.clear_currently_playing_audio_media_request()
+        self.prepare_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,77 @@
+import logging
+import queue
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class AudioSegmentationWorker:
+    """
+    Runs a PerParticipantNonStreamingAudioInputManager on its own thread, so splitting the per participant audio into
+    utterances and saving them to the database happens off the GLib main loop. The thread uses its own database connection,
+    which it closes when it stops.
+    The main loop only hears back from it through on_error_callback, which is called on the worker thread
+    (so it should hand off to the main loop) if processing fails. The worker stops after an error.
+    """
+
+    def __init__(self, *, audio_input_manager, on_error_callback, interval_seconds=0.1):
+        self.audio_input_manager = audio_input_manager
+        self.on_error_callback = on_error_callback
+        self.interval_seconds = interval_seconds
+
+        # Requests from other threads to flush the utterances, each with an event to set once it's done
+        self.flush_requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True, name="audio_segmentation_worker")
+        self.thread.start()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def flush_utterances(self, timeout=60):
+        """Process the queued audio and save every utterance in progress, waiting until it's done. Returns False if it timed out."""
+        if not self.is_running():
+            return False
+        done = threading.Event()
+        self.flush_requests.put(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout=60):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.warning("Audio segmentation worker did not stop in time")
+
+    def run(self):
+        logger.info("Audio segmentation worker started")
+        try:
+            while not self.stop_event.is_set():
+                self.audio_input_manager.process_chunks()
+                self.handle_flush_requests()
+                self.stop_event.wait(self.interval_seconds)
+            # Answer flush requests that came in while stopping
+            self.handle_flush_requests()
+        except Exception as e:
+            logger.exception(f"Error in audio segmentation worker: {e}")
+            self.on_error_callback(e)
+        finally:
+            connection.close()
+            logger.info("Audio segmentation worker exited")
+
+    def handle_flush_requests(self):
+        while True:
+            try:
+                done = self.flush_requests.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.audio_input_manager.process_chunks()
+                self.audio_input_manager.flush_utterances()
+            finally:
+                done.set()
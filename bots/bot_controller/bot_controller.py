@@ -10,6 +10,7 @@ from datetime import timedelta
 
 import gi
 import redis
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils import timezone
 
@@ -45,12 +46,15 @@ from bots.models import (
     Utterance,
     WebhookTriggerTypes,
 )
+from bots.redis_utils import redis_url
+from bots.streaming_resampler import StreamingResampler
 from bots.utils import meeting_type_from_url
 from bots.webhook_payloads import chat_message_webhook_payload, participant_event_webhook_payload, utterance_webhook_payload
 from bots.webhook_utils import trigger_webhook
-from bots.websocket_payloads import mixed_audio_websocket_payload
+from bots.websocket_payloads import mixed_audio_websocket_binary_frame, mixed_audio_websocket_payload
 
 from .audio_output_manager import AudioOutputManager
+from .audio_segmentation_worker import AudioSegmentationWorker
 from .bot_resource_snapshot_taker import BotResourceSnapshotTaker
 from .closed_caption_manager import ClosedCaptionManager
 from .file_uploader import FileUploader
@@ -62,6 +66,7 @@ from .pipeline_configuration import PipelineConfiguration
 from .realtime_audio_output_manager import RealtimeAudioOutputManager
 from .rtmp_client import RTMPClient
 from .screen_and_audio_recorder import ScreenAndAudioRecorder
+from .streaming_uploader import StreamingFileUploader, StreamingUploader
 from .video_output_manager import VideoOutputManager
 
 gi.require_version("GLib", "2.0")
@@ -73,6 +78,8 @@ logger = logging.getLogger(__name__)
 class BotController:
     # Default wait time for utterance termination (5 minutes)
     UTTERANCE_TERMINATION_WAIT_TIME_SECONDS = 300
+    # Enqueued audio media requests decoded or synthesized before it's their turn to play
+    AUDIO_MEDIA_REQUESTS_TO_PREPARE_AHEAD = 2
 
     def per_participant_audio_input_manager(self):
         if self.bot_in_db.deepgram_use_streaming():
@@ -94,7 +101,7 @@ class BotController:
             add_audio_chunk_callback=add_audio_chunk_callback,
             meeting_url=self.bot_in_db.meeting_url,
             add_video_frame_callback=None,
-            wants_any_video_frames_callback=None,
+            wants_any_video_frames_callback=self.wants_any_video_frames,
             add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback if self.pipeline_configuration.websocket_stream_audio else None,
             upsert_caption_callback=self.closed_caption_manager.upsert_caption,
             upsert_chat_message_callback=self.on_new_chat_message,
@@ -124,7 +131,7 @@ class BotController:
             add_audio_chunk_callback=add_audio_chunk_callback,
             meeting_url=self.bot_in_db.meeting_url,
             add_video_frame_callback=None,
-            wants_any_video_frames_callback=None,
+            wants_any_video_frames_callback=self.wants_any_video_frames,
             add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback if self.pipeline_configuration.websocket_stream_audio else None,
             upsert_caption_callback=self.closed_caption_manager.upsert_caption,
             upsert_chat_message_callback=self.on_new_chat_message,
@@ -162,7 +169,7 @@ class BotController:
             add_audio_chunk_callback=None,
             meeting_url=self.bot_in_db.meeting_url,
             add_video_frame_callback=None,
-            wants_any_video_frames_callback=None,
+            wants_any_video_frames_callback=self.wants_any_video_frames,
             add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback if self.pipeline_configuration.websocket_stream_audio else None,
             upsert_caption_callback=self.closed_caption_manager.upsert_caption,
             upsert_chat_message_callback=self.on_new_chat_message,
@@ -202,7 +209,7 @@ class BotController:
             zoom_client_secret=zoom_oauth_credentials["client_secret"],
             meeting_url=self.bot_in_db.meeting_url,
             add_video_frame_callback=self.gstreamer_pipeline.on_new_video_frame if self.gstreamer_pipeline else None,
-            wants_any_video_frames_callback=self.gstreamer_pipeline.wants_any_video_frames if self.gstreamer_pipeline else lambda: False,
+            wants_any_video_frames_callback=self.wants_any_video_frames,
             add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback,
             upsert_chat_message_callback=self.on_new_chat_message,
             add_participant_event_callback=self.add_participant_event,
@@ -222,12 +229,17 @@ class BotController:
             logger.info("Starting websocket audio client...")
             self.websocket_audio_client.start()
 
-        payload = mixed_audio_websocket_payload(
-            chunk=chunk,
-            input_sample_rate=self.mixed_audio_sample_rate(),
-            output_sample_rate=self.bot_in_db.websocket_audio_sample_rate(),
-            bot_object_id=self.bot_in_db.object_id,
-        )
+        if self.websocket_audio_uses_binary_frames:
+            payload = mixed_audio_websocket_binary_frame(
+                chunk=chunk,
+                resampler=self.websocket_audio_resampler,
+            )
+        else:
+            payload = mixed_audio_websocket_payload(
+                chunk=chunk,
+                resampler=self.websocket_audio_resampler,
+                bot_object_id=self.bot_in_db.object_id,
+            )
 
         self.websocket_audio_client.send_async(payload)
 
@@ -369,6 +381,20 @@ class BotController:
         except Exception as e:
             logger.exception(f"Error uploading recording to external media storage bucket {self.bot_in_db.external_media_storage_bucket_name()}: {e}")
 
+    def finish_streaming_recording_upload(self):
+        if not self.recording_file_streamer:
+            return False
+
+        logger.info("Telling streaming file uploader to finish uploading recording file...")
+        try:
+            self.recording_file_streamer.finish()
+            logger.info("Streaming file uploader finished uploading file")
+            return True
+        except Exception as e:
+            logger.exception(f"Streaming upload of recording file failed, uploading the whole file instead: {e}")
+            self.recording_file_streamer.abort()
+            return False
+
     def cleanup(self):
         if self.cleanup_called:
             logger.info("Cleanup already called, exiting")
@@ -408,6 +434,10 @@ class BotController:
         if self.main_loop and self.main_loop.is_running():
             self.main_loop.quit()
 
+        if self.audio_segmentation_worker:
+            logger.info("Telling audio segmentation worker to stop...")
+            self.audio_segmentation_worker.stop()
+
         if self.screen_and_audio_recorder:
             logger.info("Telling media recorder receiver to cleanup...")
             self.screen_and_audio_recorder.cleanup()
@@ -416,6 +446,10 @@ class BotController:
             logger.info("Telling realtime audio output manager to cleanup...")
             self.realtime_audio_output_manager.cleanup()
 
+        if self.audio_output_manager:
+            logger.info("Telling audio output manager to cleanup...")
+            self.audio_output_manager.cleanup()
+
         if self.websocket_audio_client:
             logger.info("Telling websocket audio client to cleanup...")
             self.websocket_audio_client.cleanup()
@@ -423,15 +457,16 @@ class BotController:
         if self.get_recording_file_location():
             self.upload_recording_to_external_media_storage_if_enabled()
 
-            logger.info("Telling file uploader to upload recording file...")
             file_uploader = FileUploader(
                 bucket=os.environ.get("AWS_RECORDING_STORAGE_BUCKET_NAME"),
                 key=self.get_recording_filename(),
                 endpoint_url=os.environ.get("AWS_ENDPOINT_URL"),
             )
-            file_uploader.upload_file(self.get_recording_file_location())
-            file_uploader.wait_for_upload()
-            logger.info("File uploader finished uploading file")
+            if not self.finish_streaming_recording_upload():
+                logger.info("Telling file uploader to upload recording file...")
+                file_uploader.upload_file(self.get_recording_file_location())
+                file_uploader.wait_for_upload()
+                logger.info("File uploader finished uploading file")
             file_uploader.delete_file(self.get_recording_file_location())
             logger.info("File uploader deleted file from local filesystem")
             self.recording_file_saved(file_uploader.key)
@@ -468,6 +503,8 @@ class BotController:
         self.bot_in_db = Bot.objects.get(id=bot_id)
         self.cleanup_called = False
         self.run_called = False
+        self.audio_segmentation_worker = None
+        self.recording_paused = False
 
         self.redis_client = None
         self.pubsub = None
@@ -517,6 +554,9 @@ class BotController:
         else:
             return GstreamerPipeline.OUTPUT_FORMAT_MP4
 
+    def should_record_fragmented_mp4(self):
+        return settings.RECORDING_FRAGMENTED_MP4_ENABLED and self.bot_in_db.recording_format() == RecordingFormats.MP4
+
     def get_recording_file_location(self):
         if self.pipeline_configuration.rtmp_stream_audio or self.pipeline_configuration.rtmp_stream_video:
             return None
@@ -543,9 +583,54 @@ class BotController:
         elif meeting_type == MeetingTypes.TEAMS:
             return False
 
+    def wants_any_video_frames(self):
+        """
+        Whether anything will consume the meeting video right now. The adapters check this before receiving, transferring or
+        scaling video frames, so a bot with nowhere to put the video doesn't spend CPU on it.
+        """
+        if not self.pipeline_configuration.record_video and not self.pipeline_configuration.rtmp_stream_video:
+            return False
+
+        if self.recording_paused:
+            return False
+
+        if self.pipeline_configuration.rtmp_stream_video and not (self.rtmp_client and self.rtmp_client.is_running):
+            return False
+
+        # Google Meet, Teams and Zoom web bots record the screen instead, so there's no pipeline to take frames from the adapter
+        if not self.gstreamer_pipeline:
+            return False
+
+        return self.gstreamer_pipeline.wants_any_video_frames()
+
+    def get_websocket_audio_send_queue_metrics(self):
+        if not self.websocket_audio_client:
+            return None
+        return self.websocket_audio_client.metrics(reset_window=True)
+
+    def get_gstreamer_pipeline_metrics(self):
+        if not self.gstreamer_pipeline:
+            return None
+        return self.gstreamer_pipeline.metrics(reset_window=True)
+
+    def get_rtmp_client_metrics(self):
+        if not self.rtmp_client:
+            return None
+        return self.rtmp_client.metrics(reset_window=True)
+
     def should_create_websocket_client(self):
         return self.pipeline_configuration.websocket_stream_audio
 
+    def should_stream_recording_upload(self):
+        if not settings.RECORDING_STREAMING_UPLOAD_ENABLED or not self.get_recording_file_location():
+            return False
+
+        # To make an mp4 seekable, ffmpeg writes it out again with the moov atom at the start, which changes every part
+        if self.screen_and_audio_recorder and self.screen_and_audio_recorder.makes_file_seekable_on_cleanup():
+            return False
+
+        return True
+
     def should_create_screen_and_audio_recorder(self):
         # if we're not recording audio or video and not doing rtmp streaming, then we don't need to create a screen and audio recorder
         if not self.pipeline_configuration.record_audio and not self.pipeline_configuration.record_video and not self.pipeline_configuration.rtmp_stream_audio and not self.pipeline_configuration.rtmp_stream_video:
@@ -560,8 +645,7 @@ class BotController:
         if self.redis_client:
             self.redis_client.close()
 
-        redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
-        self.redis_client = redis.from_url(redis_url)
+        self.redis_client = redis.from_url(redis_url())
         self.pubsub = self.redis_client.pubsub()
         self.pubsub.subscribe(self.pubsub_channel)
         logger.info(f"Redis connection established for bot {self.bot_in_db.id}")
@@ -597,6 +681,12 @@ class BotController:
             utterance_size_limit=self.non_streaming_audio_utterance_size_limit(),
             silence_duration_limit=self.non_streaming_audio_silence_duration_limit(),
         )
+        # Segments the per participant audio and saves the utterances on its own thread, so slow database writes don't hold up the main loop
+        self.audio_segmentation_worker = AudioSegmentationWorker(
+            audio_input_manager=self.per_participant_non_streaming_audio_input_manager,
+            on_error_callback=self.on_audio_segmentation_worker_error,
+        )
+        self.audio_segmentation_worker.start()
 
         self.per_participant_streaming_audio_input_manager = PerParticipantStreamingAudioInputManager(
             save_utterance_callback=self.save_individual_audio_utterance,
@@ -632,6 +722,8 @@ class BotController:
                 output_format=self.get_gstreamer_output_format(),
                 sink_type=self.get_gstreamer_sink_type(),
                 file_location=self.get_recording_file_location(),
+                fragmented_mp4=self.should_record_fragmented_mp4(),
+                adaptive_frame_rate=settings.GSTREAMER_ADAPTIVE_FRAME_RATE_ENABLED,
             )
             self.gstreamer_pipeline.setup()
 
@@ -641,14 +733,38 @@ class BotController:
                 file_location=self.get_recording_file_location(),
                 recording_dimensions=self.bot_in_db.recording_dimensions(),
                 audio_only=not (self.pipeline_configuration.record_video or self.pipeline_configuration.rtmp_stream_video),
+                fragmented_mp4=self.should_record_fragmented_mp4(),
             )
 
+        # Upload the recording file while it's being written, so most of it is in storage by the time the meeting ends
+        self.recording_file_streamer = None
+        if self.should_stream_recording_upload():
+            self.recording_file_streamer = StreamingFileUploader(
+                file_path=self.get_recording_file_location(),
+                streaming_uploader=StreamingUploader(
+                    bucket=os.environ.get("AWS_RECORDING_STORAGE_BUCKET_NAME"),
+                    key=self.get_recording_filename(),
+                    endpoint_url=os.environ.get("AWS_ENDPOINT_URL"),
+                ),
+            )
+            self.recording_file_streamer.start()
+
         self.websocket_audio_client = None
+        self.websocket_audio_resampler = None
+        self.websocket_audio_uses_binary_frames = False
         if self.should_create_websocket_client():
             self.websocket_audio_client = BotWebsocketClient(
                 url=self.bot_in_db.websocket_audio_url(),
                 on_message_callback=self.on_message_from_websocket_audio,
+                max_queued_messages=settings.WEBSOCKET_SEND_QUEUE_MAX_MESSAGES,
+                overflow_policy=settings.WEBSOCKET_SEND_QUEUE_OVERFLOW_POLICY,
+                overflow_block_ms=settings.WEBSOCKET_SEND_QUEUE_BLOCK_MS,
             )
+            self.websocket_audio_resampler = StreamingResampler(
+                src_rate=self.mixed_audio_sample_rate(),
+                dst_rate=self.bot_in_db.websocket_audio_sample_rate(),
+            )
+            self.websocket_audio_uses_binary_frames = self.bot_in_db.websocket_audio_framing() == "binary"
 
         self.adapter = self.get_bot_adapter()
 
@@ -656,6 +772,7 @@ class BotController:
             currently_playing_audio_media_request_finished_callback=self.currently_playing_audio_media_request_finished,
             play_raw_audio_callback=self.adapter.send_raw_audio,
             sleep_time_between_chunks_seconds=self.get_sleep_time_between_audio_output_chunks_seconds(),
+            currently_playing_audio_media_request_failed_to_play_callback=self.currently_playing_audio_media_request_failed_to_play,
         )
 
         self.realtime_audio_output_manager = RealtimeAudioOutputManager(
@@ -670,7 +787,14 @@ class BotController:
             play_video_callback=self.adapter.send_video,
         )
 
-        self.bot_resource_snapshot_taker = BotResourceSnapshotTaker(self.bot_in_db)
+        self.bot_resource_snapshot_taker = BotResourceSnapshotTaker(
+            self.bot_in_db,
+            extra_data_callbacks={
+                "websocket_audio_send_queue": self.get_websocket_audio_send_queue_metrics,
+                "gstreamer_pipeline": self.get_gstreamer_pipeline_metrics,
+                "rtmp_client": self.get_rtmp_client_metrics,
+            },
+        )
 
         # Create GLib main loop
         self.main_loop = GLib.MainLoop()
@@ -764,6 +888,11 @@ class BotController:
         BotMediaRequestManager.set_media_request_finished(audio_media_request)
         self.take_action_based_on_audio_media_requests_in_db()
 
+    def currently_playing_audio_media_request_failed_to_play(self, audio_media_request):
+        logger.info("currently_playing_audio_media_request_failed_to_play called")
+        BotMediaRequestManager.set_media_request_failed_to_play(audio_media_request)
+        self.take_action_based_on_audio_media_requests_in_db()
+
     def currently_playing_video_media_request_finished(self, video_media_request):
         logger.info("currently_playing_video_media_request_finished called")
         BotMediaRequestManager.set_media_request_finished(video_media_request)
@@ -771,9 +900,15 @@ class BotController:
 
     def take_action_based_on_audio_media_requests_in_db(self):
         media_type = BotMediaRequestMediaTypes.AUDIO
-        oldest_enqueued_media_request = self.bot_in_db.media_requests.filter(state=BotMediaRequestStates.ENQUEUED, media_type=media_type).order_by("created_at").first()
-        if not oldest_enqueued_media_request:
+        enqueued_media_requests = list(self.bot_in_db.media_requests.filter(state=BotMediaRequestStates.ENQUEUED, media_type=media_type).order_by("created_at")[: self.AUDIO_MEDIA_REQUESTS_TO_PREPARE_AHEAD + 1])
+        if not enqueued_media_requests:
             return
+        oldest_enqueued_media_request = enqueued_media_requests[0]
+
+        # Decode or synthesize what's coming up while something else plays
+        for enqueued_media_request in enqueued_media_requests:
+            self.audio_output_manager.prepare_audio_media_request(enqueued_media_request)
+
         currently_playing_media_request = self.bot_in_db.media_requests.filter(state=BotMediaRequestStates.PLAYING, media_type=media_type).first()
         if currently_playing_media_request:
             logger.info(f"Currently playing media request {currently_playing_media_request.id} so cannot play another media request")
@@ -857,6 +992,9 @@ class BotController:
     def handle_redis_message(self, message):
         if message and message["type"] == "message":
             data = json.loads(message["data"].decode("utf-8"))
+            if "ack" in data:
+                # Our own acknowledgement of an earlier command
+                return
             command = data.get("command")
 
             if command == "sync":
@@ -882,6 +1020,16 @@ class BotController:
             else:
                 logger.info(f"Unknown command: {command}")
 
+            if data.get("command_id"):
+                self.acknowledge_redis_command(data["command_id"])
+
+    def acknowledge_redis_command(self, command_id):
+        # Lets whoever sent the command with send_sync_command_and_wait_for_ack know it's been handled
+        try:
+            self.redis_client.publish(self.pubsub_channel, json.dumps({"ack": command_id}))
+        except Exception as e:
+            logger.info(f"Error acknowledging command {command_id}: {e}")
+
     def pause_recording(self):
         if not BotEventManager.is_state_that_can_pause_recording(self.bot_in_db.state):
             logger.info(f"Bot {self.bot_in_db.object_id} is in state {BotStates.state_to_api_code(self.bot_in_db.state)} and cannot pause recording")
@@ -890,6 +1038,7 @@ class BotController:
         if not pause_recording_success:
             logger.error(f"Failed to pause recording for bot {self.bot_in_db.object_id}")
             return
+        self.recording_paused = True
         self.adapter.pause_recording()
         BotEventManager.create_event(
             bot=self.bot_in_db,
@@ -904,6 +1053,7 @@ class BotController:
         if not resume_recording_success:
             logger.error(f"Failed to resume recording for bot {self.bot_in_db.object_id}")
             return
+        self.recording_paused = False
         self.adapter.resume_recording()
         BotEventManager.create_event(
             bot=self.bot_in_db,
@@ -925,9 +1075,6 @@ class BotController:
             # Set heartbeat
             self.set_bot_heartbeat()
 
-            # Process audio chunks
-            self.per_participant_non_streaming_audio_input_manager.process_chunks()
-
             # Monitor transcription
             self.per_participant_streaming_audio_input_manager.monitor_transcription()
 
@@ -972,6 +1119,9 @@ class BotController:
             logger.info(traceback.format_exc())
         self.cleanup()
 
+    def on_audio_segmentation_worker_error(self, e):
+        GLib.idle_add(lambda: self.handle_exception_in_timeout_callback(e))
+
     def get_recording_in_progress(self):
         return RecordingManager.get_recording_in_progress(self.bot_in_db)
 
@@ -1036,11 +1186,15 @@ class BotController:
             logger.warning("Warning: No recording in progress found so cannot save individual audio utterance.")
             return
 
+        # Spool the audio to utterance audio storage so the utterance row only holds a reference to it
+        audio_file_name = Utterance.save_audio_to_storage(recording_in_progress, message["audio_data"])
+
         utterance = Utterance.objects.create(
             source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
             recording=recording_in_progress,
             participant=participant,
-            audio_blob=message["audio_data"],
+            audio_file=audio_file_name,
+            audio_size_bytes=len(message["audio_data"]),
             audio_format=Utterance.AudioFormat.PCM,
             timestamp_ms=message["timestamp_ms"] - self.get_per_participant_audio_utterance_delay_ms(),
             duration_ms=len(message["audio_data"]) / ((message["sample_rate"] / 1000) * 2),
@@ -1050,6 +1204,10 @@ class BotController:
         # Set the recording transcription in progress
         RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
 
+        # When the transcription worker is enabled, it picks up pending utterances from the database on its own
+        if settings.TRANSCRIPTION_WORKER_ENABLED:
+            return
+
         # Process the utterance immediately
         process_utterance.delay(utterance.id)
         return
@@ -1145,7 +1303,11 @@ class BotController:
         GLib.idle_add(lambda: self.take_action_based_on_message_from_adapter(message))
 
     def flush_utterances(self):
-        if self.per_participant_non_streaming_audio_input_manager:
+        if self.audio_segmentation_worker and self.audio_segmentation_worker.is_running():
+            logger.info("Flushing utterances...")
+            if not self.audio_segmentation_worker.flush_utterances():
+                logger.warning("Timed out waiting for the audio segmentation worker to flush utterances")
+        elif self.per_participant_non_streaming_audio_input_manager:
             logger.info("Flushing utterances...")
             self.per_participant_non_streaming_audio_input_manager.flush_utterances()
         if self.closed_caption_manager:
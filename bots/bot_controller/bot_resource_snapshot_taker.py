@@ -1,5 +1,6 @@
 import datetime
 import logging
+from typing import Callable
 
 from django.utils import timezone
 
@@ -101,14 +102,18 @@ class BotResourceSnapshotTaker:
     A class to handle taking snapshots of bot resource usage (CPU, RAM).
     """
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, extra_data_callbacks: dict[str, Callable[[], dict | None]] | None = None):
         """
         Initializes the snapshot taker for a specific bot.
 
         It fetches the last snapshot time from the database once upon creation to
         minimize database queries.
+
+        extra_data_callbacks maps a key in the snapshot data to a callback that returns
+        more metrics to save under it, or None to leave it out.
         """
         self.bot = bot
+        self.extra_data_callbacks = extra_data_callbacks or {}
         self._last_snapshot_time = timezone.now()
         self._first_cpu_usage_millicores = None
         self._first_cpu_usage_sample_time = None
@@ -164,6 +169,15 @@ class BotResourceSnapshotTaker:
             "cpu_usage_millicores": cpu_usage_millicores_delta_per_second,
         }
 
+        for key, extra_data_callback in self.extra_data_callbacks.items():
+            try:
+                extra_data = extra_data_callback()
+            except Exception as e:
+                logger.error(f"Error getting {key} for resource snapshot of bot {self.bot.object_id}: {e}")
+                continue
+            if extra_data is not None:
+                snapshot_data[key] = extra_data
+
         BotResourceSnapshot.objects.create(bot=self.bot, data=snapshot_data)
 
         logger.info(f"Saved resource snapshot for bot {self.bot.object_id}: {snapshot_data}")
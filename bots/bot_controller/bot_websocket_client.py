@@ -1,13 +1,17 @@
 import json
 import logging
 import time
-from queue import Empty, SimpleQueue
+from queue import Empty
 from threading import Lock, Thread
 from typing import Callable
 
 from websockets import ConnectionClosed
 from websockets.sync.client import connect
 
+from bots.websocket_payloads import can_coalesce_binary_frames, coalesce_binary_frames
+
+from .bounded_send_queue import BoundedSendQueue, SendQueueOverflowPolicy
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,7 +29,14 @@ class BotWebsocketClient:
     FAILED = "FAILED"
     STOPPED = "STOPPED"
 
-    def __init__(self, url: str, on_message_callback: Callable[[dict], None]):
+    def __init__(
+        self,
+        url: str,
+        on_message_callback: Callable[[dict], None],
+        max_queued_messages: int = 1000,
+        overflow_policy: str = SendQueueOverflowPolicy.DROP_OLDEST,
+        overflow_block_ms: int = 20,
+    ):
         self.on_message_callback = on_message_callback
         self.websocket_url = url
         self.websocket = None
@@ -34,10 +45,13 @@ class BotWebsocketClient:
         self.connection_thread = None
         self.recv_loop_thread = None
         self.send_loop_thread = None
-        self.send_queue = SimpleQueue()
+        # Bounded, so a slow server makes the bot drop messages instead of running out of memory
+        self.send_queue = BoundedSendQueue(max_messages=max_queued_messages, overflow_policy=overflow_policy, block_ms=overflow_block_ms)
 
         self._max_retries = 30
         self._retry_delay_s = 10
+        # When binary frames back up in the send queue, they are joined into frames of up to this size
+        self.max_coalesced_frame_bytes = 65536
         self.dropped_message_ticker = 0
         self._start_connection_lock = Lock()
 
@@ -62,14 +76,24 @@ class BotWebsocketClient:
         finally:
             self.connection_state = self.STOPPED
 
-    def send_async(self, message: dict):
+    def send_async(self, message: dict | bytes):
         if self.connection_state == self.CONNECTED:
+            dropped_count = self.send_queue.dropped_count
             self.send_queue.put(message)
+            if self.send_queue.dropped_count > dropped_count and dropped_count % 1000 == 0:
+                logger.warning("BotWebsocketClient send queue is full, it has dropped %d messages with policy %s", self.send_queue.dropped_count, self.send_queue.overflow_policy)
         else:
             if self.dropped_message_ticker % 1000 == 0:
                 logger.warning("BotWebsocketClient is not connected, it is in state %s, dropping message", self.connection_state)
             self.dropped_message_ticker += 1
 
+    def metrics(self, reset_window: bool = False) -> dict:
+        """Send queue metrics, see BoundedSendQueue.metrics"""
+        return {
+            **self.send_queue.metrics(reset_window=reset_window),
+            "dropped_while_disconnected_count": self.dropped_message_ticker,
+        }
+
     # --------------------------------------------------------------------- #
     #  Internal helpers                                                     #
     # --------------------------------------------------------------------- #
@@ -137,19 +161,51 @@ class BotWebsocketClient:
     # --------------------------------------------------------------------- #
     #  Worker threads                                                       #
     # --------------------------------------------------------------------- #
+    def _coalesce_queued_binary_frames(self, frame: bytes):
+        """
+        Join the binary frames queued behind this one onto it, so a backlog goes out in fewer, larger frames.
+        Returns the frame to send, and the message that ended the run of frames if it was taken off the queue.
+        """
+        frames = [frame]
+        frames_size = len(frame)
+        while frames_size < self.max_coalesced_frame_bytes:
+            try:
+                next_message = self.send_queue.get_nowait()
+            except Empty:
+                break
+
+            if not isinstance(next_message, bytes) or not can_coalesce_binary_frames(frame, next_message):
+                return coalesce_binary_frames(frames), next_message
+
+            frames.append(next_message)
+            frames_size += len(next_message)
+
+        return coalesce_binary_frames(frames), None
+
     def send_loop(self):
         logger.info("BotWebsocketClient send loop started")
+        next_message = None
         while self.connection_state == self.CONNECTED:
-            try:
-                message = self.send_queue.get(timeout=1)
-            except Empty:
-                continue  # nothing queued yet
+            if next_message is not None:
+                message, next_message = next_message, None
+            else:
+                try:
+                    message = self.send_queue.get(timeout=1)
+                except Empty:
+                    continue  # nothing queued yet
+
+            if isinstance(message, bytes):
+                data, next_message = self._coalesce_queued_binary_frames(message)
+            else:
+                data = json.dumps(message)
 
             try:
-                self.websocket.send(json.dumps(message))
+                self.websocket.send(data)
             except Exception as e:
+                self.send_queue.forget_taken()
                 logger.info("BotWebsocketClient send failed (%s). Leaving loop.", e)
                 break
+            self.send_queue.record_sent()
 
         logger.info("BotWebsocketClient send loop exited")
         self._trigger_reconnect()
@@ -0,0 +1,143 @@
+import time
+from collections import deque
+from queue import Empty
+from threading import Condition
+
+
+class SendQueueOverflowPolicy:
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    BLOCK = "block"
+
+    @classmethod
+    def values(cls):
+        return [cls.DROP_OLDEST, cls.DROP_NEWEST, cls.BLOCK]
+
+
+# How many recent send latencies the percentiles are taken over
+LATENCY_SAMPLE_COUNT = 2048
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))], 1)
+
+
+class BoundedSendQueue:
+    """
+    A fixed size ring buffer of messages waiting to be sent, for a single consumer thread. When it is full, put() makes room
+    according to the overflow policy: drop the oldest message, drop the new message, or wait up to block_ms
+    for the consumer to catch up and then drop the new message.
+    Also keeps the metrics that tell whether the consumer is keeping up: depth, high-water mark, drops and how long
+    messages wait between put() and being sent.
+    """
+
+    def __init__(self, max_messages: int, overflow_policy: str = SendQueueOverflowPolicy.DROP_OLDEST, block_ms: int = 0):
+        if max_messages < 1:
+            raise ValueError("max_messages must be at least 1")
+        if overflow_policy not in SendQueueOverflowPolicy.values():
+            raise ValueError(f"Invalid overflow policy {overflow_policy}")
+
+        self.max_messages = max_messages
+        self.overflow_policy = overflow_policy
+        self.block_ms = block_ms
+
+        self._messages = deque()
+        self._condition = Condition()
+
+        self.high_water_mark = 0
+        self.dropped_oldest_count = 0
+        self.dropped_newest_count = 0
+        # When each message that has been taken off the queue but not sent yet was put on it
+        self._taken_enqueue_times = []
+        self._send_latencies_ms = deque(maxlen=LATENCY_SAMPLE_COUNT)
+
+    def qsize(self):
+        return len(self._messages)
+
+    def empty(self):
+        return not self._messages
+
+    @property
+    def dropped_count(self):
+        return self.dropped_oldest_count + self.dropped_newest_count
+
+    def put(self, message) -> bool:
+        """Queue the message. Returns False if the message was dropped."""
+        with self._condition:
+            if len(self._messages) >= self.max_messages:
+                if self.overflow_policy == SendQueueOverflowPolicy.DROP_OLDEST:
+                    self._messages.popleft()
+                    self.dropped_oldest_count += 1
+                elif self.overflow_policy == SendQueueOverflowPolicy.BLOCK:
+                    deadline = time.monotonic() + self.block_ms / 1000
+                    while len(self._messages) >= self.max_messages:
+                        remaining_seconds = deadline - time.monotonic()
+                        if remaining_seconds <= 0:
+                            self.dropped_newest_count += 1
+                            return False
+                        self._condition.wait(remaining_seconds)
+                else:
+                    self.dropped_newest_count += 1
+                    return False
+
+            self._messages.append((time.monotonic(), message))
+            self.high_water_mark = max(self.high_water_mark, len(self._messages))
+            self._condition.notify_all()
+            return True
+
+    def get(self, timeout: float | None = None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._messages, timeout):
+                raise Empty
+            return self._take()
+
+    def get_nowait(self):
+        with self._condition:
+            if not self._messages:
+                raise Empty
+            return self._take()
+
+    def _take(self):
+        enqueue_time, message = self._messages.popleft()
+        self._taken_enqueue_times.append(enqueue_time)
+        # Wake up a producer waiting for room
+        self._condition.notify_all()
+        return message
+
+    def record_sent(self):
+        """Call once the messages taken off the queue so far have been sent, to record how long they waited"""
+        now = time.monotonic()
+        with self._condition:
+            self._send_latencies_ms.extend((now - enqueue_time) * 1000 for enqueue_time in self._taken_enqueue_times)
+            self._taken_enqueue_times.clear()
+
+    def forget_taken(self):
+        """Call when the messages taken off the queue could not be sent"""
+        with self._condition:
+            self._taken_enqueue_times.clear()
+
+    def metrics(self, reset_window: bool = False) -> dict:
+        """
+        The current metrics. The high-water mark and latency percentiles cover the window since the last reset,
+        drop counts are totals.
+        """
+        with self._condition:
+            sorted_latencies = sorted(self._send_latencies_ms)
+            metrics = {
+                "depth": len(self._messages),
+                "max_messages": self.max_messages,
+                "overflow_policy": self.overflow_policy,
+                "high_water_mark": self.high_water_mark,
+                "dropped_oldest_count": self.dropped_oldest_count,
+                "dropped_newest_count": self.dropped_newest_count,
+                "send_latency_ms_p50": percentile(sorted_latencies, 0.5),
+                "send_latency_ms_p95": percentile(sorted_latencies, 0.95),
+                "send_latency_ms_p99": percentile(sorted_latencies, 0.99),
+                "send_latency_ms_max": percentile(sorted_latencies, 1),
+            }
+            if reset_window:
+                self.high_water_mark = len(self._messages)
+                self._send_latencies_ms.clear()
+            return metrics
@@ -6,6 +6,8 @@ import time
 
 from gi.repository import GLib, Gst
 
+from .gstreamer_pipeline_telemetry import FrameRateAdapter, PipelineTelemetry
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +22,8 @@ class GstreamerPipeline:
     SINK_TYPE_APPSINK = "appsink"
     SINK_TYPE_FILE = "filesink"
 
+    TELEMETRY_SAMPLE_INTERVAL_SECONDS = 1
+
     def __init__(
         self,
         *,
@@ -29,6 +33,8 @@ class GstreamerPipeline:
         output_format,
         sink_type,
         file_location=None,
+        fragmented_mp4=False,
+        adaptive_frame_rate=False,
     ):
         self.on_new_sample_callback = on_new_sample_callback
         self.video_frame_size = video_frame_size
@@ -36,6 +42,8 @@ class GstreamerPipeline:
         self.output_format = output_format
         self.sink_type = sink_type
         self.file_location = file_location
+        self.fragmented_mp4 = fragmented_mp4
+        self.adaptive_frame_rate = adaptive_frame_rate
 
         self.pipeline = None
         self.appsrc = None
@@ -52,6 +60,13 @@ class GstreamerPipeline:
         self.queue_drops = {}
         self.last_reported_drops = {}
 
+        self.telemetry = PipelineTelemetry()
+        self.frame_rate_adapter = None
+        # While the frame rate is lowered, frames are pushed this far apart and videorate repeats the previous frame in between
+        self.video_frame_interval_ns = 0
+        self.next_video_frame_pts = 0
+        self.queues = {}
+
     def on_new_sample_from_appsink(self, sink):
         """Handle new samples from the appsink"""
         sample = sink.emit("pull-sample")
@@ -67,7 +82,11 @@ class GstreamerPipeline:
         self.start_time_ns = None
 
         # Setup muxer based on output format
-        if self.output_format == self.OUTPUT_FORMAT_MP4:
+        if self.output_format == self.OUTPUT_FORMAT_MP4 and self.fragmented_mp4:
+            # One second fragments, so the file can be played while it's written and survives the bot dying. At EOS mp4mux
+            # only goes back to fill in the duration in the moov atom at the start of the file, and appends an mfra index.
+            muxer_string = "mp4mux name=muxer fragment-duration=1000"
+        elif self.output_format == self.OUTPUT_FORMAT_MP4:
             muxer_string = "mp4mux name=muxer"
         elif self.output_format == self.OUTPUT_FORMAT_FLV:
             muxer_string = "h264parse ! flvmux name=muxer streamable=true"
@@ -78,6 +97,12 @@ class GstreamerPipeline:
         else:
             raise ValueError(f"Invalid output format: {self.output_format}")
 
+        # Fragments start on a keyframe, so fragmented files get one a second
+        if self.output_format == self.OUTPUT_FORMAT_MP4 and self.fragmented_mp4:
+            video_encoder_string = "x264enc name=encoder tune=zerolatency speed-preset=ultrafast key-int-max=30"
+        else:
+            video_encoder_string = "x264enc name=encoder tune=zerolatency speed-preset=ultrafast"
+
         if self.sink_type == self.SINK_TYPE_APPSINK:
             sink_string = "appsink name=sink emit-signals=true sync=false drop=false "
         elif self.sink_type == self.SINK_TYPE_FILE:
@@ -106,9 +131,9 @@ class GstreamerPipeline:
                 "appsrc name=video_source do-timestamp=false stream-type=0 format=time ! "
                 "queue name=q1 max-size-buffers=1000 max-size-bytes=100000000 max-size-time=0 ! "  # q1 can contain 100mb of video before it drops
                 "videoconvert ! "
-                "videorate ! "
+                "videorate name=videorate ! "
                 "queue name=q2 max-size-buffers=5000 max-size-bytes=500000000 max-size-time=0 ! "  # q2 can contain 100mb of video before it drops
-                "x264enc tune=zerolatency speed-preset=ultrafast ! "
+                f"{video_encoder_string} ! "
                 "queue name=q3 max-size-buffers=1000 max-size-bytes=100000000 max-size-time=0 ! "
                 f"{muxer_string} ! queue name=q4 ! {sink_string} "
                 f"{audio_source_string} "
@@ -166,6 +191,7 @@ class GstreamerPipeline:
         # Initialize queue monitoring
         self.queue_drops = {}
         self.last_reported_drops = {}
+        self.queues = {}
 
         # Find all queue elements and connect drop signals
         iterator = self.pipeline.iterate_elements()
@@ -180,10 +206,78 @@ class GstreamerPipeline:
                 queue_name = element.get_name()
                 self.queue_drops[queue_name] = 0
                 self.last_reported_drops[queue_name] = 0
+                self.queues[queue_name] = element
                 element.connect("overrun", self.on_queue_overrun, queue_name)
 
+        self.setup_telemetry()
+
         # Start statistics monitoring
         GLib.timeout_add_seconds(15, self.monitor_pipeline_stats)
+        GLib.timeout_add_seconds(self.TELEMETRY_SAMPLE_INTERVAL_SECONDS, self.sample_telemetry)
+
+    def setup_telemetry(self):
+        self.telemetry = PipelineTelemetry()
+        self.video_frame_interval_ns = 0
+        self.next_video_frame_pts = 0
+
+        # Time each frame through the encoder by its pts, which x264enc with tune=zerolatency passes through unchanged
+        encoder = self.pipeline.get_by_name("encoder")
+        if encoder:
+            encoder.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self.on_encoder_sink_buffer)
+            encoder.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self.on_encoder_src_buffer)
+
+        self.frame_rate_adapter = None
+        if self.adaptive_frame_rate and self.appsrc:
+            self.frame_rate_adapter = FrameRateAdapter(set_frame_rate_callback=self.set_video_frame_rate)
+
+    def on_encoder_sink_buffer(self, pad, info):
+        self.telemetry.on_encoder_input(info.get_buffer().pts)
+        return Gst.PadProbeReturn.OK
+
+    def on_encoder_src_buffer(self, pad, info):
+        self.telemetry.on_encoder_output(info.get_buffer().pts)
+        return Gst.PadProbeReturn.OK
+
+    def get_queue_fill(self, queue):
+        """How full the queue is, from 0 to 1, by whichever of its limits it is closest to"""
+        fill = 0
+        for level_property, max_size_property in [("current-level-buffers", "max-size-buffers"), ("current-level-bytes", "max-size-bytes"), ("current-level-time", "max-size-time")]:
+            max_size = queue.get_property(max_size_property)
+            if max_size:
+                fill = max(fill, queue.get_property(level_property) / max_size)
+        return fill
+
+    def sample_telemetry(self):
+        """Periodically sample the queue and appsrc levels and let the frame rate adapter react to them"""
+        if not self.recording_active:
+            return False
+
+        try:
+            videorate = self.pipeline.get_by_name("videorate")
+            self.telemetry.record_levels(
+                queue_fill={queue_name: self.get_queue_fill(queue) for queue_name, queue in self.queues.items()},
+                appsrc_bytes_queued=sum(appsrc.get_property("current-level-bytes") for appsrc in [self.appsrc, *self.audio_appsrcs] if appsrc),
+                videorate_dropped_count=videorate.get_property("drop") if videorate else 0,
+                videorate_duplicated_count=videorate.get_property("duplicate") if videorate else 0,
+            )
+            max_encoder_latency_ms, queue_fill = self.telemetry.take_sample()
+            if self.frame_rate_adapter:
+                self.frame_rate_adapter.on_sample(max_encoder_latency_ms, queue_fill)
+        except Exception as e:
+            logger.info(f"Error sampling pipeline telemetry: {e}")
+
+        return True  # Continue timer
+
+    def set_video_frame_rate(self, frame_rate):
+        logger.info(f"Pipeline telemetry crossed a threshold, recording video at {frame_rate} fps")
+        self.video_frame_interval_ns = 0 if frame_rate >= 30 else Gst.SECOND // frame_rate
+
+    def metrics(self, reset_window: bool = False) -> dict:
+        """Pipeline telemetry, see PipelineTelemetry.metrics"""
+        return {
+            **self.telemetry.metrics(reset_window=reset_window),
+            "video_frame_rate": self.frame_rate_adapter.frame_rate if self.frame_rate_adapter else None,
+        }
 
     def on_pipeline_message(self, bus, message):
         """Handle pipeline messages"""
@@ -218,6 +312,7 @@ class GstreamerPipeline:
     def on_queue_overrun(self, queue, queue_name):
         """Callback for when a queue drops buffers"""
         self.queue_drops[queue_name] += 1
+        self.telemetry.on_queue_overrun(queue_name)
         return True
 
     def on_mixed_audio_raw_data_received_callback(self, data, timestamp=None, audio_appsrc_idx=0):
@@ -259,6 +354,19 @@ class GstreamerPipeline:
             # Calculate buffer timestamp relative to start time
             buffer_pts = current_time_ns - self.start_time_ns
 
+            # While the frame rate is lowered, leave out frames that come before the next one is due. Due times are spaced
+            # evenly, rather than from the last frame pushed, so jitter in the frame timestamps doesn't lower the rate further.
+            if self.video_frame_interval_ns:
+                if buffer_pts < self.next_video_frame_pts:
+                    self.telemetry.on_video_frame_left_out()
+                    return
+                self.next_video_frame_pts = max(self.next_video_frame_pts + self.video_frame_interval_ns, buffer_pts)
+
+            # Scaled frames come as a memoryview of a buffer that gets reused for the next frame. PyGObject only copies
+            # bytes in one go, so turn it into bytes here rather than have it read the memoryview one element at a time.
+            if isinstance(frame, memoryview):
+                frame = frame.tobytes()
+
             # Create buffer with timestamp
             buffer = Gst.Buffer.new_wrapped(frame)
             buffer.pts = buffer_pts
@@ -268,6 +376,7 @@ class GstreamerPipeline:
 
             # Push buffer to pipeline
             ret = self.appsrc.emit("push-buffer", buffer)
+            self.telemetry.on_video_frame_pushed(ret == Gst.FlowReturn.OK)
             if ret != Gst.FlowReturn.OK:
                 logger.info(f"Warning: Failed to push buffer to pipeline: {ret}")
 
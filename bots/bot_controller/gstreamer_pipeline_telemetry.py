@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .bounded_send_queue import percentile
+
+# How many recent encoder latencies the percentiles are taken over
+LATENCY_SAMPLE_COUNT = 2048
+# Frames that went into the encoder and haven't come out yet. Past this many, the oldest are forgotten.
+MAX_PENDING_ENCODER_FRAMES = 1024
+# A frame that takes longer than this to come out of the encoder counts as late
+LATE_FRAME_LATENCY_MS = 500
+
+
+class PipelineTelemetry:
+    """
+    Numbers that tell whether the pipeline is keeping up with the meeting: how full its queues and the video appsrc are,
+    how long frames take to get through the encoder, how many frames it encodes a second and how many were dropped or
+    late. GstreamerPipeline feeds it from pad probes, signals and a periodic sample of the element properties, which can
+    happen on different threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # Totals
+        self.frames_pushed_count = 0
+        self.frames_push_failed_count = 0
+        self.frames_left_out_count = 0
+        self.frames_encoded_count = 0
+        self.late_frame_count = 0
+        self.queue_overrun_counts = {}
+        self.videorate_dropped_count = 0
+        self.videorate_duplicated_count = 0
+
+        # Current levels, as of the last sample
+        self.queue_fill = {}
+        self.appsrc_bytes_queued = 0
+
+        # Window since the last reset
+        self._window_start_time = time.monotonic()
+        self._window_frames_encoded_count = 0
+        self._window_max_queue_fill = {}
+        self._window_max_appsrc_bytes_queued = 0
+        self._encoder_latencies_ms = deque(maxlen=LATENCY_SAMPLE_COUNT)
+
+        # Since the last take_sample()
+        self._sample_max_encoder_latency_ms = None
+
+        # Buffer pts -> when it went into the encoder
+        self._pending_encoder_frames = OrderedDict()
+
+    def on_video_frame_pushed(self, succeeded):
+        with self._lock:
+            if succeeded:
+                self.frames_pushed_count += 1
+            else:
+                self.frames_push_failed_count += 1
+
+    def on_video_frame_left_out(self):
+        """A frame that wasn't pushed because the frame rate was lowered"""
+        with self._lock:
+            self.frames_left_out_count += 1
+
+    def on_queue_overrun(self, queue_name):
+        with self._lock:
+            self.queue_overrun_counts[queue_name] = self.queue_overrun_counts.get(queue_name, 0) + 1
+
+    def on_encoder_input(self, pts, now=None):
+        with self._lock:
+            self._pending_encoder_frames[pts] = time.monotonic() if now is None else now
+            if len(self._pending_encoder_frames) > MAX_PENDING_ENCODER_FRAMES:
+                self._pending_encoder_frames.popitem(last=False)
+
+    def on_encoder_output(self, pts, now=None):
+        with self._lock:
+            self.frames_encoded_count += 1
+            self._window_frames_encoded_count += 1
+            input_time = self._pending_encoder_frames.pop(pts, None)
+            if input_time is None:
+                return
+            latency_ms = ((time.monotonic() if now is None else now) - input_time) * 1000
+            self._encoder_latencies_ms.append(latency_ms)
+            if latency_ms > LATE_FRAME_LATENCY_MS:
+                self.late_frame_count += 1
+            if self._sample_max_encoder_latency_ms is None or latency_ms > self._sample_max_encoder_latency_ms:
+                self._sample_max_encoder_latency_ms = latency_ms
+
+    def record_levels(self, queue_fill, appsrc_bytes_queued, videorate_dropped_count=0, videorate_duplicated_count=0):
+        """Record a sample of the element properties. queue_fill maps each queue's name to how full it is, from 0 to 1."""
+        with self._lock:
+            self.queue_fill = dict(queue_fill)
+            for queue_name, fill in queue_fill.items():
+                self._window_max_queue_fill[queue_name] = max(fill, self._window_max_queue_fill.get(queue_name, 0))
+            self.appsrc_bytes_queued = appsrc_bytes_queued
+            self._window_max_appsrc_bytes_queued = max(appsrc_bytes_queued, self._window_max_appsrc_bytes_queued)
+            self.videorate_dropped_count = videorate_dropped_count
+            self.videorate_duplicated_count = videorate_duplicated_count
+
+    def take_sample(self):
+        """The worst encoder latency since the last call, or None if no frames came out of the encoder, and how full the fullest queue is"""
+        with self._lock:
+            max_encoder_latency_ms = self._sample_max_encoder_latency_ms
+            self._sample_max_encoder_latency_ms = None
+            return max_encoder_latency_ms, max(self.queue_fill.values(), default=0)
+
+    def metrics(self, reset_window: bool = False) -> dict:
+        """
+        The current metrics. Encoder latency percentiles, encoded frames per second and the maximum queue and appsrc levels
+        cover the window since the last reset, counts are totals.
+        """
+        with self._lock:
+            now = time.monotonic()
+            window_seconds = now - self._window_start_time
+            sorted_latencies = sorted(self._encoder_latencies_ms)
+            metrics = {
+                "frames_pushed_count": self.frames_pushed_count,
+                "frames_push_failed_count": self.frames_push_failed_count,
+                "frames_left_out_count": self.frames_left_out_count,
+                "frames_encoded_count": self.frames_encoded_count,
+                "encoded_frames_per_second": round(self._window_frames_encoded_count / window_seconds, 1) if window_seconds > 0 else None,
+                "late_frame_count": self.late_frame_count,
+                "encoder_latency_ms_p50": percentile(sorted_latencies, 0.5),
+                "encoder_latency_ms_p95": percentile(sorted_latencies, 0.95),
+                "encoder_latency_ms_max": percentile(sorted_latencies, 1),
+                "videorate_dropped_count": self.videorate_dropped_count,
+                "videorate_duplicated_count": self.videorate_duplicated_count,
+                "queue_overrun_counts": dict(self.queue_overrun_counts),
+                "queue_fill_max": {queue_name: round(fill, 3) for queue_name, fill in self._window_max_queue_fill.items()},
+                "appsrc_bytes_queued": self.appsrc_bytes_queued,
+                "appsrc_bytes_queued_max": self._window_max_appsrc_bytes_queued,
+            }
+            if reset_window:
+                self._window_start_time = now
+                self._window_frames_encoded_count = 0
+                self._window_max_queue_fill = dict(self.queue_fill)
+                self._window_max_appsrc_bytes_queued = self.appsrc_bytes_queued
+                self._encoder_latencies_ms.clear()
+            return metrics
+
+
+class FrameRateAdapter:
+    """
+    Lowers the recording frame rate while the encoder can't keep up, and raises it again once it has kept up for a while.
+    The encoder is already on x264's fastest preset, so frames are the thing left to cut. The pipeline leaves frames out
+    before its appsrc and videorate repeats the previous frame in their place, which x264 encodes for next to nothing.
+    """
+
+    FRAME_RATES = [30, 20, 15, 10]
+
+    def __init__(self, set_frame_rate_callback, max_encoder_latency_ms=1000, max_queue_fill=0.5, overloaded_samples_to_step_down=5, healthy_samples_to_step_up=60):
+        self.set_frame_rate_callback = set_frame_rate_callback
+        self.max_encoder_latency_ms = max_encoder_latency_ms
+        self.max_queue_fill = max_queue_fill
+        self.overloaded_samples_to_step_down = overloaded_samples_to_step_down
+        self.healthy_samples_to_step_up = healthy_samples_to_step_up
+
+        self.frame_rate_index = 0
+        self.overloaded_sample_count = 0
+        self.healthy_sample_count = 0
+
+    @property
+    def frame_rate(self):
+        return self.FRAME_RATES[self.frame_rate_index]
+
+    def on_sample(self, max_encoder_latency_ms, queue_fill):
+        overloaded = (max_encoder_latency_ms is not None and max_encoder_latency_ms > self.max_encoder_latency_ms) or queue_fill > self.max_queue_fill
+        if overloaded:
+            self.overloaded_sample_count += 1
+            self.healthy_sample_count = 0
+        else:
+            self.healthy_sample_count += 1
+            self.overloaded_sample_count = 0
+
+        if self.overloaded_sample_count >= self.overloaded_samples_to_step_down and self.frame_rate_index < len(self.FRAME_RATES) - 1:
+            self.set_frame_rate_index(self.frame_rate_index + 1)
+        elif self.healthy_sample_count >= self.healthy_samples_to_step_up and self.frame_rate_index > 0:
+            self.set_frame_rate_index(self.frame_rate_index - 1)
+
+    def set_frame_rate_index(self, frame_rate_index):
+        self.frame_rate_index = frame_rate_index
+        self.overloaded_sample_count = 0
+        self.healthy_sample_count = 0
+        self.set_frame_rate_callback(self.frame_rate)
@@ -0,0 +1,51 @@
+import json
+import logging
+import threading
+
+from bots.media_cache import MediaCache
+
+logger = logging.getLogger(__name__)
+
+
+class PcmCache:
+    """
+    Decoded audio, mono 16 bit PCM, kept in the node's media cache so every bot on the node that plays the same media blob
+    or says the same text with the same voice reuses it instead of decoding or synthesizing it again.
+    """
+
+    def __init__(self, media_cache):
+        self.media_cache = media_cache
+        self._lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def media_blob_key(media_blob, sample_rate):
+        return MediaCache.key_for("pcm_s16le_mono", media_blob.checksum, str(sample_rate))
+
+    @staticmethod
+    def text_to_speech_key(text, text_to_speech_settings, sample_rate):
+        return MediaCache.key_for("text_to_speech_pcm_s16le_mono", json.dumps(text_to_speech_settings, sort_keys=True), str(sample_rate), text)
+
+    def get_or_create(self, key, create_pcm):
+        """The cached PCM for key, or what create_pcm() returns, which is cached for next time"""
+        path = self.media_cache.get(key)
+        if path:
+            try:
+                with open(path, "rb") as file:
+                    pcm = file.read()
+                with self._lock:
+                    self.hit_count += 1
+                return pcm
+            except FileNotFoundError:
+                # Evicted since
+                pass
+
+        pcm = create_pcm()
+        with self._lock:
+            self.miss_count += 1
+        try:
+            self.media_cache.put_bytes(key, pcm)
+        except OSError as e:
+            logger.warning(f"Could not cache decoded audio: {e}")
+        return pcm
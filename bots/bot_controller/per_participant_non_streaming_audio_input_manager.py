@@ -1,23 +1,22 @@
 import logging
 import queue
+import threading
 from datetime import datetime, timedelta
 
-import numpy as np
-import webrtcvad
+from .silence_detector import SilenceDetector
 
 logger = logging.getLogger(__name__)
 
-
-def calculate_normalized_rms(audio_bytes):
-    samples = np.frombuffer(audio_bytes, dtype=np.int16)
-    rms = np.sqrt(np.mean(np.square(samples)))
-    # Normalize by max possible value for 16-bit audio (32768)
-    return rms / 32768
+# About 15 seconds of audio for 20 participants talking at once, in 10 ms chunks
+MAX_QUEUED_CHUNKS = 30000
 
 
 class PerParticipantNonStreamingAudioInputManager:
     def __init__(self, *, save_utterance_callback, get_participant_callback, sample_rate, utterance_size_limit, silence_duration_limit):
-        self.queue = queue.Queue()
+        self.queue = queue.Queue(maxsize=MAX_QUEUED_CHUNKS)
+        self.dropped_chunk_count = 0
+        # process_chunks and flush_utterances can be called from different threads
+        self.lock = threading.Lock()
 
         self.save_utterance_callback = save_utterance_callback
         self.get_participant_callback = get_participant_callback
@@ -30,21 +29,42 @@ class PerParticipantNonStreamingAudioInputManager:
 
         self.UTTERANCE_SIZE_LIMIT = utterance_size_limit
         self.SILENCE_DURATION_LIMIT = silence_duration_limit
-        self.vad = webrtcvad.Vad()
+        self.silence_detector = SilenceDetector(sample_rate=sample_rate, rms_threshold=0.01)
 
     def add_chunk(self, speaker_id, chunk_time, chunk_bytes):
-        self.queue.put((speaker_id, chunk_time, chunk_bytes))
+        try:
+            self.queue.put_nowait((speaker_id, chunk_time, chunk_bytes))
+        except queue.Full:
+            if self.dropped_chunk_count % 1000 == 0:
+                logger.warning(f"Per participant audio queue is full, dropping chunk. {self.dropped_chunk_count} chunks dropped so far")
+            self.dropped_chunk_count += 1
 
     def process_chunks(self):
-        while not self.queue.empty():
-            speaker_id, chunk_time, chunk_bytes = self.queue.get()
-            self.process_chunk(speaker_id, chunk_time, chunk_bytes)
+        with self.lock:
+            self._process_chunks()
+
+    def _process_chunks(self):
+        pending_chunks = []
+        while True:
+            try:
+                pending_chunks.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # Detect silence in all the pending chunks at once, then go through them in order
+        audio_is_silent_for_chunks = self.silence_detector.detect_silence([chunk_bytes for _, _, chunk_bytes in pending_chunks])
+        for (speaker_id, chunk_time, chunk_bytes), audio_is_silent in zip(pending_chunks, audio_is_silent_for_chunks):
+            self.process_chunk(speaker_id, chunk_time, chunk_bytes, audio_is_silent)
 
         for speaker_id in list(self.first_nonsilent_audio_time.keys()):
             self.process_chunk(speaker_id, datetime.utcnow(), None)
 
     # When the meeting ends, we need to flush all utterances. Do this by pretending that we received a chunk of silence at the end of the meeting.
     def flush_utterances(self):
+        with self.lock:
+            self._flush_utterances()
+
+    def _flush_utterances(self):
         for speaker_id in list(self.first_nonsilent_audio_time.keys()):
             self.process_chunk(
                 speaker_id,
@@ -53,12 +73,11 @@ class PerParticipantNonStreamingAudioInputManager:
             )
 
     def silence_detected(self, chunk_bytes):
-        if calculate_normalized_rms(chunk_bytes) < 0.01:
-            return True
-        return not self.vad.is_speech(chunk_bytes, self.sample_rate)
+        return self.silence_detector.is_silent(chunk_bytes)
 
-    def process_chunk(self, speaker_id, chunk_time, chunk_bytes):
-        audio_is_silent = self.silence_detected(chunk_bytes) if chunk_bytes else True
+    def process_chunk(self, speaker_id, chunk_time, chunk_bytes, audio_is_silent=None):
+        if audio_is_silent is None:
+            audio_is_silent = self.silence_detected(chunk_bytes) if chunk_bytes else True
 
         # Initialize buffer and timing for new speaker
         if speaker_id not in self.utterances or len(self.utterances[speaker_id]) == 0:
@@ -2,20 +2,12 @@ import logging
 import queue
 import time
 
-import numpy as np
-import webrtcvad
-
 from bots.models import Credentials, TranscriptionProviders
 from bots.transcription_providers.deepgram.deepgram_streaming_transcriber import DeepgramStreamingTranscriber
 
-logger = logging.getLogger(__name__)
-
+from .silence_detector import SilenceDetector
 
-def calculate_normalized_rms(audio_bytes):
-    samples = np.frombuffer(audio_bytes, dtype=np.int16)
-    rms = np.sqrt(np.mean(np.square(samples)))
-    # Normalize by max possible value for 16-bit audio (32768)
-    return rms / 32768
+logger = logging.getLogger(__name__)
 
 
 class PerParticipantStreamingAudioInputManager:
@@ -32,7 +24,7 @@ class PerParticipantStreamingAudioInputManager:
 
         self.SILENCE_DURATION_LIMIT = 10  # seconds
 
-        self.vad = webrtcvad.Vad()
+        self.silence_detector = SilenceDetector(sample_rate=sample_rate, rms_threshold=0.0025)
         self.transcription_provider = transcription_provider
         self.streaming_transcribers = {}
         self.last_nonsilent_audio_time = {}
@@ -42,9 +34,7 @@ class PerParticipantStreamingAudioInputManager:
         self.deepgram_api_key = self.get_deepgram_api_key()
 
     def silence_detected(self, chunk_bytes):
-        if calculate_normalized_rms(chunk_bytes) < 0.0025:
-            return True
-        return not self.vad.is_speech(chunk_bytes, self.sample_rate)
+        return self.silence_detector.is_silent(chunk_bytes)
 
     def get_deepgram_api_key(self):
         deepgram_credentials_record = self.project.credentials.filter(credential_type=Credentials.CredentialTypes.DEEPGRAM).first()
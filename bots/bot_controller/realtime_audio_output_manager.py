@@ -1,4 +1,3 @@
-import audioop
 import logging
 import queue
 import threading
@@ -6,26 +5,9 @@ import time
 
 import numpy as np
 
-logger = logging.getLogger(__name__)
-
-SAMPLE_WIDTH = 2  # 16-bit PCM
-CHANNELS = 1  # mono
-
+from bots.streaming_resampler import StreamingResampler
 
-def _upsample(chunk: bytes, src_rate: int, dst_rate: int) -> bytes:
-    if src_rate == dst_rate:
-        return chunk  # nothing to do
-
-    # state None ⇒ filter state kept inside audioop (per-call ok for small chunks)
-    converted, _ = audioop.ratecv(
-        chunk,  # fragment
-        SAMPLE_WIDTH,  # width
-        CHANNELS,  # nchannels
-        src_rate,  # inrate
-        dst_rate,  # outrate
-        None,  # state
-    )
-    return converted
+logger = logging.getLogger(__name__)
 
 
 class RealtimeAudioOutputManager:
@@ -40,6 +22,8 @@ class RealtimeAudioOutputManager:
         self.thread_lock = threading.Lock()
 
         self.output_sample_rate = output_sample_rate
+        # Only used on the audio thread. Replaced when the input sample rate changes.
+        self.resampler = None
         self.bytes_per_sample = 2
         self.chunk_length_seconds = 0.1
         self.inner_chunk_buffer = b""
@@ -107,16 +91,18 @@ class RealtimeAudioOutputManager:
     def upsample_chunk_to_output_sample_rate(self, chunk, sample_rate):
         # If sample rates are the same, no upsampling needed
         if sample_rate == self.output_sample_rate:
-            return chunk, sample_rate
+            return chunk
 
         # Calculate upsampling ratio
         ratio = self.output_sample_rate // sample_rate
 
         # We can't upsample if the ratio is not an integer
         if self.output_sample_rate % sample_rate != 0 or ratio <= 1:
-            # Use the python upsample function if we have to. Repeating the samples actually performs better
+            # Use the resampler if we have to. Repeating the samples actually performs better
             # but it only works when the ratio is an integer.
-            return _upsample(chunk, sample_rate, self.output_sample_rate)
+            if self.resampler is None or self.resampler.src_rate != sample_rate:
+                self.resampler = StreamingResampler(src_rate=sample_rate, dst_rate=self.output_sample_rate)
+            return self.resampler.process(chunk)
 
         # Convert bytes to 16-bit samples (assuming 16-bit PCM)
         samples = np.frombuffer(chunk, dtype=np.int16)
@@ -1,30 +1,154 @@
 import logging
 import subprocess
+import threading
+import time
+from collections import deque
+
+from .bounded_send_queue import percentile
 
 logger = logging.getLogger(__name__)
 
+# The FLV file header plus the PreviousTagSize0 field that follows it
+FLV_HEADER_SIZE = 9 + 4
+# Tag type, data size, timestamp, extended timestamp and stream id
+FLV_TAG_HEADER_SIZE = 11
+FLV_PREVIOUS_TAG_SIZE_SIZE = 4
+FLV_TAG_TYPE_AUDIO = 8
+FLV_TAG_TYPE_VIDEO = 9
+FLV_TAG_TYPE_SCRIPT = 18
+
+# About 15 seconds of the pipeline's 2 Mbps video and 128 kbps audio
+DEFAULT_MAX_BUFFERED_BYTES = 4 * 1024 * 1024
+# How many recent write delays the percentiles are taken over
+WRITE_DELAY_SAMPLE_COUNT = 2048
+# A connection to ffmpeg that lasts this long counts as successful, and the reconnect attempts start over
+STABLE_CONNECTION_SECONDS = 10
+# Lines of ffmpeg's output kept to log when it exits
+FFMPEG_OUTPUT_LINE_COUNT = 20
+
+
+class FlvTag:
+    __slots__ = ("data", "tag_type", "timestamp_ms", "is_keyframe", "is_codec_config", "enqueued_at")
+
+    def __init__(self, data):
+        self.data = data
+        self.tag_type = data[0] & 0x1F
+        self.timestamp_ms = int.from_bytes(data[4:7], "big") | (data[7] << 24)
+        body = data[FLV_TAG_HEADER_SIZE:]
+        # The upper four bits of a video tag's first byte are the frame type, 1 is a keyframe
+        self.is_keyframe = self.tag_type == FLV_TAG_TYPE_VIDEO and len(body) > 0 and body[0] >> 4 == 1
+        # AVC and AAC sequence headers, which a decoder needs before anything else
+        if self.tag_type == FLV_TAG_TYPE_VIDEO:
+            self.is_codec_config = len(body) > 1 and body[0] & 0x0F == 7 and body[1] == 0
+        elif self.tag_type == FLV_TAG_TYPE_AUDIO:
+            self.is_codec_config = len(body) > 1 and body[0] >> 4 == 10 and body[1] == 0
+        else:
+            self.is_codec_config = False
+        self.enqueued_at = None
+
+
+class FlvTagReader:
+    """Splits an FLV byte stream into its file header and whole tags, however the bytes happen to be chunked."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.header = None
+
+    def feed(self, data):
+        """Add data and return the tags it completed"""
+        self.buffer += data
+        tags = []
+        if self.header is None:
+            if len(self.buffer) < FLV_HEADER_SIZE:
+                return tags
+            if self.buffer[:3] != b"FLV":
+                raise ValueError("Data does not start with an FLV header")
+            header_size = int.from_bytes(self.buffer[5:9], "big") + FLV_PREVIOUS_TAG_SIZE_SIZE
+            if len(self.buffer) < header_size:
+                return tags
+            self.header = bytes(self.buffer[:header_size])
+            del self.buffer[:header_size]
+
+        position = 0
+        while len(self.buffer) - position >= FLV_TAG_HEADER_SIZE:
+            tag_size = FLV_TAG_HEADER_SIZE + int.from_bytes(self.buffer[position + 1 : position + 4], "big") + FLV_PREVIOUS_TAG_SIZE_SIZE
+            if len(self.buffer) - position < tag_size:
+                break
+            tags.append(FlvTag(bytes(self.buffer[position : position + tag_size])))
+            position += tag_size
+        del self.buffer[:position]
+        return tags
+
+
+class GroupOfPictures:
+    """A video keyframe and everything after it up to the next one, the unit that's dropped under backpressure"""
+
+    __slots__ = ("tags", "starts_with_keyframe", "started")
+
+    def __init__(self, starts_with_keyframe):
+        self.tags = deque()
+        self.starts_with_keyframe = starts_with_keyframe
+        # Whether some of it was written already, so the rest can't go to a new ffmpeg process on its own
+        self.started = False
+
 
 class RTMPClient:
-    def __init__(self, rtmp_url):
+    def __init__(self, rtmp_url, max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES, max_reconnect_attempts=5, reconnect_backoff_seconds=1.0, max_reconnect_backoff_seconds=30.0):
         """
         Initialize the RTMP client for streaming FLV data to an RTMP endpoint.
 
+        write_data never blocks: it queues the FLV tags and a writer thread feeds them to ffmpeg. At most
+        max_buffered_bytes wait for the writer; past that, the oldest whole groups of pictures are dropped, so the stream
+        skips ahead to a keyframe instead of falling further behind. If ffmpeg exits, it's restarted with exponential
+        backoff, and the client stops running after max_reconnect_attempts restarts in a row that didn't stay up.
+
         Args:
             rtmp_url (str): The RTMP endpoint URL
         """
         self.rtmp_url = rtmp_url
+        self.max_buffered_bytes = max_buffered_bytes
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.reconnect_backoff_seconds = reconnect_backoff_seconds
+        self.max_reconnect_backoff_seconds = max_reconnect_backoff_seconds
         self.ffmpeg_process = None
+        self.ffmpeg_output_lines = deque()
         self.is_running = False
 
-    def start(self):
-        """Start the RTMP streaming process"""
-        if self.is_running:
-            return False
+        self.tag_reader = FlvTagReader()
+        # Tag type -> the latest script data or codec config tag, sent again at the start of every connection
+        self.stream_header_tags = {}
+
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._writer_thread = None
+        self._gops = deque()
+        self._buffered_bytes = 0
+        # Set when the group of pictures being filled didn't fit, so the rest of it is dropped too
+        self._dropping_gop = False
+        self._media_tag_received = False
 
+        # Totals
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.dropped_gop_count = 0
+        self.dropped_bytes = 0
+        self.reconnect_count = 0
+        self.connection_failure_count = 0
+
+        # Window since the last reset
+        self._window_start_time = time.monotonic()
+        self._window_bytes_received = 0
+        self._window_bytes_written = 0
+        self._window_max_buffered_bytes = 0
+        self._write_delays_ms = deque(maxlen=WRITE_DELAY_SAMPLE_COUNT)
+
+    def get_ffmpeg_command(self):
         # Configure FFmpeg command to copy the FLV stream directly
-        ffmpeg_cmd = [
+        return [
             "ffmpeg",
             "-y",  # Overwrite output if needed
+            "-loglevel",
+            "warning",
             "-f",
             "flv",  # Input format is FLV
             "-i",
@@ -36,63 +160,273 @@ class RTMPClient:
             self.rtmp_url,  # RTMP destination
         ]
 
-        # Start FFmpeg process
+    def start(self):
+        """Start the RTMP streaming process"""
+        if self.is_running:
+            return False
+
+        if not self._start_ffmpeg():
+            return False
+
+        self.is_running = True
+        self._stopping = False
+        self._writer_thread = threading.Thread(target=self._writer_worker, daemon=True)
+        self._writer_thread.start()
+        return True
+
+    def _start_ffmpeg(self):
         try:
-            self.ffmpeg_process = subprocess.Popen(
-                ffmpeg_cmd,
+            # Unbuffered, so a write either reaches the pipe or fails
+            ffmpeg_process = subprocess.Popen(
+                self.get_ffmpeg_command(),
                 stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                bufsize=10**8,
+                bufsize=0,
             )
-            self.is_running = True
-            logger.info(f"FFmpeg RTMP client started with PID {self.ffmpeg_process.pid}")
-            return True
         except Exception as e:
             logger.info(f"Failed to start FFmpeg process: {e}")
             return False
 
+        # Nothing else reads ffmpeg's output, and it would stop once the pipe filled up
+        output_lines = deque(maxlen=FFMPEG_OUTPUT_LINE_COUNT)
+        threading.Thread(target=self._read_ffmpeg_output, args=(ffmpeg_process, output_lines), daemon=True).start()
+        self.ffmpeg_process = ffmpeg_process
+        self.ffmpeg_output_lines = output_lines
+        logger.info(f"FFmpeg RTMP client started with PID {ffmpeg_process.pid}")
+        return True
+
+    def _read_ffmpeg_output(self, ffmpeg_process, output_lines):
+        for line in ffmpeg_process.stderr:
+            output_lines.append(line.decode("utf-8", errors="replace").rstrip())
+
+    def _stop_ffmpeg(self):
+        ffmpeg_process = self.ffmpeg_process
+        self.ffmpeg_process = None
+        if not ffmpeg_process:
+            return
+        try:
+            ffmpeg_process.stdin.close()
+        except Exception:
+            pass
+        try:
+            ffmpeg_process.terminate()
+            ffmpeg_process.wait(timeout=5.0)
+        except Exception as e:
+            logger.info(f"Error stopping FFmpeg process: {e}")
+            # Force kill if graceful shutdown fails
+            try:
+                ffmpeg_process.kill()
+            except Exception:
+                pass
+
     def write_data(self, flv_data):
         """
-        Write FLV data to the RTMP stream.
+        Queue FLV data for the RTMP stream. Returns right away, whether or not ffmpeg is keeping up.
 
         Args:
             flv_data (bytes): FLV formatted data containing audio and video
 
         Returns:
-            bool: True if data was written, False if failed
+            bool: True if the stream is still running, False if it failed
         """
-        if not self.is_running or not self.ffmpeg_process:
+        if not self.is_running:
             return False
 
         try:
-            self.ffmpeg_process.stdin.write(flv_data)
-            self.ffmpeg_process.stdin.flush()
-            return True
-        except BrokenPipeError:
-            logger.info("FFmpeg pipe broken - stream may have failed")
-            self.is_running = False
-            return False
+            tags = self.tag_reader.feed(flv_data)
         except Exception as e:
-            logger.info(f"Error writing data to FFmpeg: {e}")
+            logger.info(f"Error reading FLV data: {e}")
             self.is_running = False
             return False
 
+        with self._condition:
+            self.bytes_received += len(flv_data)
+            self._window_bytes_received += len(flv_data)
+            for tag in tags:
+                self._enqueue(tag)
+            self._window_max_buffered_bytes = max(self._buffered_bytes, self._window_max_buffered_bytes)
+            self._condition.notify()
+        return True
+
+    def _enqueue(self, tag):
+        if tag.tag_type == FLV_TAG_TYPE_SCRIPT or tag.is_codec_config:
+            self.stream_header_tags[(tag.tag_type, tag.is_codec_config)] = tag
+            # Before any media, it goes out with the stream header. After, it has to go out in order.
+            if not self._media_tag_received:
+                return
+        else:
+            self._media_tag_received = True
+
+        if tag.is_keyframe:
+            self._gops.append(GroupOfPictures(starts_with_keyframe=True))
+            self._dropping_gop = False
+        elif self._dropping_gop:
+            self.dropped_bytes += len(tag.data)
+            return
+        elif not self._gops:
+            # Audio that arrives before the first keyframe
+            self._gops.append(GroupOfPictures(starts_with_keyframe=False))
+
+        # Make room by dropping the oldest groups of pictures, never the one being filled
+        while self._buffered_bytes + len(tag.data) > self.max_buffered_bytes and len(self._gops) > 1:
+            self._drop_gop(self._gops.popleft())
+
+        if self._buffered_bytes + len(tag.data) > self.max_buffered_bytes:
+            self.dropped_gop_count += 1
+            self.dropped_bytes += len(tag.data)
+            self._dropping_gop = True
+            return
+
+        tag.enqueued_at = time.monotonic()
+        self._gops[-1].tags.append(tag)
+        self._buffered_bytes += len(tag.data)
+
+    def _drop_gop(self, gop):
+        dropped_bytes = sum(len(tag.data) for tag in gop.tags)
+        self._buffered_bytes -= dropped_bytes
+        self.dropped_bytes += dropped_bytes
+        self.dropped_gop_count += 1
+        gop.tags.clear()
+
+    def _next_tag(self):
+        while self._gops:
+            gop = self._gops[0]
+            if gop.tags:
+                tag = gop.tags.popleft()
+                gop.started = True
+                self._buffered_bytes -= len(tag.data)
+                return tag
+            # Keep the group of pictures that's still being filled
+            if len(self._gops) == 1:
+                return None
+            self._gops.popleft()
+        return None
+
+    def _skip_to_keyframe(self):
+        """A new ffmpeg process has to start from a keyframe, so drop what's left of a group of pictures that was cut off"""
+        while self._gops and (self._gops[0].started or not self._gops[0].starts_with_keyframe):
+            gop = self._gops.popleft()
+            if gop.tags:
+                self._drop_gop(gop)
+            if not self._gops:
+                # It was the one being filled, so the rest of it goes too
+                self._dropping_gop = True
+
+    def _stream_header(self):
+        return self.tag_reader.header + b"".join(tag.data for tag in self.stream_header_tags.values())
+
+    def _writer_worker(self):
+        reconnect_attempt = 0
+        connected_at = time.monotonic()
+        header_written = False
+
+        while True:
+            with self._condition:
+                tag = self._next_tag()
+                while tag is None and not self._stopping:
+                    self._condition.wait()
+                    tag = self._next_tag()
+                if self._stopping:
+                    break
+
+            try:
+                if not header_written:
+                    self.ffmpeg_process.stdin.write(self._stream_header())
+                    header_written = True
+                self.ffmpeg_process.stdin.write(tag.data)
+            except Exception as e:
+                if self._stopping:
+                    break
+                self.connection_failure_count += 1
+                logger.info(f"Error writing data to FFmpeg, stream may have failed: {e}")
+                self._stop_ffmpeg()
+                for line in self.ffmpeg_output_lines:
+                    logger.info(f"FFmpeg: {line}")
+
+                if time.monotonic() - connected_at >= STABLE_CONNECTION_SECONDS:
+                    reconnect_attempt = 0
+                reconnect_attempt += 1
+                if reconnect_attempt > self.max_reconnect_attempts:
+                    logger.info(f"Giving up on the RTMP stream after {self.max_reconnect_attempts} reconnect attempts")
+                    break
+
+                backoff_seconds = min(self.reconnect_backoff_seconds * 2 ** (reconnect_attempt - 1), self.max_reconnect_backoff_seconds)
+                logger.info(f"Restarting FFmpeg in {backoff_seconds} seconds, attempt {reconnect_attempt} of {self.max_reconnect_attempts}")
+                with self._condition:
+                    # The queue keeps filling and dropping old groups of pictures in the meantime
+                    if self._condition.wait_for(lambda: self._stopping, timeout=backoff_seconds):
+                        break
+                    self._skip_to_keyframe()
+                if not self._start_ffmpeg():
+                    break
+                self.reconnect_count += 1
+                connected_at = time.monotonic()
+                header_written = False
+                continue
+
+            with self._condition:
+                self.bytes_written += len(tag.data)
+                self._window_bytes_written += len(tag.data)
+                self._write_delays_ms.append((time.monotonic() - tag.enqueued_at) * 1000)
+
+        with self._condition:
+            self.is_running = False
+            while self._gops:
+                self._drop_gop(self._gops.popleft())
+        self._stop_ffmpeg()
+
+    def metrics(self, reset_window: bool = False) -> dict:
+        """
+        The current metrics. Bitrates, the most buffered and the write delay percentiles (how long a tag waited between
+        write_data and ffmpeg) cover the window since the last reset, counts are totals.
+        """
+        with self._condition:
+            now = time.monotonic()
+            window_seconds = now - self._window_start_time
+            sorted_write_delays = sorted(self._write_delays_ms)
+            oldest_tag = next((gop.tags[0] for gop in self._gops if gop.tags), None)
+            metrics = {
+                "is_running": self.is_running,
+                "is_connected": self.ffmpeg_process is not None and self.ffmpeg_process.poll() is None,
+                "input_kbps": round(self._window_bytes_received * 8 / 1000 / window_seconds, 1) if window_seconds > 0 else None,
+                "output_kbps": round(self._window_bytes_written * 8 / 1000 / window_seconds, 1) if window_seconds > 0 else None,
+                "buffered_bytes": self._buffered_bytes,
+                "buffered_bytes_max": self._window_max_buffered_bytes,
+                "max_buffered_bytes": self.max_buffered_bytes,
+                "lag_ms": round((now - oldest_tag.enqueued_at) * 1000) if oldest_tag else 0,
+                "write_delay_ms_p50": percentile(sorted_write_delays, 0.5),
+                "write_delay_ms_p95": percentile(sorted_write_delays, 0.95),
+                "write_delay_ms_max": percentile(sorted_write_delays, 1),
+                "bytes_written": self.bytes_written,
+                "dropped_gop_count": self.dropped_gop_count,
+                "dropped_bytes": self.dropped_bytes,
+                "reconnect_count": self.reconnect_count,
+                "connection_failure_count": self.connection_failure_count,
+            }
+            if reset_window:
+                self._window_start_time = now
+                self._window_bytes_received = 0
+                self._window_bytes_written = 0
+                self._window_max_buffered_bytes = self._buffered_bytes
+                self._write_delays_ms.clear()
+            return metrics
+
     def stop(self):
         """Stop the RTMP streaming process"""
         self.is_running = False
 
-        if self.ffmpeg_process:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        # A write that's stuck on a stalled ffmpeg fails once the process is gone
+        ffmpeg_process = self.ffmpeg_process
+        if ffmpeg_process:
             try:
-                self.ffmpeg_process.stdin.close()
-                self.ffmpeg_process.terminate()
-                self.ffmpeg_process.wait(timeout=5.0)
-            except Exception as e:
-                logger.info(f"Error stopping FFmpeg process: {e}")
-                # Force kill if graceful shutdown fails
-                try:
-                    self.ffmpeg_process.kill()
-                except Exception:
-                    pass
-
-            self.ffmpeg_process = None
+                ffmpeg_process.terminate()
+            except Exception:
+                pass
+        if self._writer_thread:
+            self._writer_thread.join(timeout=10.0)
+            self._writer_thread = None
+        self._stop_ffmpeg()
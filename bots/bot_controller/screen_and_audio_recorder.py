@@ -6,13 +6,15 @@ logger = logging.getLogger(__name__)
 
 
 class ScreenAndAudioRecorder:
-    def __init__(self, file_location, recording_dimensions, audio_only):
+    def __init__(self, file_location, recording_dimensions, audio_only, fragmented_mp4=False):
         self.file_location = file_location
         self.ffmpeg_proc = None
         # Screen will have buffer, we will crop to the recording dimensions
         self.screen_dimensions = (recording_dimensions[0] + 10, recording_dimensions[1] + 10)
         self.recording_dimensions = recording_dimensions
         self.audio_only = audio_only
+        # A fragmented mp4 can be played while it's being written and up to the last fragment if ffmpeg dies, so it never has to be made seekable
+        self.fragmented_mp4 = fragmented_mp4
         self.paused = False
         self.xterm_proc = None
 
@@ -41,11 +43,23 @@ class ScreenAndAudioRecorder:
                 self.file_location,
             ]
         else:
-            ffmpeg_cmd = ["ffmpeg", "-y", "-thread_queue_size", "4096", "-framerate", "30", "-video_size", f"{self.screen_dimensions[0]}x{self.screen_dimensions[1]}", "-f", "x11grab", "-draw_mouse", "0", "-probesize", "32", "-i", display_var, "-thread_queue_size", "4096", "-f", "alsa", "-i", "default", "-vf", f"crop={self.recording_dimensions[0]}:{self.recording_dimensions[1]}:10:10", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", "30", "-c:a", "aac", "-strict", "experimental", "-b:a", "128k", self.file_location]
+            ffmpeg_cmd = ["ffmpeg", "-y", "-thread_queue_size", "4096", "-framerate", "30", "-video_size", f"{self.screen_dimensions[0]}x{self.screen_dimensions[1]}", "-f", "x11grab", "-draw_mouse", "0", "-probesize", "32", "-i", display_var, "-thread_queue_size", "4096", "-f", "alsa", "-i", "default", "-vf", f"crop={self.recording_dimensions[0]}:{self.recording_dimensions[1]}:10:10", *self.get_video_output_args(), self.file_location]
 
         logger.info(f"Starting FFmpeg command: {' '.join(ffmpeg_cmd)}")
         self.ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
+    def get_video_output_args(self):
+        return ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", "30", "-c:a", "aac", "-strict", "experimental", "-b:a", "128k", *self.get_movflags_args()]
+
+    def get_movflags_args(self):
+        if not self.fragmented_mp4:
+            return []
+        # A fragment at every keyframe (one a second with -g 30), after a moov atom without any samples in it
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+
+    def makes_file_seekable_on_cleanup(self):
+        return not self.audio_only and not self.fragmented_mp4
+
     # Pauses by muting the audio and showing a black xterm covering the entire screen
     def pause_recording(self):
         if self.paused:
@@ -111,8 +125,8 @@ class ScreenAndAudioRecorder:
                 pass  # Create empty file
             return
 
-        # if audio only, we don't need to make it seekable
-        if self.audio_only:
+        # if audio only or fragmented, we don't need to make it seekable
+        if not self.makes_file_seekable_on_cleanup():
             return
 
         # if input file is greater than 3 GB, we will skip seekability
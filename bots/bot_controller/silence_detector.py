@@ -0,0 +1,73 @@
+import numpy as np
+import webrtcvad
+
+
+class SilenceDetector:
+    """
+    Decides which chunks of 16-bit PCM audio are silent. A chunk is silent if its RMS, normalized by the max possible
+    value for 16-bit audio (32768), is below rms_threshold, or if webrtcvad doesn't hear speech in it.
+    The RMS of a batch of chunks is worked out in one NumPy pass in float32, reusing the same buffers from batch to batch,
+    so only the chunks loud enough to be speech go through webrtcvad one at a time.
+    Not thread-safe.
+    """
+
+    def __init__(self, *, sample_rate, rms_threshold):
+        self.sample_rate = sample_rate
+        self.rms_threshold = rms_threshold
+        self.vad = webrtcvad.Vad()
+
+        self.samples = np.empty(0, dtype=np.float32)
+        self.chunk_starts = np.empty(0, dtype=np.intp)
+        self.silence_thresholds = np.empty(0, dtype=np.float32)
+        self.sums_of_squares = np.empty(0, dtype=np.float32)
+        self.loud_enough = np.empty(0, dtype=bool)
+
+    def _reserve(self, sample_count, chunk_count):
+        # Grow to the next power of two, so the buffers are only reallocated a few times over a meeting
+        if len(self.samples) < sample_count:
+            self.samples = np.empty(1 << (sample_count - 1).bit_length(), dtype=np.float32)
+        if len(self.chunk_starts) < chunk_count:
+            size = 1 << (chunk_count - 1).bit_length()
+            self.chunk_starts = np.empty(size, dtype=np.intp)
+            self.silence_thresholds = np.empty(size, dtype=np.float32)
+            self.sums_of_squares = np.empty(size, dtype=np.float32)
+            self.loud_enough = np.empty(size, dtype=bool)
+
+    def detect_silence(self, chunks):
+        """Returns whether each of the chunks is silent. Empty chunks are silent."""
+        nonempty_indices = [i for i, chunk in enumerate(chunks) if chunk and len(chunk) >= 2]
+        audio_is_silent = [True] * len(chunks)
+        if not nonempty_indices:
+            return audio_is_silent
+
+        sample_counts = [len(chunks[i]) // 2 for i in nonempty_indices]
+        chunk_count = len(nonempty_indices)
+        self._reserve(sum(sample_counts), chunk_count)
+
+        # rms / 32768 < threshold, without the square root: sum of squares < (threshold * 32768) ** 2 * sample count
+        sum_of_squares_threshold_per_sample = (self.rms_threshold * 32768) ** 2
+
+        # Copy every chunk into one float32 buffer, converting from int16 as we go
+        position = 0
+        for n, (i, sample_count) in enumerate(zip(nonempty_indices, sample_counts)):
+            self.samples[position : position + sample_count] = np.frombuffer(chunks[i], dtype=np.int16, count=sample_count)
+            self.chunk_starts[n] = position
+            self.silence_thresholds[n] = sample_count * sum_of_squares_threshold_per_sample
+            position += sample_count
+
+        samples = self.samples[:position]
+        np.multiply(samples, samples, out=samples)
+        sums_of_squares = self.sums_of_squares[:chunk_count]
+        np.add.reduceat(samples, self.chunk_starts[:chunk_count], out=sums_of_squares)
+
+        loud_enough = self.loud_enough[:chunk_count]
+        np.greater_equal(sums_of_squares, self.silence_thresholds[:chunk_count], out=loud_enough)
+
+        for n in np.flatnonzero(loud_enough):
+            i = nonempty_indices[n]
+            audio_is_silent[i] = not self.vad.is_speech(chunks[i], self.sample_rate)
+
+        return audio_is_silent
+
+    def is_silent(self, chunk):
+        return self.detect_silence([chunk])[0]
@@ -1,98 +1,235 @@
 import logging
 import os
 import threading
-from io import BytesIO
+import time
+import zlib
 from queue import Queue
 
 import boto3
 
 logger = logging.getLogger(__name__)
 
+# S3 needs every part but the last to be at least 5MB
+DEFAULT_PART_SIZE_BYTES = 5 * 1024 * 1024
+
 
 class StreamingUploader:
-    def __init__(self, bucket, key, chunk_size=5242880):  # 5MB chunks
-        self.s3_client = boto3.client("s3", endpoint_url=os.getenv("AWS_ENDPOINT_URL"))
+    def __init__(self, bucket, key, chunk_size=DEFAULT_PART_SIZE_BYTES, endpoint_url=None, region_name=None, access_key_id=None, access_key_secret=None, max_queued_parts=2, max_attempts=6, retry_backoff_seconds=1.0):
+        """Upload an object to S3 as a multipart upload, one part at a time, while the data is still being produced.
+
+        At most max_queued_parts parts wait for the upload thread, so a slow connection blocks whoever is adding parts
+        instead of growing memory. Each part is tried max_attempts times, backing off exponentially in between, and a
+        part that still fails can be uploaded again under the same part number before completing.
+        """
+        self.s3_client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name, aws_access_key_id=access_key_id, aws_secret_access_key=access_key_secret)
         self.bucket = bucket
         self.key = key
         self.chunk_size = chunk_size
-        self.buffer = BytesIO()
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self.buffer = bytearray()
         self.upload_id = None
-        self.parts = []
+        # Part number -> ETag, for the parts that have been uploaded
+        self.parts = {}
         self.part_number = 1
 
-        # Add upload queue and worker thread
-        self.upload_queue = Queue()
-        self.upload_thread = threading.Thread(target=self._upload_worker, daemon=True)
-        self.upload_thread.start()
+        self.upload_queue = Queue(maxsize=max_queued_parts)
+        self.upload_thread = None
+
+    def with_retries(self, description, function, *args, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                backoff_seconds = self.retry_backoff_seconds * 2 ** (attempt - 1)
+                logger.warning(f"{description} failed on attempt {attempt} of {self.max_attempts}, retrying in {backoff_seconds} seconds: {e}")
+                time.sleep(backoff_seconds)
 
     def _upload_worker(self):
         """Background thread to handle uploads"""
         while True:
+            chunk, part_number = self.upload_queue.get()
             try:
-                chunk, part_num = self.upload_queue.get()
                 if chunk is None:  # Sentinel value to stop the thread
                     break
 
-                response = self.s3_client.upload_part(
-                    Bucket=self.bucket,
-                    Key=self.key,
-                    PartNumber=part_num,
-                    UploadId=self.upload_id,
-                    Body=chunk,
-                )
-
-                self.parts.append({"PartNumber": part_num, "ETag": response["ETag"]})
+                response = self.with_retries(f"Uploading part {part_number} of s3://{self.bucket}/{self.key}", self.s3_client.upload_part, Bucket=self.bucket, Key=self.key, PartNumber=part_number, UploadId=self.upload_id, Body=chunk)
+                self.parts[part_number] = response["ETag"]
             except Exception as e:
-                logging.error(f"Upload error: {e}")
+                # Left out of self.parts, so it gets uploaded again before completing
+                self.parts.pop(part_number, None)
+                logger.error(f"Upload error for part {part_number}: {e}")
             finally:
                 self.upload_queue.task_done()
 
+    def start_upload(self):
+        """Initialize the multipart upload and get the upload ID"""
+        if self.upload_id:
+            return
+        response = self.with_retries(f"Starting multipart upload of s3://{self.bucket}/{self.key}", self.s3_client.create_multipart_upload, Bucket=self.bucket, Key=self.key)
+        self.upload_id = response["UploadId"]
+        self.upload_thread = threading.Thread(target=self._upload_worker, daemon=True)
+        self.upload_thread.start()
+
+    def put_part(self, part_number, chunk):
+        """Queue a part for upload, replacing any part already uploaded with that number. Blocks while the queue is full."""
+        self.start_upload()
+        self.upload_queue.put((chunk, part_number))
+
     def upload_part(self, data):
-        self.buffer.write(data)
+        self.buffer += data
 
         # Upload complete chunks
-        while self.buffer.tell() >= self.chunk_size:
-            self.buffer.seek(0)
-            chunk = self.buffer.read(self.chunk_size)
-
-            # Queue the chunk for upload instead of uploading directly
-            self.upload_queue.put((chunk, self.part_number))
+        while len(self.buffer) >= self.chunk_size:
+            chunk = self.buffer[: self.chunk_size]
+            del self.buffer[: self.chunk_size]
+            self.put_part(self.part_number, chunk)
             self.part_number += 1
 
-            # Keep remaining data
-            remaining = self.buffer.read()
-            self.buffer = BytesIO()
-            self.buffer.write(remaining)
-
-    def complete_upload(self):
-        # If we never started a multipart upload (len(self.parts) == 0), do a regular upload
-        if len(self.parts) == 0:
-            self.buffer.seek(0)
-            data = self.buffer.getvalue()
-            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=data)
-            logger.info("len(self.parts) == 0, so did a regular upload")
+    def wait_for_queued_parts(self):
+        if self.upload_thread:
+            self.upload_queue.join()
+
+    def complete_upload(self, part_numbers=None):
+        """
+        Finish the upload. part_numbers is every part the object is made of; by default, the parts added with upload_part
+        and whatever is left in the buffer. If no multipart upload was started, the buffer is uploaded with a regular put.
+        """
+        if not self.upload_id:
+            self.with_retries(f"Uploading s3://{self.bucket}/{self.key}", self.s3_client.put_object, Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            logger.info("No parts were uploaded, so did a regular upload")
             return
 
         # Upload final part if any data remains
-        if self.buffer.tell() > 0:
-            self.buffer.seek(0)
-            final_chunk = self.buffer.getvalue()
-            self.upload_queue.put((final_chunk, self.part_number))
+        if len(self.buffer) > 0:
+            self.put_part(self.part_number, bytes(self.buffer))
+            self.buffer = bytearray()
+            self.part_number += 1
+
+        if part_numbers is None:
+            part_numbers = range(1, self.part_number)
 
         # Wait for all uploads to complete
         self.upload_queue.join()
         self.upload_queue.put((None, None))  # Stop the worker thread
         self.upload_thread.join()
+        self.upload_thread = None
+
+        missing_part_numbers = [part_number for part_number in part_numbers if part_number not in self.parts]
+        if missing_part_numbers:
+            raise RuntimeError(f"Parts {missing_part_numbers} of s3://{self.bucket}/{self.key} failed to upload")
 
         # Complete multipart upload
-        self.s3_client.complete_multipart_upload(
+        self.with_retries(
+            f"Completing multipart upload of s3://{self.bucket}/{self.key}",
+            self.s3_client.complete_multipart_upload,
             Bucket=self.bucket,
             Key=self.key,
             UploadId=self.upload_id,
-            MultipartUpload={"Parts": sorted(self.parts, key=lambda x: x["PartNumber"])},
+            MultipartUpload={"Parts": [{"PartNumber": part_number, "ETag": self.parts[part_number]} for part_number in sorted(part_numbers)]},
         )
 
-    def start_upload(self):
-        """Initialize the multipart upload and get the upload ID"""
-        response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
-        self.upload_id = response["UploadId"]
+    def abort_upload(self):
+        if self.upload_thread:
+            self.upload_queue.put((None, None))
+            self.upload_thread.join()
+            self.upload_thread = None
+        if self.upload_id:
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                logger.error(f"Failed to abort multipart upload of s3://{self.bucket}/{self.key}: {e}")
+            self.upload_id = None
+
+
+class StreamingFileUploader:
+    def __init__(self, file_path, streaming_uploader, poll_interval_seconds=2.0, held_back_bytes=None):
+        """Upload a file that another process is still writing, one part at a time as it grows.
+
+        Muxers go back and rewrite bytes they've already written: mp4mux fills in the mdat size at the start of the file,
+        matroskamux fills in its headers and the size of each cluster once the cluster is done. So the first part waits
+        until the end, nothing within held_back_bytes of the end of the file is uploaded yet, and finish() compares a
+        checksum of every part against what was uploaded and uploads whichever parts changed again.
+        """
+        self.file_path = file_path
+        self.streaming_uploader = streaming_uploader
+        self.part_size = streaming_uploader.chunk_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.held_back_bytes = self.part_size if held_back_bytes is None else held_back_bytes
+
+        # Part number -> checksum of the bytes that were queued for upload
+        self.part_checksums = {}
+        # The first part waits until the file is finished
+        self.next_part_number = 2
+        self.stop_event = threading.Event()
+        self.tail_thread = None
+
+    def start(self):
+        self.tail_thread = threading.Thread(target=self._tail_worker, daemon=True)
+        self.tail_thread.start()
+
+    def _tail_worker(self):
+        while not self.stop_event.wait(self.poll_interval_seconds):
+            try:
+                self.upload_new_parts()
+            except Exception as e:
+                # The parts that are left get uploaded by finish()
+                logger.error(f"Error streaming {self.file_path} to s3://{self.streaming_uploader.bucket}/{self.streaming_uploader.key}: {e}")
+
+    def read_part(self, file, part_number, buffer):
+        file.seek((part_number - 1) * self.part_size)
+        bytes_read = file.readinto(buffer)
+        return memoryview(buffer)[:bytes_read]
+
+    def upload_new_parts(self):
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "rb") as file:
+            while not self.stop_event.is_set() and self.next_part_number * self.part_size + self.held_back_bytes <= os.fstat(file.fileno()).st_size:
+                # A new buffer for each part, since it's uploaded from the upload thread
+                chunk = bytearray(self.part_size)
+                self.read_part(file, self.next_part_number, chunk)
+                self.part_checksums[self.next_part_number] = zlib.crc32(chunk)
+                self.streaming_uploader.put_part(self.next_part_number, chunk)
+                self.next_part_number += 1
+
+    def finish(self):
+        """Stop following the file, which must be finished by now, upload whatever isn't uploaded yet and complete the upload."""
+        self.stop_event.set()
+        if self.tail_thread:
+            self.tail_thread.join()
+            self.tail_thread = None
+
+        file_size = os.path.getsize(self.file_path)
+        part_count = max(1, -(-file_size // self.part_size))
+
+        # Nothing was streamed and it's small enough for one request
+        if not self.part_checksums and part_count == 1:
+            with open(self.file_path, "rb") as file:
+                self.streaming_uploader.buffer = bytearray(file.read())
+            self.streaming_uploader.complete_upload()
+            return
+
+        self.streaming_uploader.wait_for_queued_parts()
+        scratch_buffer = bytearray(self.part_size)
+        unchanged_part_count = 0
+        with open(self.file_path, "rb") as file:
+            for part_number in range(1, part_count + 1):
+                chunk = self.read_part(file, part_number, scratch_buffer)
+                if part_number in self.streaming_uploader.parts and self.part_checksums.get(part_number) == zlib.crc32(chunk):
+                    unchanged_part_count += 1
+                    continue
+                self.streaming_uploader.put_part(part_number, bytes(chunk))
+
+        logger.info(f"Streamed {unchanged_part_count} of {part_count} parts of {self.file_path} while it was being written, uploaded the other {part_count - unchanged_part_count} after it was finished")
+        self.streaming_uploader.complete_upload(part_numbers=range(1, part_count + 1))
+
+    def abort(self):
+        self.stop_event.set()
+        if self.tail_thread:
+            self.tail_thread.join()
+            self.tail_thread = None
+        self.streaming_uploader.abort_upload()
@@ -5,7 +5,27 @@ from google.cloud import texttospeech
 from bots.models import Credentials
 
 
-def generate_audio_from_text(bot, text, settings, sample_rate):
+def get_text_to_speech_client(service_account_json, text_to_speech_clients=None):
+    """A Google Text-to-Speech client for the service account. With text_to_speech_clients, a dict, clients are kept in it and reused."""
+    # Missing credentials come through as a dict, which fails below
+    reusable = text_to_speech_clients is not None and isinstance(service_account_json, str)
+    if reusable and service_account_json in text_to_speech_clients:
+        return text_to_speech_clients[service_account_json]
+
+    try:
+        # Create client with credentials
+        client = texttospeech.TextToSpeechClient.from_service_account_info(json.loads(service_account_json))
+    except (ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid Google Text-to-Speech credentials format: " + str(e)) from e
+    except Exception as e:
+        raise ValueError("Failed to initialize Google Text-to-Speech client: " + str(e)) from e
+
+    if reusable:
+        text_to_speech_clients[service_account_json] = client
+    return client
+
+
+def generate_audio_from_text(bot, text, settings, sample_rate, text_to_speech_clients=None):
     """
     Generate audio from text using text-to-speech settings.
 
@@ -17,6 +37,7 @@ def generate_audio_from_text(bot, text, settings, sample_rate):
                 voice_language_code (str): Language code (e.g., "en-US")
                 voice_name (str): Name of the voice to use
         sample_rate (int): The sample rate in Hz
+        text_to_speech_clients (dict, optional): Clients to reuse, by service account
     Returns:
         tuple: (bytes, int) containing:
             - Audio data in LINEAR16 format
@@ -29,13 +50,7 @@ def generate_audio_from_text(bot, text, settings, sample_rate):
     if not google_tts_credentials:
         raise ValueError("Could not find Google Text-to-Speech credentials.")
 
-    try:
-        # Create client with credentials
-        client = texttospeech.TextToSpeechClient.from_service_account_info(json.loads(google_tts_credentials.get_credentials().get("service_account_json", {})))
-    except (ValueError, json.JSONDecodeError) as e:
-        raise ValueError("Invalid Google Text-to-Speech credentials format: " + str(e)) from e
-    except Exception as e:
-        raise ValueError("Failed to initialize Google Text-to-Speech client: " + str(e)) from e
+    client = get_text_to_speech_client(google_tts_credentials.get_credentials().get("service_account_json", {}), text_to_speech_clients)
 
     # Set up text input
     synthesis_input = texttospeech.SynthesisInput(text=text)
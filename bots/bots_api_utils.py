@@ -1,10 +1,10 @@
 import json
 import logging
 import os
+import time
 import uuid
 from enum import Enum
 
-import redis
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, transaction
 from django.urls import reverse
@@ -28,6 +28,7 @@ from .models import (
     WebhookSubscription,
     WebhookTriggerTypes,
 )
+from .redis_utils import get_redis_client
 from .serializers import (
     CreateBotSerializer,
     PatchBotSerializer,
@@ -38,11 +39,37 @@ logger = logging.getLogger(__name__)
 
 
 def send_sync_command(bot, command="sync"):
-    redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
-    redis_client = redis.from_url(redis_url)
     channel = f"bot_{bot.id}"
     message = {"command": command}
-    redis_client.publish(channel, json.dumps(message))
+    get_redis_client().publish(channel, json.dumps(message))
+
+
+def get_pubsub_messages_until(pubsub, deadline):
+    while (remaining_seconds := deadline - time.monotonic()) > 0:
+        message = pubsub.get_message(timeout=remaining_seconds)
+        if message:
+            yield message
+
+
+def send_sync_command_and_wait_for_ack(bot, command, timeout_seconds):
+    """
+    Sends a command to the bot and waits for the bot to acknowledge that it has handled it, which it does by publishing
+    {"ack": <command id>} on the same channel. Returns whether the acknowledgement came within timeout_seconds.
+    """
+    channel = f"bot_{bot.id}"
+    command_id = uuid.uuid4().hex
+    pubsub = get_redis_client().pubsub()
+    try:
+        pubsub.subscribe(channel)
+        messages = get_pubsub_messages_until(pubsub, time.monotonic() + timeout_seconds)
+        # Wait until subscribed, so the acknowledgement can't be published before we're listening for it
+        if not any(message["type"] == "subscribe" for message in messages):
+            return False
+
+        get_redis_client().publish(channel, json.dumps({"command": command, "command_id": command_id}))
+        return any(message["type"] == "message" and json.loads(message["data"]).get("ack") == command_id for message in messages)
+    finally:
+        pubsub.close()
 
 
 def create_bot_chat_message_request(bot, chat_message_data):
@@ -386,7 +413,7 @@ def validate_webhook_data(url, triggers, project, bot=None):
     return None
 
 
-def create_webhook_subscription(url, triggers, project, bot=None):
+def create_webhook_subscription(url, triggers, project, bot=None, batching=None):
     """
     Creates a single webhook subscription for a project or bot.
 
@@ -395,6 +422,7 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         triggers: List of trigger types (api codes as strings)
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
+        batching: Optional dictionary with 'max_events' and 'max_wait_ms' to deliver events in batches
 
     Returns:
         None
@@ -419,15 +447,26 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         bot=bot,
         url=url,
         triggers=triggers_mapped_to_integers,
+        **get_webhook_batching_fields(batching),
     )
 
 
+def get_webhook_batching_fields(batching):
+    if not batching:
+        return {}
+
+    batching_fields = {"batch_max_events": batching["max_events"]}
+    if "max_wait_ms" in batching:
+        batching_fields["batch_max_wait_ms"] = batching["max_wait_ms"]
+    return batching_fields
+
+
 def create_webhook_subscriptions(webhook_data_list, project, bot=None):
     """
     Creates multiple webhook subscriptions for a project or bot.
 
     Args:
-        webhook_data_list: List of webhook data dictionaries with 'url' and 'triggers'
+        webhook_data_list: List of webhook data dictionaries with 'url', 'triggers' and optionally 'batching'
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
 
@@ -445,5 +484,6 @@ def create_webhook_subscriptions(webhook_data_list, project, bot=None):
     for webhook_data in webhook_data_list:
         url = webhook_data.get("url", "")
         triggers = webhook_data.get("triggers", [])
+        batching = webhook_data.get("batching")
 
-        create_webhook_subscription(url, triggers, project, bot)
+        create_webhook_subscription(url, triggers, project, bot, batching)
@@ -1,8 +1,10 @@
+import itertools
+import json
 import logging
 import os
-import time
 
 from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import (
@@ -14,11 +16,12 @@ from drf_spectacular.utils import (
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .authentication import ApiKeyAuthentication
-from .bots_api_utils import BotCreationSource, create_bot, create_bot_chat_message_request, create_bot_media_request_for_image, delete_bot, patch_bot, send_sync_command
+from .bots_api_utils import BotCreationSource, create_bot, create_bot_chat_message_request, create_bot_media_request_for_image, delete_bot, patch_bot, send_sync_command, send_sync_command_and_wait_for_ack
 from .launch_bot_utils import launch_bot
 from .models import (
     Bot,
@@ -52,6 +55,9 @@ from .serializers import (
 from .throttling import ProjectPostThrottle
 from .utils import meeting_type_from_url
 
+# How long the pause and resume recording views wait for the bot to handle the command
+RECORDING_COMMAND_ACK_TIMEOUT_SECONDS = 1
+
 TokenHeaderParameter = [
     OpenApiParameter(
         name="Authorization",
@@ -123,9 +129,135 @@ class NotFoundView(APIView):
         return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class BotCreateView(APIView):
+class BotCursorPagination(CursorPagination):
+    # Oldest update first, so a client polling for changes can pick up where it left off
+    ordering = ("updated_at", "id")
+    page_size = 100
+
+
+class BotListCreateView(GenericAPIView):
     authentication_classes = [ApiKeyAuthentication]
     throttle_classes = [ProjectPostThrottle]
+    pagination_class = BotCursorPagination
+    serializer_class = BotSerializer
+
+    @extend_schema(
+        operation_id="List Bots",
+        summary="List bots",
+        description="Returns the bots in the authenticated project, least recently updated first. Results are paginated using cursor pagination. To poll for changes, pass the updated_at of the last bot you saw as updated_after.",
+        responses={
+            200: OpenApiResponse(
+                response=BotSerializer(many=True),
+                description="List of bots",
+            ),
+            400: OpenApiResponse(description="Invalid filter"),
+        },
+        parameters=[
+            *TokenHeaderParameter,
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Cursor for pagination",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="state",
+                type={"type": "array", "items": {"type": "string", "enum": [BotStates.state_to_api_code(state.value) for state in BotStates]}},
+                location=OpenApiParameter.QUERY,
+                description="Only return bots in this state. Can be given more than once.",
+                required=False,
+                examples=[OpenApiExample("State Example", value="joined_recording")],
+            ),
+            OpenApiParameter(
+                name="meeting_url",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Only return bots for this meeting URL",
+                required=False,
+                examples=[OpenApiExample("Meeting URL Example", value="https://meet.google.com/abc-defg-hij")],
+            ),
+            OpenApiParameter(
+                name="deduplication_key",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Only return bots with this deduplication key",
+                required=False,
+                examples=[OpenApiExample("Deduplication Key Example", value="user-abcd-meeting-1234")],
+            ),
+            OpenApiParameter(
+                name="metadata",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="A JSON object. Only return bots whose metadata contains all of its keys and values.",
+                required=False,
+                examples=[OpenApiExample("Metadata Example", value='{"customer_id": "abc123"}')],
+            ),
+            OpenApiParameter(
+                name="updated_after",
+                type={"type": "string", "format": "ISO 8601 datetime"},
+                location=OpenApiParameter.QUERY,
+                description="Only return bots updated at or after this time. Useful when polling for updates.",
+                required=False,
+                examples=[OpenApiExample("DateTime Example", value="2024-01-18T12:34:56Z")],
+            ),
+        ],
+        tags=["Bots"],
+    )
+    def get(self, request):
+        bots = Bot.objects.filter(project=request.auth.project)
+
+        # Apply state filter if provided
+        state_codes = request.query_params.getlist("state")
+        if state_codes:
+            states = [BotStates.api_code_to_state(state_code) for state_code in state_codes]
+            if None in states:
+                return Response({"error": f"Invalid state. Valid states are: {', '.join(BotStates.state_to_api_code(state.value) for state in BotStates)}"}, status=status.HTTP_400_BAD_REQUEST)
+            bots = bots.filter(state__in=states)
+
+        # Apply meeting_url filter if provided
+        meeting_url = request.query_params.get("meeting_url")
+        if meeting_url is not None:
+            bots = bots.filter(meeting_url=meeting_url)
+
+        # Apply deduplication_key filter if provided
+        deduplication_key = request.query_params.get("deduplication_key")
+        if deduplication_key is not None:
+            bots = bots.filter(deduplication_key=deduplication_key)
+
+        # Apply metadata filter if provided
+        metadata = request.query_params.get("metadata")
+        if metadata is not None:
+            try:
+                metadata = json.loads(metadata)
+            except json.JSONDecodeError:
+                metadata = None
+            if not isinstance(metadata, dict):
+                return Response({"error": "Invalid metadata. It must be a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+            bots = bots.filter(metadata__contains=metadata)
+
+        # Apply updated_after filter if provided
+        updated_after = request.query_params.get("updated_after")
+        if updated_after is not None:
+            try:
+                updated_after_datetime = parse_datetime(updated_after)
+            except ValueError:
+                updated_after_datetime = None
+            if updated_after_datetime is None:
+                return Response({"error": "Invalid updated_after format. Use ISO 8601 format (e.g., 2024-01-18T12:34:56Z)"}, status=status.HTTP_400_BAD_REQUEST)
+            bots = bots.filter(updated_at__gte=updated_after_datetime)
+
+        # The pagination class orders them by updated_at and id, which the bot_project_state_updated_idx and bot_project_updated_idx indexes cover
+        bots = BotSerializer.prepare_queryset(bots)
+
+        # Let the pagination class handle the rest
+        page = self.paginate_queryset(bots)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(bots, many=True)
+        return Response(serializer.data)
 
     @extend_schema(
         operation_id="Create Bot",
@@ -604,6 +736,58 @@ class RecordingView(APIView):
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+# Utterances TranscriptView reads from the database at a time. Longer transcripts are streamed.
+TRANSCRIPT_BATCH_SIZE = 1000
+TRANSCRIPT_UTTERANCE_FIELDS = ["timestamp_ms", "duration_ms", "transcription", "participant", "participant__full_name", "participant__uuid", "participant__user_uuid"]
+
+
+def transcript_utterance_batches(utterances_query, batch_size):
+    """
+    The utterances in timeline order, batch_size at a time. Each batch starts after the (timestamp_ms, id) of the last
+    utterance in the one before, so the database never skips over rows with an OFFSET.
+    """
+    utterances_query = utterances_query.order_by("timestamp_ms", "id")
+    batch = list(utterances_query[:batch_size])
+    while batch:
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_utterance = batch[-1]
+        # (timestamp_ms, id) > (last timestamp_ms, last id), written so the index on them is used
+        batch = list(utterances_query.filter(timestamp_ms__gte=last_utterance.timestamp_ms).exclude(timestamp_ms=last_utterance.timestamp_ms, id__lte=last_utterance.id)[:batch_size])
+
+
+def transcript_data(utterances):
+    # Format the response, skipping empty transcriptions
+    transcript_data = [
+        {
+            "speaker_name": utterance.participant.full_name,
+            "speaker_uuid": utterance.participant.uuid,
+            "speaker_user_uuid": utterance.participant.user_uuid,
+            "timestamp_ms": utterance.timestamp_ms,
+            "duration_ms": utterance.duration_ms,
+            "transcription": utterance.transcription,
+        }
+        for utterance in utterances
+        if utterance.transcription.get("transcript", "")
+    ]
+    return TranscriptUtteranceSerializer(transcript_data, many=True).data
+
+
+def stream_transcript(batches):
+    """The JSON array Response(transcript_data(...)) would render, a batch of utterances at a time"""
+    renderer = JSONRenderer()
+    yield b"["
+    separator = b""
+    for batch in batches:
+        data = transcript_data(batch)
+        if data:
+            # Render the batch as an array and drop its brackets
+            yield separator + renderer.render(data)[1:-1]
+            separator = b","
+    yield b"]"
+
+
 class TranscriptView(APIView):
     authentication_classes = [ApiKeyAuthentication]
 
@@ -649,8 +833,8 @@ class TranscriptView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            # Get all utterances with transcriptions, sorted by timeline
-            utterances_query = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False)
+            # Get all utterances with transcriptions, without their audio
+            utterances_query = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False).only(*TRANSCRIPT_UTTERANCE_FIELDS)
 
             # Apply updated_after filter if provided
             updated_after = request.query_params.get("updated_after")
@@ -667,25 +851,13 @@ class TranscriptView(APIView):
                     )
                 utterances_query = utterances_query.filter(updated_at__gt=updated_after_datetime)
 
-            # Apply ordering
-            utterances = utterances_query.order_by("timestamp_ms")
-
-            # Format the response, skipping empty transcriptions
-            transcript_data = [
-                {
-                    "speaker_name": utterance.participant.full_name,
-                    "speaker_uuid": utterance.participant.uuid,
-                    "speaker_user_uuid": utterance.participant.user_uuid,
-                    "timestamp_ms": utterance.timestamp_ms,
-                    "duration_ms": utterance.duration_ms,
-                    "transcription": utterance.transcription,
-                }
-                for utterance in utterances
-                if utterance.transcription.get("transcript", "")
-            ]
-
-            serializer = TranscriptUtteranceSerializer(transcript_data, many=True)
-            return Response(serializer.data)
+            batches = transcript_utterance_batches(utterances_query, TRANSCRIPT_BATCH_SIZE)
+            first_batch = next(batches, [])
+            if len(first_batch) < TRANSCRIPT_BATCH_SIZE:
+                return Response(transcript_data(first_batch))
+
+            # Too long to hold in memory at once, so read and send it a batch at a time
+            return StreamingHttpResponse(stream_transcript(itertools.chain([first_batch], batches)), content_type="application/json")
 
         except Bot.DoesNotExist:
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -999,21 +1171,18 @@ class PauseRecordingView(APIView):
             # Call the utility method on the bot instance to pause recording
             try:
                 logging.info(f"Pausing recording for bot {bot.object_id}")
-                send_sync_command(bot, "pause_recording")
-                # The best we can do is poll the state of the bot to see if the recording has been paused
-                # We'll wait up to one second and if the bot's state has not changed, we'll return an error
-                for _ in range(5):
-                    time.sleep(0.2)
-                    bot.refresh_from_db()
-                    if bot.state == BotStates.JOINED_RECORDING_PAUSED:
-                        return Response(BotSerializer(bot).data, status=status.HTTP_200_OK)
-                    if not BotEventManager.is_state_that_can_pause_recording(bot.state):
-                        return Response(
-                            {"error": f"Bot is in state {BotStates.state_to_api_code(bot.state)} and cannot pause recording"},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                logging.error(f"Unable to pause recording for bot {bot.object_id}")
+                # Wait for the bot to say it has handled the command, rather than polling the database for it
+                acknowledged = send_sync_command_and_wait_for_ack(bot, "pause_recording", timeout_seconds=RECORDING_COMMAND_ACK_TIMEOUT_SECONDS)
+                bot.refresh_from_db()
+                if bot.state == BotStates.JOINED_RECORDING_PAUSED:
+                    return Response(BotSerializer(bot).data, status=status.HTTP_200_OK)
+                if not BotEventManager.is_state_that_can_pause_recording(bot.state):
+                    return Response(
+                        {"error": f"Bot is in state {BotStates.state_to_api_code(bot.state)} and cannot pause recording"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                logging.error(f"Unable to pause recording for bot {bot.object_id} (acknowledged: {acknowledged})")
                 return Response({"error": "Unable to pause recording"}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 logging.error(f"Error pausing recording for bot {bot.object_id}: {str(e)}")
@@ -1068,21 +1237,18 @@ class ResumeRecordingView(APIView):
             # Call the utility method on the bot instance to resume recording
             try:
                 logging.info(f"Resuming recording for bot {bot.object_id}")
-                send_sync_command(bot, "resume_recording")
-                # The best we can do is poll the state of the bot to see if the recording has been resumed
-                # We'll wait up to one second and if the bot's state has not changed, we'll return an error
-                for _ in range(5):
-                    time.sleep(0.2)
-                    bot.refresh_from_db()
-                    if bot.state == BotStates.JOINED_RECORDING:
-                        return Response(BotSerializer(bot).data, status=status.HTTP_200_OK)
-                    if not BotEventManager.is_state_that_can_resume_recording(bot.state):
-                        return Response(
-                            {"error": f"Bot is in state {BotStates.state_to_api_code(bot.state)} and cannot resume recording."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                logging.error(f"Unable to resume recording for bot {bot.object_id}")
+                # Wait for the bot to say it has handled the command, rather than polling the database for it
+                acknowledged = send_sync_command_and_wait_for_ack(bot, "resume_recording", timeout_seconds=RECORDING_COMMAND_ACK_TIMEOUT_SECONDS)
+                bot.refresh_from_db()
+                if bot.state == BotStates.JOINED_RECORDING:
+                    return Response(BotSerializer(bot).data, status=status.HTTP_200_OK)
+                if not BotEventManager.is_state_that_can_resume_recording(bot.state):
+                    return Response(
+                        {"error": f"Bot is in state {BotStates.state_to_api_code(bot.state)} and cannot resume recording."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                logging.error(f"Unable to resume recording for bot {bot.object_id} (acknowledged: {acknowledged})")
                 return Response({"error": "Unable to resume recording"}, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 logging.error(f"Error resuming recording for bot {bot.object_id}: {str(e)}")
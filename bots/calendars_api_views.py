@@ -350,7 +350,7 @@ class CalendarEventListView(GenericAPIView):
             except ValueError:
                 return Response({"error": "Invalid updated_after format. Use ISO 8601 format (e.g., 2025-01-13T10:30:00Z)"}, status=status.HTTP_400_BAD_REQUEST)
 
-        events = events.order_by("-created_at")
+        events = CalendarEventSerializer.prepare_queryset(events.order_by("-created_at"))
 
         # Let the pagination class handle the rest
         page = self.paginate_queryset(events)
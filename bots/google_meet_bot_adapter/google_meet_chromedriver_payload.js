@@ -898,7 +898,10 @@ class WebSocketClient {
       VIDEO: 2,
       AUDIO: 3,
       ENCODED_MP4_CHUNK: 4,
-      PER_PARTICIPANT_AUDIO: 5
+      PER_PARTICIPANT_AUDIO: 5,
+      // Sent by the adapter to the browser
+      RAW_AUDIO: 6,
+      RAW_IMAGE: 7
   };
 
   constructor() {
@@ -924,6 +927,8 @@ class WebSocketClient {
       };
 
       this.mediaSendingEnabled = false;
+      // Whether the adapter has any use for video frames. Updated with setSendVideoFrames.
+      this.sendVideoFrames = window.initialData.sendVideoFrames;
       
       /*
       We no longer need this because we're not using MediaStreamTrackProcessor's
@@ -989,6 +994,10 @@ class WebSocketClient {
   }
   */
 
+  setSendVideoFrames(sendVideoFrames) {
+    this.sendVideoFrames = sendVideoFrames;
+  }
+
   async enableMediaSending() {
     this.mediaSendingEnabled = true;
     await window.styleManager.start();
@@ -1017,6 +1026,13 @@ class WebSocketClient {
               const jsonData = new TextDecoder().decode(new Uint8Array(data, 4));
               console.log('Received JSON message:', JSON.parse(jsonData));
               break;
+          case WebSocketClient.MESSAGE_TYPES.RAW_AUDIO:
+              // Header is the message type and the sample rate, followed by 16-bit PCM samples
+              window.botOutputManager.playPCMAudio(new Int16Array(data, 8), view.getInt32(4, true));
+              break;
+          case WebSocketClient.MESSAGE_TYPES.RAW_IMAGE:
+              window.botOutputManager.displayImage(new Uint8Array(data, 4));
+              break;
           // Add future message type handlers here
           default:
               console.warn('Unknown message type:', messageType);
@@ -1159,7 +1175,7 @@ class WebSocketClient {
           return;
       }
 
-      if (!this.mediaSendingEnabled) {
+      if (!this.mediaSendingEnabled || !this.sendVideoFrames) {
         return;
       }
       
@@ -1600,7 +1616,7 @@ const handleVideoTrack = async (event) => {
 
                 const currentTime = performance.now();
                 
-                if (firstStreamId && firstStreamId === videoTrackManager.getStreamIdToSendCached()) {
+                if (ws.sendVideoFrames && firstStreamId && firstStreamId === videoTrackManager.getStreamIdToSendCached()) {
                     // Check if enough time has passed since the last frame
                     if (currentTime - lastFrameTime >= frameInterval) {
                         // Copy the frame to get access to raw data
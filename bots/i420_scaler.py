@@ -0,0 +1,113 @@
+import functools
+
+import cv2
+import numpy as np
+
+from bots.utils import half_ceil
+
+# Source and destination sizes a scaler keeps a plan for
+MAX_CACHED_PLANS = 16
+
+
+@functools.lru_cache(maxsize=8)
+def black_i420_frame(frame_size):
+    """A black I420 frame of the given size. The same bytes object is returned every time, so don't use it as a buffer to write into."""
+    width, height = frame_size
+    y_plane_size = width * height
+    frame = np.full(y_plane_size + 2 * half_ceil(width) * half_ceil(height), 128, dtype=np.uint8)
+    # Y=0, U=128, V=128 for "dark" black
+    frame[:y_plane_size] = 0
+    return frame.tobytes()
+
+
+class I420ScalePlan:
+    """
+    Everything about scaling from one frame size to another that doesn't depend on the pixels: the output frame, with the
+    letterbox or pillarbox bars already painted black, and the views of it each plane is resized into.
+    """
+
+    def __init__(self, frame_size, new_size):
+        orig_width, orig_height = frame_size
+        new_width, new_height = new_size
+
+        self.y_plane_size = orig_width * orig_height
+        self.uv_plane_size = half_ceil(orig_width) * half_ceil(orig_height)
+        self.y_shape = (orig_height, orig_width)
+        self.uv_shape = (half_ceil(orig_height), half_ceil(orig_width))
+
+        self.frame = np.frombuffer(black_i420_frame(new_size), dtype=np.uint8).copy()
+        new_y_plane_size = new_width * new_height
+        new_uv_plane_size = half_ceil(new_width) * half_ceil(new_height)
+        final_y = self.frame[:new_y_plane_size].reshape(new_height, new_width)
+        final_u = self.frame[new_y_plane_size : new_y_plane_size + new_uv_plane_size].reshape(half_ceil(new_height), half_ceil(new_width))
+        final_v = self.frame[new_y_plane_size + new_uv_plane_size :].reshape(half_ceil(new_height), half_ceil(new_width))
+
+        # The geometry is the same as scale_i420 in bots/utils.py, so the frames come out identical
+        input_aspect = orig_width / orig_height
+        output_aspect = new_width / new_height
+        if abs(input_aspect - output_aspect) < 1e-6:
+            scaled_width, scaled_height = new_width, new_height
+        elif input_aspect > output_aspect:
+            scaled_width, scaled_height = new_width, int(round(new_width / input_aspect))
+        else:
+            scaled_width, scaled_height = int(round(new_height * input_aspect)), new_height
+
+        offset_y = (new_height - scaled_height) // 2
+        offset_x = (new_width - scaled_width) // 2
+        self.y_size = (scaled_width, scaled_height)
+        self.y_target = final_y[offset_y : offset_y + scaled_height, offset_x : offset_x + scaled_width]
+
+        # Offsets for U and V planes are half of the Y offsets (integer floor)
+        offset_y_uv = offset_y // 2
+        offset_x_uv = offset_x // 2
+        self.uv_size = (half_ceil(scaled_width), half_ceil(scaled_height))
+        self.u_target = final_u[offset_y_uv : offset_y_uv + half_ceil(scaled_height), offset_x_uv : offset_x_uv + half_ceil(scaled_width)]
+        self.v_target = final_v[offset_y_uv : offset_y_uv + half_ceil(scaled_height), offset_x_uv : offset_x_uv + half_ceil(scaled_width)]
+
+
+class I420Scaler:
+    """
+    Scales I420 (YUV 4:2:0) frames to a new size, letterboxing or pillarboxing them if the aspect ratio changes, with the
+    same output as scale_i420 in bots/utils.py. The geometry is worked out once per pair of sizes, and the planes are resized
+    straight into an output frame that is kept for the next frame of the same size, so scaling a frame doesn't allocate anything.
+    The returned memoryview points into that output frame, so it's only valid until the next frame of the same size is scaled.
+    Not thread-safe.
+    """
+
+    def __init__(self):
+        self.plans = {}
+
+    def get_plan(self, frame_size, new_size):
+        plan_key = (*frame_size, *new_size)
+        plan = self.plans.get(plan_key)
+        if plan is not None:
+            return plan
+
+        plan = I420ScalePlan(frame_size, new_size)
+        if len(self.plans) >= MAX_CACHED_PLANS:
+            self.plans.clear()
+        self.plans[plan_key] = plan
+        return plan
+
+    def scale(self, frame, frame_size, new_size):
+        """Scale a frame given as a bytes-like object holding the Y, U and V planes one after the other"""
+        plan = self.get_plan(frame_size, new_size)
+        y = np.frombuffer(frame, np.uint8, plan.y_plane_size).reshape(plan.y_shape)
+        u = np.frombuffer(frame, np.uint8, plan.uv_plane_size, plan.y_plane_size).reshape(plan.uv_shape)
+        v = np.frombuffer(frame, np.uint8, plan.uv_plane_size, plan.y_plane_size + plan.uv_plane_size).reshape(plan.uv_shape)
+        return self._scale_planes(plan, y, u, v)
+
+    def scale_planes(self, y_plane, u_plane, v_plane, frame_size, new_size):
+        """Scale a frame given as three bytes-like objects, one per plane"""
+        plan = self.get_plan(frame_size, new_size)
+        y = np.frombuffer(y_plane, np.uint8, plan.y_plane_size).reshape(plan.y_shape)
+        u = np.frombuffer(u_plane, np.uint8, plan.uv_plane_size).reshape(plan.uv_shape)
+        v = np.frombuffer(v_plane, np.uint8, plan.uv_plane_size).reshape(plan.uv_shape)
+        return self._scale_planes(plan, y, u, v)
+
+    def _scale_planes(self, plan, y, u, v):
+        # The targets are views of the output frame, so OpenCV writes the scaled planes in place
+        cv2.resize(y, plan.y_size, dst=plan.y_target, interpolation=cv2.INTER_LINEAR)
+        cv2.resize(u, plan.uv_size, dst=plan.u_target, interpolation=cv2.INTER_LINEAR)
+        cv2.resize(v, plan.uv_size, dst=plan.v_target, interpolation=cv2.INTER_LINEAR)
+        return memoryview(plan.frame)
@@ -0,0 +1,65 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+
+from accounts.models import Organization
+from bots import api_key_cache
+from bots.api_key_cache import ApiKeyCache
+from bots.authentication import ApiKeyAuthentication
+from bots.models import ApiKey, Bot, Project
+from bots.redis_utils import get_redis_client
+
+
+class Command(BaseCommand):
+    help = "Measures how many requests per second ApiKeyAuthentication authenticates, and requests per second and database queries per request for GET /api/v1/bots/<id>, looking up the API key in the database on every request like ApiKeyAuthentication used to, through Redis only (when REDIS_URL is set), and through the in-process cache. Creates a project, API key and bot in a transaction that's rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests for each configuration")
+
+    def handle(self, *args, **options):
+        redis_client = None
+        if os.getenv("REDIS_URL"):
+            redis_client = get_redis_client()
+
+        configurations = [("Database every request:", ApiKeyCache(max_entries=10000, ttl_seconds=0))]
+        if redis_client:
+            configurations.append(("Redis only:", ApiKeyCache(max_entries=10000, ttl_seconds=0, redis_client=redis_client)))
+        configurations.append(("In-process and Redis:", ApiKeyCache(max_entries=10000, ttl_seconds=5, redis_client=redis_client)))
+
+        original_api_key_cache = api_key_cache._api_key_cache
+        try:
+            with transaction.atomic():
+                organization = Organization.objects.create(name="Benchmark Organization")
+                project = Project.objects.create(name="Benchmark Project", organization=organization)
+                _, api_key_plain = ApiKey.create(project=project, name="Benchmark API Key")
+                bot = Bot.objects.create(project=project, name="Benchmark Bot", meeting_url="https://zoom.us/j/123")
+                client = Client(HTTP_AUTHORIZATION=f"Token {api_key_plain}", HTTP_HOST="localhost")
+
+                authentication_request = RequestFactory().get("/api/v1/bots", HTTP_AUTHORIZATION=f"Token {api_key_plain}")
+
+                for label, cache in configurations:
+                    api_key_cache._api_key_cache = cache
+                    # Warm up
+                    client.get(f"/api/v1/bots/{bot.object_id}")
+
+                    started_at = time.monotonic()
+                    for _ in range(options["requests"]):
+                        ApiKeyAuthentication().authenticate(authentication_request)
+                    authentications_per_second = options["requests"] / (time.monotonic() - started_at)
+
+                    queries = []
+                    started_at = time.monotonic()
+                    with connection.execute_wrapper(lambda execute, sql, params, many, context: queries.append(sql) or execute(sql, params, many, context)):
+                        for _ in range(options["requests"]):
+                            response = client.get(f"/api/v1/bots/{bot.object_id}")
+                            assert response.status_code == 200, response.content
+                    requests_per_second = options["requests"] / (time.monotonic() - started_at)
+                    api_key_queries = [sql for sql in queries if '"bots_apikey"' in sql]
+                    self.stdout.write(f"{label:24s}{authentications_per_second:7.0f} authentications/s, {requests_per_second:5.0f} requests/s, {len(queries) / options['requests']:.2f} queries/request, {len(api_key_queries) / options['requests']:.2f} of them for the API key")
+
+                transaction.set_rollback(True)
+        finally:
+            api_key_cache._api_key_cache = original_api_key_cache
@@ -0,0 +1,91 @@
+import io
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from pydub.generators import Sine
+
+from bots.bot_controller.audio_output_manager import AudioOutputManager
+from bots.bot_controller.pcm_cache import PcmCache
+from bots.media_cache import MediaCache
+from bots.utils import mp3_to_pcm
+
+
+def mp3_of_length(seconds):
+    buffer = io.BytesIO()
+    Sine(440).to_audio_segment(duration=seconds * 1000).export(buffer, format="mp3")
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Measures the latency from an audio media request to its first sample being played, for an MP3 media blob and for text-to-speech with a simulated synthesis latency: decoding on the bot's main loop like AudioOutputManager used to, with an empty PCM cache, with a warm PCM cache shared with another bot, and prepared ahead while the previous request plays. Needs ffmpeg."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mp3-seconds", type=int, default=60, help="Length of the MP3")
+        parser.add_argument("--text-to-speech-ms", type=int, default=400, help="Simulated text-to-speech synthesis latency")
+        parser.add_argument("--repeats", type=int, default=3, help="Repeats of each measurement, the median is reported")
+
+    def handle(self, *args, **options):
+        mp3 = mp3_of_length(options["mp3_seconds"])
+        self.stdout.write(f"{options['mp3_seconds']} s MP3 ({len(mp3) / 1024:.0f} KB), text-to-speech taking {options['text_to_speech_ms']} ms")
+        text_to_speech_pcm = bytes(2 * AudioOutputManager.SAMPLE_RATE * 3)
+
+        def generate_audio_from_text(**kwargs):
+            time.sleep(options["text_to_speech_ms"] / 1000)
+            return text_to_speech_pcm, 3000
+
+        with tempfile.TemporaryDirectory() as directory, patch("bots.bot_controller.audio_output_manager.generate_audio_from_text", generate_audio_from_text):
+            self.directory = directory
+            for label, make_request, decode in [
+                ("MP3", lambda checksum: SimpleNamespace(media_blob=SimpleNamespace(checksum=checksum, blob=mp3, duration_ms=options["mp3_seconds"] * 1000), text_to_speak=None, text_to_speech_settings=None, bot=None), lambda: mp3_to_pcm(mp3, sample_rate=AudioOutputManager.SAMPLE_RATE)),
+                ("Text-to-speech", lambda checksum: SimpleNamespace(media_blob=None, text_to_speak=f"Hello {checksum}", text_to_speech_settings={"google": {"voice_language_code": "en-US", "voice_name": "en-US-Standard-A"}}, bot=None), lambda: generate_audio_from_text()[0]),
+            ]:
+                self.stdout.write(label)
+                self.report("Decoded on main loop:", options["repeats"], lambda repeat: self.synchronous_latency(decode))
+                self.report("PCM cache, cold:", options["repeats"], lambda repeat: self.cached_latency(make_request(f"cold-{repeat}"), warm=False, prepare_ahead_seconds=0))
+                self.report("PCM cache, warm:", options["repeats"], lambda repeat: self.cached_latency(make_request(f"warm-{repeat}"), warm=True, prepare_ahead_seconds=0))
+                self.report("Prepared ahead, cold:", options["repeats"], lambda repeat: self.cached_latency(make_request(f"ahead-{repeat}"), warm=False, prepare_ahead_seconds=3))
+
+    def report(self, label, repeats, measure):
+        latencies = sorted(measure(repeat) for repeat in range(repeats))
+        self.stdout.write(f"  {label:23s}first sample after {latencies[len(latencies) // 2] * 1000:7.1f} ms")
+
+    def synchronous_latency(self, decode):
+        # The main loop blocks on this before it starts the playback thread
+        started_at = time.monotonic()
+        decode()
+        return time.monotonic() - started_at
+
+    def manager(self, first_sample_played):
+        return AudioOutputManager(
+            currently_playing_audio_media_request_finished_callback=lambda request: None,
+            play_raw_audio_callback=lambda bytes, sample_rate: first_sample_played.set(),
+            sleep_time_between_chunks_seconds=0.1,
+            pcm_cache=PcmCache(MediaCache(self.directory, max_size_bytes=1024 * 1024 * 1024)),
+        )
+
+    def cached_latency(self, request, warm, prepare_ahead_seconds):
+        if warm:
+            # Another bot on the node played it first
+            first_sample_played = threading.Event()
+            other_bot = self.manager(first_sample_played)
+            other_bot.start_playing_audio_media_request(SimpleNamespace(id=0, **vars(request)))
+            first_sample_played.wait()
+            other_bot.cleanup()
+
+        request.id = 1
+        first_sample_played = threading.Event()
+        manager = self.manager(first_sample_played)
+        if prepare_ahead_seconds:
+            # Enqueued while the previous request was still playing
+            manager.prepare_audio_media_request(request)
+            time.sleep(prepare_ahead_seconds)
+        started_at = time.monotonic()
+        manager.start_playing_audio_media_request(request)
+        first_sample_played.wait()
+        latency = time.monotonic() - started_at
+        manager.cleanup()
+        return latency
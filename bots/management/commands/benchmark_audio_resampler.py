@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from bots.streaming_resampler import StreamingResampler
+
+try:
+    import audioop  # Removed in Python 3.13
+except ImportError:
+    audioop = None
+
+
+def sine_wave_snr_db(samples, sample_rate, frequency):
+    t = np.arange(len(samples)) / sample_rate
+    basis = np.stack([np.sin(2 * np.pi * frequency * t), np.cos(2 * np.pi * frequency * t)], axis=1)
+    coefficients, *_ = np.linalg.lstsq(basis, samples.astype(np.float64), rcond=None)
+    fitted = basis @ coefficients
+    return 10 * np.log10(np.var(fitted) / np.var(samples - fitted))
+
+
+class Command(BaseCommand):
+    help = "Measures chunks/sec and sine wave SNR of the streaming resampler vs audioop.ratecv called without state on each chunk, for the sample rate conversions the bots do."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=int, default=30, help="Seconds of audio to resample for each conversion")
+        parser.add_argument("--chunk-ms", type=int, default=10, help="Length of each chunk of audio")
+
+    def handle(self, *args, **options):
+        chunk_ms = options["chunk_ms"]
+        frequency = 440
+
+        if audioop is None:
+            self.stdout.write("audioop is not available in this Python version, only measuring the streaming resampler")
+
+        # Mixed audio to websocket audio, and websocket audio to the meeting when the rates aren't multiples of each other
+        for src_rate, dst_rate in [(48000, 16000), (32000, 16000), (48000, 24000), (24000, 32000), (22050, 48000)]:
+            t = np.arange(src_rate * options["seconds"]) / src_rate
+            samples = (10000 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+            chunk_size = src_rate * chunk_ms // 1000
+            chunks = [samples[i : i + chunk_size].tobytes() for i in range(0, len(samples), chunk_size)]
+
+            implementations = [("streaming resampler", StreamingResampler(src_rate, dst_rate).process)]
+            if audioop is not None:
+                implementations.insert(0, ("audioop.ratecv per chunk", lambda chunk: audioop.ratecv(chunk, 2, 1, src_rate, dst_rate, None)[0]))
+
+            for label, resample in implementations:
+                start_time = time.perf_counter()
+                output = b"".join(resample(chunk) for chunk in chunks)
+                elapsed_seconds = time.perf_counter() - start_time
+
+                # Skip the first 100 ms, while the filter warms up
+                output_samples = np.frombuffer(output, dtype=np.int16)[dst_rate // 10 :]
+                snr_db = sine_wave_snr_db(output_samples, dst_rate, frequency)
+                self.stdout.write(f"{src_rate} -> {dst_rate} Hz, {label}: {len(chunks) / elapsed_seconds:.0f} chunks/sec, SNR {snr_db:.1f} dB")
@@ -0,0 +1,114 @@
+import statistics
+import time
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserRole
+from bots.models import ApiKey, Bot, BotEventSubTypes, BotEventTypes, BotStates, Project
+from bots.projects_views import ProjectBotsView
+
+BOT_LIST_INDEXES = ["bot_project_state_updated_idx", "bot_project_updated_idx", "bot_project_created_idx"]
+
+project_bots_queryset = ProjectBotsView.get_queryset
+
+
+def get_queryset_like_before(view):
+    """What ProjectBotsView.get_queryset did before: read every bot in the project to add the display names"""
+    queryset = project_bots_queryset(view)
+    for bot in queryset:
+        if bot.last_event_type:
+            bot.last_event_type_display = dict(BotEventTypes.choices).get(bot.last_event_type, str(bot.last_event_type))
+        if bot.last_event_sub_type:
+            bot.last_event_sub_type_display = dict(BotEventSubTypes.choices).get(bot.last_event_sub_type, str(bot.last_event_sub_type))
+    return queryset
+
+
+class Command(BaseCommand):
+    help = "Measures getting a page of a large project's bots: polling GET /api/v1/bots/<id> for each of them, the way clients had to without a list endpoint, and GET /api/v1/bots, with and without filters, with and without the composite indexes. Also measures a page of the dashboard's bot list, reading every bot in the project the way ProjectBotsView used to and only the page the way it does now. Creates the bots with generate_series, so it needs Postgres, in a transaction that's rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bots", type=int, default=1000000, help="Bots in the project")
+        parser.add_argument("--repeat", type=int, default=5, help="Times to get each page, reporting the median")
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        with transaction.atomic():
+            organization = Organization.objects.create(name="Benchmark Organization")
+            project = Project.objects.create(name="Benchmark Project", organization=organization)
+            _, api_key_plain = ApiKey.create(project=project, name="Benchmark API Key")
+            user = User.objects.create_user(username="benchmark_bot_list", email="benchmark_bot_list@example.com", password="benchmark", role=UserRole.ADMIN, organization=organization)
+
+            started_at = time.monotonic()
+            with connection.cursor() as cursor:
+                # Mostly ended bots, updated over the last 90 days
+                cursor.execute(
+                    f"""
+                    INSERT INTO {Bot._meta.db_table} (object_id, name, meeting_url, created_at, updated_at, version, state, project_id, settings, metadata, deduplication_key)
+                    SELECT
+                        'bot_' || lpad(i::text, 16, '0'),
+                        'Benchmark Bot',
+                        'https://meet.google.com/abc-defg-' || (i %% 1000),
+                        now() - (%(bots)s - i) * interval '90 days' / %(bots)s,
+                        now() - (%(bots)s - i) * interval '90 days' / %(bots)s,
+                        1,
+                        CASE WHEN i %% 10 < 7 THEN %(ended)s WHEN i %% 10 < 9 THEN %(fatal_error)s ELSE %(joined_recording)s END,
+                        %(project_id)s,
+                        '{{}}'::jsonb,
+                        jsonb_build_object('customer_id', (i %% 1000)::text),
+                        'meeting-' || i
+                    FROM generate_series(1, %(bots)s) AS i
+                    """,
+                    {"bots": options["bots"], "ended": BotStates.ENDED, "fatal_error": BotStates.FATAL_ERROR, "joined_recording": BotStates.JOINED_RECORDING, "project_id": project.id},
+                )
+                cursor.execute(f"ANALYZE {Bot._meta.db_table}")
+            self.stdout.write(f"Created {options['bots']} bots in {time.monotonic() - started_at:.0f} s")
+
+            api_client = Client(HTTP_AUTHORIZATION=f"Token {api_key_plain}", HTTP_HOST="localhost")
+            halfway_updated_at = Bot.objects.filter(project=project).order_by("updated_at").values_list("updated_at", flat=True)[options["bots"] // 2]
+            halfway = halfway_updated_at.isoformat().replace("+00:00", "Z")
+            page_bot_ids = [bot["id"] for bot in api_client.get("/api/v1/bots").json()["results"]]
+
+            self.measure(f"Polling {len(page_bot_ids)} bots one at a time:", lambda: [api_client.get(f"/api/v1/bots/{bot_id}") for bot_id in page_bot_ids])
+
+            pages = [
+                ("First page", "/api/v1/bots"),
+                ("Next page", api_client.get("/api/v1/bots").json()["next"]),
+                ("Halfway through", f"/api/v1/bots?updated_after={halfway}"),
+                ("Ended, halfway through", f"/api/v1/bots?state=ended&updated_after={halfway}"),
+                ("Joined, first page", "/api/v1/bots?state=joined_recording"),
+                ("By meeting URL", "/api/v1/bots?meeting_url=https://meet.google.com/abc-defg-7"),
+                ("By metadata", '/api/v1/bots?metadata={"customer_id":"7"}'),
+            ]
+            for label, path in pages:
+                self.measure(f"{label}:", lambda: self.get(api_client, path))
+
+            dashboard_client = Client(HTTP_HOST="localhost")
+            dashboard_client.force_login(user)
+            dashboard_path = reverse("bots:project-bots", kwargs={"object_id": project.object_id})
+            self.measure("Dashboard page:", lambda: self.get(dashboard_client, dashboard_path))
+            with patch.object(ProjectBotsView, "get_queryset", get_queryset_like_before):
+                self.measure("Dashboard page, before:", lambda: self.get(dashboard_client, dashboard_path), repeat=1)
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP INDEX {', '.join(BOT_LIST_INDEXES)}")
+            for label, path in pages:
+                self.measure(f"{label}, no indexes:", lambda: self.get(api_client, path))
+
+            transaction.set_rollback(True)
+
+    def get(self, client, path):
+        response = client.get(path)
+        assert response.status_code == 200, response.content
+        return response
+
+    def measure(self, label, get_page, repeat=None):
+        durations = []
+        for _ in range(repeat or self.repeat):
+            started_at = time.monotonic()
+            get_page()
+            durations.append(time.monotonic() - started_at)
+        self.stdout.write(f"{label:40s}{statistics.median(durations) * 1000:9.1f} ms")
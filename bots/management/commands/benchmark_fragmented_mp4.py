@@ -0,0 +1,81 @@
+import os
+import resource
+import signal
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from bots.benchmark_utils import start_local_s3_server
+from bots.bot_controller.file_uploader import FileUploader
+from bots.bot_controller.screen_and_audio_recorder import ScreenAndAudioRecorder
+
+
+def child_bytes_written():
+    # ru_oublock counts 512 byte blocks written to disk, for the ffmpeg processes that have exited
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock * 512
+
+
+class Command(BaseCommand):
+    help = "Compares regular and fragmented mp4 screen recordings: the time from the end of the recording until it's uploaded, the bytes written to disk, and whether the file can be played if ffmpeg is killed partway through. ffmpeg records synthetic video and audio with the ScreenAndAudioRecorder output settings and the upload goes to a local S3 stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=int, default=3600, help="Length of the synthetic recording")
+        parser.add_argument("--width", type=int, default=1280, help="Width of the recording")
+        parser.add_argument("--height", type=int, default=720, help="Height of the recording")
+        parser.add_argument("--uplink-mb-per-second", type=float, default=40, help="Upload bandwidth to storage in MB/s")
+
+    def ffmpeg_command(self, recorder, seconds, width, height):
+        # Synthetic stand-ins for the x11grab and alsa inputs
+        return ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30", "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000", "-t", str(seconds), *recorder.get_video_output_args(), recorder.file_location]
+
+    def playable_seconds(self, file_path):
+        """Decode the whole file and return how many seconds of it could be played, or None if it couldn't be opened"""
+        result = subprocess.run(["ffmpeg", "-v", "error", "-stats", "-i", file_path, "-f", "null", "-"], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        time_field = result.stderr.rsplit("time=", 1)[-1].split()[0]
+        hours, minutes, seconds = time_field.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def handle(self, *args, **options):
+        server, endpoint_url = start_local_s3_server(upload_bytes_per_second=options["uplink_mb_per_second"] * 1024 * 1024)
+
+        self.stdout.write(f"{options['seconds']} second {options['width']}x{options['height']} recording, {options['uplink_mb_per_second']} MB/s uplink")
+        with tempfile.TemporaryDirectory() as directory:
+            for label, fragmented_mp4 in [("regular mp4", False), ("fragmented mp4", True)]:
+                file_location = os.path.join(directory, f"recording_{int(fragmented_mp4)}.mp4")
+                recorder = ScreenAndAudioRecorder(file_location=file_location, recording_dimensions=(options["width"], options["height"]), audio_only=False, fragmented_mp4=fragmented_mp4)
+
+                bytes_written_before = child_bytes_written()
+                subprocess.run(self.ffmpeg_command(recorder, options["seconds"], options["width"], options["height"]), check=True)
+                recording_bytes_written = child_bytes_written() - bytes_written_before
+
+                # What BotController does once the meeting is over
+                shutdown_time = time.perf_counter()
+                recorder.cleanup()
+                cleanup_seconds = time.perf_counter() - shutdown_time
+                cleanup_bytes_written = child_bytes_written() - bytes_written_before - recording_bytes_written
+                file_uploader = FileUploader(bucket="recordings", key=os.path.basename(file_location), endpoint_url=endpoint_url, region_name="us-east-1", access_key_id="benchmark", access_key_secret="benchmark")
+                file_uploader.upload_file(file_location)
+                file_uploader.wait_for_upload()
+                shutdown_to_upload_seconds = time.perf_counter() - shutdown_time
+                file_size = os.path.getsize(file_location)
+                server.s3_objects.clear()
+                os.remove(file_location)
+
+                # A bot that dies partway through the meeting
+                ffmpeg_process = subprocess.Popen(self.ffmpeg_command(recorder, options["seconds"], options["width"], options["height"]))
+                time.sleep(5)
+                ffmpeg_process.send_signal(signal.SIGKILL)
+                ffmpeg_process.wait()
+                crashed_recording_size = os.path.getsize(file_location)
+                crashed_playable_seconds = self.playable_seconds(file_location)
+                os.remove(file_location)
+
+                self.stdout.write(f"{label}: {file_size / 1024 / 1024:.1f} MB file")
+                self.stdout.write(f"  shutdown to upload: {shutdown_to_upload_seconds:.2f} seconds ({cleanup_seconds:.2f} of them making the file seekable)")
+                self.stdout.write(f"  written to disk: {recording_bytes_written / 1024 / 1024:.1f} MB while recording, {cleanup_bytes_written / 1024 / 1024:.1f} MB after")
+                playable_description = "can't be opened" if crashed_playable_seconds is None else f"{crashed_playable_seconds:.1f} seconds playable"
+                self.stdout.write(f"  killed after 5 seconds: {crashed_recording_size / 1024 / 1024:.1f} MB file, {playable_description}")
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from django.core.management.base import BaseCommand
+from gi.repository import GLib, Gst
+
+from bots.bot_controller.gstreamer_pipeline import GstreamerPipeline
+
+
+def busy_loop(cpu):
+    os.sched_setaffinity(0, {cpu})
+    while True:
+        pass
+
+
+class Command(BaseCommand):
+    help = "Records videotestsrc video through a GstreamerPipeline pinned to one CPU that busy loops are competing for, and prints the pipeline telemetry every few seconds, with and without the adaptive frame rate."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=int, default=60, help="How long to record in each mode")
+        parser.add_argument("--width", type=int, default=1920, help="Width of the video")
+        parser.add_argument("--height", type=int, default=1080, help="Height of the video")
+        parser.add_argument("--competing-processes", type=int, default=2, help="Busy loops sharing the pipeline's CPU, so the pipeline gets about 1 / (n + 1) of it")
+        parser.add_argument("--report-interval-seconds", type=int, default=10, help="How often to print the telemetry")
+
+    def record(self, file_location, adaptive_frame_rate, options):
+        pipeline = GstreamerPipeline(
+            on_new_sample_callback=None,
+            video_frame_size=(options["width"], options["height"]),
+            audio_format=GstreamerPipeline.AUDIO_FORMAT_PCM,
+            output_format=GstreamerPipeline.OUTPUT_FORMAT_MP4,
+            sink_type=GstreamerPipeline.SINK_TYPE_FILE,
+            file_location=file_location,
+            adaptive_frame_rate=adaptive_frame_rate,
+        )
+        pipeline.setup()
+
+        # A live test pattern stands in for the meeting video, handed over like the adapters do
+        source = Gst.parse_launch(f"videotestsrc is-live=true pattern=ball ! video/x-raw,format=I420,width={options['width']},height={options['height']},framerate=30/1 ! appsink name=frames emit-signals=true sync=false max-buffers=2 drop=true")
+
+        def on_new_frame(sink):
+            sample = sink.emit("pull-sample")
+            buffer = sample.get_buffer()
+            pipeline.on_new_video_frame(buffer.extract_dup(0, buffer.get_size()), time.time_ns())
+            return Gst.FlowReturn.OK
+
+        source.get_by_name("frames").connect("new-sample", on_new_frame)
+
+        # 10 ms of silence at a time, 32 kHz S16LE mono
+        silence = bytes(640)
+
+        def push_silence():
+            pipeline.on_mixed_audio_raw_data_received_callback(silence, time.time_ns())
+            return pipeline.recording_active
+
+        GLib.timeout_add(10, push_silence)
+
+        main_loop = GLib.MainLoop()
+        threading.Thread(target=main_loop.run, daemon=True).start()
+        source.set_state(Gst.State.PLAYING)
+
+        for elapsed_seconds in range(options["report_interval_seconds"], options["seconds"] + 1, options["report_interval_seconds"]):
+            time.sleep(options["report_interval_seconds"])
+            metrics = pipeline.metrics(reset_window=True)
+            self.stdout.write(f"  {elapsed_seconds:4d}s: encoder latency p50 {metrics['encoder_latency_ms_p50']} ms, p95 {metrics['encoder_latency_ms_p95']} ms, {metrics['encoded_frames_per_second']} encoded fps, {metrics['late_frame_count']} late, {metrics['frames_push_failed_count']} failed pushes, {metrics['frames_left_out_count']} left out, fullest queue {max(metrics['queue_fill_max'].values(), default=0):.0%}, appsrc {metrics['appsrc_bytes_queued_max'] / 1024 / 1024:.1f} MB, video fps {metrics['video_frame_rate']}")
+
+        source.set_state(Gst.State.NULL)
+        pipeline.cleanup()
+        main_loop.quit()
+
+    def handle(self, *args, **options):
+        cpu = min(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpu})
+        competing_processes = [multiprocessing.Process(target=busy_loop, args=(cpu,), daemon=True) for _ in range(options["competing_processes"])]
+        for process in competing_processes:
+            process.start()
+
+        self.stdout.write(f"{options['width']}x{options['height']} at 30 fps on CPU {cpu}, shared with {options['competing_processes']} busy loops")
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for label, adaptive_frame_rate in [("fixed frame rate", False), ("adaptive frame rate", True)]:
+                    self.stdout.write(label)
+                    self.record(os.path.join(directory, f"recording_{label.replace(' ', '_')}.mp4"), adaptive_frame_rate, options)
+        finally:
+            for process in competing_processes:
+                process.terminate()
@@ -0,0 +1,35 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from bots.i420_scaler import I420Scaler
+from bots.utils import half_ceil, scale_i420
+
+SOURCE_SIZES = {"360p": (640, 360), "720p": (1280, 720), "1080p": (1920, 1080), "4:3 480p": (640, 480)}
+
+
+class Command(BaseCommand):
+    help = "Measures frames/sec of scaling I420 video frames to the recording size with scale_i420 vs the I420Scaler. Both hand the GStreamer pipeline bytes, which is what it pushes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--frames", type=int, default=300, help="Number of frames to scale for each source size")
+        parser.add_argument("--width", type=int, default=1920, help="Width of the recording")
+        parser.add_argument("--height", type=int, default=1080, help="Height of the recording")
+
+    def handle(self, *args, **options):
+        new_size = (options["width"], options["height"])
+        rng = np.random.default_rng(0)
+        scaler = I420Scaler()
+
+        self.stdout.write(f"Scaling {options['frames']} frames per source size to {new_size[0]}x{new_size[1]}")
+        for label, frame_size in SOURCE_SIZES.items():
+            width, height = frame_size
+            frame = rng.integers(0, 256, width * height + 2 * half_ceil(width) * half_ceil(height), dtype=np.uint8)
+
+            for name, scale in [("scale_i420", lambda: scale_i420(frame, frame_size, new_size)), ("I420Scaler", lambda: scaler.scale(frame, frame_size, new_size).tobytes())]:
+                start_time = time.perf_counter()
+                for _ in range(options["frames"]):
+                    scale()
+                elapsed_seconds = time.perf_counter() - start_time
+                self.stdout.write(f"{label}, {name}: {options['frames'] / elapsed_seconds:.0f} frames/sec")
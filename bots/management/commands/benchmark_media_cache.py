@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand
+
+from bots.benchmark_utils import start_local_media_server
+from bots.media_cache import HttpMediaSource, MediaCache
+
+# About what qtdemux needs from the start of the mdat to decode the first frame
+FIRST_FRAME_BYTES = 256 * 1024
+
+
+def mp4_box(box_type, payload):
+    return (8 + len(payload)).to_bytes(4, "big") + box_type + payload
+
+
+def read_until_first_frame(read):
+    """
+    Read a file the way qtdemux does before the first frame comes out: the box headers from the start, skipping over
+    the mdat to find the moov after it, then the moov, then the start of the mdat. read(offset, length) returns bytes.
+    """
+    offset = 0
+    mdat_payload_offset = None
+    while True:
+        header = read(offset, 8)
+        box_size = int.from_bytes(header[:4], "big")
+        if header[4:8] == b"mdat":
+            mdat_payload_offset = offset + 8
+        elif header[4:8] == b"moov":
+            read(offset, box_size)
+            break
+        offset += box_size
+    read(mdat_payload_offset, FIRST_FRAME_BYTES)
+
+
+class Command(BaseCommand):
+    help = "Measures how long it takes until an MP4 with its moov at the end could show its first frame, played from a local HTTP server with throttled bandwidth: downloading the whole file first like MP4Demuxer used to, reading it with range requests into an empty media cache, and reading it from a warm media cache. The reads stand in for qtdemux's, so it runs without GStreamer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=200, help="Size of the MP4")
+        parser.add_argument("--bandwidth-mbps", type=int, default=160, help="Bandwidth of the local server")
+        parser.add_argument("--latency-ms", type=int, default=20, help="Latency of each request")
+
+    def handle(self, *args, **options):
+        server, base_url = start_local_media_server(latency_seconds=options["latency_ms"] / 1000, download_bytes_per_second=options["bandwidth_mbps"] * 1000 * 1000 / 8)
+        moov = mp4_box(b"moov", os.urandom(200 * 1024))
+        mdat = mp4_box(b"mdat", os.urandom(options["size_mb"] * 1024 * 1024 - len(moov) - 32))
+        server.media_files["/clip.mp4"] = mp4_box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2") + mdat + moov
+        url = f"{base_url}/clip.mp4"
+        self.stdout.write(f"{options['size_mb']} MB MP4 with the moov at the end, served at {options['bandwidth_mbps']} Mbps with {options['latency_ms']} ms latency")
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Before: download everything, then open it
+            started_at = time.monotonic()
+            download_path = os.path.join(directory, "download.mp4")
+            urllib.request.urlretrieve(url, download_path)
+            with open(download_path, "rb") as file:
+
+                def read_file(offset, length):
+                    file.seek(offset)
+                    return file.read(length)
+
+                read_until_first_frame(read_file)
+            self.stdout.write(f"Download first:      first frame after {time.monotonic() - started_at:6.2f} s")
+
+            cache = MediaCache(os.path.join(directory, "cache"), max_size_bytes=2 * options["size_mb"] * 1024 * 1024)
+            for label in ["Range reads, cold:", "Media cache, warm:"]:
+                server.bytes_sent = 0
+                started_at = time.monotonic()
+                media_source = HttpMediaSource(url, cache)
+                media_source.open()
+                read_until_first_frame(media_source.read)
+                first_frame_seconds = time.monotonic() - started_at
+                self.stdout.write(f"{label:21s}first frame after {first_frame_seconds:6.2f} s, {server.bytes_sent / 1024 / 1024:.1f} MB downloaded by then")
+                media_source.wait_until_downloaded()
+                media_source.close()
+
+        server.shutdown()
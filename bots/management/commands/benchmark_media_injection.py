@@ -0,0 +1,141 @@
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand
+from websockets.sync.client import connect
+from websockets.sync.server import serve
+
+from bots.web_bot_adapter.web_bot_adapter import WebBotAdapter
+
+SAMPLE_RATE = 44100
+
+
+class ExecuteScriptHandler(BaseHTTPRequestHandler):
+    """Stands in for chromedriver's execute script endpoint. Parses the command like the browser has to, and records when it arrived."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        command = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        # The audio arrives as a JavaScript array literal inside the script
+        script = command["script"]
+        np.array(json.loads(script[script.index("(") + 1 : script.rindex(",")]), dtype=np.int16)
+        self.server.receive_times.append(time.time())
+
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_browser(port_queue, websocket_url_queue, results_queue, chunk_count):
+    """
+    Stands in for the browser in a separate process, so only the bot side is in the CPU time. Receives the audio through
+    a chromedriver-like HTTP endpoint and then through the websocket, and reports when each chunk arrived.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ExecuteScriptHandler)
+    server.receive_times = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port_queue.put(server.server_address[1])
+
+    with connect(websocket_url_queue.get(timeout=10), compression=None, max_size=None) as websocket:
+        port_queue.put("connected")
+        receive_times = []
+        for _ in range(chunk_count):
+            message = websocket.recv()
+            np.frombuffer(message, dtype=np.int16, offset=8)
+            receive_times.append(time.time())
+
+    results_queue.put({"chromedriver": server.receive_times, "websocket": receive_times})
+
+
+class ExecuteScriptDriver:
+    """Sends execute_script commands over HTTP the way selenium does, to the chromedriver stand-in"""
+
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+
+    def execute_script(self, script, *args):
+        self.session.post(self.url, data=json.dumps({"script": script, "args": list(args)}))
+
+
+class Command(BaseCommand):
+    help = "Measures the bot's CPU time and the latency of sending a clip of bot output audio to the browser through chromedriver's execute_script vs the binary websocket channel. The browser is stood in for by a separate process."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10, help="Length of the audio clip")
+        parser.add_argument("--chunk-ms", type=int, default=100, help="Length of each chunk passed to send_raw_audio")
+
+    def handle(self, *args, **options):
+        chunk_samples = SAMPLE_RATE * options["chunk_ms"] // 1000
+        chunk_count = int(options["seconds"] * 1000 / options["chunk_ms"])
+        t = np.arange(chunk_samples * chunk_count) / SAMPLE_RATE
+        clip = (10000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16).tobytes()
+        chunks = [clip[i : i + chunk_samples * 2] for i in range(0, len(clip), chunk_samples * 2)]
+
+        adapter = WebBotAdapter(
+            display_name="Benchmark Bot",
+            send_message_callback=Mock(),
+            meeting_url="https://meet.google.com/abc-defg-hij",
+            add_video_frame_callback=Mock(),
+            wants_any_video_frames_callback=None,
+            add_audio_chunk_callback=Mock(),
+            add_mixed_audio_chunk_callback=Mock(),
+            add_encoded_mp4_chunk_callback=Mock(),
+            upsert_caption_callback=Mock(),
+            upsert_chat_message_callback=Mock(),
+            add_participant_event_callback=Mock(),
+            automatic_leave_configuration=Mock(),
+            recording_view=Mock(),
+            should_create_debug_recording=False,
+            start_recording_screen_callback=Mock(),
+            stop_recording_screen_callback=Mock(),
+            video_frame_size=(1920, 1080),
+        )
+        websocket_server = serve(adapter.handle_websocket, "127.0.0.1", 0, compression=None, max_size=None)
+        threading.Thread(target=websocket_server.serve_forever, daemon=True).start()
+
+        port_queue = multiprocessing.Queue()
+        websocket_url_queue = multiprocessing.Queue()
+        results_queue = multiprocessing.Queue()
+        browser_process = multiprocessing.Process(target=run_browser, args=(port_queue, websocket_url_queue, results_queue, chunk_count), daemon=True)
+        browser_process.start()
+        adapter.driver = ExecuteScriptDriver(f"http://127.0.0.1:{port_queue.get(timeout=10)}/execute/sync")
+
+        self.stdout.write(f"Sending {options['seconds']} seconds of {SAMPLE_RATE} Hz audio in {chunk_count} chunks of {options['chunk_ms']} ms")
+
+        try:
+            cpu_seconds = {}
+            send_times = {}
+            for channel in ["chromedriver", "websocket"]:
+                if channel == "websocket":
+                    websocket_url_queue.put(f"ws://127.0.0.1:{websocket_server.socket.getsockname()[1]}")
+                    port_queue.get(timeout=10)
+                    while adapter.browser_websocket is None:
+                        time.sleep(0.01)
+
+                send_times[channel] = []
+                start_cpu_seconds = time.process_time()
+                for chunk in chunks:
+                    send_times[channel].append(time.time())
+                    adapter.send_raw_audio(chunk, SAMPLE_RATE)
+                cpu_seconds[channel] = time.process_time() - start_cpu_seconds
+
+            receive_times = results_queue.get(timeout=60)
+            for channel in ["chromedriver", "websocket"]:
+                latencies_ms = 1000 * (np.array(receive_times[channel]) - np.array(send_times[channel]))
+                self.stdout.write(f"{channel}: {cpu_seconds[channel] * 1000:.1f} ms of bot CPU for the clip, latency per chunk p50 {np.percentile(latencies_ms, 50):.2f} ms, p95 {np.percentile(latencies_ms, 95):.2f} ms, max {latencies_ms.max():.2f} ms")
+        finally:
+            browser_process.terminate()
+            websocket_server.shutdown()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from bots.benchmark_utils import start_local_s3_server
+from bots.bot_controller.file_uploader import FileUploader
+from bots.bot_controller.streaming_uploader import StreamingFileUploader, StreamingUploader
+
+BUCKET = "recordings"
+
+
+class Command(BaseCommand):
+    help = "Measures the time from the end of a meeting until its recording is in storage, uploading the whole file after the meeting with FileUploader vs streaming it while it's written with StreamingFileUploader. Storage is a local S3 stand-in behind a rate limited uplink."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recording-mb", type=int, default=300, help="Size of the recording file in MB")
+        parser.add_argument("--recording-mb-per-second", type=float, default=20, help="How fast the recording file grows. A real meeting is much slower, this just keeps the benchmark short.")
+        parser.add_argument("--uplink-mb-per-second", type=float, default=40, help="Upload bandwidth to storage in MB/s")
+        parser.add_argument("--latency-ms", type=float, default=20, help="Latency of each request to storage")
+
+    def write_recording(self, file_path, size_bytes, bytes_per_second):
+        """Write the file like mp4mux does: media data as it's encoded, then the mdat size at the start and the moov atom at the end"""
+        block = os.urandom(1024 * 1024)
+        start_time = time.perf_counter()
+        with open(file_path, "wb") as file:
+            for written_bytes in range(0, size_bytes, len(block)):
+                file.write(block)
+                file.flush()
+                time.sleep(max(0, start_time + (written_bytes + len(block)) / bytes_per_second - time.perf_counter()))
+            file.seek(28)
+            file.write(size_bytes.to_bytes(4, "big"))
+            file.seek(0, os.SEEK_END)
+            file.write(os.urandom(256 * 1024))
+
+    def check_upload(self, server, key, file_path):
+        with open(file_path, "rb") as file:
+            if server.s3_objects.pop((BUCKET, key), None) != file.read():
+                raise Exception(f"{key} doesn't match the recording file")
+
+    def handle(self, *args, **options):
+        server, endpoint_url = start_local_s3_server(latency_seconds=options["latency_ms"] / 1000, upload_bytes_per_second=options["uplink_mb_per_second"] * 1024 * 1024)
+        size_bytes = options["recording_mb"] * 1024 * 1024
+        bytes_per_second = options["recording_mb_per_second"] * 1024 * 1024
+        client_arguments = {"endpoint_url": endpoint_url, "region_name": "us-east-1", "access_key_id": "benchmark", "access_key_secret": "benchmark"}
+
+        self.stdout.write(f"{options['recording_mb']} MB recording written at {options['recording_mb_per_second']} MB/s, {options['uplink_mb_per_second']} MB/s uplink with {options['latency_ms']} ms latency")
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "recording.mp4")
+
+            # Before: the file is uploaded once the meeting is over
+            self.write_recording(file_path, size_bytes, bytes_per_second)
+            meeting_end_time = time.perf_counter()
+            file_uploader = FileUploader(bucket=BUCKET, key="after_meeting.mp4", **client_arguments)
+            file_uploader.upload_file(file_path)
+            file_uploader.wait_for_upload()
+            after_meeting_seconds = time.perf_counter() - meeting_end_time
+            self.check_upload(server, "after_meeting.mp4", file_path)
+
+            # After: the file is uploaded in parts as it grows
+            request_count_before = server.request_count
+            streaming_file_uploader = StreamingFileUploader(file_path, StreamingUploader(bucket=BUCKET, key="streamed.mp4", **client_arguments), poll_interval_seconds=1)
+            streaming_file_uploader.start()
+            writer_thread = threading.Thread(target=self.write_recording, args=(file_path, size_bytes, bytes_per_second))
+            writer_thread.start()
+            writer_thread.join()
+            meeting_end_time = time.perf_counter()
+            streaming_file_uploader.finish()
+            streamed_seconds = time.perf_counter() - meeting_end_time
+            self.check_upload(server, "streamed.mp4", file_path)
+
+        self.stdout.write(f"Upload after the meeting (FileUploader): recording available {after_meeting_seconds:.2f} seconds after the meeting ended")
+        self.stdout.write(f"Streamed upload (StreamingFileUploader): recording available {streamed_seconds:.2f} seconds after the meeting ended, {server.request_count - request_count_before} requests, at most {streaming_file_uploader.streaming_uploader.upload_queue.maxsize + 2} parts of {streaming_file_uploader.part_size // (1024 * 1024)} MB in memory")
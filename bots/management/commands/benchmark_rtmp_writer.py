@@ -0,0 +1,92 @@
+import os
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from bots.benchmark_utils import flv_frame, flv_stream_start, throttled_pipe_sink_command
+from bots.bot_controller.rtmp_client import DEFAULT_MAX_BUFFERED_BYTES, FlvTagReader, RTMPClient
+
+FRAME_INTERVAL_SECONDS = 1 / 30
+
+
+class BlockingPipeWriter:
+    """How RTMPClient used to write: straight into ffmpeg's stdin, on the appsink thread"""
+
+    def __init__(self, command, max_buffered_bytes):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, bufsize=10**8)
+
+    def write_data(self, flv_data):
+        self.process.stdin.write(flv_data)
+        self.process.stdin.flush()
+        return True
+
+    def stop(self):
+        self.process.stdin.close()
+        self.process.terminate()
+        self.process.wait()
+
+
+class ThrottledSinkRTMPClient(RTMPClient):
+    def __init__(self, command, max_buffered_bytes):
+        super().__init__(rtmp_url="rtmp://localhost/live/benchmark", max_buffered_bytes=max_buffered_bytes)
+        self.command = command
+
+    def get_ffmpeg_command(self):
+        return self.command
+
+
+class Command(BaseCommand):
+    help = "Streams 30 fps of synthetic FLV in real time, like the GStreamer appsink does, to a local sink that reads slower than the stream, through the old blocking pipe writes and through RTMPClient's writer thread. Prints how long the appsink thread was blocked and how far behind live the sink ended up."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=int, default=30, help="How long to stream")
+        parser.add_argument("--frame-size", type=int, default=8000, help="Bytes per video frame, 8000 is about 2 Mbps")
+        parser.add_argument("--sink-bytes-per-second", type=int, default=100_000, help="How fast the sink reads")
+        parser.add_argument("--max-buffered-bytes", type=int, default=DEFAULT_MAX_BUFFERED_BYTES, help="RTMPClient's byte budget")
+
+    def stream(self, writer, options):
+        writer.write_data(flv_stream_start())
+        started_at = time.monotonic()
+        slowest_write_seconds = 0
+        late_frame_count = 0
+        frame_count = options["seconds"] * 30
+        for frame_index in range(frame_count):
+            due_at = started_at + frame_index * FRAME_INTERVAL_SECONDS
+            now = time.monotonic()
+            if now < due_at:
+                time.sleep(due_at - now)
+            elif now - due_at > FRAME_INTERVAL_SECONDS:
+                late_frame_count += 1
+            write_started_at = time.monotonic()
+            writer.write_data(flv_frame(round(frame_index * FRAME_INTERVAL_SECONDS * 1000), frame_index % 30 == 0, options["frame_size"]))
+            slowest_write_seconds = max(slowest_write_seconds, time.monotonic() - write_started_at)
+        return slowest_write_seconds, late_frame_count, time.monotonic() - started_at
+
+    def received_timestamp_ms(self, output_path):
+        with open(output_path, "rb") as file:
+            tags = FlvTagReader().feed(file.read())
+        return tags[-1].timestamp_ms if tags else 0
+
+    def handle(self, *args, **options):
+        stream_bytes_per_second = len(flv_frame(0, False, options["frame_size"])) * 30
+        self.stdout.write(f"Streaming {stream_bytes_per_second * 8 / 1000:.0f} kbps for {options['seconds']} seconds to a sink that reads {options['sink_bytes_per_second'] * 8 / 1000:.0f} kbps")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label, make_writer in [("blocking pipe writes", BlockingPipeWriter), ("writer thread", ThrottledSinkRTMPClient)]:
+                output_path = os.path.join(directory, f"{label.replace(' ', '_')}.flv")
+                writer = make_writer(throttled_pipe_sink_command(output_path, options["sink_bytes_per_second"]), options["max_buffered_bytes"])
+                if isinstance(writer, RTMPClient):
+                    writer.start()
+
+                slowest_write_seconds, late_frame_count, elapsed_seconds = self.stream(writer, options)
+                behind_live_seconds = elapsed_seconds - self.received_timestamp_ms(output_path) / 1000
+
+                self.stdout.write(label)
+                self.stdout.write(f"  Slowest write_data: {slowest_write_seconds * 1000:.0f} ms, frames handed over late: {late_frame_count}, streaming took {elapsed_seconds:.1f} s")
+                self.stdout.write(f"  Sink was {behind_live_seconds:.1f} s behind live at the end")
+                if isinstance(writer, RTMPClient):
+                    metrics = writer.metrics()
+                    self.stdout.write(f"  Output {metrics['output_kbps']} kbps, {metrics['dropped_gop_count']} GOPs dropped, write delay p95 {metrics['write_delay_ms_p95']:.0f} ms")
+                writer.stop()
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+import webrtcvad
+from django.core.management.base import BaseCommand
+
+from bots.bot_controller.silence_detector import SilenceDetector
+
+
+def per_chunk_silence_detected(vad, chunk_bytes, sample_rate, rms_threshold):
+    """How silence used to be detected, one chunk at a time. Squaring the int16 samples overflows for loud audio."""
+    samples = np.frombuffer(chunk_bytes, dtype=np.int16)
+    with np.errstate(invalid="ignore"):
+        rms = np.sqrt(np.mean(np.square(samples)))
+    if rms / 32768 < rms_threshold:
+        return True
+    return not vad.is_speech(chunk_bytes, sample_rate)
+
+
+class Command(BaseCommand):
+    help = "Measures chunks/sec of silence detection for many simultaneous speakers, one chunk at a time vs batched with the SilenceDetector, draining the queue every 100 ms like the bot's main loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--speakers", type=int, default=24, help="Number of simultaneous speakers")
+        parser.add_argument("--seconds", type=int, default=30, help="Seconds of audio per speaker")
+        parser.add_argument("--sample-rate", type=int, default=32000, help="Sample rate of the per participant audio")
+        parser.add_argument("--speaking-fraction", type=float, default=0.3, help="Fraction of the time each speaker is talking")
+
+    def handle(self, *args, **options):
+        sample_rate = options["sample_rate"]
+        chunk_samples = sample_rate // 100
+        chunk_count = options["seconds"] * 100
+        rng = np.random.default_rng(0)
+
+        # Voiced sound while speaking, low background noise otherwise
+        chunks_per_speaker = []
+        for _ in range(options["speakers"]):
+            t = np.arange(chunk_samples * chunk_count) / sample_rate
+            voiced = sum(np.sin(2 * np.pi * rng.uniform(100, 250) * harmonic * t) / harmonic for harmonic in range(1, 6))
+            speaking = np.repeat(rng.random(chunk_count // 50 + 1) < options["speaking_fraction"], 50 * chunk_samples)[: len(t)]
+            audio = np.where(speaking, 8000 * voiced, 0) + rng.normal(0, 20, len(t))
+            samples = np.clip(audio, -32768, 32767).astype(np.int16)
+            chunks_per_speaker.append([samples[i : i + chunk_samples].tobytes() for i in range(0, len(samples), chunk_samples)])
+
+        # What's on the queue each time the main loop drains it
+        batches = []
+        for first_chunk_index in range(0, chunk_count, 10):
+            batches.append([chunks[chunk_index] for chunk_index in range(first_chunk_index, min(first_chunk_index + 10, chunk_count)) for chunks in chunks_per_speaker])
+        total_chunks = sum(len(batch) for batch in batches)
+
+        self.stdout.write(f"{options['speakers']} speakers, {options['seconds']} seconds of {sample_rate} Hz audio each, {total_chunks} chunks")
+
+        vad = webrtcvad.Vad()
+        start_time = time.perf_counter()
+        per_chunk_results = [per_chunk_silence_detected(vad, chunk, sample_rate, 0.01) for batch in batches for chunk in batch]
+        per_chunk_seconds = time.perf_counter() - start_time
+
+        silence_detector = SilenceDetector(sample_rate=sample_rate, rms_threshold=0.01)
+        start_time = time.perf_counter()
+        batched_results = [audio_is_silent for batch in batches for audio_is_silent in silence_detector.detect_silence(batch)]
+        batched_seconds = time.perf_counter() - start_time
+
+        # With the RMS worked out exactly, which is what the batched decisions should match
+        exact_results = []
+        for batch in batches:
+            for chunk in batch:
+                rms = np.sqrt(np.mean(np.square(np.frombuffer(chunk, dtype=np.int16).astype(np.float64))))
+                exact_results.append(rms / 32768 < 0.01 or not vad.is_speech(chunk, sample_rate))
+
+        self.stdout.write(f"one chunk at a time: {total_chunks / per_chunk_seconds:.0f} chunks/sec, {sum(a != b for a, b in zip(per_chunk_results, exact_results))} decisions differ from the exact RMS")
+        self.stdout.write(f"batched: {total_chunks / batched_seconds:.0f} chunks/sec, {sum(a != b for a, b in zip(batched_results, exact_results))} decisions differ from the exact RMS, {sum(not silent for silent in batched_results)} chunks with speech")
@@ -0,0 +1,91 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotStates, Participant, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, Utterance
+from bots.serializers import TranscriptUtteranceSerializer
+
+
+def render_transcript_like_before(recording):
+    """What TranscriptView did before: every utterance, audio included, serialized into one response"""
+    utterances = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False).order_by("timestamp_ms")
+    transcript_data = [
+        {
+            "speaker_name": utterance.participant.full_name,
+            "speaker_uuid": utterance.participant.uuid,
+            "speaker_user_uuid": utterance.participant.user_uuid,
+            "timestamp_ms": utterance.timestamp_ms,
+            "duration_ms": utterance.duration_ms,
+            "transcription": utterance.transcription,
+        }
+        for utterance in utterances
+        if utterance.transcription.get("transcript", "")
+    ]
+    return JSONRenderer().render(TranscriptUtteranceSerializer(transcript_data, many=True).data)
+
+
+class Command(BaseCommand):
+    help = "Measures the latency and peak Python memory of getting a long transcript: the way TranscriptView used to, reading every utterance with its audio and rendering them at once, and through the view as it is now, which leaves out the audio and streams the utterances a batch at a time. Creates the recording and its utterances in a transaction that's rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utterances", type=int, default=50000, help="Utterances in the recording")
+        parser.add_argument("--audio-bytes", type=int, default=8000, help="Size of each utterance's legacy audio blob")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            organization = Organization.objects.create(name="Benchmark Organization")
+            project = Project.objects.create(name="Benchmark Project", organization=organization)
+            _, api_key_plain = ApiKey.create(project=project, name="Benchmark API Key")
+            bot = Bot.objects.create(project=project, name="Benchmark Bot", meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+            recording = Recording.objects.create(bot=bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS)
+            participants = [Participant.objects.create(bot=bot, uuid=f"participant_{index}", full_name=f"Participant {index}") for index in range(10)]
+            audio_blob = bytes(options["audio_bytes"])
+            Utterance.objects.bulk_create(
+                (
+                    Utterance(
+                        recording=recording,
+                        participant=participants[index % len(participants)],
+                        audio_blob=audio_blob,
+                        timestamp_ms=index * 3000,
+                        duration_ms=2500,
+                        transcription={"transcript": f"This is utterance number {index} of the benchmark meeting, about as long as a sentence", "words": []},
+                    )
+                    for index in range(options["utterances"])
+                ),
+                batch_size=1000,
+            )
+            self.stdout.write(f"{options['utterances']} utterances with {options['audio_bytes']} byte audio blobs")
+
+            client = Client(HTTP_AUTHORIZATION=f"Token {api_key_plain}", HTTP_HOST="localhost")
+
+            def get_transcript_now():
+                response = client.get(f"/api/v1/bots/{bot.object_id}/transcript")
+                content = b"".join(response.streaming_content) if response.streaming else response.content
+                return content, response.streaming
+
+            content, _ = self.measure("Before:", lambda: (render_transcript_like_before(recording), False))
+            content_now, streaming = self.measure("Streamed, no audio:", get_transcript_now)
+            assert streaming
+            assert json.loads(content_now) == json.loads(content)
+
+            transaction.set_rollback(True)
+
+    def measure(self, label, get_transcript):
+        started_at = time.monotonic()
+        get_transcript()
+        elapsed_seconds = time.monotonic() - started_at
+
+        # Again, since tracing allocations slows it down
+        tracemalloc.start()
+        content, streaming = get_transcript()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # The streamed content is joined here for the comparison, but a client would get it a batch at a time
+        self.stdout.write(f"{label:20s}{elapsed_seconds:6.2f} s, peak Python memory {(peak_bytes - (len(content) if streaming else 0)) / 1024 / 1024:7.1f} MB for {len(content) / 1024 / 1024:.1f} MB of JSON")
+        return content, streaming
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from accounts.models import Organization
+from bots.benchmark_utils import CountingRequestHandler, start_local_server
+from bots.models import Bot, Credentials, Participant, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionProviders, TranscriptionTypes, Utterance
+from bots.tasks.process_utterance_task import transcribe_utterance
+from bots.transcription_worker import TranscriptionWorker
+
+
+class FakeTranscriptionProviderHandler(CountingRequestHandler):
+    def do_POST(self):
+        self.read_body()
+        self.send_json(200, {"text": "hello from the fake provider"})
+
+
+class Command(BaseCommand):
+    help = "Compares utterance transcription throughput of one task per utterance vs the batched transcription worker, against a local fake OpenAI compatible transcription server. Needs ffmpeg, like the real transcription path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utterances", type=int, default=200, help="Number of utterances to transcribe in each mode")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of utterances transcribed in parallel in each mode")
+        parser.add_argument("--provider-latency-ms", type=int, default=20, help="How long the fake provider takes to answer each request")
+        parser.add_argument("--no-tls", action="store_true", help="Serve the fake provider over plain HTTP instead of HTTPS")
+
+    def create_fixture(self):
+        organization = Organization.objects.create(name="Transcription worker benchmark")
+        project = Project.objects.create(name="Transcription worker benchmark", organization=organization)
+        credentials = Credentials.objects.create(project=project, credential_type=Credentials.CredentialTypes.OPENAI)
+        credentials.set_credentials({"api_key": "fake-api-key"})
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123")
+        recording = Recording.objects.create(
+            bot=bot,
+            recording_type=RecordingTypes.AUDIO_AND_VIDEO,
+            transcription_type=TranscriptionTypes.NON_REALTIME,
+            transcription_provider=TranscriptionProviders.OPENAI,
+            state=RecordingStates.IN_PROGRESS,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            is_default_recording=True,
+        )
+        participant = Participant.objects.create(bot=bot, uuid="benchmark-participant")
+        return organization, recording, participant
+
+    def delete_fixture(self, organization):
+        for project in organization.projects.all():
+            for bot in project.bots.all():
+                for recording in bot.recordings.all():
+                    for utterance in recording.utterances.all():
+                        utterance.delete_audio_data()
+                    recording.utterances.all().delete()
+                bot.recordings.all().delete()
+                bot.participants.all().delete()
+                bot.delete()
+            project.credentials.all().delete()
+            project.delete()
+        organization.delete()
+
+    def create_utterances(self, recording, participant, count, sample_rate=16000):
+        # One second of audio per utterance
+        audio_data = os.urandom(sample_rate * 2)
+        utterance_ids = []
+        for i in range(count):
+            audio_file_name = Utterance.save_audio_to_storage(recording, audio_data)
+            utterance = Utterance.objects.create(
+                source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                recording=recording,
+                participant=participant,
+                audio_file=audio_file_name,
+                audio_size_bytes=len(audio_data),
+                audio_format=Utterance.AudioFormat.PCM,
+                timestamp_ms=i * 1000,
+                duration_ms=1000,
+                sample_rate=sample_rate,
+            )
+            utterance_ids.append(utterance.id)
+        return utterance_ids
+
+    def run_one_task_per_utterance(self, utterance_ids, concurrency):
+        def process(utterance_id):
+            close_old_connections()
+            try:
+                transcribe_utterance(Utterance.objects.get(id=utterance_id))
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(process, utterance_ids))
+
+    def run_batched_worker(self, concurrency):
+        worker = TranscriptionWorker(batch_size=concurrency * 8, concurrency=concurrency)
+        try:
+            while worker.run_once():
+                pass
+        finally:
+            worker.shutdown()
+
+    def handle(self, *args, **options):
+        count = options["utterances"]
+        concurrency = options["concurrency"]
+
+        # The worker claims every pending utterance, so don't run against a database that has real ones waiting
+        if Utterance.objects.filter(source=Utterance.Sources.PER_PARTICIPANT_AUDIO, transcription__isnull=True, failure_data__isnull=True).exists():
+            raise CommandError("There are utterances waiting to be transcribed in this database. Run the benchmark against a database without pending utterances.")
+
+        with tempfile.TemporaryDirectory() as certificate_directory:
+            server, server_url = start_local_server(FakeTranscriptionProviderHandler, latency_seconds=options["provider_latency_ms"] / 1000, use_tls=not options["no_tls"], certificate_directory=certificate_directory)
+            base_url = f"{server_url}/v1"
+            os.environ["OPENAI_BASE_URL"] = base_url
+            self.stdout.write(f"Fake provider listening on {base_url}, transcribing {count} utterances per mode with concurrency {concurrency}")
+
+            try:
+                for label, use_worker in [("one task per utterance", False), ("batched transcription worker", True)]:
+                    organization, recording, participant = self.create_fixture()
+                    try:
+                        utterance_ids = self.create_utterances(recording, participant, count)
+                        connection_count_before = server.connection_count
+                        request_count_before = server.request_count
+
+                        start_time = time.time()
+                        if use_worker:
+                            self.run_batched_worker(concurrency)
+                        else:
+                            self.run_one_task_per_utterance(utterance_ids, concurrency)
+                        elapsed_seconds = time.time() - start_time
+
+                        transcribed_count = Utterance.objects.filter(id__in=utterance_ids, transcription__isnull=False).count()
+                        connection_count = server.connection_count - connection_count_before
+                        request_count = server.request_count - request_count_before
+                        self.stdout.write(f"{label}: {transcribed_count}/{count} transcribed in {elapsed_seconds:.2f}s, {transcribed_count / elapsed_seconds:.1f} utterances/sec, {request_count} provider requests over {connection_count} connections")
+                    finally:
+                        self.delete_fixture(organization)
+            finally:
+                server.shutdown()
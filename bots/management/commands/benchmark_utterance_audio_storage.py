@@ -0,0 +1,100 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import Organization
+from bots.models import Bot, Participant, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionProviders, TranscriptionTypes, Utterance, utterance_audio_storage
+
+
+class BenchmarkRollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compares the database write volume of storing utterance audio in the utterance row vs in utterance audio storage. Everything written to the database is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utterances", type=int, default=200, help="Number of utterances to write in each mode")
+        parser.add_argument("--utterance-seconds", type=float, default=5.0, help="Length of each utterance in seconds")
+        parser.add_argument("--sample-rate", type=int, default=32000, help="Sample rate of the utterance audio")
+
+    def current_wal_lsn(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_insert_lsn()")
+            return cursor.fetchone()[0]
+
+    def wal_bytes_since(self, start_lsn):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", [start_lsn])
+            return int(cursor.fetchone()[0])
+
+    def create_fixture(self):
+        organization = Organization.objects.create(name="Utterance audio storage benchmark")
+        project = Project.objects.create(name="Utterance audio storage benchmark", organization=organization)
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123")
+        recording = Recording.objects.create(
+            bot=bot,
+            recording_type=RecordingTypes.AUDIO_AND_VIDEO,
+            transcription_type=TranscriptionTypes.NON_REALTIME,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+            state=RecordingStates.IN_PROGRESS,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            is_default_recording=True,
+        )
+        participant = Participant.objects.create(bot=bot, uuid="benchmark-participant")
+        return recording, participant
+
+    def write_utterances(self, recording, participant, audio_data, sample_rate, count, use_storage):
+        stored_file_names = []
+        for i in range(count):
+            utterance_fields = {
+                "source": Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                "recording": recording,
+                "participant": participant,
+                "audio_format": Utterance.AudioFormat.PCM,
+                "timestamp_ms": i * 1000,
+                "duration_ms": len(audio_data) / ((sample_rate / 1000) * 2),
+                "sample_rate": sample_rate,
+            }
+            if use_storage:
+                audio_file_name = Utterance.save_audio_to_storage(recording, audio_data)
+                stored_file_names.append(audio_file_name)
+                utterance_fields["audio_file"] = audio_file_name
+                utterance_fields["audio_size_bytes"] = len(audio_data)
+            else:
+                utterance_fields["audio_blob"] = audio_data
+            Utterance.objects.create(**utterance_fields)
+        return stored_file_names
+
+    def run_mode(self, audio_data, sample_rate, count, use_storage):
+        stored_file_names = []
+        try:
+            with transaction.atomic():
+                recording, participant = self.create_fixture()
+                start_lsn = self.current_wal_lsn()
+                start_time = time.time()
+                stored_file_names = self.write_utterances(recording, participant, audio_data, sample_rate, count, use_storage)
+                elapsed_seconds = time.time() - start_time
+                wal_bytes = self.wal_bytes_since(start_lsn)
+                raise BenchmarkRollback()
+        except BenchmarkRollback:
+            pass
+        finally:
+            for audio_file_name in stored_file_names:
+                utterance_audio_storage().delete(audio_file_name)
+
+        return wal_bytes, elapsed_seconds
+
+    def handle(self, *args, **options):
+        count = options["utterances"]
+        sample_rate = options["sample_rate"]
+        # Random bytes don't compress, which is close to how TOAST treats real speech
+        audio_data = os.urandom(int(options["utterance_seconds"] * sample_rate) * 2)
+        audio_megabytes = len(audio_data) * count / 1_000_000
+
+        self.stdout.write(f"Writing {count} utterances of {len(audio_data)} bytes ({audio_megabytes:.1f} MB of audio) in each mode")
+        for label, use_storage in [("audio in utterance row", False), ("audio in utterance audio storage", True)]:
+            wal_bytes, elapsed_seconds = self.run_mode(audio_data, sample_rate, count, use_storage)
+            self.stdout.write(f"{label}: {wal_bytes / 1_000_000:.2f} MB of WAL, {wal_bytes / count:.0f} WAL bytes per utterance, {count / elapsed_seconds:.1f} utterances/sec")
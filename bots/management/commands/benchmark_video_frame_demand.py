@@ -0,0 +1,87 @@
+import os
+import struct
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bots.bot_controller import BotController
+from bots.bot_controller.pipeline_configuration import PipelineConfiguration
+from bots.utils import png_to_yuv420_frame
+from bots.web_bot_adapter.web_bot_adapter import WebBotAdapter
+
+FIXTURE_IMAGE_PATH = os.path.join(settings.BASE_DIR, "static", "images", "zoom_app_review_architecture_diagram_example.png")
+
+
+def fixture_video_messages(width, height, count):
+    """Video frame messages like the browser sends, made from an image in the repo, panned a little each frame so they aren't identical"""
+    with open(FIXTURE_IMAGE_PATH, "rb") as file:
+        image = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
+    image = cv2.resize(image, (width + count, height))
+    stream_id = b"stream_1"
+    messages = []
+    for i in range(count):
+        _, png_bytes = cv2.imencode(".png", image[:, i : i + width])
+        frame, _, _ = png_to_yuv420_frame(png_bytes.tobytes())
+        messages.append(struct.pack("<iqi", 2, i * 66666, len(stream_id)) + stream_id + struct.pack("<ii", width, height) + frame)
+    return messages
+
+
+class Command(BaseCommand):
+    help = "Measures the CPU an audio only bot spends on the meeting video it's sent. Before, the only check was whether the GStreamer pipeline could take video, which it can for an audio only recording in MP4. Now BotController works out whether anything will use the frames."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=60, help="Seconds of meeting video to process")
+        parser.add_argument("--fps", type=int, default=15, help="Frame rate of the meeting video")
+        parser.add_argument("--width", type=int, default=1280, help="Width of the meeting video")
+        parser.add_argument("--height", type=int, default=720, help="Height of the meeting video")
+
+    def handle(self, *args, **options):
+        messages = fixture_video_messages(options["width"], options["height"], 30)
+        frame_count = int(options["seconds"] * options["fps"])
+
+        # The state BotController works the demand out from, for an audio only recording whose pipeline has a video branch
+        audio_only_controller = SimpleNamespace(
+            pipeline_configuration=PipelineConfiguration.audio_recorder_bot(),
+            recording_paused=False,
+            rtmp_client=None,
+            gstreamer_pipeline=Mock(wants_any_video_frames=Mock(return_value=True)),
+        )
+        demand_callbacks = {
+            "before (pipeline can take video)": audio_only_controller.gstreamer_pipeline.wants_any_video_frames,
+            "after (BotController demand)": lambda: BotController.wants_any_video_frames(audio_only_controller),
+        }
+
+        self.stdout.write(f"Processing {options['seconds']} seconds of {options['width']}x{options['height']} video at {options['fps']} fps for an audio only bot")
+        for label, wants_any_video_frames in demand_callbacks.items():
+            add_video_frame_callback = Mock()
+            adapter = WebBotAdapter(
+                display_name="Benchmark Bot",
+                send_message_callback=Mock(),
+                meeting_url="https://meet.google.com/abc-defg-hij",
+                add_video_frame_callback=add_video_frame_callback,
+                wants_any_video_frames_callback=wants_any_video_frames,
+                add_audio_chunk_callback=Mock(),
+                add_mixed_audio_chunk_callback=Mock(),
+                add_encoded_mp4_chunk_callback=Mock(),
+                upsert_caption_callback=Mock(),
+                upsert_chat_message_callback=Mock(),
+                add_participant_event_callback=Mock(),
+                automatic_leave_configuration=Mock(),
+                recording_view=Mock(),
+                should_create_debug_recording=False,
+                start_recording_screen_callback=Mock(),
+                stop_recording_screen_callback=Mock(),
+                video_frame_size=(1920, 1080),
+            )
+
+            start_cpu_seconds = time.process_time()
+            for i in range(frame_count):
+                adapter.process_video_frame(messages[i % len(messages)])
+            cpu_seconds = time.process_time() - start_cpu_seconds
+
+            self.stdout.write(f"{label}: {cpu_seconds / options['seconds'] * 60:.2f} CPU seconds per bot-minute, {add_video_frame_callback.call_count} frames scaled and passed on")
@@ -0,0 +1,46 @@
+import struct
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from bots.web_bot_adapter.float32_audio_decoder import Float32AudioDecoder
+
+
+def convert_with_fresh_arrays(message, offset):
+    """How the web bot adapter used to convert each frame, without clipping"""
+    audio_data = np.frombuffer(message[offset:], dtype=np.float32)
+    return (audio_data * 32768.0).astype(np.int16)
+
+
+def convert_with_fresh_arrays_and_clip(message, offset):
+    """The straightforward fix for the wrap around"""
+    audio_data = np.frombuffer(message[offset:], dtype=np.float32)
+    return np.clip(audio_data * 32768.0, -32768, 32767).astype(np.int16)
+
+
+class Command(BaseCommand):
+    help = "Measures frames/sec of converting the float32 audio frames the browser sends to 16-bit PCM: with fresh arrays per frame as before (which wraps around instead of clipping), with np.clip added, and with the Float32AudioDecoder."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--frames", type=int, default=200000, help="Number of frames to convert for each stream")
+        parser.add_argument("--sample-rate", type=int, default=48000, help="Sample rate of the browser audio")
+
+    def handle(self, *args, **options):
+        samples = (0.5 * np.sin(2 * np.pi * 440 * np.arange(options["sample_rate"] // 100) / options["sample_rate"])).astype(np.float32)
+        participant_id = b"participant_12345"
+        messages = {
+            "mixed_audio": (struct.pack("<i", 3) + samples.tobytes(), 4),
+            "per_participant_audio": (struct.pack("<iB", 5, len(participant_id)) + participant_id + samples.tobytes(), 5 + len(participant_id)),
+        }
+        decoder = Float32AudioDecoder()
+
+        self.stdout.write(f"Converting {options['frames']} frames of 10 ms at {options['sample_rate']} Hz per stream")
+        for stream, (message, offset) in messages.items():
+            for label, convert in [("fresh arrays, no clipping", convert_with_fresh_arrays), ("fresh arrays with np.clip", convert_with_fresh_arrays_and_clip), ("Float32AudioDecoder", lambda message, offset: decoder.decode(stream, message, offset))]:
+                start_time = time.perf_counter()
+                for _ in range(options["frames"]):
+                    # All of them have to hand the callbacks bytes they can keep
+                    convert(message, offset).tobytes()
+                elapsed_seconds = time.perf_counter() - start_time
+                self.stdout.write(f"{stream}, {label}: {options['frames'] / elapsed_seconds:.0f} frames/sec")
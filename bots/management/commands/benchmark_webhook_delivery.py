@@ -0,0 +1,105 @@
+import tempfile
+import time
+import uuid
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts.models import Organization
+from attendee.celery import app as celery_app
+from bots.benchmark_utils import CountingRequestHandler, start_local_server
+from bots.models import Bot, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.webhook_utils import sign_payload, trigger_webhook
+
+
+class WebhookSinkHandler(CountingRequestHandler):
+    def do_POST(self):
+        self.read_body()
+        self.send_json(200, {"ok": True})
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Compares webhook fan-out and delivery throughput of one insert, task and connection per subscription vs the bulk fan-out with pooled delivery, against a local webhook sink. Tasks run inline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=200, help="Number of transcript update events to trigger in each mode")
+        parser.add_argument("--subscriptions", type=int, default=5, help="Number of webhook subscriptions on the project")
+        parser.add_argument("--sink-latency-ms", type=int, default=0, help="How long the webhook sink takes to answer each request")
+        parser.add_argument("--no-tls", action="store_true", help="Serve the webhook sink over plain HTTP instead of HTTPS")
+
+    def create_fixture(self, sink_url, subscription_count):
+        organization = Organization.objects.create(name="Webhook delivery benchmark")
+        project = Project.objects.create(name="Webhook delivery benchmark", organization=organization)
+        WebhookSecret.objects.create(project=project)
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123")
+        for i in range(subscription_count):
+            WebhookSubscription.objects.create(project=project, url=f"{sink_url}/webhook/{i}", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        return organization, project, bot
+
+    def delete_fixture(self, organization, project, bot):
+        bot.delete()
+        project.delete()
+        organization.delete()
+
+    def trigger_one_delivery_per_subscription(self, bot, payload):
+        """How fan-out and delivery used to work: a row, a task and a fresh connection for every subscription"""
+        for subscription in bot.project.webhook_subscriptions.filter(bot__isnull=True, triggers__contains=[WebhookTriggerTypes.TRANSCRIPT_UPDATE], is_active=True):
+            delivery = WebhookDeliveryAttempt.objects.create(webhook_subscription=subscription, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, idempotency_key=uuid.uuid4(), bot=bot, payload=payload)
+
+            delivery = WebhookDeliveryAttempt.objects.get(id=delivery.id)
+            webhook_data = {"idempotency_key": str(delivery.idempotency_key), "bot_id": delivery.bot.object_id, "bot_metadata": delivery.bot.metadata, "trigger": "transcript.update", "data": delivery.payload}
+            active_secret = delivery.webhook_subscription.project.webhook_secrets.filter().order_by("-created_at").first()
+            signature = sign_payload(webhook_data, active_secret.get_secret())
+            response = requests.post(delivery.webhook_subscription.url, json=webhook_data, headers={"Content-Type": "application/json", "X-Webhook-Signature": signature}, timeout=10)
+            delivery.attempt_count += 1
+            delivery.add_to_response_body_list(response.text[:10000])
+            delivery.status = WebhookDeliveryAttemptStatus.SUCCESS
+            delivery.save()
+
+    def handle(self, *args, **options):
+        event_count = options["events"]
+        subscription_count = options["subscriptions"]
+        payload = {"speaker_name": "Benchmark Speaker", "transcription": {"transcript": "hello world " * 20}}
+
+        # Run deliver_webhooks inline so both modes do the same amount of work in this process
+        celery_app.conf.task_always_eager = True
+
+        with tempfile.TemporaryDirectory() as certificate_directory:
+            server, sink_url = start_local_server(WebhookSinkHandler, latency_seconds=options["sink_latency_ms"] / 1000, use_tls=not options["no_tls"], certificate_directory=certificate_directory)
+            self.stdout.write(f"Webhook sink listening on {sink_url}, triggering {event_count} events for {subscription_count} subscriptions in each mode")
+
+            try:
+                for label, use_bulk_fan_out in [("one insert, task and connection per subscription", False), ("bulk fan-out with pooled delivery", True)]:
+                    organization, project, bot = self.create_fixture(sink_url, subscription_count)
+                    try:
+                        connection_count_before = server.connection_count
+                        request_count_before = server.request_count
+
+                        start_time = time.time()
+                        query_counter = QueryCounter()
+                        with connection.execute_wrapper(query_counter):
+                            for _ in range(event_count):
+                                if use_bulk_fan_out:
+                                    trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=bot, payload=payload)
+                                else:
+                                    self.trigger_one_delivery_per_subscription(bot, payload)
+                        elapsed_seconds = time.time() - start_time
+
+                        delivered_count = WebhookDeliveryAttempt.objects.filter(bot=bot, status=WebhookDeliveryAttemptStatus.SUCCESS).count()
+                        connection_count = server.connection_count - connection_count_before
+                        request_count = server.request_count - request_count_before
+                        self.stdout.write(f"{label}: {delivered_count} webhooks delivered in {elapsed_seconds:.2f}s, {delivered_count / elapsed_seconds:.1f} webhooks/sec, {query_counter.count / event_count:.1f} queries per event, {request_count} requests over {connection_count} connections")
+                    finally:
+                        self.delete_fixture(organization, project, bot)
+            finally:
+                server.shutdown()
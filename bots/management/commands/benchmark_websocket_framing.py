@@ -0,0 +1,99 @@
+import json
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from websockets.sync.server import serve
+
+from bots.bot_controller.bot_websocket_client import BotWebsocketClient
+from bots.streaming_resampler import StreamingResampler
+from bots.websocket_payloads import mixed_audio_websocket_binary_frame, mixed_audio_websocket_payload
+
+MIXED_AUDIO_SAMPLE_RATE = 48000
+CHUNK_MS = 10
+
+
+def run_websocket_sink(port_queue):
+    """
+    Websocket server that counts what it receives. When it gets a {"flush": true} message it replies with the totals,
+    which tells the client everything it sent before that has arrived.
+    """
+
+    def handler(websocket):
+        received_bytes = 0
+        received_frames = 0
+        for message in websocket:
+            if isinstance(message, str) and json.loads(message).get("flush"):
+                websocket.send(json.dumps({"received_bytes": received_bytes, "received_frames": received_frames}))
+                received_bytes = 0
+                received_frames = 0
+                continue
+            received_bytes += len(message)
+            received_frames += 1
+
+    with serve(handler, "127.0.0.1", 0) as server:
+        port_queue.put(server.socket.getsockname()[1])
+        server.serve_forever()
+
+
+class Command(BaseCommand):
+    help = "Measures the bot's CPU time per minute of mixed audio sent to a local websocket server with JSON vs binary framing. The server runs in a separate process, so only the bot side is measured."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=float, default=1, help="Minutes of meeting audio to send with each framing")
+        parser.add_argument("--speedup", type=float, default=10, help="How much faster than real time to produce the audio chunks")
+        parser.add_argument("--sample-rate", type=int, default=16000, help="Sample rate of the audio sent to the websocket")
+
+    def handle(self, *args, **options):
+        port_queue = multiprocessing.Queue()
+        server_process = multiprocessing.Process(target=run_websocket_sink, args=(port_queue,), daemon=True)
+        server_process.start()
+        url = f"ws://127.0.0.1:{port_queue.get(timeout=10)}"
+
+        chunk_samples = MIXED_AUDIO_SAMPLE_RATE * CHUNK_MS // 1000
+        chunk_count = int(options["minutes"] * 60 * 1000 / CHUNK_MS)
+        t = np.arange(chunk_samples * 100) / MIXED_AUDIO_SAMPLE_RATE
+        one_second_of_audio = (10000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+        chunks = [one_second_of_audio[i : i + chunk_samples].tobytes() for i in range(0, len(one_second_of_audio), chunk_samples)]
+        chunk_interval_seconds = CHUNK_MS / 1000 / options["speedup"]
+
+        self.stdout.write(f"Sending {options['minutes']} minutes of audio in {CHUNK_MS} ms chunks at {options['speedup']}x real time to {url}")
+
+        try:
+            for framing in ["json", "binary"]:
+                totals_received = threading.Event()
+                totals = {}
+
+                def on_message(message):
+                    totals.update(json.loads(message))
+                    totals_received.set()
+
+                client = BotWebsocketClient(url=url, on_message_callback=on_message)
+                client.start()
+                while client.connection_state != BotWebsocketClient.CONNECTED:
+                    time.sleep(0.01)
+
+                resampler = StreamingResampler(MIXED_AUDIO_SAMPLE_RATE, options["sample_rate"])
+                start_cpu_seconds = time.process_time()
+                start_time = time.perf_counter()
+                for i in range(chunk_count):
+                    if framing == "binary":
+                        client.send_async(mixed_audio_websocket_binary_frame(chunks[i % len(chunks)], resampler))
+                    else:
+                        client.send_async(mixed_audio_websocket_payload(chunks[i % len(chunks)], resampler, "bot_benchmark"))
+
+                    # Keep to the schedule, like audio coming from a meeting
+                    sleep_seconds = start_time + (i + 1) * chunk_interval_seconds - time.perf_counter()
+                    if sleep_seconds > 0:
+                        time.sleep(sleep_seconds)
+
+                client.send_async({"flush": True})
+                totals_received.wait(timeout=60)
+                cpu_seconds = time.process_time() - start_cpu_seconds
+                client.cleanup()
+
+                self.stdout.write(f"{framing}: {cpu_seconds / options['minutes']:.2f} CPU seconds per bot-minute, {totals['received_bytes'] / options['minutes'] / 1e6:.2f} MB per bot-minute in {totals['received_frames']} frames")
+        finally:
+            server_process.terminate()
@@ -0,0 +1,49 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bots.models import Utterance, utterance_audio_storage
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Moves utterance audio that is still stored in the database into utterance audio storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of utterances to move per batch")
+        # Utterances that were touched recently may still be in the middle of being transcribed, so leave them alone
+        parser.add_argument("--min-age-minutes", type=int, default=60, help="Only move utterances that have not been updated for this many minutes")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated_before = timezone.now() - timezone.timedelta(minutes=options["min_age_minutes"])
+
+        utterances_to_move = Utterance.objects.filter(audio_file="", updated_at__lt=updated_before).exclude(audio_blob=b"").select_related("recording").only("id", "audio_blob", "recording__object_id").order_by("id")
+
+        last_id = 0
+        moved_count = 0
+        moved_bytes = 0
+        while True:
+            batch = list(utterances_to_move.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            for utterance in batch:
+                audio_data = bytes(utterance.audio_blob)
+                audio_file_name = Utterance.save_audio_to_storage(utterance.recording, audio_data)
+
+                # Only swap the reference in if nobody else cleared or moved the audio in the meantime
+                updated_count = Utterance.objects.filter(id=utterance.id, audio_file="").exclude(audio_blob=b"").update(audio_file=audio_file_name, audio_size_bytes=len(audio_data), audio_blob=b"")
+                if updated_count == 0:
+                    utterance_audio_storage().delete(audio_file_name)
+                    continue
+
+                moved_count += 1
+                moved_bytes += len(audio_data)
+
+            last_id = batch[-1].id
+            logger.info(f"Moved audio for {moved_count} utterances ({moved_bytes} bytes) to utterance audio storage so far")
+
+        self.stdout.write(f"Moved audio for {moved_count} utterances ({moved_bytes} bytes) to utterance audio storage")
@@ -0,0 +1,54 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from bots.transcription_worker import TranscriptionWorker
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Transcribes pending per participant utterances in batches. Used instead of one celery task per utterance when TRANSCRIPTION_WORKER_ENABLED is set."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Maximum number of utterances to claim at once (default: 50)")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of utterances to transcribe in parallel (default: 8)")
+        parser.add_argument("--claim-seconds", type=int, default=600, help="How long a claimed utterance is reserved for this worker (default: 600)")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to wait before polling again when there was no work (default: 1)")
+
+    # Graceful shutdown flags
+    _keep_running = True
+
+    def _graceful_exit(self, signum, frame):
+        log.info("Received %s, shutting down after current batch", signum)
+        self._keep_running = False
+
+    def handle(self, *args, **opts):
+        # Trap SIGINT / SIGTERM so Kubernetes or Heroku can stop the container cleanly
+        signal.signal(signal.SIGINT, self._graceful_exit)
+        signal.signal(signal.SIGTERM, self._graceful_exit)
+
+        worker = TranscriptionWorker(batch_size=opts["batch_size"], concurrency=opts["concurrency"], claim_seconds=opts["claim_seconds"])
+        log.info("Transcription worker started with batch size %s and concurrency %s", opts["batch_size"], opts["concurrency"])
+
+        try:
+            while self._keep_running:
+                claimed_count = 0
+                try:
+                    claimed_count = worker.run_once()
+                except Exception:
+                    log.exception("Transcription worker batch failed")
+                finally:
+                    # Close stale connections so the loop never inherits a dead socket
+                    connection.close()
+
+                # If the batch was full there is probably more work waiting, so go straight to the next one
+                if claimed_count < opts["batch_size"] and self._keep_running:
+                    time.sleep(opts["interval"])
+        finally:
+            worker.shutdown()
+
+        log.info("Transcription worker exited")
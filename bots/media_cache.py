@@ -0,0 +1,315 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Size of the byte ranges media is downloaded in
+DEFAULT_CHUNK_SIZE = 512 * 1024
+# A download that hasn't been touched in this long was left behind by a bot that went away
+STALE_PARTIAL_FILE_SECONDS = 60 * 60
+PARTIAL_FILE_SUFFIX = ".partial"
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class MediaCache:
+    """
+    Content addressed files in a local directory, shared by the bots on a node. Files are looked up by a key, and the
+    least recently used ones are deleted once the files add up to more than max_size_bytes. Files are written to a
+    partial file next to the cache and renamed into place once they're complete, so a file in the cache is always whole.
+    """
+
+    def __init__(self, directory, max_size_bytes):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(*parts):
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """The path of the cached file, or None if it isn't cached. Marks the file as recently used."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def new_partial_path(self, key):
+        return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}{PARTIAL_FILE_SUFFIX}")
+
+    def put(self, key, partial_path):
+        """Move a finished partial file into the cache and return its path, or None if it's too big to keep, in which case the partial file is left where it is"""
+        size = os.path.getsize(partial_path)
+        if size > self.max_size_bytes:
+            return None
+        self.evict(size)
+        path = self.path_for(key)
+        # Another bot may have cached the same file in the meantime, which this replaces with identical bytes
+        os.replace(partial_path, path)
+        return path
+
+    def put_bytes(self, key, data):
+        partial_path = self.new_partial_path(key)
+        with open(partial_path, "wb") as file:
+            file.write(data)
+        path = self.put(key, partial_path)
+        if path is None:
+            os.unlink(partial_path)
+        return path
+
+    def evict(self, incoming_size=0):
+        """Delete the least recently used files until incoming_size more bytes fit, and any abandoned partial files"""
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as directory_entries:
+            for entry in directory_entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(PARTIAL_FILE_SUFFIX):
+                    if now - stat.st_mtime > STALE_PARTIAL_FILE_SECONDS:
+                        self._unlink(entry.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size + incoming_size <= self.max_size_bytes:
+                break
+            # A bot that's playing the file keeps its open file descriptor
+            self._unlink(path)
+            total_size -= size
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+_media_cache = None
+
+
+def get_media_cache():
+    global _media_cache
+    if _media_cache is None:
+        _media_cache = MediaCache(settings.MEDIA_CACHE_DIRECTORY, settings.MEDIA_CACHE_MAX_SIZE_BYTES)
+    return _media_cache
+
+
+class HttpMediaSource:
+    """
+    Random access to a remote media file that's served from the media cache when it's there, and otherwise read while
+    it's being downloaded. The file is downloaded in byte ranges by a background thread, starting from wherever the
+    reader last asked for, so a demuxer that reads the moov at the end of the file first gets it without waiting for the
+    rest. Once every range is downloaded, the file goes into the cache under its URL and ETag.
+    """
+
+    def __init__(self, url, media_cache, chunk_size=DEFAULT_CHUNK_SIZE, timeout_seconds=30):
+        self.url = url
+        self.media_cache = media_cache
+        self.chunk_size = chunk_size
+        self.timeout_seconds = timeout_seconds
+
+        self.size = None
+        self.cache_key = None
+        # Set when the whole file is on disk, and to the file in the cache if it went into the cache
+        self.download_complete = False
+        self.path = None
+        self.cache_hit = False
+
+        self._session = requests.Session()
+        self._fd = None
+        self._partial_path = None
+        self._condition = threading.Condition()
+        self._downloaded_chunks = set()
+        # Where the reader is, so the download follows it
+        self._wanted_chunk = 0
+        self._closed = False
+        self._error = None
+        self._download_thread = None
+
+    def open(self):
+        """Find out what's at the URL and start reading it. Blocks for one request."""
+        response = self._session.get(self.url, headers={"Range": f"bytes=0-{self.chunk_size - 1}"}, stream=True, timeout=self.timeout_seconds)
+        response.raise_for_status()
+        if self._closed:
+            response.close()
+            raise RuntimeError(f"Closed while opening {self.url}")
+
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if validator:
+            self.cache_key = MediaCache.key_for(self.url, validator)
+            cached_path = self.media_cache.get(self.cache_key)
+            if cached_path:
+                try:
+                    self._open_complete_file(cached_path)
+                except FileNotFoundError:
+                    # Evicted since
+                    pass
+                else:
+                    response.close()
+                    self.cache_hit = True
+                    logger.info(f"Reading {self.url} from the media cache")
+                    return
+
+        if response.status_code == 206:
+            content_range = CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+            self.size = int(content_range.group(3))
+            target = self._download_ranges
+        else:
+            # The server ignored the range, so the whole file is coming in order
+            self.size = int(response.headers["Content-Length"]) if "Content-Length" in response.headers else None
+            target = self._download_sequentially
+
+        self._partial_path = self.media_cache.new_partial_path(self.cache_key or MediaCache.key_for(self.url))
+        self._fd = os.open(self._partial_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if self.size is not None:
+            os.ftruncate(self._fd, self.size)
+        self._download_thread = threading.Thread(target=self._download_worker, args=(target, response), daemon=True)
+        self._download_thread.start()
+
+    def _open_complete_file(self, path):
+        self._fd = os.open(path, os.O_RDONLY)
+        self.path = path
+        self.download_complete = True
+        self.size = os.fstat(self._fd).st_size
+        self._downloaded_chunks = set(range(self.chunk_count))
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def _download_worker(self, target, first_response):
+        try:
+            target(first_response)
+            self._finish_download()
+        except Exception as e:
+            with self._condition:
+                if not self._closed:
+                    logger.error(f"Error downloading {self.url}: {e}")
+                    self._error = e
+                self._condition.notify_all()
+
+    def _write_chunk(self, chunk_index, data):
+        os.pwrite(self._fd, data, chunk_index * self.chunk_size)
+        with self._condition:
+            self._downloaded_chunks.add(chunk_index)
+            self._condition.notify_all()
+
+    def _read_exactly(self, response, length):
+        data = bytearray()
+        for piece in response.iter_content(chunk_size=64 * 1024):
+            data += piece
+            if len(data) >= length:
+                break
+        if len(data) < length:
+            raise RuntimeError(f"Connection closed after {len(data)} of {length} bytes")
+        return bytes(data[:length])
+
+    def _download_ranges(self, first_response):
+        with first_response:
+            self._write_chunk(0, self._read_exactly(first_response, min(self.chunk_size, self.size)))
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                missing_chunks = [chunk_index for chunk_index in range(self.chunk_count) if chunk_index not in self._downloaded_chunks]
+                if not missing_chunks:
+                    return
+                # The first missing chunk at or after the reader, or from the start once everything after it is done
+                chunk_index = next((chunk_index for chunk_index in missing_chunks if chunk_index >= self._wanted_chunk), missing_chunks[0])
+
+            start = chunk_index * self.chunk_size
+            end = min(start + self.chunk_size, self.size) - 1
+            with self._session.get(self.url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=self.timeout_seconds) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RuntimeError(f"Server answered a range request with {response.status_code}")
+                self._write_chunk(chunk_index, self._read_exactly(response, end - start + 1))
+
+    def _download_sequentially(self, response):
+        with response:
+            chunk_index = 0
+            chunk = bytearray()
+            for piece in response.iter_content(chunk_size=64 * 1024):
+                if self._closed:
+                    return
+                chunk += piece
+                while len(chunk) >= self.chunk_size:
+                    self._write_chunk(chunk_index, chunk[: self.chunk_size])
+                    del chunk[: self.chunk_size]
+                    chunk_index += 1
+            downloaded_size = chunk_index * self.chunk_size + len(chunk)
+            if self.size is None:
+                self.size = downloaded_size
+            elif downloaded_size != self.size:
+                raise RuntimeError(f"Connection closed after {downloaded_size} of {self.size} bytes")
+            if chunk:
+                self._write_chunk(chunk_index, chunk)
+
+    def _finish_download(self):
+        with self._condition:
+            if self._closed or len(self._downloaded_chunks) < self.chunk_count:
+                return
+        if self.cache_key:
+            self.path = self.media_cache.put(self.cache_key, self._partial_path)
+            if self.path:
+                self._partial_path = None
+        with self._condition:
+            self.download_complete = True
+            self._condition.notify_all()
+
+    def read(self, offset, length):
+        """Read up to length bytes at offset, waiting for them to be downloaded. Returns fewer bytes only at the end of the file, and none once closed."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return b""
+                if self._error:
+                    raise self._error
+                # Not known until a download without a Content-Length is done
+                if self.size is not None:
+                    if offset >= self.size:
+                        return b""
+                    length = min(length, self.size - offset)
+                    first_chunk = offset // self.chunk_size
+                    last_chunk = (offset + length - 1) // self.chunk_size
+                    self._wanted_chunk = first_chunk
+                    if all(chunk_index in self._downloaded_chunks for chunk_index in range(first_chunk, last_chunk + 1)):
+                        break
+                self._condition.wait()
+        return os.pread(self._fd, length, offset)
+
+    def wait_until_downloaded(self, timeout_seconds=None):
+        with self._condition:
+            return self._condition.wait_for(lambda: self.download_complete or self._error is not None or self._closed, timeout=timeout_seconds)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._download_thread and self._download_thread is not threading.current_thread():
+            self._download_thread.join(timeout=self.timeout_seconds)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        # Unfinished, or finished but not going into the cache
+        if self._partial_path and os.path.exists(self._partial_path):
+            os.unlink(self._partial_path)
+        self._session.close()
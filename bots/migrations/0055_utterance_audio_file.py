@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 06:12
+
+import bots.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0054_alter_credentials_credential_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utterance',
+            name='audio_file',
+            field=models.FileField(blank=True, max_length=255, storage=bots.models.utterance_audio_storage, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='audio_size_bytes',
+            field=models.IntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0055_utterance_audio_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utterance',
+            name='transcription_claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='utterance',
+            index=models.Index(condition=models.Q(('failure_data__isnull', True), ('source', 1), ('transcription__isnull', True)), fields=['transcription_claimed_until', 'id'], name='utterance_pending_idx'),
+        ),
+    ]
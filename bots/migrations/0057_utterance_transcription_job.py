@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0056_utterance_transcription_claimed_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utterance',
+            name='transcription_job_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='transcription_job_submitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-17 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0057_utterance_transcription_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_flush_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_max_events',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_max_wait_ms',
+            field=models.PositiveIntegerField(default=1000),
+        ),
+    ]
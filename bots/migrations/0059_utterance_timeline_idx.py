@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0058_webhooksubscription_batching'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='utterance',
+            index=models.Index(fields=['recording', 'timestamp_ms', 'id'], name='utterance_timeline_idx'),
+        ),
+    ]
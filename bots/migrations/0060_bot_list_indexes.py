@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-17 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0059_utterance_timeline_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bot',
+            index=models.Index(fields=['project', 'state', 'updated_at', 'id'], name='bot_project_state_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bot',
+            index=models.Index(fields=['project', 'updated_at', 'id'], name='bot_project_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bot',
+            index=models.Index(fields=['project', 'created_at'], name='bot_project_created_idx'),
+        ),
+    ]
@@ -5,12 +5,15 @@ import os
 import random
 import secrets
 import string
+import uuid
 
 from concurrency.exceptions import RecordModifiedError
 from concurrency.fields import IntegerVersionField
 from cryptography.fernet import Fernet, InvalidToken
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from django.db import models, transaction
 from django.db.models import Q
 from django.db.utils import IntegrityError
@@ -252,6 +255,11 @@ class BotStates(models.IntegerChoices):
         }
         return mapping.get(value)
 
+    @classmethod
+    def api_code_to_state(cls, api_code):
+        """Returns the state value for a given API code, or None if there isn't one"""
+        return next((state.value for state in cls if cls.state_to_api_code(state.value) == api_code), None)
+
     @classmethod
     def post_meeting_states(cls):
         return [cls.FATAL_ERROR, cls.ENDED, cls.DATA_DELETED]
@@ -312,7 +320,9 @@ class Bot(models.Model):
 
             # Delete all utterances and recording files for each recording
             for recording in self.recordings.all():
-                # Delete all utterances first
+                # Delete any utterance audio that lives outside the database, then the utterances themselves
+                for audio_file_name in recording.utterances.exclude(audio_file="").values_list("audio_file", flat=True):
+                    utterance_audio_storage().delete(audio_file_name)
                 recording.utterances.all().delete()
 
                 # Delete the actual recording file if it exists
@@ -523,6 +533,11 @@ class Bot(models.Model):
         websocket_audio_settings = websocket_settings.get("audio") or {}
         return websocket_audio_settings.get("sample_rate", 16000)
 
+    def websocket_audio_framing(self):
+        websocket_settings = self.settings.get("websocket_settings") or {}
+        websocket_audio_settings = websocket_settings.get("audio") or {}
+        return websocket_audio_settings.get("framing", "json")
+
     def zoom_tokens_callback_url(self):
         callback_settings = self.settings.get("callback_settings", {})
         if callback_settings is None:
@@ -613,6 +628,11 @@ class Bot(models.Model):
         # The partial index will exclude bots without a join_at which should speed up the query and reduce the space used by the index.
         indexes = [
             models.Index(fields=["join_at"], name="bot_join_at_idx", condition=models.Q(join_at__isnull=False)),
+            # For listing a project's bots in the order they were updated, with or without a state filter, a page at a time
+            models.Index(fields=["project", "state", "updated_at", "id"], name="bot_project_state_updated_idx"),
+            models.Index(fields=["project", "updated_at", "id"], name="bot_project_updated_idx"),
+            # For the dashboard's list of a project's bots, newest first
+            models.Index(fields=["project", "created_at"], name="bot_project_created_idx"),
         ]
 
         # Within a project, we don't want to allow bots that aren't in apost-meeting state with the same deduplication key.
@@ -1631,6 +1651,10 @@ class TranscriptionFailureReasons(models.TextChoices):
     UTTERANCES_STILL_IN_PROGRESS_WHEN_RECORDING_TERMINATED = "utterances_still_in_progress_when_recording_terminated"
 
 
+def utterance_audio_storage():
+    return storages["utterance_audio"]
+
+
 class Utterance(models.Model):
     # If transcription is None and failure_data is not None, then the transcription failed
     # If transcription is not None and failure_data is None, then the transcription succeeded
@@ -1646,7 +1670,10 @@ class Utterance(models.Model):
 
     recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name="utterances")
     participant = models.ForeignKey(Participant, on_delete=models.PROTECT, related_name="utterances")
+    # Legacy location for the raw audio. New utterances keep their audio in utterance audio storage and only store a reference to it here.
     audio_blob = models.BinaryField()
+    audio_file = models.FileField(storage=utterance_audio_storage, max_length=255, blank=True)
+    audio_size_bytes = models.IntegerField(null=True, default=None)
     audio_format = models.IntegerField(choices=AudioFormat.choices, default=AudioFormat.PCM, null=True)
     timestamp_ms = models.BigIntegerField()
     duration_ms = models.IntegerField()
@@ -1656,15 +1683,56 @@ class Utterance(models.Model):
     failure_data = models.JSONField(null=True, default=None)
     source_uuid = models.CharField(max_length=255, null=True, unique=True)
     sample_rate = models.IntegerField(null=True, default=None)
+    # Used by the transcription worker. While this is in the future, the utterance is either being transcribed by a worker or waiting to be retried.
+    transcription_claimed_until = models.DateTimeField(null=True, blank=True)
+    # For providers that transcribe in a background job, the provider's id for the job that is currently running (for Gladia, the job's result url)
+    transcription_job_id = models.CharField(max_length=255, null=True, blank=True)
+    transcription_job_submitted_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     source = models.IntegerField(choices=Sources.choices, default=Sources.PER_PARTICIPANT_AUDIO, null=False)
 
+    AUDIO_READ_CHUNK_SIZE = 1024 * 1024
+
+    class Meta:
+        indexes = [
+            # Only per participant audio utterances (source=1) that still need to be transcribed are in this index, so the transcription worker can find them quickly
+            models.Index(fields=["transcription_claimed_until", "id"], name="utterance_pending_idx", condition=models.Q(transcription__isnull=True, failure_data__isnull=True, source=1)),
+            # A recording's utterances in timeline order, which is how the transcript endpoint reads them
+            models.Index(fields=["recording", "timestamp_ms", "id"], name="utterance_timeline_idx"),
+        ]
+
     def __str__(self):
         return f"Utterance at {self.timestamp_ms}ms ({self.duration_ms}ms long)"
 
+    @classmethod
+    def save_audio_to_storage(cls, recording: Recording, audio_data: bytes) -> str:
+        """Write raw audio to utterance audio storage and return the name it was stored under"""
+        name = f"{recording.object_id}/{uuid.uuid4().hex}.pcm"
+        return utterance_audio_storage().save(name, ContentFile(audio_data))
+
+    def iter_audio_chunks(self):
+        if not self.audio_file:
+            legacy_audio_data = bytes(self.audio_blob)
+            if legacy_audio_data:
+                yield legacy_audio_data
+            return
+
+        with self.audio_file.open("rb") as audio_file:
+            for chunk in audio_file.chunks(chunk_size=self.AUDIO_READ_CHUNK_SIZE):
+                yield chunk
+
+    def get_audio_data(self) -> bytes:
+        return b"".join(self.iter_audio_chunks())
+
+    def delete_audio_data(self):
+        """Discard the utterance's audio from storage and the database. Does not save the utterance."""
+        if self.audio_file:
+            self.audio_file.delete(save=False)
+        self.audio_blob = b""
+
 
 class Credentials(models.Model):
     class CredentialTypes(models.IntegerChoices):
@@ -2072,6 +2140,15 @@ class WebhookSubscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # When batch_max_events is set, events are delivered in batches of up to batch_max_events, sent at most batch_max_wait_ms after the first event in the batch
+    batch_max_events = models.PositiveIntegerField(null=True, blank=True)
+    batch_max_wait_ms = models.PositiveIntegerField(default=1000)
+    batch_flush_due_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_batched(self):
+        return self.batch_max_events is not None
+
 
 class WebhookDeliveryAttemptStatus(models.IntegerChoices):
     PENDING = 1, "Pending"
@@ -404,13 +404,7 @@ class ProjectBotsView(LoginRequiredMixin, ProjectUrlContextMixin, ListView):
         # Apply annotations and ordering
         queryset = queryset.annotate(last_event_type=models.Subquery(latest_event_type), last_event_sub_type=models.Subquery(latest_event_sub_type)).order_by("-created_at")
 
-        # Add display names for the event types
-        for bot in queryset:
-            if bot.last_event_type:
-                bot.last_event_type_display = dict(BotEventTypes.choices).get(bot.last_event_type, str(bot.last_event_type))
-            if bot.last_event_sub_type:
-                bot.last_event_sub_type_display = dict(BotEventSubTypes.choices).get(bot.last_event_sub_type, str(bot.last_event_sub_type))
-
+        # Not evaluated here, so that the paginator only reads the current page. The display names are added in get_context_data
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -427,9 +421,21 @@ class ProjectBotsView(LoginRequiredMixin, ProjectUrlContextMixin, ListView):
         # Add flag to detect if create modal should be automatically opened
         context["open_create_modal"] = self.request.GET.get("open_create_modal") == "true"
 
+        # Add display names for the event types of the bots in the current page
+        for bot in context["bots"]:
+            if bot.last_event_type:
+                bot.last_event_type_display = dict(BotEventTypes.choices).get(bot.last_event_type, str(bot.last_event_type))
+            if bot.last_event_sub_type:
+                bot.last_event_sub_type_display = dict(BotEventSubTypes.choices).get(bot.last_event_sub_type, str(bot.last_event_sub_type))
+
         # Check if any bots in the current page have a join_at value
         context["has_scheduled_bots"] = any(bot.join_at is not None for bot in context["bots"])
 
+        # The pages linked to around the current one. A large project has too many pages to loop over them all in the template.
+        page_obj = context["page_obj"]
+        if page_obj:
+            context["nearby_page_numbers"] = range(max(page_obj.number - 2, 1), min(page_obj.number + 2, page_obj.paginator.num_pages) + 1)
+
         return context
 
 
@@ -625,6 +631,8 @@ class ProjectBotDetailView(LoginRequiredMixin, ProjectUrlContextMixin, View):
         # Calculate maximum values from resource snapshots
         max_ram_usage = 0
         max_cpu_usage = 0
+        max_encoder_latency_ms = None
+        has_gstreamer_pipeline_metrics = False
         if resource_snapshots.exists():
             for snapshot in resource_snapshots:
                 data = snapshot.data
@@ -636,6 +644,14 @@ class ProjectBotDetailView(LoginRequiredMixin, ProjectUrlContextMixin, View):
                 if cpu_usage > max_cpu_usage:
                     max_cpu_usage = cpu_usage
 
+                gstreamer_pipeline_metrics = data.get("gstreamer_pipeline")
+                if gstreamer_pipeline_metrics:
+                    has_gstreamer_pipeline_metrics = True
+                    snapshot.max_queue_fill_percent = round(100 * max(gstreamer_pipeline_metrics.get("queue_fill_max", {}).values(), default=0))
+                    encoder_latency_ms = gstreamer_pipeline_metrics.get("encoder_latency_ms_max")
+                    if encoder_latency_ms is not None and (max_encoder_latency_ms is None or encoder_latency_ms > max_encoder_latency_ms):
+                        max_encoder_latency_ms = encoder_latency_ms
+
         context = self.get_project_context(object_id, project)
         context.update(
             {
@@ -650,6 +666,8 @@ class ProjectBotDetailView(LoginRequiredMixin, ProjectUrlContextMixin, View):
                 "resource_snapshots": resource_snapshots,
                 "max_ram_usage": max_ram_usage,
                 "max_cpu_usage": max_cpu_usage,
+                "max_encoder_latency_ms": max_encoder_latency_ms,
+                "has_gstreamer_pipeline_metrics": has_gstreamer_pipeline_metrics,
             }
         )
 
@@ -0,0 +1,25 @@
+import os
+import threading
+
+import redis
+
+
+def redis_url():
+    return os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+
+
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+
+def get_redis_client():
+    """
+    The process's Redis client. Its connection pool is shared by every thread and reconnects after a fork, so commands
+    reuse open connections instead of connecting for each one.
+    """
+    global _redis_client
+    if _redis_client is None:
+        with _redis_client_lock:
+            if _redis_client is None:
+                _redis_client = redis.from_url(redis_url(), socket_connect_timeout=2, socket_timeout=2)
+    return _redis_client
@@ -4,6 +4,7 @@ import os
 from dataclasses import asdict
 
 import jsonschema
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.utils import timezone
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -438,6 +439,26 @@ def get_webhook_trigger_enum():
                     "description": "List of webhook trigger types",
                     "uniqueItems": True,
                 },
+                "batching": {
+                    "type": "object",
+                    "properties": {
+                        "max_events": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": 1000,
+                            "description": "Deliver up to this many events in each request",
+                        },
+                        "max_wait_ms": {
+                            "type": "integer",
+                            "minimum": 10,
+                            "maximum": 60000,
+                            "description": "Deliver a batch at most this many milliseconds after its first event, even if it isn't full. Defaults to 1000.",
+                        },
+                    },
+                    "required": ["max_events"],
+                    "additionalProperties": False,
+                    "description": "Deliver events in batches instead of one request per event",
+                },
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -520,6 +541,12 @@ class BotChatMessageRequestSerializer(serializers.Serializer):
                         "default": 16000,
                         "description": "The sample rate of the audio to send. Can be 8000, 16000, or 24000. Defaults to 16000.",
                     },
+                    "framing": {
+                        "type": "string",
+                        "enum": ["json", "binary"],
+                        "default": "json",
+                        "description": "How audio is sent to the websocket. 'json' sends JSON messages with base64 encoded audio. 'binary' sends binary frames with a small header followed by the raw audio, which is smaller and cheaper to decode. Defaults to 'json'.",
+                    },
                 },
                 "required": ["url"],
                 "additionalProperties": False,
@@ -593,7 +620,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
     calendar_event_id = serializers.CharField(help_text="The ID of the calendar event the bot should join.", required=False, default=None)
     deduplication_key = serializers.CharField(help_text="Optional key for deduplicating bots. If a bot with this key already exists in a non-terminal state, the new bot will not be created and an error will be returned.", required=False, default=None)
     webhooks = WebhooksJSONField(
-        help_text="List of webhook subscriptions to create for this bot. Each item should have 'url' and 'triggers' fields.",
+        help_text="List of webhook subscriptions to create for this bot. Each item should have 'url' and 'triggers' fields, and can have a 'batching' field.",
         required=False,
         default=None,
     )
@@ -628,6 +655,15 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                     "minItems": 1,
                     "uniqueItems": True,
                 },
+                "batching": {
+                    "type": "object",
+                    "properties": {
+                        "max_events": {"type": "integer", "minimum": 1, "maximum": 1000},
+                        "max_wait_ms": {"type": "integer", "minimum": 10, "maximum": 60000},
+                    },
+                    "required": ["max_events"],
+                    "additionalProperties": False,
+                },
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -1038,6 +1074,10 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                         "type": "integer",
                         "enum": [8000, 16000, 24000],
                     },
+                    "framing": {
+                        "type": "string",
+                        "enum": ["json", "binary"],
+                    },
                 },
                 "required": ["url"],
                 "additionalProperties": False,
@@ -1373,6 +1413,11 @@ class BotSerializer(serializers.ModelSerializer):
         }
     )
     def get_transcription_state(self, obj):
+        if hasattr(obj, "default_recording_transcription_state"):
+            if obj.default_recording_transcription_state is None:
+                return None
+            return RecordingTranscriptionStates.state_to_api_code(obj.default_recording_transcription_state)
+
         default_recording = Recording.objects.filter(bot=obj, is_default_recording=True).first()
         if not default_recording:
             return None
@@ -1386,12 +1431,31 @@ class BotSerializer(serializers.ModelSerializer):
         }
     )
     def get_recording_state(self, obj):
+        if hasattr(obj, "default_recording_state"):
+            if obj.default_recording_state is None:
+                return None
+            return RecordingStates.state_to_api_code(obj.default_recording_state)
+
         default_recording = Recording.objects.filter(bot=obj, is_default_recording=True).first()
         if not default_recording:
             return None
 
         return RecordingStates.state_to_api_code(default_recording.state)
 
+    @staticmethod
+    def prepare_queryset(queryset):
+        """
+        Annotates a Bot queryset with its default recording's states and prefetches its events, so serializing many
+        bots from it takes the same number of queries as serializing one. Bots that didn't come from it, like the ones
+        the single bot views serialize, still work, at the cost of a query for each state.
+        """
+        # The default recording the same way Recording.objects.filter(...).first() picks it
+        default_recordings = Recording.objects.filter(bot=OuterRef("pk"), is_default_recording=True).order_by("id")
+        return queryset.annotate(
+            default_recording_state=Subquery(default_recordings.values("state")[:1]),
+            default_recording_transcription_state=Subquery(default_recordings.values("transcription_state")[:1]),
+        ).prefetch_related("bot_events")
+
     class Meta:
         model = Bot
         fields = [
@@ -1798,6 +1862,11 @@ class CalendarEventSerializer(serializers.ModelSerializer):
         """Get associated bots for this calendar event"""
         return BotSerializer(obj.bots.all(), many=True).data
 
+    @staticmethod
+    def prepare_queryset(queryset):
+        """Loads a CalendarEvent queryset's calendars and bots up front, see BotSerializer.prepare_queryset"""
+        return queryset.select_related("calendar").prefetch_related(Prefetch("bots", queryset=BotSerializer.prepare_queryset(Bot.objects.all())))
+
     class Meta:
         model = CalendarEvent
         fields = [
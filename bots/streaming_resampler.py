@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+
+# Zero crossings of the windowed sinc on each side of its centre, measured at the lower of the two sample rates.
+# More gives a sharper low-pass filter at the cost of more work per output sample.
+FILTER_HALF_WIDTH_ZERO_CROSSINGS = 8
+# Cutoff as a fraction of the lower Nyquist frequency, leaving room for the transition band below it
+FILTER_CUTOFF = 0.9
+FILTER_KAISER_BETA = 8.0
+# Different chunk sizes and output phases a resampler keeps a plan for
+MAX_CACHED_PLANS = 64
+
+
+class StreamingResampler:
+    """
+    Resamples a stream of mono 16-bit PCM chunks by a rational factor, using a polyphase windowed-sinc filter.
+    The filter history and the output phase carry over from one chunk to the next, so a stream split into
+    chunks comes out the same as if it were resampled in one go, with no artifacts at the chunk boundaries.
+    Use one instance per stream. It is not thread-safe.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+
+        divisor = math.gcd(src_rate, dst_rate)
+        # Each output sample is taken at a multiple of down / up input samples
+        self.up = dst_rate // divisor
+        self.down = src_rate // divisor
+
+        self.taps_per_phase = math.ceil(2 * FILTER_HALF_WIDTH_ZERO_CROSSINGS * max(self.up, self.down) / self.up)
+        self.phase_filters = self._create_phase_filters()
+        self.plans = {}
+        self.reset()
+
+    def _create_phase_filters(self):
+        filter_length = self.up * self.taps_per_phase
+        cutoff = FILTER_CUTOFF * 0.5 / max(self.up, self.down)
+        offsets = np.arange(filter_length) - (filter_length - 1) / 2
+        prototype_filter = 2 * cutoff * np.sinc(2 * cutoff * offsets) * np.kaiser(filter_length, FILTER_KAISER_BETA)
+        # Stuffing zeros between the input samples scales the signal level by 1 / up, so the filter has a gain of up to undo that
+        prototype_filter *= self.up / prototype_filter.sum()
+        # Row p holds the taps used for output samples at phase p, lined up with the most recent input sample first
+        return prototype_filter.reshape(self.taps_per_phase, self.up).T.astype(np.float32).copy()
+
+    def reset(self):
+        """Forget the stream so far, e.g. after a gap in the audio"""
+        self.history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        # Position of the next output sample relative to the first sample of the next chunk, in units of 1 / up input samples
+        self.next_output_position = 0
+
+    @property
+    def delay_seconds(self):
+        """How far the output lags behind the input"""
+        return (self.up * self.taps_per_phase - 1) / 2 / (self.up * self.src_rate)
+
+    def _get_plan(self, sample_count):
+        """
+        Which input samples and filter taps make up each output sample of the next chunk. Chunks usually have the
+        same size and the output phase goes round a short cycle, so the plans are worked out once and then reused.
+        """
+        plan_key = (sample_count, self.next_output_position)
+        plan = self.plans.get(plan_key)
+        if plan is not None:
+            return plan
+
+        # Every output sample whose newest input sample is in this chunk
+        end_position = sample_count * self.up
+        output_count = max(0, -(-(end_position - self.next_output_position) // self.down))
+        output_positions = self.next_output_position + self.down * np.arange(output_count)
+        newest_input_indices = output_positions // self.up + self.taps_per_phase - 1
+        window_indices = newest_input_indices[:, None] - np.arange(self.taps_per_phase)[None, :]
+        next_output_position = self.next_output_position + self.down * output_count - end_position
+        plan = (window_indices, self.phase_filters[output_positions % self.up], next_output_position)
+
+        if len(self.plans) >= MAX_CACHED_PLANS:
+            self.plans.clear()
+        self.plans[plan_key] = plan
+        return plan
+
+    def process(self, chunk: bytes) -> bytes:
+        if self.src_rate == self.dst_rate:
+            return chunk  # nothing to do
+
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        buffer = np.concatenate((self.history, samples.astype(np.float32)))
+        window_indices, filters, self.next_output_position = self._get_plan(len(samples))
+
+        output = np.einsum("ij,ij->i", buffer[window_indices], filters)
+        self.history = buffer[len(buffer) - (self.taps_per_phase - 1) :]
+
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16).tobytes()
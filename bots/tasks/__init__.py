@@ -1,5 +1,5 @@
 from .autopay_charge_task import autopay_charge
-from .deliver_webhook_task import deliver_webhook
+from .deliver_webhook_task import deliver_webhook, deliver_webhook_batch, deliver_webhooks
 from .launch_scheduled_bot_task import launch_scheduled_bot
 from .process_utterance_task import process_utterance
 from .restart_bot_pod_task import restart_bot_pod
@@ -11,6 +11,8 @@ __all__ = [
     "process_utterance",
     "run_bot",
     "deliver_webhook",
+    "deliver_webhooks",
+    "deliver_webhook_batch",
     "restart_bot_pod",
     "launch_scheduled_bot",
     "sync_calendar",
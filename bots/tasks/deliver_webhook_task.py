@@ -1,46 +1,49 @@
 import logging
+from datetime import timedelta
 
 import requests
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
 
-from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookTriggerTypes
-from bots.webhook_utils import sign_payload
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSubscription, WebhookTriggerTypes
+from bots.webhook_utils import get_webhook_signing_secret, sign_payload
 
 logger = logging.getLogger(__name__)
 
+# Shared by every delivery in this worker process, so connections to each destination host are kept alive and reused.
+# requests keeps a separate connection pool per host.
+webhook_session = requests.Session()
+webhook_session.mount("https://", HTTPAdapter(pool_connections=100, pool_maxsize=10))
+webhook_session.mount("http://", HTTPAdapter(pool_connections=100, pool_maxsize=10))
 
-@shared_task(
-    bind=True,
-    retry_backoff=True,  # Enable exponential backoff
-    max_retries=3,
-    autoretry_for=(Exception,),
-)
-def deliver_webhook(self, delivery_id):
-    """
-    Deliver a webhook to its destination.
-    """
-    try:
-        delivery = WebhookDeliveryAttempt.objects.get(id=delivery_id)
-    except WebhookDeliveryAttempt.DoesNotExist:
-        logger.error(f"Webhook delivery attempt {delivery_id} not found")
-        raise  # Re-raises the original exception with preserved traceback
+MAX_DELIVERY_ATTEMPTS = 3
 
-    subscription = delivery.webhook_subscription
+# A scheduled batch flush that is this overdue was probably lost (e.g. the worker died), so a new one can be scheduled
+LOST_BATCH_FLUSH_SECONDS = 60
+
+
+def get_inactive_subscription_error_response(subscription):
+    return {
+        "status_code": None,  # No HTTP status since request failed
+        "error_type": "InactiveSubscription",
+        "error_message": "Webhook subscription is no longer active",
+        "request_url": subscription.url,
+    }
+
+
+def get_request_exception_error_response(subscription, e):
+    return {
+        "status_code": None,  # No HTTP status since request failed
+        "error_type": type(e).__name__,
+        "error_message": str(e),
+        "request_url": subscription.url,
+    }
 
-    # If the subscription is no longer active, mark as failed and return
-    if not subscription.is_active:
-        delivery.status = WebhookDeliveryAttemptStatus.FAILURE
-        error_response = {
-            "status_code": None,  # No HTTP status since request failed
-            "error_type": "InactiveSubscription",
-            "error_message": "Webhook subscription is no longer active",
-            "request_url": subscription.url,
-        }
-        delivery.add_to_response_body_list(error_response)
-        delivery.save()
-        return
 
+def get_webhook_data(delivery):
     related_object_specific_webhook_data = {}
 
     if delivery.bot:
@@ -51,17 +54,43 @@ def deliver_webhook(self, delivery_id):
         related_object_specific_webhook_data["calendar_deduplication_key"] = delivery.calendar.deduplication_key
         related_object_specific_webhook_data["calendar_metadata"] = delivery.calendar.metadata
 
-    # Prepare the webhook payload
-    webhook_data = {
+    return {
         "idempotency_key": str(delivery.idempotency_key),
         **related_object_specific_webhook_data,
         "trigger": WebhookTriggerTypes.trigger_type_to_api_code(delivery.webhook_trigger_type),
         "data": delivery.payload,
     }
 
+
+def post_webhook(subscription, webhook_data):
     # Sign the payload
-    active_secret = subscription.project.webhook_secrets.filter().order_by("-created_at").first()
-    signature = sign_payload(webhook_data, active_secret.get_secret())
+    signature = sign_payload(webhook_data, get_webhook_signing_secret(subscription.project))
+
+    return webhook_session.post(
+        subscription.url,
+        json=webhook_data,
+        headers={
+            "Content-Type": "application/json",
+            "User-Agent": "Attendee-Webhook/1.0",
+            "X-Webhook-Signature": signature,
+        },
+        timeout=10,  # 10-second timeout
+    )
+
+
+def attempt_webhook_delivery(delivery):
+    """
+    Make one attempt at delivering a webhook and record the outcome on the delivery attempt.
+    Returns True if the delivery failed and should be retried.
+    """
+    subscription = delivery.webhook_subscription
+
+    # If the subscription is no longer active, mark as failed and return
+    if not subscription.is_active:
+        delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+        delivery.add_to_response_body_list(get_inactive_subscription_error_response(subscription))
+        delivery.save()
+        return False
 
     # Increment attempt counter
     delivery.attempt_count += 1
@@ -69,16 +98,7 @@ def deliver_webhook(self, delivery_id):
 
     # Send the webhook
     try:
-        response = requests.post(
-            subscription.url,
-            json=webhook_data,
-            headers={
-                "Content-Type": "application/json",
-                "User-Agent": "Attendee-Webhook/1.0",
-                "X-Webhook-Signature": signature,
-            },
-            timeout=10,  # 10-second timeout
-        )
+        response = post_webhook(subscription, get_webhook_data(delivery))
 
         # Update the delivery attempt with the response
         delivery.response_status_code = response.status_code
@@ -92,7 +112,7 @@ def deliver_webhook(self, delivery_id):
             delivery.status = WebhookDeliveryAttemptStatus.SUCCESS
             delivery.succeeded_at = timezone.now()
             delivery.save()
-            return
+            return False
 
         # If we got here, the delivery failed with a non-2xx status code
         delivery.status = WebhookDeliveryAttemptStatus.FAILURE
@@ -100,20 +120,159 @@ def deliver_webhook(self, delivery_id):
     except requests.RequestException as e:
         # Handle network errors, timeouts, etc.
         delivery.status = WebhookDeliveryAttemptStatus.FAILURE
-        error_response = {
-            "status_code": None,  # No HTTP status since request failed
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "request_url": subscription.url,
-        }
-        delivery.add_to_response_body_list(error_response)
+        delivery.add_to_response_body_list(get_request_exception_error_response(subscription, e))
 
     delivery.save()
 
-    if delivery.status == WebhookDeliveryAttemptStatus.FAILURE:
-        # Check if this was the last retry attempt
-        if delivery.attempt_count >= self.max_retries:
-            logger.error(f"Webhook delivery failed after {delivery.attempt_count} attempts. " + f"Webhook ID: {delivery.id}, URL: {subscription.url}, " + f"Event: {delivery.webhook_trigger_type}, Status: {delivery.status}")
+    # Check if this was the last retry attempt
+    if delivery.attempt_count >= MAX_DELIVERY_ATTEMPTS:
+        logger.error(f"Webhook delivery failed after {delivery.attempt_count} attempts. " + f"Webhook ID: {delivery.id}, URL: {subscription.url}, " + f"Event: {delivery.webhook_trigger_type}, Status: {delivery.status}")
+        return False
+
+    logger.info(f"Retrying webhook delivery {delivery.id} (attempt {delivery.attempt_count}/{MAX_DELIVERY_ATTEMPTS})")
+    return True
+
+
+@shared_task(
+    bind=True,
+    retry_backoff=True,  # Enable exponential backoff
+    max_retries=MAX_DELIVERY_ATTEMPTS,
+    autoretry_for=(Exception,),
+)
+def deliver_webhook(self, delivery_id):
+    """
+    Deliver a webhook to its destination.
+    """
+    try:
+        delivery = WebhookDeliveryAttempt.objects.select_related("webhook_subscription__project", "bot", "calendar").get(id=delivery_id)
+    except WebhookDeliveryAttempt.DoesNotExist:
+        logger.error(f"Webhook delivery attempt {delivery_id} not found")
+        raise  # Re-raises the original exception with preserved traceback
+
+    if attempt_webhook_delivery(delivery):
+        raise Exception("Retry due to failure")
+
+
+@shared_task
+def deliver_webhooks(delivery_ids):
+    """
+    Deliver all the webhooks for one event. Deliveries that fail are retried individually by deliver_webhook.
+    """
+    deliveries = WebhookDeliveryAttempt.objects.filter(id__in=delivery_ids).select_related("webhook_subscription__project", "bot", "calendar").order_by("id")
+
+    for delivery in deliveries:
+        try:
+            should_retry = attempt_webhook_delivery(delivery)
+        except Exception:
+            logger.exception(f"Error delivering webhook {delivery.id}")
+            should_retry = True
+
+        if should_retry:
+            deliver_webhook.apply_async(args=[delivery.id], countdown=1)
+
+
+def attempt_webhook_batch_delivery(subscription, deliveries):
+    """
+    Make one attempt at delivering a batch of webhooks in a single signed request and record the outcome on each delivery attempt.
+    The batch succeeds or fails as a whole. Failed deliveries with attempts left stay pending, so they go out again with the next batch.
+    Returns True if any of the deliveries should be retried.
+    """
+    now = timezone.now()
+
+    if not subscription.is_active:
+        for delivery in deliveries:
+            delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+            delivery.add_to_response_body_list(get_inactive_subscription_error_response(subscription))
+            delivery.updated_at = now
+        WebhookDeliveryAttempt.objects.bulk_update(deliveries, ["status", "response_body_list", "updated_at"])
+        return False
+
+    succeeded = False
+    try:
+        response = post_webhook(subscription, {"events": [get_webhook_data(delivery) for delivery in deliveries]})
+        # Limit response body storage to prevent DB issues with large responses
+        response_body = response.text[:10000]
+        succeeded = 200 <= response.status_code < 300
+    except requests.RequestException as e:
+        response_body = get_request_exception_error_response(subscription, e)
+
+    for delivery in deliveries:
+        delivery.attempt_count += 1
+        delivery.last_attempt_at = now
+        delivery.updated_at = now
+        delivery.add_to_response_body_list(response_body)
+        if succeeded:
+            delivery.status = WebhookDeliveryAttemptStatus.SUCCESS
+            delivery.succeeded_at = now
+        elif delivery.attempt_count >= MAX_DELIVERY_ATTEMPTS:
+            delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+            logger.error(f"Batched webhook delivery failed after {delivery.attempt_count} attempts. " + f"Webhook ID: {delivery.id}, URL: {subscription.url}, " + f"Event: {delivery.webhook_trigger_type}")
+
+    WebhookDeliveryAttempt.objects.bulk_update(deliveries, ["status", "attempt_count", "last_attempt_at", "succeeded_at", "response_body_list", "updated_at"])
+
+    return any(delivery.status == WebhookDeliveryAttemptStatus.PENDING for delivery in deliveries)
+
+
+def get_webhook_batch_retry_at(deliveries):
+    """Deliveries that failed before are retried with exponential backoff, the same as deliver_webhook does"""
+    retry_times = [delivery.last_attempt_at + timedelta(seconds=2**delivery.attempt_count) for delivery in deliveries if delivery.status == WebhookDeliveryAttemptStatus.PENDING and delivery.attempt_count and delivery.last_attempt_at]
+    return max(retry_times, default=None)
+
+
+def schedule_webhook_batch_flush(subscription, countdown_seconds):
+    """
+    Schedule a flush of the subscription's pending webhooks, unless one is already scheduled.
+    """
+    now = timezone.now()
+    flush_not_scheduled = Q(batch_flush_due_at__isnull=True) | Q(batch_flush_due_at__lt=now - timedelta(seconds=LOST_BATCH_FLUSH_SECONDS))
+    if WebhookSubscription.objects.filter(flush_not_scheduled, id=subscription.id).update(batch_flush_due_at=now + timedelta(seconds=countdown_seconds)):
+        deliver_webhook_batch.apply_async(args=[subscription.id], countdown=countdown_seconds)
+
+
+def enqueue_batched_webhook_delivery(subscription):
+    """
+    Called after a delivery attempt is added to a batched subscription. The batch is sent right away once it has
+    batch_max_events in it, otherwise batch_max_wait_ms after its first event was added.
+    """
+    pending_count = subscription.webhookdelivery_attempts.filter(status=WebhookDeliveryAttemptStatus.PENDING).count()
+    if pending_count % subscription.batch_max_events == 0:
+        deliver_webhook_batch.delay(subscription.id)
+    else:
+        schedule_webhook_batch_flush(subscription, subscription.batch_max_wait_ms / 1000)
+
+
+@shared_task
+def deliver_webhook_batch(subscription_id):
+    """
+    Deliver the oldest pending webhooks of a batched subscription in one request. Events are always delivered in the order they were triggered.
+    If the request fails, the events stay pending and are retried with the next batch, after a backoff.
+    """
+    subscription = WebhookSubscription.objects.select_related("project").filter(id=subscription_id).first()
+    if subscription is None:
+        return
+
+    # Events triggered from here on need another flush
+    WebhookSubscription.objects.filter(id=subscription_id).update(batch_flush_due_at=None)
+
+    pending_deliveries = subscription.webhookdelivery_attempts.filter(status=WebhookDeliveryAttemptStatus.PENDING).order_by("id")
+    with transaction.atomic():
+        # Lock the batch, so concurrent flushes for this subscription never send the same event twice
+        deliveries = list(pending_deliveries.select_for_update(skip_locked=True, of=("self",)).select_related("bot", "calendar")[: subscription.batch_max_events])
+        if not deliveries:
+            return
+
+        # Older events are still being sent by another flush. It flushes again when it's done, so these go out after them.
+        if pending_deliveries.filter(id__lt=deliveries[0].id).exists():
+            return
+
+        retry_at = get_webhook_batch_retry_at(deliveries)
+        if retry_at and retry_at > timezone.now():
+            should_retry = True
         else:
-            logger.info(f"Retrying webhook delivery {delivery.id} (attempt {delivery.attempt_count}/{self.max_retries})")
-            raise Exception("Retry due to failure")
+            should_retry = attempt_webhook_batch_delivery(subscription, deliveries)
+
+    if should_retry:
+        retry_at = get_webhook_batch_retry_at(deliveries)
+        schedule_webhook_batch_flush(subscription, max((retry_at - timezone.now()).total_seconds(), 0))
+    elif pending_deliveries.exists():
+        schedule_webhook_batch_flush(subscription, 0)
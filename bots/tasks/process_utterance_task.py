@@ -5,6 +5,7 @@ import time
 
 import requests
 from celery import shared_task
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -24,20 +25,69 @@ def is_retryable_failure(failure_data):
     ]
 
 
-def get_transcription(utterance, recording):
+def get_provider_credentials(recording, credential_type, transcription_clients=None):
+    # The transcription worker keeps decrypted credentials around between utterances
+    if transcription_clients:
+        return transcription_clients.get_credentials(recording.bot.project_id, credential_type)
+
+    credentials_record = recording.bot.project.credentials.filter(credential_type=credential_type).first()
+    if not credentials_record:
+        return None
+    return credentials_record.get_credentials()
+
+
+def get_http_client(transcription_clients=None):
+    # The transcription worker reuses one pooled session so connections to the provider stay open between utterances
+    if transcription_clients:
+        return transcription_clients.http_session
+    return requests
+
+
+# How long we wait for a provider's transcription job before giving up on it
+TRANSCRIPTION_JOB_TIMEOUT_SECONDS = 120
+
+
+def advance_transcription_job(utterance, submit_job, check_job, transcription_clients=None):
+    """
+    For providers that transcribe in a background job. Rather than blocking until the job is done, each call
+    does one step: submit the job if there isn't one yet, otherwise check on it once.
+    Returns (None, None) while the job is still running. The job id is set on the utterance, the caller saves it.
+    """
+    if not utterance.transcription_job_id:
+        job_id, failure_data = submit_job(utterance, transcription_clients)
+        if failure_data:
+            return None, failure_data
+
+        utterance.transcription_job_id = job_id
+        utterance.transcription_job_submitted_at = timezone.now()
+        return None, None
+
+    transcription, failure_data = check_job(utterance, utterance.transcription_job_id, transcription_clients)
+    if transcription is None and failure_data is None and timezone.now() - utterance.transcription_job_submitted_at > timezone.timedelta(seconds=TRANSCRIPTION_JOB_TIMEOUT_SECONDS):
+        return None, {"reason": TranscriptionFailureReasons.TIMED_OUT, "step": "transcribe_result_poll"}
+    return transcription, failure_data
+
+
+def transcription_job_poll_delay_seconds(utterance):
+    # Check often on young jobs, and back off for jobs that have been running for a while
+    job_age_seconds = (timezone.now() - utterance.transcription_job_submitted_at).total_seconds()
+    return min(max(job_age_seconds / 4, 1), 10)
+
+
+def get_transcription(utterance, recording, transcription_clients=None):
     try:
         if recording.transcription_provider == TranscriptionProviders.DEEPGRAM:
-            transcription, failure_data = get_transcription_via_deepgram(utterance)
+            transcription, failure_data = get_transcription_via_deepgram(utterance, transcription_clients)
         elif recording.transcription_provider == TranscriptionProviders.GLADIA:
-            transcription, failure_data = get_transcription_via_gladia(utterance)
+            transcription, failure_data = advance_transcription_job(utterance, submit_transcription_job_via_gladia, check_transcription_job_via_gladia, transcription_clients)
         elif recording.transcription_provider == TranscriptionProviders.OPENAI:
-            transcription, failure_data = get_transcription_via_openai(utterance)
+            transcription, failure_data = get_transcription_via_openai(utterance, transcription_clients)
         elif recording.transcription_provider == TranscriptionProviders.ASSEMBLY_AI:
-            transcription, failure_data = get_transcription_via_assemblyai(utterance)
+            transcription, failure_data = advance_transcription_job(utterance, submit_transcription_job_via_assemblyai, check_transcription_job_via_assemblyai, transcription_clients)
         elif recording.transcription_provider == TranscriptionProviders.SARVAM:
-            transcription, failure_data = get_transcription_via_sarvam(utterance)
+            transcription, failure_data = get_transcription_via_sarvam(utterance, transcription_clients)
         elif recording.transcription_provider == TranscriptionProviders.ELEVENLABS:
-            transcription, failure_data = get_transcription_via_elevenlabs(utterance)
+            transcription, failure_data = get_transcription_via_elevenlabs(utterance, transcription_clients)
         else:
             raise Exception(f"Unknown transcription provider: {recording.transcription_provider}")
 
@@ -46,17 +96,20 @@ def get_transcription(utterance, recording):
         return None, {"reason": TranscriptionFailureReasons.INTERNAL_ERROR, "error": str(e)}
 
 
-@shared_task(
-    bind=True,
-    soft_time_limit=3600,
-    autoretry_for=(Exception,),
-    retry_backoff=True,  # Enable exponential backoff
-    max_retries=6,
-)
-def process_utterance(self, utterance_id):
-    utterance = Utterance.objects.get(id=utterance_id)
-    logger.info(f"Processing utterance {utterance_id}")
+class RetryableTranscriptionFailure(Exception):
+    pass
+
+
+class TranscriptionJobPending(Exception):
+    """The provider is still working on the utterance's transcription job. Check again after retry_in_seconds."""
+
+    def __init__(self, message, retry_in_seconds):
+        super().__init__(message)
+        self.retry_in_seconds = retry_in_seconds
+
 
+def transcribe_utterance(utterance, transcription_clients=None):
+    utterance_id = utterance.id
     recording = utterance.recording
 
     if utterance.failure_data:
@@ -64,14 +117,23 @@ def process_utterance(self, utterance_id):
         return
 
     if utterance.transcription is None:
-        utterance.transcription_attempt_count += 1
+        # Checking on a provider job that is already running is not a new attempt
+        if not utterance.transcription_job_id:
+            utterance.transcription_attempt_count += 1
 
-        transcription, failure_data = get_transcription(utterance, recording)
+        transcription, failure_data = get_transcription(utterance, recording, transcription_clients)
+
+        if transcription is None and failure_data is None and utterance.transcription_job_id:
+            utterance.save()
+            raise TranscriptionJobPending(f"Transcription job {utterance.transcription_job_id} for utterance {utterance_id} is still running", retry_in_seconds=transcription_job_poll_delay_seconds(utterance))
 
         if failure_data:
+            # A failed job can't be resumed, so if we retry, a new job is submitted
+            utterance.transcription_job_id = None
+            utterance.transcription_job_submitted_at = None
             if utterance.transcription_attempt_count < 5 and is_retryable_failure(failure_data):
                 utterance.save()
-                raise Exception(f"Retryable failure when transcribing utterance {utterance_id}: {failure_data}")
+                raise RetryableTranscriptionFailure(f"Retryable failure when transcribing utterance {utterance_id}: {failure_data}")
             else:
                 # Keep the audio blob around if it fails
                 utterance.failure_data = failure_data
@@ -79,7 +141,7 @@ def process_utterance(self, utterance_id):
                 logger.info(f"Transcription failed for utterance {utterance_id}, failure data: {failure_data}")
                 return
 
-        utterance.audio_blob = b""  # set the audio blob binary field to empty byte string
+        utterance.delete_audio_data()  # the audio is no longer needed once we have the transcription
         utterance.transcription = transcription
         utterance.save()
 
@@ -98,24 +160,46 @@ def process_utterance(self, utterance_id):
         RecordingManager.set_recording_transcription_complete(utterance.recording)
 
 
-def get_transcription_via_gladia(utterance):
-    recording = utterance.recording
-    gladia_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.GLADIA).first()
-    if not gladia_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
+@shared_task(
+    bind=True,
+    soft_time_limit=3600,
+    autoretry_for=(Exception,),
+    retry_backoff=True,  # Enable exponential backoff
+    max_retries=6,
+)
+def process_utterance(self, utterance_id):
+    utterance = Utterance.objects.get(id=utterance_id)
+    logger.info(f"Processing utterance {utterance_id}")
 
-    gladia_credentials = gladia_credentials_record.get_credentials()
+    try:
+        transcribe_utterance(utterance)
+    except TranscriptionJobPending as e:
+        # Don't hold on to the worker while the provider is busy, check on the job again later
+        logger.info(f"{e}, checking again in {e.retry_in_seconds} seconds")
+        process_utterance.apply_async(args=[utterance_id], countdown=e.retry_in_seconds)
+
+
+def get_gladia_headers(utterance, transcription_clients=None):
+    gladia_credentials = get_provider_credentials(utterance.recording, Credentials.CredentialTypes.GLADIA, transcription_clients)
     if not gladia_credentials:
+        return None
+    return {"x-gladia-key": gladia_credentials["api_key"]}
+
+
+def submit_transcription_job_via_gladia(utterance, transcription_clients=None):
+    """Upload the utterance's audio and start a Gladia transcription job. Returns the job's result url, or failure data."""
+    recording = utterance.recording
+    headers = get_gladia_headers(utterance, transcription_clients)
+    if not headers:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
+    http_client = get_http_client(transcription_clients)
+
     upload_url = "https://api.gladia.io/v2/upload"
 
-    payload_mp3 = pcm_to_mp3(utterance.audio_blob.tobytes(), sample_rate=utterance.sample_rate)
-    headers = {
-        "x-gladia-key": gladia_credentials["api_key"],
-    }
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_data(), sample_rate=utterance.sample_rate)
     files = {"audio": ("file.mp3", payload_mp3, "audio/mpeg")}
-    upload_response = requests.request("POST", upload_url, headers=headers, files=files)
+    upload_response = http_client.request("POST", upload_url, headers=headers, files=files)
 
     if upload_response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -133,73 +217,92 @@ def get_transcription_via_gladia(utterance):
         transcribe_request_body["code_switching_config"] = {
             "languages": recording.bot.gladia_code_switching_languages(),
         }
-    transcribe_response = requests.request("POST", transcribe_url, headers=headers, json=transcribe_request_body)
+    transcribe_response = http_client.request("POST", transcribe_url, headers=headers, json=transcribe_request_body)
 
     if transcribe_response.status_code != 200 and transcribe_response.status_code != 201:
         return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_request", "status_code": transcribe_response.status_code}
 
     transcribe_response_json = transcribe_response.json()
-    result_url = transcribe_response_json["result_url"]
+    return transcribe_response_json["result_url"], None
 
-    # Poll the result_url until we get a completed transcription
-    max_retries = 120  # Maximum number of retries (2 minutes with 1s sleep)
-    retry_count = 0
 
-    while retry_count < max_retries:
-        result_response = requests.get(result_url, headers=headers)
-
-        if result_response.status_code != 200:
-            logger.error(f"Gladia result fetch failed with status code {result_response.status_code}")
-            time.sleep(10)
-            retry_count += 1
-            continue
-
-        result_data = result_response.json()
-        status = result_data.get("status")
-
-        if status == "done":
-            # Transcription is complete
-            transcription = result_data.get("result", {}).get("transcription", "")
-            logger.info("Gladia transcription completed successfully, now deleting audio file from Gladia")
-            # Delete the audio file from Gladia
-            delete_response = requests.request("DELETE", result_url, headers=headers)
-            if delete_response.status_code != 200 and delete_response.status_code != 202:
-                logger.error(f"Gladia delete failed with status code {delete_response.status_code}")
-            else:
-                logger.info("Gladia delete successful")
-
-            transcription["transcript"] = transcription["full_transcript"]
-            del transcription["full_transcript"]
+def check_transcription_job_via_gladia(utterance, result_url, transcription_clients=None):
+    """Check on a Gladia transcription job once. Returns (None, None) while the job is still running."""
+    headers = get_gladia_headers(utterance, transcription_clients)
+    if not headers:
+        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
-            # Extract all words from all utterances into a flat list
-            all_words = []
-            for utterance in transcription["utterances"]:
-                if "words" in utterance:
-                    all_words.extend(utterance["words"])
-            transcription["words"] = all_words
-            del transcription["utterances"]
+    http_client = get_http_client(transcription_clients)
 
-            return transcription, None
+    result_response = http_client.get(result_url, headers=headers)
 
-        elif status == "error":
-            error_code = result_data.get("error_code")
-            return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "error_code": error_code}
+    if result_response.status_code != 200:
+        logger.error(f"Gladia result fetch failed with status code {result_response.status_code}")
+        return None, None
 
-        elif status in ["queued", "processing"]:
-            # Still processing, wait and retry
-            logger.info(f"Gladia transcription status: {status}, waiting...")
-            time.sleep(1)
-            retry_count += 1
+    result_data = result_response.json()
+    status = result_data.get("status")
 
+    if status == "done":
+        # Transcription is complete
+        transcription = result_data.get("result", {}).get("transcription", "")
+        logger.info("Gladia transcription completed successfully, now deleting audio file from Gladia")
+        # Delete the audio file from Gladia
+        delete_response = http_client.request("DELETE", result_url, headers=headers)
+        if delete_response.status_code != 200 and delete_response.status_code != 202:
+            logger.error(f"Gladia delete failed with status code {delete_response.status_code}")
         else:
-            # Unknown status
-            return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "status": status}
+            logger.info("Gladia delete successful")
+
+        transcription["transcript"] = transcription["full_transcript"]
+        del transcription["full_transcript"]
+
+        # Extract all words from all utterances into a flat list
+        all_words = []
+        for utterance in transcription["utterances"]:
+            if "words" in utterance:
+                all_words.extend(utterance["words"])
+        transcription["words"] = all_words
+        del transcription["utterances"]
+
+        return transcription, None
+
+    elif status == "error":
+        error_code = result_data.get("error_code")
+        return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "error_code": error_code}
+
+    elif status in ["queued", "processing"]:
+        logger.info(f"Gladia transcription status: {status}")
+        return None, None
+
+    else:
+        # Unknown status
+        return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "status": status}
+
+
+def get_transcription_via_gladia(utterance, transcription_clients=None):
+    """Submit a Gladia transcription job and block until it finishes. The utterance pipeline checks on jobs without blocking instead, see advance_transcription_job."""
+    result_url, failure_data = submit_transcription_job_via_gladia(utterance, transcription_clients)
+    if failure_data:
+        return None, failure_data
+
+    # Poll the result_url until we get a completed transcription
+    max_retries = 120  # Maximum number of retries (2 minutes with 1s sleep)
+    retry_count = 0
+
+    while retry_count < max_retries:
+        transcription, failure_data = check_transcription_job_via_gladia(utterance, result_url, transcription_clients)
+        if transcription is not None or failure_data is not None:
+            return transcription, failure_data
+
+        time.sleep(1)
+        retry_count += 1
 
     # If we've reached here, we've timed out
     return None, {"reason": TranscriptionFailureReasons.TIMED_OUT, "step": "transcribe_result_poll"}
 
 
-def get_transcription_via_deepgram(utterance):
+def get_transcription_via_deepgram(utterance, transcription_clients=None):
     from deepgram import (
         DeepgramApiError,
         DeepgramClient,
@@ -209,7 +312,7 @@ def get_transcription_via_deepgram(utterance):
 
     recording = utterance.recording
     payload: FileSource = {
-        "buffer": utterance.audio_blob.tobytes(),
+        "buffer": utterance.get_audio_data(),
     }
 
     deepgram_model = recording.bot.deepgram_model()
@@ -226,18 +329,19 @@ def get_transcription_via_deepgram(utterance):
         redact=recording.bot.deepgram_redaction_settings(),
     )
 
-    deepgram_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.DEEPGRAM).first()
-    if not deepgram_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
-
-    deepgram_credentials = deepgram_credentials_record.get_credentials()
+    deepgram_credentials = get_provider_credentials(recording, Credentials.CredentialTypes.DEEPGRAM, transcription_clients)
     if not deepgram_credentials:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
-    deepgram = DeepgramClient(deepgram_credentials["api_key"])
+    if transcription_clients:
+        deepgram = transcription_clients.get_deepgram_client(deepgram_credentials["api_key"])
+        transcribe_kwargs = {"transport": transcription_clients.deepgram_transport}
+    else:
+        deepgram = DeepgramClient(deepgram_credentials["api_key"])
+        transcribe_kwargs = {}
 
     try:
-        response = deepgram.listen.rest.v("1").transcribe_file(payload, options)
+        response = deepgram.listen.rest.v("1").transcribe_file(payload, options, **transcribe_kwargs)
     except DeepgramApiError as e:
         original_error_json = json.loads(e.original_error)
         if original_error_json.get("err_code") == "INVALID_AUTH":
@@ -252,16 +356,14 @@ def get_transcription_via_deepgram(utterance):
     return json.loads(alternatives[0].to_json()), None
 
 
-def get_transcription_via_openai(utterance):
+def get_transcription_via_openai(utterance, transcription_clients=None):
     recording = utterance.recording
-    openai_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.OPENAI).first()
-    if not openai_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
-
-    openai_credentials = openai_credentials_record.get_credentials()
+    openai_credentials = get_provider_credentials(recording, Credentials.CredentialTypes.OPENAI, transcription_clients)
     if not openai_credentials:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
+    http_client = get_http_client(transcription_clients)
+
     # If the audio blob is less than 80ms in duration, just return an empty transcription
     # Audio clips this short are almost never generated, it almost certainly didn't have any speech
     # and if we send it to the openai api, it will fail with a corrupted file error
@@ -270,7 +372,7 @@ def get_transcription_via_openai(utterance):
         return {"transcript": ""}, None
 
     # Convert PCM audio to MP3
-    payload_mp3 = pcm_to_mp3(utterance.audio_blob.tobytes(), sample_rate=utterance.sample_rate)
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_data(), sample_rate=utterance.sample_rate)
 
     # Prepare the request for OpenAI's transcription API
     base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -283,7 +385,7 @@ def get_transcription_via_openai(utterance):
         files["prompt"] = (None, recording.bot.openai_transcription_prompt())
     if recording.bot.openai_transcription_language():
         files["language"] = (None, recording.bot.openai_transcription_language())
-    response = requests.post(url, headers=headers, files=files)
+    response = http_client.post(url, headers=headers, files=files)
 
     if response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -301,13 +403,8 @@ def get_transcription_via_openai(utterance):
     return transcription, None
 
 
-def get_transcription_via_assemblyai(utterance):
-    recording = utterance.recording
-    assemblyai_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.ASSEMBLY_AI).first()
-    if not assemblyai_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
-
-    assemblyai_credentials = assemblyai_credentials_record.get_credentials()
+def get_assemblyai_headers(utterance, transcription_clients=None):
+    assemblyai_credentials = get_provider_credentials(utterance.recording, Credentials.CredentialTypes.ASSEMBLY_AI, transcription_clients)
     if not assemblyai_credentials:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
@@ -315,12 +412,26 @@ def get_transcription_via_assemblyai(utterance):
     if not api_key:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND, "error": "api_key not in credentials"}
 
-    headers = {"authorization": api_key}
-    base_url = "https://api.assemblyai.com/v2"
+    return {"authorization": api_key}, None
+
 
-    payload_mp3 = pcm_to_mp3(utterance.audio_blob.tobytes(), sample_rate=utterance.sample_rate)
+def get_assemblyai_base_url():
+    return os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com/v2")
 
-    upload_response = requests.post(f"{base_url}/upload", headers=headers, data=payload_mp3)
+
+def submit_transcription_job_via_assemblyai(utterance, transcription_clients=None):
+    """Upload the utterance's audio and start an AssemblyAI transcription job. Returns the transcript id, or failure data."""
+    recording = utterance.recording
+    headers, failure_data = get_assemblyai_headers(utterance, transcription_clients)
+    if failure_data:
+        return None, failure_data
+
+    http_client = get_http_client(transcription_clients)
+    base_url = get_assemblyai_base_url()
+
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_data(), sample_rate=utterance.sample_rate)
+
+    upload_response = http_client.post(f"{base_url}/upload", headers=headers, data=payload_mp3)
 
     if upload_response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -349,85 +460,103 @@ def get_transcription_via_assemblyai(utterance):
         data["speech_model"] = speech_model
 
     url = f"{base_url}/transcript"
-    response = requests.post(url, json=data, headers=headers)
+    response = http_client.post(url, json=data, headers=headers)
 
     if response.status_code != 200:
         return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "status_code": response.status_code, "text": response.text}
 
-    transcript_id = response.json()["id"]
-    polling_endpoint = f"{base_url}/transcript/{transcript_id}"
+    return response.json()["id"], None
 
-    # Poll the result_url until we get a completed transcription
-    max_retries = 120  # Maximum number of retries (2 minutes with 1s sleep)
-    retry_count = 0
 
-    while retry_count < max_retries:
-        polling_response = requests.get(polling_endpoint, headers=headers)
+def check_transcription_job_via_assemblyai(utterance, transcript_id, transcription_clients=None):
+    """Check on an AssemblyAI transcription job once. Returns (None, None) while the job is still running."""
+    headers, failure_data = get_assemblyai_headers(utterance, transcription_clients)
+    if failure_data:
+        return None, failure_data
 
-        if polling_response.status_code != 200:
-            logger.error(f"AssemblyAI result fetch failed with status code {polling_response.status_code}")
-            time.sleep(10)
-            retry_count += 10
-            continue
+    http_client = get_http_client(transcription_clients)
+    polling_endpoint = f"{get_assemblyai_base_url()}/transcript/{transcript_id}"
 
-        transcription_result = polling_response.json()
+    polling_response = http_client.get(polling_endpoint, headers=headers)
 
-        if transcription_result["status"] == "completed":
-            logger.info("AssemblyAI transcription completed successfully, now deleting from AssemblyAI.")
+    if polling_response.status_code != 200:
+        logger.error(f"AssemblyAI result fetch failed with status code {polling_response.status_code}")
+        return None, None
 
-            # Delete the transcript from AssemblyAI
-            delete_response = requests.delete(polling_endpoint, headers=headers)
-            if delete_response.status_code != 200:
-                logger.error(f"AssemblyAI delete failed with status code {delete_response.status_code}: {delete_response.text}")
-            else:
-                logger.info("AssemblyAI delete successful")
+    transcription_result = polling_response.json()
 
-            transcript_text = transcription_result.get("text", "")
-            words = transcription_result.get("words", [])
+    if transcription_result["status"] == "completed":
+        logger.info("AssemblyAI transcription completed successfully, now deleting from AssemblyAI.")
 
-            formatted_words = []
-            if words:
-                for word in words:
-                    formatted_words.append(
-                        {
-                            "word": word["text"],
-                            "start": word["start"] / 1000.0,
-                            "end": word["end"] / 1000.0,
-                            "confidence": word["confidence"],
-                        }
-                    )
+        # Delete the transcript from AssemblyAI
+        delete_response = http_client.delete(polling_endpoint, headers=headers)
+        if delete_response.status_code != 200:
+            logger.error(f"AssemblyAI delete failed with status code {delete_response.status_code}: {delete_response.text}")
+        else:
+            logger.info("AssemblyAI delete successful")
+
+        transcript_text = transcription_result.get("text", "")
+        words = transcription_result.get("words", [])
+
+        formatted_words = []
+        if words:
+            for word in words:
+                formatted_words.append(
+                    {
+                        "word": word["text"],
+                        "start": word["start"] / 1000.0,
+                        "end": word["end"] / 1000.0,
+                        "confidence": word["confidence"],
+                    }
+                )
+
+        transcription = {"transcript": transcript_text, "words": formatted_words}
+        return transcription, None
+
+    elif transcription_result["status"] == "error":
+        error = transcription_result.get("error")
 
-            transcription = {"transcript": transcript_text, "words": formatted_words}
-            return transcription, None
+        if error and "language_detection cannot be performed on files with no spoken audio" in error:
+            logger.info(f"AssemblyAI transcription skipped for utterance {utterance.id} because it did not have any spoken audio and we tried to detect language")
+            return {"transcript": "", "words": []}, None
 
-        elif transcription_result["status"] == "error":
-            error = transcription_result.get("error")
+        return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "error": error}
 
-            if error and "language_detection cannot be performed on files with no spoken audio" in error:
-                logger.info(f"AssemblyAI transcription skipped for utterance {utterance.id} because it did not have any spoken audio and we tried to detect language")
-                return {"transcript": "", "words": []}, None
+    else:  # queued, processing
+        logger.info(f"AssemblyAI transcription status: {transcription_result['status']}")
+        return None, None
 
-            return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_result_poll", "error": error}
 
-        else:  # queued, processing
-            logger.info(f"AssemblyAI transcription status: {transcription_result['status']}, waiting...")
-            time.sleep(1)
-            retry_count += 1
+def get_transcription_via_assemblyai(utterance, transcription_clients=None):
+    """Submit an AssemblyAI transcription job and block until it finishes. The utterance pipeline checks on jobs without blocking instead, see advance_transcription_job."""
+    transcript_id, failure_data = submit_transcription_job_via_assemblyai(utterance, transcription_clients)
+    if failure_data:
+        return None, failure_data
+
+    # Poll the result_url until we get a completed transcription
+    max_retries = 120  # Maximum number of retries (2 minutes with 1s sleep)
+    retry_count = 0
+
+    while retry_count < max_retries:
+        transcription, failure_data = check_transcription_job_via_assemblyai(utterance, transcript_id, transcription_clients)
+        if transcription is not None or failure_data is not None:
+            return transcription, failure_data
+
+        time.sleep(1)
+        retry_count += 1
 
     # If we've reached here, we've timed out
     return None, {"reason": TranscriptionFailureReasons.TIMED_OUT, "step": "transcribe_result_poll"}
 
 
-def get_transcription_via_sarvam(utterance):
+def get_transcription_via_sarvam(utterance, transcription_clients=None):
     recording = utterance.recording
-    sarvam_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.SARVAM).first()
-    if not sarvam_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
-
-    sarvam_credentials = sarvam_credentials_record.get_credentials()
+    sarvam_credentials = get_provider_credentials(recording, Credentials.CredentialTypes.SARVAM, transcription_clients)
     if not sarvam_credentials:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
+    http_client = get_http_client(transcription_clients)
+
     api_key = sarvam_credentials.get("api_key")
     if not api_key:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND, "error": "api_key not in credentials"}
@@ -443,7 +572,7 @@ def get_transcription_via_sarvam(utterance):
         return {"transcript": ""}, None
 
     # Sarvam says 16kHz sample rate works best
-    payload_mp3 = pcm_to_mp3(utterance.audio_blob.tobytes(), sample_rate=utterance.sample_rate, output_sample_rate=16000)
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_data(), sample_rate=utterance.sample_rate, output_sample_rate=16000)
 
     files = {"file": ("audio.mp3", payload_mp3, "audio/mpeg")}
 
@@ -455,7 +584,7 @@ def get_transcription_via_sarvam(utterance):
         data["model"] = recording.bot.sarvam_model()
 
     try:
-        response = requests.post(base_url, headers=headers, files=files, data=data if data else None)
+        response = http_client.post(base_url, headers=headers, files=files, data=data if data else None)
 
         if response.status_code == 403:
             return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -489,22 +618,20 @@ def get_transcription_via_sarvam(utterance):
         return None, {"reason": TranscriptionFailureReasons.INTERNAL_ERROR, "error": str(e)}
 
 
-def get_transcription_via_elevenlabs(utterance):
+def get_transcription_via_elevenlabs(utterance, transcription_clients=None):
     recording = utterance.recording
-    elevenlabs_credentials_record = recording.bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.ELEVENLABS).first()
-    if not elevenlabs_credentials_record:
-        return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
-
-    elevenlabs_credentials = elevenlabs_credentials_record.get_credentials()
+    elevenlabs_credentials = get_provider_credentials(recording, Credentials.CredentialTypes.ELEVENLABS, transcription_clients)
     if not elevenlabs_credentials:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}
 
+    http_client = get_http_client(transcription_clients)
+
     api_key = elevenlabs_credentials.get("api_key")
     if not api_key:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND, "error": "api_key not in credentials"}
 
     # Convert PCM audio to MP3 for ElevenLabs
-    payload_mp3 = pcm_to_mp3(utterance.audio_blob.tobytes(), sample_rate=utterance.sample_rate)
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_data(), sample_rate=utterance.sample_rate)
 
     # Prepare the request for ElevenLabs speech-to-text API
     url = "https://api.elevenlabs.io/v1/speech-to-text"
@@ -526,7 +653,7 @@ def get_transcription_via_elevenlabs(utterance):
     data["tag_audio_events"] = recording.bot.elevenlabs_tag_audio_events()
 
     try:
-        response = requests.post(url, headers=headers, files=files, data=data if data else None)
+        response = http_client.post(url, headers=headers, files=files, data=data if data else None)
 
         if response.status_code == 401:
             return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
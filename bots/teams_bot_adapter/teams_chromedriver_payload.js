@@ -979,7 +979,10 @@ class WebSocketClient {
         VIDEO: 2,  // Reserved for future use
         AUDIO: 3,   // Reserved for future use
         ENCODED_MP4_CHUNK: 4,
-        PER_PARTICIPANT_AUDIO: 5
+        PER_PARTICIPANT_AUDIO: 5,
+        // Sent by the adapter to the browser
+        RAW_AUDIO: 6,
+        RAW_IMAGE: 7
     };
   
     constructor() {
@@ -1005,6 +1008,8 @@ class WebSocketClient {
         };
   
         this.mediaSendingEnabled = false;
+        // Whether the adapter has any use for video frames. Updated with setSendVideoFrames.
+        this.sendVideoFrames = window.initialData.sendVideoFrames;
         /*
         We no longer need this because we're not using MediaStreamTrackProcessor's
         this.lastVideoFrameTime = performance.now();
@@ -1049,6 +1054,10 @@ class WebSocketClient {
     }
     */
   
+    setSendVideoFrames(sendVideoFrames) {
+        this.sendVideoFrames = sendVideoFrames;
+    }
+
     enableMediaSending() {
         this.mediaSendingEnabled = true;
         window.styleManager.start();
@@ -1080,6 +1089,13 @@ class WebSocketClient {
                 const jsonData = new TextDecoder().decode(new Uint8Array(data, 4));
                 console.log('Received JSON message:', JSON.parse(jsonData));
                 break;
+            case WebSocketClient.MESSAGE_TYPES.RAW_AUDIO:
+                // Header is the message type and the sample rate, followed by 16-bit PCM samples
+                window.botOutputManager.playPCMAudio(new Int16Array(data, 8), view.getInt32(4, true));
+                break;
+            case WebSocketClient.MESSAGE_TYPES.RAW_IMAGE:
+                window.botOutputManager.displayImage(new Uint8Array(data, 4));
+                break;
             // Add future message type handlers here
             default:
                 console.warn('Unknown message type:', messageType);
@@ -1230,7 +1246,7 @@ class WebSocketClient {
             return;
         }
   
-        if (!this.mediaSendingEnabled) {
+        if (!this.mediaSendingEnabled || !this.sendVideoFrames) {
           return;
         }
         
@@ -1751,7 +1767,7 @@ const handleVideoTrack = async (event) => {
                  // if (Math.random() < 0.02)
                    //realConsole?.log('firstStreamId', firstStreamId, 'streamIdToSend', virtualStreamToPhysicalStreamMappingManager.getVideoStreamIdToSend());
                   
-                  if (firstStreamId && firstStreamId === virtualStreamToPhysicalStreamMappingManager.getVideoStreamIdToSend()) {
+                  if (ws.sendVideoFrames && firstStreamId && firstStreamId === virtualStreamToPhysicalStreamMappingManager.getVideoStreamIdToSend()) {
                       // Check if enough time has passed since the last frame
                       if (currentTime - lastFrameTime >= frameInterval) {
                           // Copy the frame to get access to raw data
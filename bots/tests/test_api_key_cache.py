@@ -0,0 +1,130 @@
+import time
+
+import redis
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework import exceptions
+
+from accounts.models import Organization
+from bots.api_key_cache import ApiKeyCache, get_api_key_cache
+from bots.authentication import ApiKeyAuthentication
+from bots.models import ApiKey, Bot, Project
+
+
+class InMemoryRedis:
+    """Just the commands ApiKeyCache uses, for caches in different "processes" to share"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+class UnavailableRedis:
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise redis.exceptions.ConnectionError("Connection refused")
+
+        return command
+
+
+class TestApiKeyCache(TestCase):
+    def setUp(self):
+        get_api_key_cache().clear()
+        self.addCleanup(get_api_key_cache().clear)
+        self.organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.api_key, self.api_key_plain = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, name="Test Bot", meeting_url="https://zoom.us/j/123")
+
+    def authenticate(self, api_key_plain=None):
+        request = RequestFactory().get("/api/v1/bots", HTTP_AUTHORIZATION=f"Token {api_key_plain or self.api_key_plain}")
+        return ApiKeyAuthentication().authenticate(request)[1]
+
+    def test_api_key_is_looked_up_in_the_database_once(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        with self.assertNumQueries(0):
+            api_key = self.authenticate()
+
+        self.assertEqual(api_key.id, self.api_key.id)
+        self.assertEqual(api_key.project.object_id, self.project.object_id)
+        self.assertEqual(api_key.project.created_at, self.project.created_at)
+        # The organization isn't cached, since views check its credits
+        self.assertEqual(api_key.project.organization, self.organization)
+
+    def test_disabled_api_key_stops_working_right_away(self):
+        self.authenticate()
+
+        self.api_key.disabled_at = timezone.now()
+        self.api_key.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_api_key_stops_working_right_away(self):
+        self.authenticate()
+        response = self.client.get(f"/api/v1/bots/{self.bot.object_id}", HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+        self.assertEqual(response.status_code, 200)
+
+        self.api_key.delete()
+
+        response = self.client.get(f"/api/v1/bots/{self.bot.object_id}", HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+        self.assertEqual(response.status_code, 401)
+
+    def test_project_changes_are_seen_right_away(self):
+        self.authenticate()
+
+        self.project.name = "Renamed Project"
+        self.project.save()
+
+        self.assertEqual(self.authenticate().project.name, "Renamed Project")
+
+    def test_api_key_revoked_by_another_process_stops_working_within_the_ttl(self):
+        shared_redis = InMemoryRedis()
+        cache = ApiKeyCache(max_entries=10, ttl_seconds=0.2, redis_client=shared_redis)
+        self.assertIsNotNone(cache.get(self.api_key.key_hash))
+
+        # What the signal handlers in the other process do
+        ApiKey.objects.filter(id=self.api_key.id).update(disabled_at=timezone.now())
+        ApiKeyCache(max_entries=10, ttl_seconds=0.2, redis_client=shared_redis).invalidate([self.api_key.key_hash])
+
+        self.assertIsNotNone(cache.get(self.api_key.key_hash))
+        time.sleep(0.25)
+        self.assertIsNone(cache.get(self.api_key.key_hash))
+
+    def test_api_key_is_shared_between_processes_through_redis(self):
+        shared_redis = InMemoryRedis()
+        ApiKeyCache(max_entries=10, ttl_seconds=5, redis_client=shared_redis).get(self.api_key.key_hash)
+        cache = ApiKeyCache(max_entries=10, ttl_seconds=5, redis_client=shared_redis)
+
+        with self.assertNumQueries(0):
+            api_key = cache.get(self.api_key.key_hash)
+
+        self.assertEqual(api_key.project.id, self.project.id)
+        self.assertEqual(cache.redis_hit_count, 1)
+
+    def test_unavailable_redis_falls_back_to_the_database(self):
+        cache = ApiKeyCache(max_entries=10, ttl_seconds=0, redis_client=UnavailableRedis())
+
+        with self.assertLogs("bots.api_key_cache", level="WARNING"):
+            self.assertEqual(cache.get(self.api_key.key_hash).id, self.api_key.id)
+        self.assertIsNone(cache.get("unknown"))
+
+    def test_least_recently_used_api_keys_are_evicted(self):
+        other_api_key, _ = ApiKey.create(project=self.project, name="Other API Key")
+        cache = ApiKeyCache(max_entries=1, ttl_seconds=5)
+        cache.get(self.api_key.key_hash)
+        cache.get(other_api_key.key_hash)
+
+        with self.assertNumQueries(1):
+            cache.get(self.api_key.key_hash)
@@ -0,0 +1,130 @@
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+from bots.bot_controller.audio_output_manager import AudioOutputManager
+from bots.bot_controller.pcm_cache import PcmCache
+from bots.bot_controller.text_to_speech import get_text_to_speech_client
+from bots.media_cache import MediaCache
+
+PCM = b"\x01\x02" * AudioOutputManager.SAMPLE_RATE
+
+
+def wait_for(condition, timeout_seconds=5):
+    deadline = time.monotonic() + timeout_seconds
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class TestAudioOutputManager(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Shared by every manager in a test, like the bots on a node
+        self.media_cache = MediaCache(directory.name, max_size_bytes=100 * 1024 * 1024)
+        self.next_request_id = 1
+
+    def manager(self, **kwargs):
+        manager = AudioOutputManager(
+            currently_playing_audio_media_request_finished_callback=Mock(),
+            play_raw_audio_callback=Mock(),
+            sleep_time_between_chunks_seconds=0,
+            currently_playing_audio_media_request_failed_to_play_callback=Mock(),
+            pcm_cache=PcmCache(self.media_cache),
+            **kwargs,
+        )
+        self.addCleanup(manager.cleanup)
+        return manager
+
+    def request(self, media_blob=None, text_to_speak=None, text_to_speech_settings=None):
+        self.next_request_id += 1
+        return SimpleNamespace(id=self.next_request_id, media_blob=media_blob, text_to_speak=text_to_speak, text_to_speech_settings=text_to_speech_settings, bot=Mock())
+
+    def media_blob(self, checksum="abc"):
+        return SimpleNamespace(checksum=checksum, blob=b"mp3 bytes", duration_ms=1000)
+
+    def played_audio(self, manager):
+        wait_for(lambda: not manager.audio_thread.is_alive())
+        return b"".join(call.kwargs["bytes"] for call in manager.play_raw_audio_callback.call_args_list)
+
+    @patch("bots.bot_controller.audio_output_manager.mp3_to_pcm", return_value=PCM)
+    def test_media_blob_is_decoded_once_for_every_bot_on_the_node(self, mock_mp3_to_pcm):
+        for _ in range(2):
+            manager = self.manager()
+            manager.start_playing_audio_media_request(self.request(media_blob=self.media_blob()))
+            self.assertEqual(self.played_audio(manager), PCM)
+
+        mock_mp3_to_pcm.assert_called_once_with(b"mp3 bytes", sample_rate=AudioOutputManager.SAMPLE_RATE)
+
+        manager = self.manager()
+        manager.start_playing_audio_media_request(self.request(media_blob=self.media_blob(checksum="other")))
+        self.played_audio(manager)
+        self.assertEqual(mock_mp3_to_pcm.call_count, 2)
+
+    @patch("bots.bot_controller.audio_output_manager.generate_audio_from_text", return_value=(PCM, 1000))
+    def test_speech_is_synthesized_once_per_text_and_voice(self, mock_generate_audio_from_text):
+        voice = {"google": {"voice_language_code": "en-US", "voice_name": "en-US-Standard-A"}}
+        other_voice = {"google": {"voice_language_code": "en-US", "voice_name": "en-US-Standard-B"}}
+        manager = self.manager()
+
+        for text, settings in [("Hello", voice), ("Hello", voice), ("Hello", other_voice), ("Goodbye", voice)]:
+            manager.start_playing_audio_media_request(self.request(text_to_speak=text, text_to_speech_settings=settings))
+            self.assertEqual(self.played_audio(manager), PCM)
+            manager.play_raw_audio_callback.reset_mock()
+
+        self.assertEqual(mock_generate_audio_from_text.call_count, 3)
+        self.assertEqual(manager.currently_playing_audio_media_request_duration_ms, 1000)
+
+    @patch("bots.bot_controller.audio_output_manager.mp3_to_pcm")
+    def test_audio_is_prepared_off_the_calling_thread_and_ahead_of_playback(self, mock_mp3_to_pcm):
+        decode_started = threading.Event()
+        finish_decoding = threading.Event()
+
+        def slow_decode(*args, **kwargs):
+            decode_started.set()
+            finish_decoding.wait()
+            return PCM
+
+        mock_mp3_to_pcm.side_effect = slow_decode
+        manager = self.manager()
+        request = self.request(media_blob=self.media_blob())
+
+        manager.prepare_audio_media_request(request)
+        self.assertTrue(decode_started.wait(timeout=5))
+        started_at = time.monotonic()
+        manager.start_playing_audio_media_request(request)
+
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertFalse(manager.currently_playing_audio_media_request_is_finished())
+        finish_decoding.set()
+        self.assertEqual(self.played_audio(manager), PCM)
+        mock_mp3_to_pcm.assert_called_once()
+
+    @patch("bots.bot_controller.audio_output_manager.generate_audio_from_text", side_effect=ValueError("Could not find Google Text-to-Speech credentials."))
+    def test_failure_to_prepare_is_reported_from_monitor(self, mock_generate_audio_from_text):
+        manager = self.manager()
+        request = self.request(text_to_speak="Hello", text_to_speech_settings={})
+
+        manager.start_playing_audio_media_request(request)
+        wait_for(lambda: not manager.audio_thread.is_alive())
+        manager.monitor_currently_playing_audio_media_request()
+
+        manager.currently_playing_audio_media_request_failed_to_play_callback.assert_called_once_with(request)
+        manager.currently_playing_audio_media_request_finished_callback.assert_not_called()
+        self.assertIsNone(manager.currently_playing_audio_media_request)
+
+    @patch("bots.bot_controller.text_to_speech.texttospeech.TextToSpeechClient")
+    def test_text_to_speech_clients_are_reused(self, MockTextToSpeechClient):
+        MockTextToSpeechClient.from_service_account_info.side_effect = lambda info: MagicMock()
+        text_to_speech_clients = {}
+
+        client = get_text_to_speech_client('{"client_email": "a"}', text_to_speech_clients)
+
+        self.assertIs(get_text_to_speech_client('{"client_email": "a"}', text_to_speech_clients), client)
+        self.assertIsNot(get_text_to_speech_client('{"client_email": "b"}', text_to_speech_clients), client)
+        self.assertEqual(MockTextToSpeechClient.from_service_account_info.call_count, 2)
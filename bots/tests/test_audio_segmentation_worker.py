@@ -0,0 +1,136 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from bots.bot_controller.audio_segmentation_worker import AudioSegmentationWorker
+from bots.bot_controller.per_participant_non_streaming_audio_input_manager import PerParticipantNonStreamingAudioInputManager
+
+SPEECH = b"\x01\x00" * 320
+SILENCE = b"\x00\x00" * 320
+SPEAKER_COUNT = 20
+# How long each utterance takes to save, standing in for a slow database
+SAVE_LATENCY_SECONDS = 0.2
+MAIN_LOOP_TICK_LATENCY_TARGET_SECONDS = 0.05
+
+
+def create_manager(save_utterance_callback):
+    manager = PerParticipantNonStreamingAudioInputManager(
+        save_utterance_callback=save_utterance_callback,
+        get_participant_callback=lambda speaker_id: {"participant_uuid": speaker_id},
+        sample_rate=32000,
+        utterance_size_limit=10 * 1024 * 1024,
+        silence_duration_limit=0.2,
+    )
+    manager.silence_detector = Mock()
+    manager.silence_detector.detect_silence.side_effect = lambda chunks: [chunk != SPEECH for chunk in chunks]
+    return manager
+
+
+class TestAudioSegmentationWorker(unittest.TestCase):
+    def setUp(self):
+        self.saved_utterances = []
+
+        def slow_save_utterance(utterance):
+            time.sleep(SAVE_LATENCY_SECONDS)
+            self.saved_utterances.append(utterance)
+
+        self.manager = create_manager(slow_save_utterance)
+        self.worker = None
+
+    def tearDown(self):
+        if self.worker:
+            self.worker.stop()
+
+    def run_meeting(self, main_loop_tick, seconds=2):
+        """
+        20 speakers talk in turns of 700 ms with 700 ms pauses, sending 10 ms chunks in real time, while the main loop ticks every 100 ms.
+        Returns how long each tick took.
+        """
+        stop_speaking = threading.Event()
+
+        def speak():
+            start_time = time.monotonic()
+            chunk_index = 0
+            while not stop_speaking.is_set():
+                chunk = SPEECH if (chunk_index // 70) % 2 == 0 else SILENCE
+                for speaker_index in range(SPEAKER_COUNT):
+                    self.manager.add_chunk(f"speaker_{speaker_index}", datetime.utcnow(), chunk)
+                chunk_index += 1
+                time.sleep(max(0, start_time + chunk_index * 0.01 - time.monotonic()))
+
+        speaker_thread = threading.Thread(target=speak, daemon=True)
+        speaker_thread.start()
+
+        tick_durations = []
+        end_time = time.monotonic() + seconds
+        while time.monotonic() < end_time:
+            tick_start_time = time.monotonic()
+            main_loop_tick()
+            tick_durations.append(time.monotonic() - tick_start_time)
+            time.sleep(0.1)
+
+        stop_speaking.set()
+        speaker_thread.join()
+        return tick_durations
+
+    def test_main_loop_stays_responsive_while_saving_is_slow(self):
+        self.worker = AudioSegmentationWorker(audio_input_manager=self.manager, on_error_callback=Mock(), interval_seconds=0.1)
+        self.worker.start()
+
+        tick_durations = self.run_meeting(main_loop_tick=lambda: None)
+
+        self.assertLess(max(tick_durations), MAIN_LOOP_TICK_LATENCY_TARGET_SECONDS)
+
+        # Everything said gets saved once the worker catches up
+        self.assertTrue(self.worker.flush_utterances(timeout=60))
+        self.assertTrue(self.manager.queue.empty())
+        self.assertEqual(self.manager.first_nonsilent_audio_time, {})
+        self.assertEqual({utterance["participant_uuid"] for utterance in self.saved_utterances}, {f"speaker_{i}" for i in range(SPEAKER_COUNT)})
+        self.assertEqual(self.manager.dropped_chunk_count, 0)
+
+    def test_main_loop_stalls_when_it_segments_the_audio_itself(self):
+        # The same meeting with segmentation on the main loop, to show that the save latency really is there
+        tick_durations = self.run_meeting(main_loop_tick=self.manager.process_chunks, seconds=1.5)
+
+        self.assertGreater(max(tick_durations), SAVE_LATENCY_SECONDS)
+
+    def test_error_is_reported_and_worker_stops(self):
+        error = Exception("Database is down")
+        self.manager.save_utterance_callback = Mock(side_effect=error)
+        on_error_callback = Mock()
+        self.worker = AudioSegmentationWorker(audio_input_manager=self.manager, on_error_callback=on_error_callback, interval_seconds=0.01)
+        self.worker.start()
+
+        self.manager.add_chunk("speaker_0", datetime.utcnow(), SPEECH)
+        self.assertTrue(self.worker.flush_utterances(timeout=5))
+        self.worker.thread.join(5)
+
+        on_error_callback.assert_called_once_with(error)
+        self.assertFalse(self.worker.is_running())
+        self.assertFalse(self.worker.flush_utterances(timeout=1))
+
+    def test_closes_its_database_connection_when_it_stops(self):
+        closed_on_threads = []
+        self.worker = AudioSegmentationWorker(audio_input_manager=self.manager, on_error_callback=Mock(), interval_seconds=0.01)
+        with patch("bots.bot_controller.audio_segmentation_worker.connection") as mock_connection:
+            mock_connection.close.side_effect = lambda: closed_on_threads.append(threading.current_thread())
+            self.worker.start()
+            self.worker.stop()
+
+        self.assertEqual(closed_on_threads, [self.worker.thread])
+
+    def test_drops_chunks_when_the_queue_is_full(self):
+        with patch("bots.bot_controller.per_participant_non_streaming_audio_input_manager.MAX_QUEUED_CHUNKS", 5):
+            manager = create_manager(Mock())
+
+        for _ in range(8):
+            manager.add_chunk("speaker_0", datetime.utcnow(), SPEECH)
+
+        self.assertEqual(manager.queue.qsize(), 5)
+        self.assertEqual(manager.dropped_chunk_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserRole
+from bots.models import ApiKey, Bot, BotEvent, BotEventTypes, BotStates, Project
+
+
+class BotListTestCase(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key_plain = ApiKey.create(project=self.project, name="Test API Key")
+
+    def create_bot(self, project=None, **kwargs):
+        kwargs.setdefault("meeting_url", "https://meet.google.com/abc-defg-hij")
+        return Bot.objects.create(project=project or self.project, name="Test Bot", **kwargs)
+
+    def list_bots(self, query=""):
+        return self.client.get(f"/api/v1/bots{query}", HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+
+    def listed_bot_ids(self, query=""):
+        response = self.list_bots(query)
+        self.assertEqual(response.status_code, 200)
+        return [bot["id"] for bot in response.json()["results"]]
+
+
+class TestBotListView(BotListTestCase):
+    def test_lists_the_projects_bots_least_recently_updated_first(self):
+        first_bot = self.create_bot()
+        second_bot = self.create_bot()
+        other_project = Project.objects.create(name="Other Project", organization=self.organization)
+        self.create_bot(project=other_project)
+        # Saving it moves it to the end
+        first_bot.save()
+
+        self.assertEqual(self.listed_bot_ids(), [second_bot.object_id, first_bot.object_id])
+
+    def test_filters(self):
+        joined_bot = self.create_bot(state=BotStates.JOINED_RECORDING, deduplication_key="meeting-1", metadata={"customer_id": "abc", "team": "sales"})
+        ended_bot = self.create_bot(state=BotStates.ENDED, meeting_url="https://zoom.us/j/123", metadata={"customer_id": "def"})
+        fatal_error_bot = self.create_bot(state=BotStates.FATAL_ERROR)
+
+        self.assertEqual(self.listed_bot_ids("?state=joined_recording"), [joined_bot.object_id])
+        self.assertEqual(self.listed_bot_ids("?state=ended&state=fatal_error"), [ended_bot.object_id, fatal_error_bot.object_id])
+        self.assertEqual(self.listed_bot_ids("?meeting_url=https://zoom.us/j/123"), [ended_bot.object_id])
+        self.assertEqual(self.listed_bot_ids("?deduplication_key=meeting-1"), [joined_bot.object_id])
+        self.assertEqual(self.listed_bot_ids(f"?metadata={json.dumps({'customer_id': 'abc'})}"), [joined_bot.object_id])
+        self.assertEqual(self.listed_bot_ids(f"?metadata={json.dumps({'customer_id': 'abc', 'team': 'support'})}"), [])
+
+    def test_polling_with_updated_after(self):
+        first_bot = self.create_bot()
+        second_bot = self.create_bot()
+        # What a client would have seen last time it polled
+        updated_after = second_bot.updated_at.isoformat().replace("+00:00", "Z")
+        first_bot.save()
+        third_bot = self.create_bot()
+
+        self.assertEqual(self.listed_bot_ids(f"?updated_after={updated_after}"), [second_bot.object_id, first_bot.object_id, third_bot.object_id])
+
+    def test_invalid_filters(self):
+        for query in ["?state=not_a_state", "?metadata=not-json", "?metadata=[1]", "?updated_after=yesterday"]:
+            with self.subTest(query=query):
+                response = self.list_bots(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    @patch("bots.bots_api_views.BotCursorPagination.page_size", 2)
+    def test_paginates_through_every_bot(self):
+        bots = [self.create_bot(state=BotStates.ENDED) for _ in range(5)]
+
+        bot_ids = []
+        response = self.list_bots("?state=ended")
+        while True:
+            bot_ids += [bot["id"] for bot in response.json()["results"]]
+            if not response.json()["next"]:
+                break
+            response = self.client.get(response.json()["next"], HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+
+        self.assertEqual(bot_ids, [bot.object_id for bot in bots])
+
+
+class TestBotListQueryPlans(BotListTestCase):
+    """The list queries have to read a page from an index, in order, rather than sort every bot in the project"""
+
+    def setUp(self):
+        super().setUp()
+        # Enough bots, in this project and another, for the planner to prefer reading a page from an index to sorting
+        other_project = Project.objects.create(name="Other Project", organization=self.organization)
+        states = [BotStates.ENDED, BotStates.FATAL_ERROR, BotStates.JOINED_RECORDING]
+        Bot.objects.bulk_create(Bot(object_id=f"bot_{index:016d}", project=[self.project, other_project][index % 2], meeting_url="https://meet.google.com/abc-defg-hij", state=states[index // 2 % len(states)]) for index in range(6000))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE bots_bot")
+
+    def query_plan(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.list_bots(query)
+        self.assertEqual(response.status_code, 200)
+        bot_queries = [captured_query["sql"] for captured_query in queries.captured_queries if 'FROM "bots_bot"' in captured_query["sql"]]
+        self.assertEqual(len(bot_queries), 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {bot_queries[0]}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assertPageIsReadFromIndex(self, query, index_name):
+        # Leaving out the subplans for the default recording's states, which read one bot's recordings each
+        plan = self.query_plan(query).split("SubPlan")[0]
+        self.assertIn(f"Index Scan using {index_name}", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_query_plans(self):
+        self.assertPageIsReadFromIndex("", "bot_project_updated_idx")
+        self.assertPageIsReadFromIndex("?updated_after=2024-01-18T12:34:56Z", "bot_project_updated_idx")
+        self.assertPageIsReadFromIndex("?state=ended", "bot_project_state_updated_idx")
+        self.assertPageIsReadFromIndex("?state=ended&updated_after=2024-01-18T12:34:56Z", "bot_project_state_updated_idx")
+
+
+class TestProjectBotsView(BotListTestCase):
+    def test_only_the_page_is_read(self):
+        user = User.objects.create_user(username="admin", email="admin@example.com", password="testpassword123", role=UserRole.ADMIN, organization=self.organization)
+        self.client.force_login(user)
+        bots = [self.create_bot() for _ in range(25)]
+        BotEvent.objects.create(bot=bots[-1], old_state=BotStates.READY, new_state=BotStates.JOINING, event_type=BotEventTypes.JOIN_REQUESTED)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("bots:project-bots", kwargs={"object_id": self.project.object_id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["bots"]), 20)
+        self.assertEqual(response.context["bots"][0].last_event_type_display, "Bot requested to join meeting")
+        self.assertEqual(list(response.context["nearby_page_numbers"]), [1, 2])
+        bot_queries = [query["sql"] for query in queries.captured_queries if 'FROM "bots_bot"' in query["sql"] and "COUNT(*)" not in query["sql"]]
+        self.assertEqual(len(bot_queries), 1)
+        self.assertIn("LIMIT 20", bot_queries[0])
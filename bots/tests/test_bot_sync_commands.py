@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import fakeredis
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from accounts.models import Organization
+from bots import redis_utils
+from bots.bot_controller.bot_controller import BotController
+from bots.bots_api_utils import send_sync_command, send_sync_command_and_wait_for_ack
+from bots.models import ApiKey, Bot, BotStates, Project
+
+
+class SimulatedBotListener:
+    """Subscribes to a bot's channel and handles its commands like BotController's redis_listener"""
+
+    def __init__(self, redis_client, bot, handle_command=None, acknowledge=True, ack_command_id=None):
+        self.redis_client = redis_client
+        self.channel = f"bot_{bot.id}"
+        self.handle_command = handle_command
+        self.acknowledge = acknowledge
+        # Acknowledge with this id instead of the command's
+        self.ack_command_id = ack_command_id
+        self.commands = []
+        self.pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(self.channel)
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            message = self.pubsub.get_message(timeout=0.01)
+            if not message:
+                continue
+            data = json.loads(message["data"])
+            if "ack" in data:
+                continue
+            self.commands.append(data)
+            if self.handle_command:
+                self.handle_command(data["command"])
+            if self.acknowledge and data.get("command_id"):
+                self.redis_client.publish(self.channel, json.dumps({"ack": self.ack_command_id or data["command_id"]}))
+
+    def stop(self):
+        self.stopped = True
+        self.thread.join(timeout=5)
+        self.pubsub.close()
+
+
+class BotSyncCommandTestCase:
+    def setUp(self):
+        super().setUp()
+        self.redis_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        get_redis_client_patcher = patch("bots.bots_api_utils.get_redis_client", return_value=self.redis_client)
+        get_redis_client_patcher.start()
+        self.addCleanup(get_redis_client_patcher.stop)
+
+        organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=organization)
+        self.bot = Bot.objects.create(project=self.project, name="Test Bot", meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+
+    def start_bot_listener(self, **kwargs):
+        listener = SimulatedBotListener(self.redis_client, self.bot, **kwargs)
+        self.addCleanup(listener.stop)
+        return listener
+
+
+class TestSendSyncCommand(BotSyncCommandTestCase, TestCase):
+    def test_redis_client_is_created_once_per_process(self):
+        with patch.object(redis_utils, "_redis_client", None), patch.object(redis_utils.redis, "from_url", return_value=self.redis_client) as mock_from_url, patch.dict("os.environ", {"REDIS_URL": "redis://localhost:6379"}):
+            threads = [threading.Thread(target=redis_utils.get_redis_client) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertIs(redis_utils.get_redis_client(), self.redis_client)
+        mock_from_url.assert_called_once()
+
+    def test_command_is_sent_without_waiting(self):
+        listener = self.start_bot_listener()
+
+        send_sync_command(self.bot, "sync_media_requests")
+
+        deadline = time.monotonic() + 5
+        while not listener.commands and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(listener.commands, [{"command": "sync_media_requests"}])
+
+    def test_acknowledged_command(self):
+        listener = self.start_bot_listener()
+
+        started_at = time.monotonic()
+        self.assertTrue(send_sync_command_and_wait_for_ack(self.bot, "pause_recording", timeout_seconds=5))
+
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual([command["command"] for command in listener.commands], ["pause_recording"])
+
+    def test_unacknowledged_command_times_out(self):
+        # Like a bot running a version that doesn't acknowledge commands
+        self.start_bot_listener(acknowledge=False)
+
+        started_at = time.monotonic()
+        self.assertFalse(send_sync_command_and_wait_for_ack(self.bot, "pause_recording", timeout_seconds=0.3))
+
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.3)
+
+    def test_acknowledgement_of_another_command_is_ignored(self):
+        self.start_bot_listener(ack_command_id="another command")
+
+        self.assertFalse(send_sync_command_and_wait_for_ack(self.bot, "pause_recording", timeout_seconds=0.3))
+
+    def test_bot_controller_acknowledges_commands(self):
+        acks = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        acks.subscribe(f"bot_{self.bot.id}")
+        self.addCleanup(acks.close)
+        with patch.object(BotController, "__init__", return_value=None):
+            controller = BotController()
+        controller.redis_client = self.redis_client
+        controller.pubsub_channel = f"bot_{self.bot.id}"
+        controller.bot_in_db = Mock()
+        controller.take_action_based_on_bot_in_db = Mock()
+
+        controller.handle_redis_message({"type": "message", "data": json.dumps({"command": "sync", "command_id": "abc"}).encode("utf-8")})
+        # Its own acknowledgement comes back to it on the channel
+        controller.handle_redis_message({"type": "message", "data": json.dumps({"ack": "abc"}).encode("utf-8")})
+
+        controller.take_action_based_on_bot_in_db.assert_called_once()
+        messages = []
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            message = acks.get_message(timeout=0.1)
+            if message:
+                messages.append(json.loads(message["data"]))
+        self.assertEqual(messages, [{"ack": "abc"}])
+
+
+class TestRecordingCommandViews(BotSyncCommandTestCase, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.api_key_plain = ApiKey.create(project=self.project, name="Test API Key")
+
+    def set_bot_state(self, state):
+        # The simulated bot runs in its own thread, with its own database connection
+        Bot.objects.filter(id=self.bot.id).update(state=state)
+        connection.close()
+
+    def post(self, path):
+        return self.client.post(f"/api/v1/bots/{self.bot.object_id}/{path}", HTTP_AUTHORIZATION=f"Token {self.api_key_plain}", content_type="application/json")
+
+    def test_pause_recording_returns_once_the_bot_acknowledges(self):
+        self.start_bot_listener(handle_command=lambda command: self.set_bot_state(BotStates.JOINED_RECORDING_PAUSED))
+
+        started_at = time.monotonic()
+        response = self.post("pause_recording")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "joined_recording_paused")
+        # It used to take at least 200 ms, polling the database
+        self.assertLess(time.monotonic() - started_at, 0.2)
+
+    def test_resume_recording_returns_once_the_bot_acknowledges(self):
+        self.bot.state = BotStates.JOINED_RECORDING_PAUSED
+        self.bot.save()
+        self.start_bot_listener(handle_command=lambda command: self.set_bot_state(BotStates.JOINED_RECORDING))
+
+        response = self.post("resume_recording")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "joined_recording")
+
+    def test_pause_recording_fails_when_the_bot_does_not_pause(self):
+        self.start_bot_listener()
+
+        response = self.post("pause_recording")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unable to pause recording"})
+
+    def test_pause_recording_falls_back_to_the_database_when_the_bot_does_not_acknowledge(self):
+        self.start_bot_listener(handle_command=lambda command: self.set_bot_state(BotStates.JOINED_RECORDING_PAUSED), acknowledge=False)
+
+        with patch("bots.bots_api_views.RECORDING_COMMAND_ACK_TIMEOUT_SECONDS", 0.3):
+            response = self.post("pause_recording")
+
+        self.assertEqual(response.status_code, 200)
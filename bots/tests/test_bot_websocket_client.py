@@ -1,4 +1,7 @@
+import base64
 import json
+import os
+import socket
 import threading
 import time
 import unittest
@@ -6,8 +9,12 @@ from queue import Empty
 from unittest.mock import Mock, call, patch
 
 from websockets import ConnectionClosed
+from websockets.sync.server import serve
 
 from bots.bot_controller.bot_websocket_client import BotWebsocketClient
+from bots.bot_controller.bounded_send_queue import BoundedSendQueue, SendQueueOverflowPolicy
+from bots.streaming_resampler import StreamingResampler
+from bots.websocket_payloads import BINARY_FRAME_HEADER, mixed_audio_websocket_binary_frame
 
 
 class TestBotWebsocketClient(unittest.TestCase):
@@ -279,6 +286,56 @@ class TestBotWebsocketClient(unittest.TestCase):
         expected_calls = [call(json.dumps(msg)) for msg in test_messages]
         mock_websocket.send.assert_has_calls(expected_calls)
 
+    def test_send_loop_coalesces_queued_binary_frames(self):
+        """Test that binary frames queued behind each other go out as one frame, and other messages keep their place."""
+        mock_websocket = Mock()
+        self.client.websocket = mock_websocket
+        self.client.connection_state = BotWebsocketClient.CONNECTED
+
+        resampler = StreamingResampler(16000, 16000)
+        chunks = [bytes([i]) * 320 for i in range(4)]
+        with patch("bots.websocket_payloads.time.time", side_effect=[1.0, 1.01, 1.02, 1.03]):
+            frames = [mixed_audio_websocket_binary_frame(chunk, resampler) for chunk in chunks]
+        json_message = {"type": "test"}
+        for message in [frames[0], frames[1], frames[2], json_message, frames[3]]:
+            self.client.send_queue.put(message)
+
+        def side_effect(*args):
+            if self.client.send_queue.empty() and mock_websocket.send.call_count == 3:
+                self.client.connection_state = BotWebsocketClient.STOPPED
+
+        mock_websocket.send.side_effect = side_effect
+
+        self.client.send_loop()
+
+        sent = [sent_call.args[0] for sent_call in mock_websocket.send.call_args_list]
+        self.assertEqual(sent[1:], [json.dumps(json_message), frames[3]])
+        # The first frame's header, with the audio of all three frames
+        self.assertEqual(BINARY_FRAME_HEADER.unpack(sent[0][: BINARY_FRAME_HEADER.size]), (1, 0, 101, 16000, 1000))
+        self.assertEqual(sent[0][BINARY_FRAME_HEADER.size :], chunks[0] + chunks[1] + chunks[2])
+
+    def test_send_loop_limits_coalesced_frame_size(self):
+        """Test that coalescing stops once a frame reaches the maximum size."""
+        mock_websocket = Mock()
+        self.client.websocket = mock_websocket
+        self.client.connection_state = BotWebsocketClient.CONNECTED
+        self.client.max_coalesced_frame_bytes = 1000
+
+        resampler = StreamingResampler(16000, 16000)
+        for i in range(6):
+            self.client.send_queue.put(mixed_audio_websocket_binary_frame(bytes([i]) * 320, resampler))
+
+        def side_effect(*args):
+            if self.client.send_queue.empty():
+                self.client.connection_state = BotWebsocketClient.STOPPED
+
+        mock_websocket.send.side_effect = side_effect
+
+        self.client.send_loop()
+
+        sent = [sent_call.args[0] for sent_call in mock_websocket.send.call_args_list]
+        self.assertEqual([len(frame) - BINARY_FRAME_HEADER.size for frame in sent], [960, 960])
+
     def test_send_loop_handles_send_error(self):
         """Test that send loop handles websocket send errors."""
         mock_websocket = Mock()
@@ -422,5 +479,178 @@ class TestBotWebsocketClient(unittest.TestCase):
         mock_websocket.close.assert_called_once()
 
 
+class TestBoundedSendQueue(unittest.TestCase):
+    def test_drop_oldest_keeps_newest_messages(self):
+        queue = BoundedSendQueue(max_messages=3, overflow_policy=SendQueueOverflowPolicy.DROP_OLDEST)
+        for i in range(5):
+            self.assertTrue(queue.put(i))
+
+        self.assertEqual([queue.get_nowait() for _ in range(3)], [2, 3, 4])
+        self.assertEqual(queue.dropped_oldest_count, 2)
+        self.assertEqual(queue.dropped_newest_count, 0)
+
+    def test_drop_newest_keeps_oldest_messages(self):
+        queue = BoundedSendQueue(max_messages=3, overflow_policy=SendQueueOverflowPolicy.DROP_NEWEST)
+        results = [queue.put(i) for i in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual([queue.get_nowait() for _ in range(3)], [0, 1, 2])
+        self.assertEqual(queue.dropped_newest_count, 2)
+
+    def test_block_waits_for_room(self):
+        queue = BoundedSendQueue(max_messages=1, overflow_policy=SendQueueOverflowPolicy.BLOCK, block_ms=1000)
+        queue.put("first")
+        threading.Timer(0.05, queue.get_nowait).start()
+
+        start_time = time.monotonic()
+        self.assertTrue(queue.put("second"))
+
+        self.assertLess(time.monotonic() - start_time, 0.5)
+        self.assertEqual(queue.get_nowait(), "second")
+        self.assertEqual(queue.dropped_count, 0)
+
+    def test_block_drops_newest_after_timeout(self):
+        queue = BoundedSendQueue(max_messages=1, overflow_policy=SendQueueOverflowPolicy.BLOCK, block_ms=50)
+        queue.put("first")
+
+        start_time = time.monotonic()
+        self.assertFalse(queue.put("second"))
+
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.05)
+        self.assertEqual(queue.get_nowait(), "first")
+        self.assertEqual(queue.dropped_newest_count, 1)
+
+    def test_get_times_out_when_empty(self):
+        queue = BoundedSendQueue(max_messages=1)
+
+        with self.assertRaises(Empty):
+            queue.get(timeout=0.01)
+
+    def test_metrics_window(self):
+        queue = BoundedSendQueue(max_messages=10)
+        for i in range(4):
+            queue.put(i)
+        queue.get_nowait()
+        queue.get_nowait()
+        queue.record_sent()
+
+        metrics = queue.metrics(reset_window=True)
+        self.assertEqual(metrics["depth"], 2)
+        self.assertEqual(metrics["high_water_mark"], 4)
+        self.assertIsNotNone(metrics["send_latency_ms_p50"])
+        self.assertGreaterEqual(metrics["send_latency_ms_max"], metrics["send_latency_ms_p50"])
+
+        metrics = queue.metrics()
+        self.assertEqual(metrics["high_water_mark"], 2)
+        self.assertIsNone(metrics["send_latency_ms_p50"])
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            BoundedSendQueue(max_messages=0)
+        with self.assertRaises(ValueError):
+            BoundedSendQueue(max_messages=10, overflow_policy="drop_everything")
+
+
+SMALL_SOCKET_BUFFER_BYTES = 16384
+
+
+class TestBotWebsocketClientWithSlowServer(unittest.TestCase):
+    """
+    Runs the client against a local websocket server that takes 20 ms to handle each message. The socket buffers
+    are kept small and the messages large and random, so the server's slowness reaches the client instead of being buffered.
+    """
+
+    def setUp(self):
+        self.received_messages = []
+        self.padding = base64.b64encode(os.urandom(12288)).decode()
+
+        def handler(websocket):
+            for message in websocket:
+                time.sleep(0.02)
+                self.received_messages.append(json.loads(message)["index"])
+
+        self.server = serve(handler, "127.0.0.1", 0, max_queue=1)
+        self.server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SMALL_SOCKET_BUFFER_BYTES)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        self.client = None
+
+    def tearDown(self):
+        if self.client:
+            self.client.cleanup()
+        self.server.shutdown()
+
+    def start_client(self, **kwargs):
+        self.client = BotWebsocketClient(self.url, Mock(), **kwargs)
+        self.client.start()
+        deadline = time.monotonic() + 5
+        while self.client.connection_state != BotWebsocketClient.CONNECTED and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.client.connection_state, BotWebsocketClient.CONNECTED)
+        self.client.websocket.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SMALL_SOCKET_BUFFER_BYTES)
+
+    def message(self, index):
+        # Random, so compression doesn't shrink it
+        return {"index": index, "padding": self.padding}
+
+    def wait_for_queue_to_drain(self):
+        deadline = time.monotonic() + 5
+        while not self.client.send_queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_drop_oldest_bounds_the_queue_and_delivers_the_newest_messages(self):
+        self.start_client(max_queued_messages=10, overflow_policy=SendQueueOverflowPolicy.DROP_OLDEST)
+
+        for i in range(200):
+            self.client.send_async(self.message(i))
+            metrics = self.client.metrics()
+            self.assertLessEqual(metrics["depth"], 10)
+
+        metrics = self.client.metrics()
+        self.assertEqual(metrics["high_water_mark"], 10)
+        self.assertGreater(metrics["dropped_oldest_count"], 150)
+        self.assertEqual(metrics["dropped_newest_count"], 0)
+
+        self.wait_for_queue_to_drain()
+        deadline = time.monotonic() + 5
+        while 199 not in self.received_messages and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn(199, self.received_messages)
+        self.assertEqual(self.received_messages, sorted(self.received_messages))
+
+        # Messages waited behind up to 10 others, each taking the server 20 ms
+        metrics = self.client.metrics()
+        self.assertGreater(metrics["send_latency_ms_p95"], 50)
+
+    def test_block_slows_the_producer_down_to_the_server(self):
+        self.start_client(max_queued_messages=2, overflow_policy=SendQueueOverflowPolicy.BLOCK, overflow_block_ms=500)
+
+        start_time = time.monotonic()
+        for i in range(20):
+            self.client.send_async(self.message(i))
+        elapsed_seconds = time.monotonic() - start_time
+
+        # Each message had to wait for the server to take the one ahead of it, so none were dropped
+        self.assertGreater(elapsed_seconds, 0.1)
+        self.assertEqual(self.client.metrics()["dropped_newest_count"], 0)
+
+        self.wait_for_queue_to_drain()
+        deadline = time.monotonic() + 5
+        while len(self.received_messages) < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.received_messages, list(range(20)))
+
+    def test_block_drops_newest_when_server_is_too_slow(self):
+        self.start_client(max_queued_messages=2, overflow_policy=SendQueueOverflowPolicy.BLOCK, overflow_block_ms=1)
+
+        for i in range(50):
+            self.client.send_async(self.message(i))
+
+        metrics = self.client.metrics()
+        self.assertGreater(metrics["dropped_newest_count"], 0)
+        self.assertEqual(metrics["dropped_oldest_count"], 0)
+        self.assertLessEqual(metrics["high_water_mark"], 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -243,6 +243,20 @@ class TestCreateBot(TestCase):
         self.assertIsNotNone(error)
         self.assertEqual(error, {"error": "URL already subscribed for this bot"})
 
+    def test_with_batched_webhook(self):
+        bot, error = create_bot(data={"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Test Bot", "webhooks": [{"url": "https://example.com", "triggers": ["transcript.update"], "batching": {"max_events": 50}}, {"url": "https://example2.com", "triggers": ["chat_messages.update"]}]}, source=BotCreationSource.API, project=self.project)
+        self.assertIsNone(error)
+        batched_webhook = bot.bot_webhook_subscriptions.get(url="https://example.com")
+        self.assertEqual(batched_webhook.batch_max_events, 50)
+        self.assertEqual(batched_webhook.batch_max_wait_ms, 1000)
+        self.assertFalse(bot.bot_webhook_subscriptions.get(url="https://example2.com").is_batched)
+
+    def test_with_invalid_webhook_batching(self):
+        bot, error = create_bot(data={"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Test Bot", "webhooks": [{"url": "https://example.com", "triggers": ["transcript.update"], "batching": {"max_events": 0}}]}, source=BotCreationSource.API, project=self.project)
+        self.assertIsNone(bot)
+        self.assertIn("webhooks", error)
+        self.assertIn("less than the minimum of 1", str(error["webhooks"][0]))
+
     def test_create_bot_with_duplicate_deduplication_key(self):
         """Test creating a bot with a duplicate deduplication key in the same project."""
         deduplication_key = "test-key-123"
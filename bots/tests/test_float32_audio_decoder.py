@@ -0,0 +1,107 @@
+import struct
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+
+from bots.web_bot_adapter.float32_audio_decoder import Float32AudioDecoder
+from bots.web_bot_adapter.web_bot_adapter import WebBotAdapter
+
+
+def mixed_audio_message(samples):
+    return struct.pack("<i", 3) + np.asarray(samples, dtype=np.float32).tobytes()
+
+
+def per_participant_audio_message(participant_id, samples):
+    participant_id_bytes = participant_id.encode("utf-8")
+    return struct.pack("<iB", 5, len(participant_id_bytes)) + participant_id_bytes + np.asarray(samples, dtype=np.float32).tobytes()
+
+
+class TestFloat32AudioDecoder(unittest.TestCase):
+    def setUp(self):
+        self.decoder = Float32AudioDecoder()
+
+    def test_full_scale_and_over_range_samples_are_clipped(self):
+        samples = [0.0, 0.5, -0.5, 1.0, -1.0, 1.5, -2.0, 1000.0, -1000.0, np.float32(32767 / 32768), np.finfo(np.float32).max]
+
+        pcm = self.decoder.decode("mixed_audio", mixed_audio_message(samples), 4)
+
+        self.assertEqual(pcm.tolist(), [0, 16384, -16384, 32767, -32768, 32767, -32768, 32767, -32768, 32767, 32767])
+
+    def test_in_range_samples_match_plain_conversion(self):
+        samples = np.random.default_rng(0).uniform(-1, 32767 / 32768, 480).astype(np.float32)
+
+        pcm = self.decoder.decode("mixed_audio", mixed_audio_message(samples), 4)
+
+        np.testing.assert_array_equal(pcm, (samples * 32768.0).astype(np.int16))
+
+    def test_unaligned_offset(self):
+        # A participant ID of odd length leaves the samples at an offset that isn't a multiple of 4
+        message = per_participant_audio_message("abc", [0.25, -0.25, 1.0])
+
+        pcm = self.decoder.decode("per_participant_audio", message, 8)
+
+        self.assertEqual(pcm.tolist(), [8192, -8192, 32767])
+
+    def test_buffers_are_reused_per_stream(self):
+        first = self.decoder.decode("mixed_audio", mixed_audio_message([0.1] * 480), 4)
+        second = self.decoder.decode("mixed_audio", mixed_audio_message([0.2] * 480), 4)
+        other_stream = self.decoder.decode("per_participant_audio", mixed_audio_message([0.3] * 480), 4)
+        shorter = self.decoder.decode("mixed_audio", mixed_audio_message([0.4] * 240), 4)
+
+        self.assertTrue(np.shares_memory(first, second))
+        self.assertFalse(np.shares_memory(first, other_stream))
+        self.assertEqual(shorter.tolist(), [int(np.float32(0.4) * 32768)] * 240)
+        self.assertEqual(other_stream[0], int(np.float32(0.3) * 32768))
+
+
+class TestWebBotAdapterAudioFrames(unittest.TestCase):
+    def setUp(self):
+        self.add_audio_chunk_callback = Mock()
+        self.add_mixed_audio_chunk_callback = Mock()
+        self.adapter = WebBotAdapter(
+            display_name="Test Bot",
+            send_message_callback=Mock(),
+            meeting_url="https://meet.google.com/abc-defg-hij",
+            add_video_frame_callback=Mock(),
+            wants_any_video_frames_callback=None,
+            add_audio_chunk_callback=self.add_audio_chunk_callback,
+            add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback,
+            add_encoded_mp4_chunk_callback=Mock(),
+            upsert_caption_callback=Mock(),
+            upsert_chat_message_callback=Mock(),
+            add_participant_event_callback=Mock(),
+            automatic_leave_configuration=Mock(),
+            recording_view=Mock(),
+            should_create_debug_recording=False,
+            start_recording_screen_callback=Mock(),
+            stop_recording_screen_callback=Mock(),
+            video_frame_size=(1920, 1080),
+        )
+
+    def test_mixed_audio_frame_is_clipped(self):
+        self.adapter.process_mixed_audio_frame(mixed_audio_message([1.0, -1.0, 1.5, -1.5, 0.5]))
+
+        chunk = self.add_mixed_audio_chunk_callback.call_args.kwargs["chunk"]
+        self.assertEqual(np.frombuffer(chunk, dtype=np.int16).tolist(), [32767, -32768, 32767, -32768, 16384])
+        self.assertIsNotNone(self.adapter.last_audio_message_processed_time)
+
+    def test_silent_mixed_audio_frame_does_not_count_as_audio(self):
+        self.adapter.process_mixed_audio_frame(mixed_audio_message([0.0] * 480))
+
+        self.assertIsNone(self.adapter.last_audio_message_processed_time)
+        self.add_mixed_audio_chunk_callback.assert_called_once()
+
+    def test_per_participant_audio_frames_keep_their_own_bytes(self):
+        self.adapter.process_per_participant_audio_frame(per_participant_audio_message("participant_1", [1.0, -1.0, 2.0]))
+        self.adapter.process_per_participant_audio_frame(per_participant_audio_message("p2", [0.5, -0.5, -2.0]))
+
+        (first_participant, _, first_chunk), (second_participant, _, second_chunk) = [call.args for call in self.add_audio_chunk_callback.call_args_list]
+        self.assertEqual(first_participant, "participant_1")
+        self.assertEqual(np.frombuffer(first_chunk, dtype=np.int16).tolist(), [32767, -32768, 32767])
+        self.assertEqual(second_participant, "p2")
+        self.assertEqual(np.frombuffer(second_chunk, dtype=np.int16).tolist(), [16384, -16384, -32768])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+
+from bots.bot_controller.gstreamer_pipeline import GstreamerPipeline
+from bots.bot_controller.screen_and_audio_recorder import ScreenAndAudioRecorder
+
+
+class TestScreenAndAudioRecorderFragmentedMp4(unittest.TestCase):
+    def ffmpeg_command(self, recorder):
+        with patch("bots.bot_controller.screen_and_audio_recorder.subprocess.Popen") as mock_popen:
+            recorder.start_recording(":99")
+        return mock_popen.call_args.args[0]
+
+    def test_fragmented_recording_is_written_as_fragmented_mp4(self):
+        recorder = ScreenAndAudioRecorder(file_location="/tmp/recording.mp4", recording_dimensions=(1920, 1080), audio_only=False, fragmented_mp4=True)
+
+        ffmpeg_command = self.ffmpeg_command(recorder)
+
+        self.assertEqual(ffmpeg_command[-3:], ["-movflags", "+frag_keyframe+empty_moov+default_base_moof", "/tmp/recording.mp4"])
+
+    def test_regular_recording_is_not_fragmented(self):
+        recorder = ScreenAndAudioRecorder(file_location="/tmp/recording.mp4", recording_dimensions=(1920, 1080), audio_only=False)
+
+        self.assertNotIn("-movflags", self.ffmpeg_command(recorder))
+
+    def test_fragmented_recording_is_not_rewritten_on_cleanup(self):
+        recorder = ScreenAndAudioRecorder(file_location="/tmp/recording.mp4", recording_dimensions=(1920, 1080), audio_only=False, fragmented_mp4=True)
+
+        with patch("bots.bot_controller.screen_and_audio_recorder.os.path.exists", return_value=True), patch.object(recorder, "make_file_seekable") as mock_make_file_seekable:
+            recorder.cleanup()
+
+        mock_make_file_seekable.assert_not_called()
+        self.assertFalse(recorder.makes_file_seekable_on_cleanup())
+
+    def test_regular_recording_is_made_seekable_on_cleanup(self):
+        recorder = ScreenAndAudioRecorder(file_location="/tmp/recording.mp4", recording_dimensions=(1920, 1080), audio_only=False)
+
+        with patch("bots.bot_controller.screen_and_audio_recorder.os.path.exists", return_value=True), patch("bots.bot_controller.screen_and_audio_recorder.os.path.getsize", return_value=1024), patch.object(recorder, "make_file_seekable") as mock_make_file_seekable:
+            recorder.cleanup()
+
+        mock_make_file_seekable.assert_called_once_with("/tmp/recording.mp4", "/tmp/recording.seekable.mp4")
+        self.assertTrue(recorder.makes_file_seekable_on_cleanup())
+
+
+@patch("bots.bot_controller.gstreamer_pipeline.GLib")
+@patch("bots.bot_controller.gstreamer_pipeline.Gst")
+class TestGstreamerPipelineFragmentedMp4(unittest.TestCase):
+    def pipeline_string(self, mock_gst, output_format, fragmented_mp4):
+        pipeline = GstreamerPipeline(
+            on_new_sample_callback=None,
+            video_frame_size=(1920, 1080),
+            audio_format=GstreamerPipeline.AUDIO_FORMAT_PCM,
+            output_format=output_format,
+            sink_type=GstreamerPipeline.SINK_TYPE_FILE,
+            file_location="/tmp/recording.mp4",
+            fragmented_mp4=fragmented_mp4,
+        )
+        mock_gst.parse_launch.return_value.iterate_elements.return_value.next.return_value = (mock_gst.IteratorResult.DONE, None)
+        pipeline.setup()
+        return mock_gst.parse_launch.call_args.args[0]
+
+    def test_fragmented_mp4_pipeline(self, mock_gst, mock_glib):
+        pipeline_string = self.pipeline_string(mock_gst, GstreamerPipeline.OUTPUT_FORMAT_MP4, fragmented_mp4=True)
+
+        self.assertIn("mp4mux name=muxer fragment-duration=1000 ", pipeline_string)
+        self.assertIn("x264enc name=encoder tune=zerolatency speed-preset=ultrafast key-int-max=30 ", pipeline_string)
+
+    def test_regular_mp4_pipeline(self, mock_gst, mock_glib):
+        pipeline_string = self.pipeline_string(mock_gst, GstreamerPipeline.OUTPUT_FORMAT_MP4, fragmented_mp4=False)
+
+        self.assertIn("mp4mux name=muxer ", pipeline_string)
+        self.assertNotIn("fragment-duration", pipeline_string)
+        self.assertNotIn("key-int-max", pipeline_string)
+
+    def test_fragmenting_only_applies_to_mp4(self, mock_gst, mock_glib):
+        pipeline_string = self.pipeline_string(mock_gst, GstreamerPipeline.OUTPUT_FORMAT_WEBM, fragmented_mp4=True)
+
+        self.assertIn("matroskamux name=muxer", pipeline_string)
+        self.assertNotIn("key-int-max", pipeline_string)
+
+
+if __name__ == "__main__":
+    unittest.main()
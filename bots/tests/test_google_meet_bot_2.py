@@ -375,7 +375,7 @@ class TestGoogleMeetBot2(TransactionTestCase):
     @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.check_if_meeting_is_found", return_value=None)
     @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.wait_for_host_if_needed", return_value=None)
     @patch("time.time")
-    @patch("bots.tasks.deliver_webhook_task.deliver_webhook")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhooks")
     def test_bot_can_join_meeting_and_record_with_closed_caption_transcription(
         self,
         mock_deliver_webhook,
@@ -952,7 +952,7 @@ class TestGoogleMeetBot2(TransactionTestCase):
     @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.check_if_meeting_is_found", return_value=None)
     @patch("bots.google_meet_bot_adapter.google_meet_ui_methods.GoogleMeetUIMethods.wait_for_host_if_needed", return_value=None)
     @patch("time.time")
-    @patch("bots.tasks.deliver_webhook_task.deliver_webhook")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhooks")
     def test_bot_can_join_meeting_with_no_recording_format_and_generate_transcription(
         self,
         mock_deliver_webhook,
@@ -0,0 +1,215 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserRole
+from bots.bot_controller.gstreamer_pipeline import GstreamerPipeline
+from bots.bot_controller.gstreamer_pipeline_telemetry import LATE_FRAME_LATENCY_MS, MAX_PENDING_ENCODER_FRAMES, FrameRateAdapter, PipelineTelemetry
+from bots.models import Bot, BotResourceSnapshot, Project
+
+
+class TestPipelineTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.telemetry = PipelineTelemetry()
+
+    def test_encoder_latency_is_measured_per_frame(self):
+        for i in range(100):
+            self.telemetry.on_encoder_input(i, now=i)
+            self.telemetry.on_encoder_output(i, now=i + (i + 1) / 1000)
+
+        metrics = self.telemetry.metrics()
+
+        self.assertEqual(metrics["frames_encoded_count"], 100)
+        self.assertAlmostEqual(metrics["encoder_latency_ms_p50"], 51, delta=0.1)
+        self.assertAlmostEqual(metrics["encoder_latency_ms_p95"], 96, delta=0.1)
+        self.assertAlmostEqual(metrics["encoder_latency_ms_max"], 100, delta=0.1)
+        self.assertEqual(metrics["late_frame_count"], 0)
+
+    def test_frames_slower_than_the_threshold_are_late(self):
+        self.telemetry.on_encoder_input(1, now=0)
+        self.telemetry.on_encoder_output(1, now=(LATE_FRAME_LATENCY_MS + 1) / 1000)
+
+        self.assertEqual(self.telemetry.metrics()["late_frame_count"], 1)
+
+    def test_frames_the_encoder_never_returns_are_forgotten(self):
+        for i in range(MAX_PENDING_ENCODER_FRAMES + 10):
+            self.telemetry.on_encoder_input(i, now=0)
+
+        self.assertEqual(len(self.telemetry._pending_encoder_frames), MAX_PENDING_ENCODER_FRAMES)
+
+    def test_pushes_and_overruns_are_counted(self):
+        self.telemetry.on_video_frame_pushed(True)
+        self.telemetry.on_video_frame_pushed(True)
+        self.telemetry.on_video_frame_pushed(False)
+        self.telemetry.on_video_frame_left_out()
+        self.telemetry.on_queue_overrun("q1")
+        self.telemetry.on_queue_overrun("q1")
+
+        metrics = self.telemetry.metrics()
+
+        self.assertEqual(metrics["frames_pushed_count"], 2)
+        self.assertEqual(metrics["frames_push_failed_count"], 1)
+        self.assertEqual(metrics["frames_left_out_count"], 1)
+        self.assertEqual(metrics["queue_overrun_counts"], {"q1": 2})
+
+    def test_levels_keep_the_maximum_for_the_window(self):
+        self.telemetry.record_levels({"q1": 0.9, "q2": 0.1}, appsrc_bytes_queued=5000, videorate_dropped_count=3)
+        self.telemetry.record_levels({"q1": 0.2, "q2": 0.3}, appsrc_bytes_queued=100)
+
+        metrics = self.telemetry.metrics(reset_window=True)
+
+        self.assertEqual(metrics["queue_fill_max"], {"q1": 0.9, "q2": 0.3})
+        self.assertEqual(metrics["appsrc_bytes_queued"], 100)
+        self.assertEqual(metrics["appsrc_bytes_queued_max"], 5000)
+        # The next window starts from the current levels
+        self.assertEqual(self.telemetry.metrics()["queue_fill_max"], {"q1": 0.2, "q2": 0.3})
+
+    def test_resetting_the_window_clears_latencies_but_not_counts(self):
+        self.telemetry.on_encoder_input(1, now=0)
+        self.telemetry.on_encoder_output(1, now=0.01)
+
+        self.telemetry.metrics(reset_window=True)
+        metrics = self.telemetry.metrics()
+
+        self.assertIsNone(metrics["encoder_latency_ms_p95"])
+        self.assertEqual(metrics["frames_encoded_count"], 1)
+
+    def test_take_sample_returns_the_worst_latency_since_the_last_sample(self):
+        self.telemetry.record_levels({"q1": 0.4, "q2": 0.7}, appsrc_bytes_queued=0)
+        for pts, latency_seconds in [(1, 0.2), (2, 0.05)]:
+            self.telemetry.on_encoder_input(pts, now=0)
+            self.telemetry.on_encoder_output(pts, now=latency_seconds)
+
+        max_encoder_latency_ms, queue_fill = self.telemetry.take_sample()
+
+        self.assertAlmostEqual(max_encoder_latency_ms, 200)
+        self.assertEqual(queue_fill, 0.7)
+        self.assertIsNone(self.telemetry.take_sample()[0])
+
+
+class TestFrameRateAdapter(unittest.TestCase):
+    def setUp(self):
+        self.set_frame_rate_callback = Mock()
+        self.adapter = FrameRateAdapter(set_frame_rate_callback=self.set_frame_rate_callback, overloaded_samples_to_step_down=3, healthy_samples_to_step_up=5)
+
+    def test_steps_down_while_overloaded(self):
+        for _ in range(6):
+            self.adapter.on_sample(max_encoder_latency_ms=2000, queue_fill=0)
+
+        self.assertEqual(self.adapter.frame_rate, 15)
+        self.assertEqual([call.args[0] for call in self.set_frame_rate_callback.call_args_list], [20, 15])
+
+    def test_full_queues_count_as_overloaded(self):
+        for _ in range(3):
+            self.adapter.on_sample(max_encoder_latency_ms=None, queue_fill=0.9)
+
+        self.assertEqual(self.adapter.frame_rate, 20)
+
+    def test_one_bad_sample_does_not_step_down(self):
+        for _ in range(10):
+            self.adapter.on_sample(max_encoder_latency_ms=2000, queue_fill=0)
+            self.adapter.on_sample(max_encoder_latency_ms=10, queue_fill=0)
+
+        self.assertEqual(self.adapter.frame_rate, 30)
+        self.set_frame_rate_callback.assert_not_called()
+
+    def test_does_not_go_below_the_lowest_frame_rate(self):
+        for _ in range(100):
+            self.adapter.on_sample(max_encoder_latency_ms=2000, queue_fill=0)
+
+        self.assertEqual(self.adapter.frame_rate, FrameRateAdapter.FRAME_RATES[-1])
+
+    def test_steps_back_up_once_healthy(self):
+        for _ in range(3):
+            self.adapter.on_sample(max_encoder_latency_ms=2000, queue_fill=0)
+        for _ in range(5):
+            self.adapter.on_sample(max_encoder_latency_ms=10, queue_fill=0.1)
+
+        self.assertEqual(self.adapter.frame_rate, 30)
+        self.assertEqual([call.args[0] for call in self.set_frame_rate_callback.call_args_list], [20, 30])
+
+
+@patch("bots.bot_controller.gstreamer_pipeline.GLib")
+@patch("bots.bot_controller.gstreamer_pipeline.Gst")
+class TestGstreamerPipelineTelemetry(unittest.TestCase):
+    def pipeline(self, mock_gst, adaptive_frame_rate=False):
+        mock_gst.SECOND = 1_000_000_000
+        mock_gst.parse_launch.return_value.iterate_elements.return_value.next.return_value = (mock_gst.IteratorResult.DONE, None)
+        mock_gst.FlowReturn.OK = "ok"
+        pipeline = GstreamerPipeline(
+            on_new_sample_callback=None,
+            video_frame_size=(1280, 720),
+            audio_format=GstreamerPipeline.AUDIO_FORMAT_PCM,
+            output_format=GstreamerPipeline.OUTPUT_FORMAT_MP4,
+            sink_type=GstreamerPipeline.SINK_TYPE_FILE,
+            file_location="/tmp/recording.mp4",
+            adaptive_frame_rate=adaptive_frame_rate,
+        )
+        pipeline.setup()
+        pipeline.appsrc.emit.return_value = "ok"
+        return pipeline
+
+    def test_encoder_is_probed_on_both_sides(self, mock_gst, mock_glib):
+        pipeline = self.pipeline(mock_gst)
+
+        mock_gst.parse_launch.return_value.get_by_name.assert_any_call("encoder")
+        encoder = mock_gst.parse_launch.return_value.get_by_name.return_value
+        encoder.get_static_pad.assert_any_call("sink")
+        encoder.get_static_pad.assert_any_call("src")
+        mock_glib.timeout_add_seconds.assert_any_call(GstreamerPipeline.TELEMETRY_SAMPLE_INTERVAL_SECONDS, pipeline.sample_telemetry)
+
+    def test_lowered_frame_rate_leaves_frames_out(self, mock_gst, mock_glib):
+        pipeline = self.pipeline(mock_gst, adaptive_frame_rate=True)
+        pipeline.set_video_frame_rate(10)
+
+        # 30 fps coming in
+        for i in range(30):
+            pipeline.on_new_video_frame(b"\x00" * 16, i * 33_333_333)
+
+        metrics = pipeline.metrics()
+        self.assertEqual(metrics["frames_pushed_count"], 10)
+        self.assertEqual(metrics["frames_left_out_count"], 20)
+
+    def test_frame_rate_is_only_reported_when_adaptive(self, mock_gst, mock_glib):
+        self.assertIsNone(self.pipeline(mock_gst).metrics()["video_frame_rate"])
+        self.assertEqual(self.pipeline(mock_gst, adaptive_frame_rate=True).metrics()["video_frame_rate"], 30)
+
+
+class TestBotDetailPipelineTelemetry(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Organization")
+        self.user = User.objects.create_user(username="admin", email="admin@example.com", password="testpassword123", role=UserRole.ADMIN, organization=organization)
+        self.project = Project.objects.create(name="Test Project", organization=organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_bot_detail(self):
+        return self.client.get(reverse("bots:project-bot-detail", kwargs={"object_id": self.project.object_id, "bot_object_id": self.bot.object_id}))
+
+    def test_pipeline_telemetry_is_shown_with_the_resource_snapshots(self):
+        BotResourceSnapshot.objects.create(bot=self.bot, data={"ram_usage_megabytes": 500, "cpu_usage_millicores": 900})
+        BotResourceSnapshot.objects.create(
+            bot=self.bot,
+            data={
+                "ram_usage_megabytes": 510,
+                "cpu_usage_millicores": 1200,
+                "gstreamer_pipeline": {"encoder_latency_ms_p95": 412.5, "encoder_latency_ms_max": 987.6, "encoded_frames_per_second": 24.3, "late_frame_count": 7, "frames_push_failed_count": 0, "queue_fill_max": {"q1": 0.25, "q3": 0.8}, "video_frame_rate": 20},
+            },
+        )
+
+        response = self.get_bot_detail()
+
+        self.assertContains(response, "Encoder Latency p95 (ms)")
+        self.assertContains(response, "<td>412.5</td>", html=True)
+        self.assertContains(response, "<td>80</td>", html=True)
+        self.assertContains(response, "Maximum Encoder Latency:</strong> 987.6 ms")
+
+    def test_pipeline_columns_are_left_out_without_telemetry(self):
+        BotResourceSnapshot.objects.create(bot=self.bot, data={"ram_usage_megabytes": 500, "cpu_usage_millicores": 900})
+
+        response = self.get_bot_detail()
+
+        self.assertNotContains(response, "Encoder Latency p95 (ms)")
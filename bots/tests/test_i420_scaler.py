@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from bots.i420_scaler import MAX_CACHED_PLANS, I420Scaler, black_i420_frame
+from bots.utils import half_ceil, scale_i420
+
+SOURCE_SIZES = [(640, 360), (1280, 720), (1920, 1080), (641, 361), (480, 640), (333, 777), (1080, 1920), (1, 1)]
+DESTINATION_SIZES = [(1920, 1080), (1280, 720), (640, 480), (641, 359), (360, 640), (3, 3)]
+
+
+def random_i420_frame(rng, frame_size):
+    width, height = frame_size
+    return rng.integers(0, 256, width * height + 2 * half_ceil(width) * half_ceil(height), dtype=np.uint8).tobytes()
+
+
+class TestI420Scaler(unittest.TestCase):
+    def setUp(self):
+        self.scaler = I420Scaler()
+        self.rng = np.random.default_rng(0)
+
+    def test_matches_scale_i420_pixel_for_pixel(self):
+        for frame_size in SOURCE_SIZES:
+            for new_size in DESTINATION_SIZES:
+                with self.subTest(frame_size=frame_size, new_size=new_size):
+                    # Twice, so the second frame goes through the cached plan
+                    for _ in range(2):
+                        frame = random_i420_frame(self.rng, frame_size)
+                        self.assertEqual(self.scaler.scale(frame, frame_size, new_size).tobytes(), scale_i420(frame, frame_size, new_size))
+
+    def test_scale_planes_matches_scale(self):
+        frame_size = (640, 360)
+        frame = random_i420_frame(self.rng, frame_size)
+        y_plane_size = 640 * 360
+        uv_plane_size = 320 * 180
+
+        expected = scale_i420(frame, frame_size, (1920, 1080))
+        scaled = self.scaler.scale_planes(frame[:y_plane_size], frame[y_plane_size : y_plane_size + uv_plane_size], frame[y_plane_size + uv_plane_size :], frame_size, (1920, 1080))
+
+        self.assertEqual(scaled.tobytes(), expected)
+
+    def test_accepts_numpy_arrays(self):
+        frame = random_i420_frame(self.rng, (640, 360))
+
+        scaled = self.scaler.scale(np.frombuffer(frame, dtype=np.uint8), (640, 360), (1280, 720))
+
+        self.assertEqual(scaled.tobytes(), scale_i420(frame, (640, 360), (1280, 720)))
+
+    def test_letterbox_bars_stay_black_when_the_output_frame_is_reused(self):
+        # A 4:3 frame pillarboxed into 16:9 leaves 240 pixels of bars on each side
+        for _ in range(3):
+            scaled = np.frombuffer(self.scaler.scale(random_i420_frame(self.rng, (640, 480)), (640, 480), (1920, 1080)), dtype=np.uint8)
+
+        y = scaled[: 1920 * 1080].reshape(1080, 1920)
+        u = scaled[1920 * 1080 : 1920 * 1080 + 960 * 540].reshape(540, 960)
+        self.assertFalse(y[:, :240].any())
+        self.assertFalse(y[:, -240:].any())
+        self.assertTrue((u[:, :120] == 128).all())
+        self.assertTrue((u[:, -120:] == 128).all())
+
+    def test_output_frame_is_reused_per_size(self):
+        first = self.scaler.scale(random_i420_frame(self.rng, (640, 360)), (640, 360), (1280, 720))
+        second = self.scaler.scale(random_i420_frame(self.rng, (640, 360)), (640, 360), (1280, 720))
+        other_size = self.scaler.scale(random_i420_frame(self.rng, (320, 180)), (320, 180), (1280, 720))
+
+        self.assertTrue(np.shares_memory(np.asarray(first), np.asarray(second)))
+        self.assertFalse(np.shares_memory(np.asarray(first), np.asarray(other_size)))
+
+    def test_plan_cache_is_bounded(self):
+        for width in range(2, 2 * (MAX_CACHED_PLANS + 5), 2):
+            self.scaler.scale(random_i420_frame(self.rng, (width, width)), (width, width), (4, 4))
+
+        self.assertLessEqual(len(self.scaler.plans), MAX_CACHED_PLANS)
+
+    def test_black_frame_is_shared(self):
+        black_frame = black_i420_frame((1280, 720))
+
+        self.assertIs(black_i420_frame((1280, 720)), black_frame)
+        self.assertEqual(black_frame, b"\x00" * (1280 * 720) + b"\x80" * (2 * 640 * 360))
+
+
+if __name__ == "__main__":
+    unittest.main()
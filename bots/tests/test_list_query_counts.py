@@ -0,0 +1,99 @@
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotEvent, BotEventSubTypes, BotEventTypes, BotStates, Calendar, CalendarEvent, CalendarPlatform, CalendarStates, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionTypes
+from bots.serializers import BotSerializer
+
+
+class ListQueryCountTestCase(TestCase):
+    """List endpoints have to take the same number of queries however many rows are on the page"""
+
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=organization)
+        _, self.api_key_plain = ApiKey.create(project=self.project, name="Test API Key")
+
+    def create_bot(self, **kwargs):
+        bot = Bot.objects.create(project=self.project, name="Test Bot", meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.ENDED, **kwargs)
+        Recording.objects.create(bot=bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.COMPLETE, transcription_state=RecordingTranscriptionStates.COMPLETE)
+        Recording.objects.create(bot=bot, recording_type=RecordingTypes.AUDIO_ONLY, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=False, state=RecordingStates.FAILED)
+        BotEvent.objects.create(bot=bot, old_state=BotStates.JOINING, new_state=BotStates.JOINED_RECORDING, event_type=BotEventTypes.BOT_JOINED_MEETING)
+        BotEvent.objects.create(bot=bot, old_state=BotStates.JOINED_RECORDING, new_state=BotStates.ENDED, event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_PROCESS_TERMINATED)
+        return bot
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def assertConstantQueryCount(self, path, add_rows, count_rows):
+        """Gets path with one row and again with more, and checks that both took the same number of queries"""
+        # Once first, so both counts leave out the API key lookup, which is cached after it
+        self.get(path)
+
+        add_rows(1)
+        response, query_count = self.get(path)
+        self.assertEqual(count_rows(response), 1)
+
+        add_rows(5)
+        response, query_count_with_more_rows = self.get(path)
+        self.assertEqual(count_rows(response), 6)
+        self.assertEqual(query_count_with_more_rows, query_count)
+        return response
+
+
+class TestCalendarEventListQueryCount(ListQueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calendar = Calendar.objects.create(project=self.project, platform=CalendarPlatform.GOOGLE, state=CalendarStates.CONNECTED, client_id="test_client_id")
+
+    def add_calendar_events(self, count):
+        for _ in range(count):
+            start_time = timezone.now() + timedelta(days=1)
+            calendar_event = CalendarEvent.objects.create(calendar=self.calendar, platform_uuid=f"event_{CalendarEvent.objects.count()}", meeting_url="https://meet.google.com/abc-defg-hij", start_time=start_time, end_time=start_time + timedelta(hours=1), raw={})
+            self.create_bot(calendar_event=calendar_event)
+            self.create_bot(calendar_event=calendar_event)
+
+    def test_query_count_does_not_depend_on_the_number_of_events(self):
+        response = self.assertConstantQueryCount("/api/v1/calendar_events", self.add_calendar_events, lambda response: len(response.json()["results"]))
+
+        # The same as serializing each bot on its own, without the annotations
+        for calendar_event in response.json()["results"]:
+            self.assertEqual(len(calendar_event["bots"]), 2)
+            for bot in calendar_event["bots"]:
+                self.assertEqual(bot, json.loads(JSONRenderer().render(BotSerializer(Bot.objects.get(object_id=bot["id"])).data)))
+                self.assertEqual(bot["recording_state"], "complete")
+                self.assertEqual(bot["transcription_state"], "complete")
+                self.assertEqual([event["type"] for event in bot["events"]], ["joined_meeting", "fatal_error"])
+
+    def test_bot_without_a_default_recording(self):
+        start_time = timezone.now() + timedelta(days=1)
+        calendar_event = CalendarEvent.objects.create(calendar=self.calendar, platform_uuid="event", meeting_url="https://meet.google.com/abc-defg-hij", start_time=start_time, end_time=start_time + timedelta(hours=1), raw={})
+        Bot.objects.create(project=self.project, name="Test Bot", meeting_url="https://meet.google.com/abc-defg-hij", calendar_event=calendar_event)
+
+        response, _ = self.get("/api/v1/calendar_events")
+
+        bot = response.json()["results"][0]["bots"][0]
+        self.assertIsNone(bot["recording_state"])
+        self.assertIsNone(bot["transcription_state"])
+        self.assertEqual(bot["events"], [])
+
+
+class TestBotListQueryCount(ListQueryCountTestCase):
+    def add_bots(self, count):
+        for _ in range(count):
+            self.create_bot()
+
+    def test_query_count_does_not_depend_on_the_number_of_bots(self):
+        response = self.assertConstantQueryCount("/api/v1/bots", self.add_bots, lambda response: len(response.json()["results"]))
+
+        for bot in response.json()["results"]:
+            self.assertEqual(bot, json.loads(JSONRenderer().render(BotSerializer(Bot.objects.get(object_id=bot["id"])).data)))
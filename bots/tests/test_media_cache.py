@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bots.benchmark_utils import start_local_media_server
+from bots.media_cache import PARTIAL_FILE_SUFFIX, STALE_PARTIAL_FILE_SECONDS, HttpMediaSource, MediaCache
+
+CHUNK_SIZE = 64 * 1024
+
+
+class TestMediaCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def set_last_used(self, path, seconds_ago):
+        timestamp = time.time() - seconds_ago
+        os.utime(path, (timestamp, timestamp))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = MediaCache(self.directory, max_size_bytes=250)
+        for index, key in enumerate(["a", "b"]):
+            self.set_last_used(cache.put_bytes(key, bytes(100)), seconds_ago=100 - index)
+
+        # Using a marks it as the most recently used, so b goes
+        self.assertIsNotNone(cache.get("a"))
+        cache.put_bytes("c", bytes(100))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_file_bigger_than_the_cache_is_not_kept(self):
+        cache = MediaCache(self.directory, max_size_bytes=50)
+        cache.put_bytes("a", bytes(10))
+
+        self.assertIsNone(cache.put_bytes("b", bytes(100)))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(os.listdir(self.directory), ["a"])
+
+    def test_abandoned_partial_files_are_deleted(self):
+        cache = MediaCache(self.directory, max_size_bytes=1000)
+        abandoned_path = cache.new_partial_path("a")
+        in_progress_path = cache.new_partial_path("b")
+        for path in [abandoned_path, in_progress_path]:
+            with open(path, "wb") as file:
+                file.write(bytes(10))
+        self.set_last_used(abandoned_path, seconds_ago=STALE_PARTIAL_FILE_SECONDS + 1)
+
+        cache.evict()
+
+        self.assertFalse(os.path.exists(abandoned_path))
+        self.assertTrue(os.path.exists(in_progress_path))
+        self.assertTrue(in_progress_path.endswith(PARTIAL_FILE_SUFFIX))
+
+
+class TestHttpMediaSource(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = MediaCache(directory.name, max_size_bytes=100 * 1024 * 1024)
+        self.server, self.base_url = start_local_media_server()
+        self.addCleanup(self.server.shutdown)
+        self.data = os.urandom(20 * CHUNK_SIZE + 123)
+        self.server.media_files["/clip.mp4"] = self.data
+
+    def media_source(self):
+        media_source = HttpMediaSource(f"{self.base_url}/clip.mp4", self.cache, chunk_size=CHUNK_SIZE)
+        self.addCleanup(media_source.close)
+        media_source.open()
+        return media_source
+
+    def read_all(self, media_source):
+        return b"".join(media_source.read(offset, 10000) for offset in range(0, len(self.data), 10000))
+
+    def test_cold_read_downloads_in_ranges_and_caches_the_file(self):
+        media_source = self.media_source()
+
+        self.assertFalse(media_source.cache_hit)
+        self.assertEqual(media_source.size, len(self.data))
+        self.assertEqual(self.read_all(media_source), self.data)
+        self.assertTrue(media_source.wait_until_downloaded(timeout_seconds=10))
+        self.assertEqual(media_source.path, self.cache.path_for(media_source.cache_key))
+        with open(media_source.path, "rb") as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertTrue(all(requested_range is not None for requested_range in self.server.requested_ranges))
+
+    def test_end_of_the_file_is_readable_before_the_rest_is_downloaded(self):
+        self.server.download_bytes_per_second = 20 * CHUNK_SIZE
+        media_source = self.media_source()
+
+        # Like qtdemux looking for a moov at the end
+        self.assertEqual(media_source.read(len(self.data) - 100, 100), self.data[-100:])
+
+        self.assertLess(self.server.bytes_sent, len(self.data) / 2)
+        self.assertEqual(media_source.read(len(self.data), 100), b"")
+
+    def test_warm_read_comes_from_the_cache(self):
+        cold_media_source = self.media_source()
+        cold_media_source.wait_until_downloaded(timeout_seconds=10)
+        cold_media_source.close()
+        request_count = len(self.server.requested_ranges)
+
+        media_source = self.media_source()
+
+        self.assertTrue(media_source.cache_hit)
+        self.assertEqual(self.read_all(media_source), self.data)
+        # Just the request that checks the ETag
+        self.assertEqual(len(self.server.requested_ranges), request_count + 1)
+
+    def test_changed_file_is_not_read_from_the_cache(self):
+        self.media_source().wait_until_downloaded(timeout_seconds=10)
+        self.data = os.urandom(len(self.data))
+        self.server.media_files["/clip.mp4"] = self.data
+
+        media_source = self.media_source()
+
+        self.assertFalse(media_source.cache_hit)
+        self.assertEqual(self.read_all(media_source), self.data)
+
+    def test_server_without_range_support(self):
+        self.server.supports_ranges = False
+        media_source = self.media_source()
+
+        self.assertEqual(self.read_all(media_source), self.data)
+        self.assertTrue(media_source.wait_until_downloaded(timeout_seconds=10))
+        self.assertEqual(self.server.requested_ranges, [None])
+        self.assertIsNotNone(self.cache.get(media_source.cache_key))
+
+    def test_close_wakes_up_a_waiting_read(self):
+        self.server.download_bytes_per_second = CHUNK_SIZE
+        media_source = self.media_source()
+        results = []
+        reader = threading.Thread(target=lambda: results.append(media_source.read(len(self.data) - 100, 100)))
+        reader.start()
+
+        time.sleep(0.1)
+        media_source.close()
+        reader.join(timeout=5)
+
+        self.assertEqual(results, [b""])
+        self.assertEqual([name for name in os.listdir(self.cache.directory) if name.endswith(PARTIAL_FILE_SUFFIX)], [])
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+import unittest
+
+from bots.benchmark_utils import flv_gop, flv_header, flv_stream_start, throttled_pipe_sink_command
+from bots.bot_controller.rtmp_client import FLV_TAG_TYPE_AUDIO, FLV_TAG_TYPE_SCRIPT, FLV_TAG_TYPE_VIDEO, FlvTagReader, RTMPClient
+
+
+class ThrottledSinkRTMPClient(RTMPClient):
+    def __init__(self, output_path, bytes_per_second, exit_after_bytes=0, dropped_connection_count=1, **kwargs):
+        super().__init__(rtmp_url="rtmp://localhost/live/test", **kwargs)
+        self.sink_command = throttled_pipe_sink_command(output_path, bytes_per_second, exit_after_bytes, dropped_connection_count)
+
+    def get_ffmpeg_command(self):
+        return self.sink_command
+
+
+def wait_for(condition, timeout_seconds=10):
+    deadline = time.monotonic() + timeout_seconds
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class TestRTMPClient(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output_path = os.path.join(directory.name, "received.flv")
+
+    def client(self, **kwargs):
+        client = ThrottledSinkRTMPClient(self.output_path, **kwargs)
+        self.addCleanup(client.stop)
+        self.assertTrue(client.start())
+        return client
+
+    def received_connections(self):
+        """What the sink received, split at each FLV header, with each connection's tags"""
+        with open(self.output_path, "rb") as file:
+            data = file.read()
+        connections = []
+        for connection_data in data.split(flv_header())[1:]:
+            reader = FlvTagReader()
+            connections.append(reader.feed(flv_header() + connection_data))
+        return connections
+
+    def wait_for_sink_to_receive(self, timestamp_ms):
+        wait_for(lambda: os.path.exists(self.output_path) and any(tag.timestamp_ms == timestamp_ms for tag in self.received_connections()[-1][-2:]))
+
+    def test_tags_are_split_however_the_data_is_chunked(self):
+        data = flv_stream_start() + flv_gop(0, frame_count=3)
+        reader = FlvTagReader()
+
+        tags = []
+        for offset in range(0, len(data), 7):
+            tags.extend(reader.feed(data[offset : offset + 7]))
+
+        self.assertEqual(reader.header, flv_header())
+        self.assertEqual([(tag.tag_type, tag.is_keyframe, tag.is_codec_config) for tag in tags[:5]], [(FLV_TAG_TYPE_SCRIPT, False, False), (FLV_TAG_TYPE_VIDEO, True, True), (FLV_TAG_TYPE_AUDIO, False, True), (FLV_TAG_TYPE_VIDEO, True, False), (FLV_TAG_TYPE_AUDIO, False, False)])
+        self.assertEqual(tags[-1].timestamp_ms, 66)
+
+    def test_everything_arrives_when_the_sink_keeps_up(self):
+        client = self.client(bytes_per_second=10_000_000)
+
+        self.assertTrue(client.write_data(flv_stream_start()))
+        for gop_index in range(5):
+            self.assertTrue(client.write_data(flv_gop(gop_index * 1000)))
+        wait_for(lambda: client.metrics()["buffered_bytes"] == 0 and os.path.getsize(self.output_path) == client.bytes_written + len(flv_stream_start()))
+
+        connections = self.received_connections()
+        self.assertEqual(len(connections), 1)
+        self.assertEqual(b"".join(tag.data for tag in connections[0]), (flv_stream_start() + b"".join(flv_gop(gop_index * 1000) for gop_index in range(5)))[len(flv_header()) :])
+        self.assertEqual(client.metrics()["dropped_gop_count"], 0)
+
+    def test_writes_do_not_block_and_whole_gops_are_dropped_when_the_sink_is_slow(self):
+        # About 63 KB a GOP against a sink that reads 50 KB a second and room for 3 GOPs
+        client = self.client(bytes_per_second=50_000, max_buffered_bytes=200_000)
+
+        client.write_data(flv_stream_start())
+        slowest_write_seconds = 0
+        for gop_index in range(40):
+            started_at = time.monotonic()
+            self.assertTrue(client.write_data(flv_gop(gop_index * 1000)))
+            slowest_write_seconds = max(slowest_write_seconds, time.monotonic() - started_at)
+
+        self.assertLess(slowest_write_seconds, 0.1)
+        metrics = client.metrics()
+        self.assertGreater(metrics["dropped_gop_count"], 30)
+        self.assertLessEqual(metrics["buffered_bytes_max"], 200_000)
+        self.assertTrue(metrics["is_connected"])
+
+        self.wait_for_sink_to_receive(39 * 1000 + 29 * 33)
+        client.stop()
+
+        # Whatever made it through is whole tags, and after every gap in the video, the first frame is a keyframe
+        tags = self.received_connections()[0]
+        video_tags = [tag for tag in tags if tag.tag_type == FLV_TAG_TYPE_VIDEO and not tag.is_codec_config]
+        self.assertTrue(video_tags[0].is_keyframe)
+        for previous_tag, tag in zip(video_tags, video_tags[1:]):
+            if tag.timestamp_ms - previous_tag.timestamp_ms != 33:
+                self.assertTrue(tag.is_keyframe)
+        self.assertEqual(video_tags[-1].timestamp_ms, 39 * 1000 + 29 * 33)
+
+    def test_reconnects_with_the_stream_header_and_a_keyframe(self):
+        client = self.client(bytes_per_second=10_000_000, exit_after_bytes=100_000, reconnect_backoff_seconds=0.01)
+
+        client.write_data(flv_stream_start())
+        for gop_index in range(4):
+            client.write_data(flv_gop(gop_index * 1000))
+        wait_for(lambda: client.metrics()["reconnect_count"] == 1)
+        for gop_index in range(4, 6):
+            client.write_data(flv_gop(gop_index * 1000))
+        self.wait_for_sink_to_receive(5 * 1000 + 29 * 33)
+        client.stop()
+
+        connections = self.received_connections()
+        self.assertEqual(len(connections), 2)
+        reconnected_tags = connections[1]
+        self.assertEqual([tag.data for tag in reconnected_tags[:3]], [tag.data for tag in FlvTagReader().feed(flv_stream_start())])
+        self.assertTrue(reconnected_tags[3].is_keyframe)
+        self.assertEqual(reconnected_tags[-1].timestamp_ms, 5 * 1000 + 29 * 33)
+
+    def test_stops_running_after_the_reconnect_attempts_run_out(self):
+        client = self.client(bytes_per_second=10_000_000, exit_after_bytes=1, dropped_connection_count=100, max_reconnect_attempts=2, reconnect_backoff_seconds=0.01)
+
+        client.write_data(flv_stream_start())
+        deadline = time.monotonic() + 10
+        while client.write_data(flv_gop(0, frame_count=1)):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+        self.assertFalse(client.is_running)
+        self.assertEqual(client.metrics()["reconnect_count"], 2)
+        self.assertEqual(client.metrics()["connection_failure_count"], 3)
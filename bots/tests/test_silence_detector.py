@@ -0,0 +1,136 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import numpy as np
+import webrtcvad
+
+from bots.bot_controller import per_participant_non_streaming_audio_input_manager
+from bots.bot_controller.per_participant_non_streaming_audio_input_manager import PerParticipantNonStreamingAudioInputManager
+from bots.bot_controller.silence_detector import SilenceDetector
+
+SAMPLE_RATE = 32000
+CHUNK_SAMPLES = SAMPLE_RATE // 100  # 10 ms
+
+
+def reference_silence_detected(vad, chunk_bytes, rms_threshold):
+    """Silence detection one chunk at a time with the RMS worked out exactly"""
+    samples = np.frombuffer(chunk_bytes, dtype=np.int16).astype(np.float64)
+    if np.sqrt(np.mean(np.square(samples))) / 32768 < rms_threshold:
+        return True
+    return not vad.is_speech(chunk_bytes, SAMPLE_RATE)
+
+
+def speaker_chunks(seed, chunk_count):
+    """Bursts of loud and quiet voiced sound, noise and digital silence, like a participant talking on and off"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(CHUNK_SAMPLES * chunk_count) / SAMPLE_RATE
+    pitch = rng.uniform(100, 250)
+    voiced = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 8))
+    envelope = np.repeat(rng.choice([0, 0.0001, 0.005, 0.05, 0.3, 1.0], size=chunk_count // 25 + 1), 25 * CHUNK_SAMPLES)[: len(t)]
+    audio = 12000 * envelope * voiced + rng.normal(0, 30, len(t)) * (envelope > 0)
+    samples = np.clip(audio, -32768, 32767).astype(np.int16)
+    return [samples[i : i + CHUNK_SAMPLES].tobytes() for i in range(0, len(samples), CHUNK_SAMPLES)]
+
+
+class TestSilenceDetector(unittest.TestCase):
+    def test_matches_reference_one_chunk_at_a_time(self):
+        for rms_threshold in [0.01, 0.0025]:
+            with self.subTest(rms_threshold=rms_threshold):
+                detector = SilenceDetector(sample_rate=SAMPLE_RATE, rms_threshold=rms_threshold)
+                vad = webrtcvad.Vad()
+                chunks = [chunk for seed in range(5) for chunk in speaker_chunks(seed, 300)]
+
+                expected = [reference_silence_detected(vad, chunk, rms_threshold) for chunk in chunks]
+
+                # Batches of different sizes, so the buffers are reused and grown
+                detected = []
+                for batch_size in [1, 7, 64, 500, 3]:
+                    batch, chunks = chunks[:batch_size], chunks[batch_size:]
+                    detected.extend(detector.detect_silence(batch))
+                detected.extend(detector.detect_silence(chunks))
+
+                self.assertEqual(detected, expected)
+                self.assertIn(True, detected)
+                self.assertIn(False, detected)
+
+    def test_full_scale_audio_is_not_treated_as_silence(self):
+        # Squaring these samples as int16 would overflow
+        square_wave = np.where(np.sin(2 * np.pi * 200 * np.arange(CHUNK_SAMPLES) / SAMPLE_RATE) >= 0, 32767, -32768).astype(np.int16).tobytes()
+        vad = Mock()
+        vad.is_speech.return_value = True
+        detector = SilenceDetector(sample_rate=SAMPLE_RATE, rms_threshold=0.01)
+        detector.vad = vad
+
+        self.assertEqual(detector.detect_silence([square_wave]), [False])
+        vad.is_speech.assert_called_once_with(square_wave, SAMPLE_RATE)
+
+    def test_only_loud_chunks_go_to_webrtcvad(self):
+        quiet = (np.ones(CHUNK_SAMPLES) * 100).astype(np.int16).tobytes()
+        loud = (np.ones(CHUNK_SAMPLES) * 1000).astype(np.int16).tobytes()
+        vad = Mock()
+        vad.is_speech.return_value = False
+        detector = SilenceDetector(sample_rate=SAMPLE_RATE, rms_threshold=0.01)
+        detector.vad = vad
+
+        self.assertEqual(detector.detect_silence([quiet, loud, b"", None, quiet]), [True, True, True, True, True])
+        vad.is_speech.assert_called_once_with(loud, SAMPLE_RATE)
+
+
+class ReferencePerParticipantNonStreamingAudioInputManager(PerParticipantNonStreamingAudioInputManager):
+    """How chunks used to be processed: one at a time off the queue, each with its own RMS and webrtcvad call"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reference_vad = webrtcvad.Vad()
+
+    def silence_detected(self, chunk_bytes):
+        return reference_silence_detected(self.reference_vad, chunk_bytes, 0.01)
+
+    def process_chunks(self):
+        while not self.queue.empty():
+            speaker_id, chunk_time, chunk_bytes = self.queue.get()
+            self.process_chunk(speaker_id, chunk_time, chunk_bytes)
+
+        for speaker_id in list(self.first_nonsilent_audio_time.keys()):
+            self.process_chunk(speaker_id, per_participant_non_streaming_audio_input_manager.datetime.utcnow(), None)
+
+
+class TestPerParticipantNonStreamingAudioInputManagerFlushes(unittest.TestCase):
+    def run_meeting(self, manager_class):
+        saved_utterances = []
+        manager = manager_class(
+            save_utterance_callback=saved_utterances.append,
+            get_participant_callback=lambda speaker_id: {"participant_uuid": speaker_id},
+            sample_rate=SAMPLE_RATE,
+            utterance_size_limit=SAMPLE_RATE * 2 * 3,
+            silence_duration_limit=0.5,
+        )
+
+        speaker_count = 20
+        chunks_per_speaker = [speaker_chunks(seed, 800) for seed in range(speaker_count)]
+        start_time = datetime(2025, 1, 1)
+        with patch("bots.bot_controller.per_participant_non_streaming_audio_input_manager.datetime") as mock_datetime:
+            for chunk_index in range(800):
+                chunk_time = start_time + timedelta(milliseconds=10 * chunk_index)
+                for speaker_index in range(speaker_count):
+                    manager.add_chunk(f"speaker_{speaker_index}", chunk_time, chunks_per_speaker[speaker_index][chunk_index])
+                # The main loop drains the queue every 100 ms
+                if chunk_index % 10 == 9:
+                    mock_datetime.utcnow.return_value = chunk_time
+                    manager.process_chunks()
+
+            manager.flush_utterances()
+        return saved_utterances
+
+    def test_flush_decisions_are_unchanged(self):
+        expected = self.run_meeting(ReferencePerParticipantNonStreamingAudioInputManager)
+        saved = self.run_meeting(PerParticipantNonStreamingAudioInputManager)
+
+        self.assertGreater(len(expected), 20)
+        self.assertEqual({utterance["flush_reason"] for utterance in expected}, {"buffer_full", "silence_limit"})
+        self.assertEqual(saved, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
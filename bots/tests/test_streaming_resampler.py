@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+
+from bots.bot_controller.realtime_audio_output_manager import RealtimeAudioOutputManager
+from bots.streaming_resampler import StreamingResampler
+
+
+def sine_wave(sample_rate, frequency, duration_seconds, amplitude=10000):
+    t = np.arange(int(sample_rate * duration_seconds)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def resample_in_chunks(resampler, samples, chunk_ms):
+    chunk_size = resampler.src_rate * chunk_ms // 1000
+    return np.frombuffer(b"".join(resampler.process(samples[i : i + chunk_size].tobytes()) for i in range(0, len(samples), chunk_size)), dtype=np.int16)
+
+
+def sine_wave_snr_db(samples, sample_rate, frequency):
+    """Fit a sine wave of the given frequency (any phase and amplitude) and compare it to what's left over"""
+    t = np.arange(len(samples)) / sample_rate
+    basis = np.stack([np.sin(2 * np.pi * frequency * t), np.cos(2 * np.pi * frequency * t)], axis=1)
+    coefficients, *_ = np.linalg.lstsq(basis, samples.astype(np.float64), rcond=None)
+    fitted = basis @ coefficients
+    return 10 * np.log10(np.var(fitted) / np.var(samples - fitted))
+
+
+class TestStreamingResampler(unittest.TestCase):
+    RATE_PAIRS_AND_CHUNK_SIZES = [
+        (48000, 16000, 10),
+        (32000, 16000, 10),
+        (48000, 24000, 20),
+        (44100, 16000, 10),
+        (16000, 48000, 20),
+        (24000, 32000, 100),
+        (22050, 48000, 100),
+    ]
+
+    def test_sine_wave_snr_across_chunk_boundaries(self):
+        for src_rate, dst_rate, chunk_ms in self.RATE_PAIRS_AND_CHUNK_SIZES:
+            with self.subTest(src_rate=src_rate, dst_rate=dst_rate):
+                output = resample_in_chunks(StreamingResampler(src_rate, dst_rate), sine_wave(src_rate, 440, 1), chunk_ms)
+
+                # Skip the filter's warm up at the start of the stream
+                self.assertGreater(sine_wave_snr_db(output[dst_rate // 10 :], dst_rate, 440), 75)
+
+    def test_chunked_stream_matches_stream_resampled_in_one_go(self):
+        for src_rate, dst_rate, chunk_ms in self.RATE_PAIRS_AND_CHUNK_SIZES:
+            with self.subTest(src_rate=src_rate, dst_rate=dst_rate):
+                samples = sine_wave(src_rate, 1000, 0.5)
+                chunked_output = resample_in_chunks(StreamingResampler(src_rate, dst_rate), samples, chunk_ms)
+                whole_output = np.frombuffer(StreamingResampler(src_rate, dst_rate).process(samples.tobytes()), dtype=np.int16)
+
+                self.assertEqual(len(chunked_output), len(samples) * dst_rate // src_rate)
+                np.testing.assert_array_equal(chunked_output, whole_output)
+
+    def test_removes_frequencies_above_the_output_nyquist_frequency(self):
+        # 7 kHz fits under the 8 kHz Nyquist frequency at 16 kHz, 10 kHz would alias to 6 kHz
+        output = resample_in_chunks(StreamingResampler(48000, 16000), sine_wave(48000, 10000, 1), 10)
+
+        self.assertLess(np.abs(output[1600:]).max(), 10)
+
+    def test_same_sample_rate_passes_chunk_through(self):
+        chunk = sine_wave(16000, 440, 0.01).tobytes()
+
+        self.assertIs(StreamingResampler(16000, 16000).process(chunk), chunk)
+
+    def test_reset_forgets_the_stream(self):
+        resampler = StreamingResampler(48000, 16000)
+        samples = sine_wave(48000, 440, 0.1)
+        first_output = resampler.process(samples.tobytes())
+        resampler.process(sine_wave(48000, 1000, 0.05).tobytes())
+
+        resampler.reset()
+
+        self.assertEqual(resampler.process(samples.tobytes()), first_output)
+
+
+class TestRealtimeAudioOutputManagerResampling(unittest.TestCase):
+    def setUp(self):
+        self.manager = RealtimeAudioOutputManager(play_raw_audio_callback=Mock(), sleep_time_between_chunks_seconds=0, output_sample_rate=32000)
+
+    def test_keeps_one_resampler_per_input_sample_rate(self):
+        samples = sine_wave(24000, 440, 0.5)
+        chunks = [samples[i : i + 2400].tobytes() for i in range(0, len(samples), 2400)]
+
+        output = np.frombuffer(b"".join(self.manager.upsample_chunk_to_output_sample_rate(chunk, 24000) for chunk in chunks), dtype=np.int16)
+        resampler = self.manager.resampler
+
+        np.testing.assert_array_equal(output, np.frombuffer(StreamingResampler(24000, 32000).process(samples.tobytes()), dtype=np.int16))
+
+        self.manager.upsample_chunk_to_output_sample_rate(sine_wave(22050, 440, 0.1).tobytes(), 22050)
+        self.assertIsNot(self.manager.resampler, resampler)
+        self.assertEqual(self.manager.resampler.src_rate, 22050)
+
+    def test_integer_ratio_repeats_samples(self):
+        chunk = np.array([1, 2, 3], dtype=np.int16).tobytes()
+
+        self.assertEqual(np.frombuffer(self.manager.upsample_chunk_to_output_sample_rate(chunk, 16000), dtype=np.int16).tolist(), [1, 1, 2, 2, 3, 3])
+        self.assertIsNone(self.manager.resampler)
+
+    def test_same_sample_rate_returns_chunk(self):
+        chunk = sine_wave(32000, 440, 0.01).tobytes()
+
+        self.assertIs(self.manager.upsample_chunk_to_output_sample_rate(chunk, 32000), chunk)
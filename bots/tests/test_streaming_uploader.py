@@ -0,0 +1,213 @@
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from django.test import override_settings
+
+from bots.benchmark_utils import start_local_s3_server
+from bots.bot_controller import BotController
+from bots.bot_controller.streaming_uploader import StreamingFileUploader, StreamingUploader
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+# Only StreamingUploader's own retries, so the tests don't wait on botocore's backoff
+@patch.dict(os.environ, {"AWS_MAX_ATTEMPTS": "1", "AWS_RETRY_MODE": "standard"})
+class TestStreamingUploader(unittest.TestCase):
+    def setUp(self):
+        self.server, self.endpoint_url = start_local_s3_server()
+        self.addCleanup(self.server.shutdown)
+
+    def uploader(self, key="recording.mp4", **kwargs):
+        return StreamingUploader(bucket="recordings", key=key, endpoint_url=self.endpoint_url, region_name="us-east-1", access_key_id="test", access_key_secret="test", retry_backoff_seconds=0.01, **kwargs)
+
+    def stored_object(self, key="recording.mp4"):
+        return self.server.s3_objects[("recordings", key)]
+
+    def test_data_added_in_uneven_pieces_is_uploaded_in_parts(self):
+        data = os.urandom(2 * PART_SIZE + 12345)
+        uploader = self.uploader()
+
+        for offset in range(0, len(data), 1000003):
+            uploader.upload_part(data[offset : offset + 1000003])
+        uploader.complete_upload()
+
+        self.assertEqual(self.stored_object(), data)
+        self.assertEqual(self.server.uploaded_part_count, 3)
+
+    def test_small_object_is_uploaded_with_a_regular_put(self):
+        uploader = self.uploader()
+
+        uploader.upload_part(b"abc")
+        uploader.complete_upload()
+
+        self.assertEqual(self.stored_object(), b"abc")
+        self.assertEqual(self.server.uploaded_part_count, 0)
+
+    def test_parts_are_retried_after_transient_errors(self):
+        data = os.urandom(PART_SIZE + 1)
+        self.server.failing_upload_part_count = 2
+        uploader = self.uploader(max_attempts=3)
+
+        uploader.upload_part(data)
+        uploader.complete_upload()
+
+        self.assertEqual(self.stored_object(), data)
+
+    def test_complete_fails_if_a_part_never_uploaded(self):
+        self.server.failing_upload_part_count = 100
+        uploader = self.uploader(max_attempts=2)
+
+        uploader.upload_part(os.urandom(PART_SIZE + 1))
+        with self.assertRaises(RuntimeError):
+            uploader.complete_upload()
+        uploader.abort_upload()
+
+        self.assertNotIn(("recordings", "recording.mp4"), self.server.s3_objects)
+        self.assertEqual(self.server.multipart_uploads, {})
+
+    def test_adding_parts_blocks_while_the_queue_is_full(self):
+        self.server.upload_bytes_per_second = 50 * 1024 * 1024
+        uploader = self.uploader(max_queued_parts=1)
+        added_part_count = 0
+
+        def add_parts():
+            nonlocal added_part_count
+            for _ in range(4):
+                uploader.upload_part(bytes(PART_SIZE))
+                added_part_count += 1
+
+        adder_thread = threading.Thread(target=add_parts)
+        adder_thread.start()
+        adder_thread.join(timeout=0.05)
+
+        # One part uploading and one queued, so the third waits
+        self.assertLessEqual(added_part_count, 2)
+        adder_thread.join()
+        uploader.complete_upload()
+        self.assertEqual(self.stored_object(), bytes(4 * PART_SIZE))
+
+
+@patch.dict(os.environ, {"AWS_MAX_ATTEMPTS": "1", "AWS_RETRY_MODE": "standard"})
+class TestStreamingFileUploader(unittest.TestCase):
+    def setUp(self):
+        self.server, self.endpoint_url = start_local_s3_server()
+        self.addCleanup(self.server.shutdown)
+        file_descriptor, self.file_path = tempfile.mkstemp(suffix=".mp4")
+        os.close(file_descriptor)
+        self.addCleanup(os.remove, self.file_path)
+
+    def file_uploader(self, max_attempts=6):
+        streaming_uploader = StreamingUploader(bucket="recordings", key="recording.mp4", endpoint_url=self.endpoint_url, region_name="us-east-1", access_key_id="test", access_key_secret="test", max_attempts=max_attempts, retry_backoff_seconds=0.01)
+        return StreamingFileUploader(self.file_path, streaming_uploader, poll_interval_seconds=60)
+
+    def stored_object(self):
+        return self.server.s3_objects[("recordings", "recording.mp4")]
+
+    def file_contents(self):
+        with open(self.file_path, "rb") as file:
+            return file.read()
+
+    def test_parts_are_uploaded_as_the_file_grows(self):
+        file_uploader = self.file_uploader()
+
+        with open(self.file_path, "wb") as file:
+            file.write(os.urandom(4 * PART_SIZE))
+            file.flush()
+            file_uploader.upload_new_parts()
+            file_uploader.streaming_uploader.wait_for_queued_parts()
+
+            # The first part waits for the end and the last part is held back, in case they get rewritten
+            self.assertEqual(sorted(file_uploader.streaming_uploader.parts), [2, 3])
+
+            file.write(os.urandom(PART_SIZE // 2))
+        file_uploader.finish()
+
+        self.assertEqual(self.stored_object(), self.file_contents())
+        self.assertEqual(self.server.uploaded_part_count, 5)
+
+    def test_parts_that_were_rewritten_are_uploaded_again(self):
+        file_uploader = self.file_uploader()
+
+        with open(self.file_path, "wb") as file:
+            file.write(os.urandom(5 * PART_SIZE))
+            file.flush()
+            file_uploader.upload_new_parts()
+            file_uploader.streaming_uploader.wait_for_queued_parts()
+
+            # Like a muxer filling in a size once it knows it
+            file.seek(2 * PART_SIZE + 100)
+            file.write(b"\x00\x00\x10\x00")
+            file.seek(0, os.SEEK_END)
+            file.write(b"moov" * 100)
+        file_uploader.finish()
+
+        self.assertEqual(self.stored_object(), self.file_contents())
+        # Parts 2, 3 and 4 were streamed, part 3 was uploaded again along with parts 1, 5 and 6
+        self.assertEqual(self.server.uploaded_part_count, 7)
+
+    def test_part_that_failed_while_streaming_is_uploaded_at_the_end(self):
+        file_uploader = self.file_uploader(max_attempts=1)
+        self.server.failing_upload_part_count = 1
+
+        with open(self.file_path, "wb") as file:
+            file.write(os.urandom(4 * PART_SIZE))
+            file.flush()
+            file_uploader.upload_new_parts()
+        file_uploader.finish()
+
+        self.assertEqual(self.stored_object(), self.file_contents())
+
+    def test_small_file_is_uploaded_with_a_regular_put(self):
+        with open(self.file_path, "wb") as file:
+            file.write(b"audio")
+
+        self.file_uploader().finish()
+
+        self.assertEqual(self.stored_object(), b"audio")
+        self.assertEqual(self.server.uploaded_part_count, 0)
+
+    def test_file_is_followed_from_a_thread(self):
+        file_uploader = self.file_uploader()
+        file_uploader.poll_interval_seconds = 0.01
+        file_uploader.start()
+
+        with open(self.file_path, "wb") as file:
+            file.write(os.urandom(3 * PART_SIZE + 1))
+        while not file_uploader.part_checksums:
+            threading.Event().wait(0.01)
+        file_uploader.finish()
+
+        self.assertEqual(self.stored_object(), self.file_contents())
+
+
+class TestBotControllerStreamingRecordingUpload(unittest.TestCase):
+    def controller(self, screen_and_audio_recorder=None, file_location="/tmp/recording.mp4"):
+        return SimpleNamespace(get_recording_file_location=Mock(return_value=file_location), screen_and_audio_recorder=screen_and_audio_recorder)
+
+    def should_stream_recording_upload(self, controller):
+        return BotController.should_stream_recording_upload(controller)
+
+    @override_settings(RECORDING_STREAMING_UPLOAD_ENABLED=True)
+    def test_gstreamer_and_screen_recordings_that_are_not_rewritten_are_streamed(self):
+        self.assertTrue(self.should_stream_recording_upload(self.controller()))
+        self.assertTrue(self.should_stream_recording_upload(self.controller(screen_and_audio_recorder=Mock(makes_file_seekable_on_cleanup=Mock(return_value=False)))))
+
+    @override_settings(RECORDING_STREAMING_UPLOAD_ENABLED=True)
+    def test_screen_recordings_that_get_rewritten_are_not_streamed(self):
+        self.assertFalse(self.should_stream_recording_upload(self.controller(screen_and_audio_recorder=Mock(makes_file_seekable_on_cleanup=Mock(return_value=True)))))
+
+    @override_settings(RECORDING_STREAMING_UPLOAD_ENABLED=True)
+    def test_bots_without_a_recording_file_do_not_stream(self):
+        self.assertFalse(self.should_stream_recording_upload(self.controller(file_location=None)))
+
+    @override_settings(RECORDING_STREAMING_UPLOAD_ENABLED=False)
+    def test_streaming_can_be_turned_off(self):
+        self.assertFalse(self.should_stream_recording_upload(self.controller()))
+
+
+if __name__ == "__main__":
+    unittest.main()
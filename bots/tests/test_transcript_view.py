@@ -0,0 +1,80 @@
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotStates, Participant, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, Utterance
+
+
+class TestTranscriptView(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Organization")
+        project = Project.objects.create(name="Test Project", organization=organization)
+        _, self.api_key_plain = ApiKey.create(project=project, name="Test API Key")
+        self.bot = Bot.objects.create(project=project, name="Test Bot", meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS)
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant_uuid", full_name="Participant")
+
+    def create_utterances(self, timestamps_ms, **kwargs):
+        return [Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"\x00" * 1000, timestamp_ms=timestamp_ms, duration_ms=500, transcription={"transcript": f"Said at {timestamp_ms}"}, **kwargs) for timestamp_ms in timestamps_ms]
+
+    def get_transcript(self, query=""):
+        return self.client.get(f"/api/v1/bots/{self.bot.object_id}/transcript{query}", HTTP_AUTHORIZATION=f"Token {self.api_key_plain}")
+
+    def transcript_of(self, response):
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return [utterance["transcription"]["transcript"] for utterance in json.loads(content)]
+
+    def test_short_transcript_is_returned_in_one_response_without_audio(self):
+        self.create_utterances([3000, 1000, 2000])
+        Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=1500, duration_ms=500, transcription={"transcript": ""})
+        Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=1600, duration_ms=500)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_transcript()
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(self.transcript_of(response), ["Said at 1000", "Said at 2000", "Said at 3000"])
+        self.assertEqual(response.json()[0], {"speaker_name": "Participant", "speaker_uuid": "participant_uuid", "speaker_user_uuid": None, "timestamp_ms": 1000, "duration_ms": 500, "transcription": {"transcript": "Said at 1000"}})
+        self.assertFalse(any("audio_blob" in query["sql"] for query in queries.captured_queries))
+
+    @patch("bots.bots_api_views.TRANSCRIPT_BATCH_SIZE", 3)
+    def test_long_transcript_is_streamed_in_timeline_order(self):
+        # Utterances with the same timestamp straddle the batches
+        utterances = self.create_utterances([5000, 1000, 2000, 3000, 3000, 3000, 3000, 4000, 6000, 7000])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_transcript()
+            transcript = self.transcript_of(response)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(transcript, [utterance.transcription["transcript"] for utterance in sorted(utterances, key=lambda utterance: (utterance.timestamp_ms, utterance.id))])
+        utterance_queries = [query["sql"] for query in queries.captured_queries if '"bots_utterance"' in query["sql"]]
+        self.assertEqual(len(utterance_queries), 4)
+        self.assertFalse(any("audio_blob" in sql or "OFFSET" in sql for sql in utterance_queries))
+
+    @patch("bots.bots_api_views.TRANSCRIPT_BATCH_SIZE", 2)
+    def test_streamed_transcript_with_updated_after(self):
+        self.create_utterances([1000, 2000])
+        updated_after = timezone.now()
+        self.create_utterances([3000, 4000, 5000])
+
+        response = self.get_transcript(f"?updated_after={updated_after.isoformat().replace('+00:00', 'Z')}")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.transcript_of(response), ["Said at 3000", "Said at 4000", "Said at 5000"])
+
+    @patch("bots.bots_api_views.TRANSCRIPT_BATCH_SIZE", 2)
+    def test_streamed_transcript_where_a_batch_has_only_empty_transcriptions(self):
+        self.create_utterances([1000])
+        Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=2000, duration_ms=500, transcription={"transcript": ""})
+        Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=3000, duration_ms=500, transcription={"transcript": ""})
+        self.create_utterances([4000])
+
+        self.assertEqual(self.transcript_of(self.get_transcript()), ["Said at 1000", "Said at 4000"])
@@ -0,0 +1,217 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots.models import (
+    Bot,
+    Credentials,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    RecordingTranscriptionStates,
+    TranscriptionFailureReasons,
+    TranscriptionProviders,
+    Utterance,
+)
+from bots.tasks.process_utterance_task import RetryableTranscriptionFailure, process_utterance, transcribe_utterance
+from bots.transcription_worker import TranscriptionWorker
+
+
+class MockAssemblyAIHandler(BaseHTTPRequestHandler):
+    """Minimal AssemblyAI API whose transcription jobs take server.job_duration_seconds to finish"""
+
+    def _send_json(self, status_code, body):
+        encoded_body = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v2/upload":
+            self._send_json(200, {"upload_url": "https://cdn.example.com/upload/1"})
+        elif self.path == "/v2/transcript":
+            with self.server.lock:
+                job_id = f"job-{len(self.server.jobs)}"
+                self.server.jobs[job_id] = time.monotonic()
+            self._send_json(200, {"id": job_id})
+        else:
+            self._send_json(404, {})
+
+    def do_GET(self):
+        job_id = self.path.rsplit("/", 1)[-1]
+        with self.server.lock:
+            submitted_at = self.server.jobs.get(job_id)
+        if submitted_at is None:
+            self._send_json(404, {})
+        elif time.monotonic() - submitted_at < self.server.job_duration_seconds:
+            self._send_json(200, {"status": "processing"})
+        else:
+            self._send_json(200, {"status": "completed", "text": f"transcript for {job_id}", "words": [{"text": "transcript", "start": 0, "end": 100, "confidence": 0.9}]})
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.deleted_jobs.append(self.path.rsplit("/", 1)[-1])
+        self._send_json(200, {})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TranscriptionJobTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.IN_PROGRESS,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            transcription_provider=TranscriptionProviders.ASSEMBLY_AI,
+        )
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+        credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.ASSEMBLY_AI)
+        credentials.set_credentials({"api_key": "test-key"})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockAssemblyAIHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.jobs = {}
+        self.server.deleted_jobs = []
+        self.server.job_duration_seconds = 0.5
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        for patcher in [
+            mock.patch.dict("os.environ", {"ASSEMBLYAI_BASE_URL": f"http://127.0.0.1:{self.server.server_address[1]}/v2"}),
+            mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        from django.conf import settings
+
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        settings.CELERY_TASK_EAGER_PROPAGATES = True
+
+    def _create_utterance(self):
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"pcm", timestamp_ms=0, duration_ms=500, sample_rate=16_000)
+
+    def _wait_for_jobs_to_finish(self):
+        time.sleep(self.server.job_duration_seconds + 0.1)
+
+    @mock.patch.object(process_utterance, "apply_async")
+    def test_process_utterance_submits_job_and_checks_back_later(self, mock_apply_async):
+        utterance = self._create_utterance()
+
+        process_utterance.apply(args=[utterance.id])
+
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription_job_id, "job-0")
+        self.assertIsNotNone(utterance.transcription_job_submitted_at)
+        self.assertIsNone(utterance.transcription)
+        self.assertEqual(utterance.transcription_attempt_count, 1)
+        mock_apply_async.assert_called_once_with(args=[utterance.id], countdown=1)
+
+        # The provider is still working on it, so the task schedules another check without resubmitting
+        process_utterance.apply(args=[utterance.id])
+        utterance.refresh_from_db()
+        self.assertEqual(list(self.server.jobs), ["job-0"])
+        self.assertEqual(utterance.transcription_attempt_count, 1)
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+        self._wait_for_jobs_to_finish()
+        process_utterance.apply(args=[utterance.id])
+
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription["transcript"], "transcript for job-0")
+        self.assertEqual(utterance.transcription["words"], [{"word": "transcript", "start": 0.0, "end": 0.1, "confidence": 0.9}])
+        self.assertEqual(utterance.transcription_attempt_count, 1)
+        self.assertEqual(self.server.deleted_jobs, ["job-0"])
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+    @mock.patch.object(process_utterance, "apply_async")
+    def test_many_jobs_are_in_flight_at_once(self, mock_apply_async):
+        self.server.job_duration_seconds = 2
+        utterances = [self._create_utterance() for _ in range(20)]
+
+        for utterance in utterances:
+            process_utterance.apply(args=[utterance.id])
+
+        # Every job was submitted before any of them finished, without a task waiting on each one
+        self.assertEqual(len(self.server.jobs), 20)
+        self.assertLess(max(self.server.jobs.values()) - min(self.server.jobs.values()), self.server.job_duration_seconds)
+        self.assertEqual(Utterance.objects.filter(transcription_job_id__isnull=False, transcription__isnull=True).count(), 20)
+
+        self._wait_for_jobs_to_finish()
+        for call in mock_apply_async.call_args_list:
+            process_utterance.apply(args=call.kwargs["args"])
+
+        self.assertEqual(Utterance.objects.filter(transcription__isnull=False).count(), 20)
+        self.assertEqual(len(self.server.deleted_jobs), 20)
+
+    def test_timed_out_job_is_resubmitted_on_retry(self):
+        self.server.job_duration_seconds = 3600
+        utterance = self._create_utterance()
+        with self.assertRaises(Exception):
+            transcribe_utterance(utterance)
+        Utterance.objects.filter(id=utterance.id).update(transcription_job_submitted_at=timezone.now() - timezone.timedelta(hours=1))
+        utterance.refresh_from_db()
+
+        with self.assertRaises(RetryableTranscriptionFailure):
+            transcribe_utterance(utterance)
+
+        utterance.refresh_from_db()
+        self.assertIsNone(utterance.transcription_job_id)
+        self.assertIsNone(utterance.failure_data)
+
+        with self.assertRaises(Exception):
+            transcribe_utterance(utterance)
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription_job_id, "job-1")
+        self.assertEqual(utterance.transcription_attempt_count, 2)
+
+    def test_failed_job_is_not_polled_again(self):
+        utterance = self._create_utterance()
+        with self.assertRaises(Exception):
+            transcribe_utterance(utterance)
+        utterance.refresh_from_db()
+        utterance.transcription_attempt_count = 5
+
+        with mock.patch("bots.tasks.process_utterance_task.check_transcription_job_via_assemblyai", return_value=(None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED})):
+            transcribe_utterance(utterance)
+
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.failure_data, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED})
+        self.assertIsNone(utterance.transcription_job_id)
+
+    def test_worker_releases_utterance_until_next_check(self):
+        utterance = self._create_utterance()
+        worker = TranscriptionWorker(batch_size=10, concurrency=2)
+        self.addCleanup(worker.shutdown)
+
+        self.assertEqual(worker.run_once(), 1)
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription_job_id, "job-0")
+        self.assertGreater(utterance.transcription_claimed_until, timezone.now())
+        self.assertLess(utterance.transcription_claimed_until, timezone.now() + timezone.timedelta(seconds=worker.claim_seconds))
+
+        self._wait_for_jobs_to_finish()
+        Utterance.objects.filter(id=utterance.id).update(transcription_claimed_until=None)
+        self.assertEqual(worker.run_once(), 1)
+
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription["transcript"], "transcript for job-0")
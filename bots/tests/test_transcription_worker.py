@@ -0,0 +1,130 @@
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots.models import (
+    Bot,
+    Credentials,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    RecordingTranscriptionStates,
+    TranscriptionFailureReasons,
+    TranscriptionProviders,
+    Utterance,
+)
+from bots.tasks.process_utterance_task import get_transcription_via_openai
+from bots.transcription_worker import TranscriptionClients, TranscriptionWorker
+
+
+class TranscriptionWorkerTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.IN_PROGRESS,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            transcription_provider=TranscriptionProviders.OPENAI,
+        )
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+        self.credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.OPENAI)
+        self.credentials.set_credentials({"api_key": "test-key"})
+
+        self.worker = TranscriptionWorker(batch_size=10, concurrency=2)
+        self.addCleanup(self.worker.shutdown)
+
+    def _create_utterance(self, **kwargs):
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"pcm", timestamp_ms=0, duration_ms=500, sample_rate=16_000, **kwargs)
+
+    def test_claim_only_returns_pending_unclaimed_utterances(self):
+        pending = self._create_utterance()
+        self._create_utterance(transcription={"transcript": "done"})
+        self._create_utterance(failure_data={"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID})
+        self._create_utterance(transcription_claimed_until=timezone.now() + timezone.timedelta(minutes=5))
+        self._create_utterance(source=Utterance.Sources.CLOSED_CAPTION_FROM_PLATFORM)
+        expired_claim = self._create_utterance(transcription_claimed_until=timezone.now() - timezone.timedelta(minutes=5))
+
+        claimed = self.worker.claim_pending_utterances()
+
+        self.assertEqual([utterance.id for utterance in claimed], [pending.id, expired_claim.id])
+        pending.refresh_from_db()
+        self.assertGreater(pending.transcription_claimed_until, timezone.now())
+
+        # A second worker polling right afterwards does not get the same utterances
+        self.assertEqual(self.worker.claim_pending_utterances(), [])
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_run_once_transcribes_claimed_utterances_with_shared_clients(self, mock_get_transcription):
+        utterances = [self._create_utterance() for _ in range(3)]
+        mock_get_transcription.return_value = ({"transcript": "hello"}, None)
+
+        self.assertEqual(self.worker.run_once(), 3)
+
+        for utterance in utterances:
+            utterance.refresh_from_db()
+            self.assertEqual(utterance.transcription, {"transcript": "hello"})
+            self.assertEqual(utterance.transcription_attempt_count, 1)
+        for call in mock_get_transcription.call_args_list:
+            self.assertIs(call.args[2], self.worker.transcription_clients)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_retryable_failure_backs_off_and_is_retried(self, mock_get_transcription):
+        utterance = self._create_utterance()
+        mock_get_transcription.return_value = (None, {"reason": TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED})
+
+        self.worker.run_once()
+
+        utterance.refresh_from_db()
+        self.assertIsNone(utterance.transcription)
+        self.assertIsNone(utterance.failure_data)
+        self.assertEqual(utterance.transcription_attempt_count, 1)
+        self.assertGreater(utterance.transcription_claimed_until, timezone.now())
+        self.assertEqual(self.worker.claim_pending_utterances(), [])
+
+        # Once the backoff has passed the utterance is picked up again
+        Utterance.objects.filter(id=utterance.id).update(transcription_claimed_until=timezone.now() - timezone.timedelta(seconds=1))
+        mock_get_transcription.return_value = ({"transcript": "hello"}, None)
+        self.worker.run_once()
+
+        utterance.refresh_from_db()
+        self.assertEqual(utterance.transcription, {"transcript": "hello"})
+        self.assertEqual(utterance.transcription_attempt_count, 2)
+
+    def test_credentials_are_decrypted_once_per_ttl(self):
+        transcription_clients = TranscriptionClients(credentials_ttl_seconds=60)
+        self.addCleanup(transcription_clients.close)
+
+        with mock.patch.object(Credentials, "get_credentials", autospec=True, return_value={"api_key": "test-key"}) as mock_get_credentials:
+            for _ in range(3):
+                self.assertEqual(transcription_clients.get_credentials(self.project.id, Credentials.CredentialTypes.OPENAI), {"api_key": "test-key"})
+            self.assertEqual(mock_get_credentials.call_count, 1)
+
+            with mock.patch("bots.transcription_worker.time.monotonic", return_value=10**9):
+                transcription_clients.get_credentials(self.project.id, Credentials.CredentialTypes.OPENAI)
+            self.assertEqual(mock_get_credentials.call_count, 2)
+
+    @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
+    def test_openai_provider_uses_pooled_session(self, mock_pcm_to_mp3):
+        utterance = self._create_utterance()
+        transcription_clients = TranscriptionClients()
+        self.addCleanup(transcription_clients.close)
+
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"text": "hello"}
+        with mock.patch.object(transcription_clients.http_session, "post", return_value=response) as mock_session_post, mock.patch("bots.tasks.process_utterance_task.requests.post") as mock_requests_post:
+            transcription, failure_data = get_transcription_via_openai(utterance, transcription_clients)
+
+        self.assertIsNone(failure_data)
+        self.assertEqual(transcription, {"transcript": "hello"})
+        mock_session_post.assert_called_once()
+        self.assertEqual(mock_session_post.call_args.kwargs["headers"], {"Authorization": "Bearer test-key"})
+        mock_requests_post.assert_not_called()
@@ -0,0 +1,125 @@
+import uuid
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots.models import (
+    Bot,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    RecordingTranscriptionStates,
+    TranscriptionFailureReasons,
+    Utterance,
+    utterance_audio_storage,
+)
+from bots.tasks.process_utterance_task import process_utterance
+
+
+class UtteranceAudioStorageTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.COMPLETE,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            transcription_provider=1,
+        )
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+
+        from django.conf import settings
+
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        settings.CELERY_TASK_EAGER_PROPAGATES = True
+
+    def _create_stored_utterance(self, audio_data):
+        audio_file_name = Utterance.save_audio_to_storage(self.recording, audio_data)
+        return Utterance.objects.create(
+            recording=self.recording,
+            participant=self.participant,
+            audio_file=audio_file_name,
+            audio_size_bytes=len(audio_data),
+            timestamp_ms=0,
+            duration_ms=500,
+            sample_rate=16_000,
+        )
+
+    def test_stored_audio_round_trips_in_chunks(self):
+        audio_data = bytes(range(256)) * 10_000
+        utterance = self._create_stored_utterance(audio_data)
+        utterance.refresh_from_db()
+
+        self.assertEqual(bytes(utterance.audio_blob), b"")
+        self.assertEqual(utterance.audio_size_bytes, len(audio_data))
+        self.assertTrue(utterance.audio_file.name.startswith(f"{self.recording.object_id}/"))
+
+        with mock.patch.object(Utterance, "AUDIO_READ_CHUNK_SIZE", 1000):
+            chunks = list(utterance.iter_audio_chunks())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), audio_data)
+        self.assertEqual(utterance.get_audio_data(), audio_data)
+
+    def test_legacy_audio_blob_is_still_readable(self):
+        utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"legacy-pcm", timestamp_ms=0, duration_ms=500, sample_rate=16_000)
+        utterance.refresh_from_db()
+
+        self.assertEqual(utterance.get_audio_data(), b"legacy-pcm")
+
+    @mock.patch("bots.tasks.process_utterance_task.RecordingManager.set_recording_transcription_complete")
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_successful_transcription_reads_and_deletes_stored_audio(self, mock_get_transcription, mock_set_complete):
+        utterance = self._create_stored_utterance(b"stored-pcm")
+        audio_file_name = utterance.audio_file.name
+        audio_seen_by_provider = []
+
+        def fake_get_transcription(utterance, recording, transcription_clients=None):
+            audio_seen_by_provider.append(utterance.get_audio_data())
+            return {"transcript": "hello world"}, None
+
+        mock_get_transcription.side_effect = fake_get_transcription
+
+        process_utterance.apply(args=[utterance.id])
+        utterance.refresh_from_db()
+
+        self.assertEqual(audio_seen_by_provider, [b"stored-pcm"])
+        self.assertEqual(utterance.transcription["transcript"], "hello world")
+        self.assertFalse(utterance.audio_file)
+        self.assertFalse(utterance_audio_storage().exists(audio_file_name))
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_failed_transcription_keeps_stored_audio(self, mock_get_transcription):
+        utterance = self._create_stored_utterance(b"stored-pcm")
+        mock_get_transcription.return_value = (None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID})
+
+        process_utterance.apply(args=[utterance.id])
+        utterance.refresh_from_db()
+
+        self.assertIsNotNone(utterance.failure_data)
+        self.assertTrue(utterance_audio_storage().exists(utterance.audio_file.name))
+        self.assertEqual(utterance.get_audio_data(), b"stored-pcm")
+
+    def test_migrate_command_moves_legacy_audio_to_storage(self):
+        legacy_utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"legacy-pcm", timestamp_ms=0, duration_ms=500, sample_rate=16_000)
+        recent_utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"recent-pcm", timestamp_ms=1000, duration_ms=500, sample_rate=16_000)
+        Utterance.objects.filter(id=legacy_utterance.id).update(updated_at=timezone.now() - timezone.timedelta(hours=2))
+
+        call_command("migrate_utterance_audio_to_storage", stdout=StringIO())
+
+        legacy_utterance.refresh_from_db()
+        self.assertEqual(bytes(legacy_utterance.audio_blob), b"")
+        self.assertEqual(legacy_utterance.audio_size_bytes, len(b"legacy-pcm"))
+        self.assertEqual(legacy_utterance.get_audio_data(), b"legacy-pcm")
+
+        # Recently updated utterances might still be getting transcribed, so they are left alone
+        recent_utterance.refresh_from_db()
+        self.assertFalse(recent_utterance.audio_file)
+        self.assertEqual(bytes(recent_utterance.audio_blob), b"recent-pcm")
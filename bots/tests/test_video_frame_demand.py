@@ -0,0 +1,130 @@
+import struct
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+from bots.bot_controller import BotController
+from bots.bot_controller.pipeline_configuration import PipelineConfiguration
+from bots.web_bot_adapter.web_bot_adapter import WebBotAdapter
+
+
+def video_message(width=640, height=360, timestamp=1234):
+    stream_id = b"stream_1"
+    frame = np.zeros(width * height * 3 // 2, dtype=np.uint8)
+    return struct.pack("<iqi", 2, timestamp, len(stream_id)) + stream_id + struct.pack("<ii", width, height) + frame.tobytes()
+
+
+def mixed_audio_message(samples):
+    return struct.pack("<i", 3) + np.asarray(samples, dtype=np.float32).tobytes()
+
+
+class TestBotControllerVideoFrameDemand(unittest.TestCase):
+    def controller(self, pipeline_configuration, **kwargs):
+        # Just the state that the demand is worked out from
+        attributes = {
+            "pipeline_configuration": pipeline_configuration,
+            "recording_paused": False,
+            "rtmp_client": None,
+            "gstreamer_pipeline": Mock(wants_any_video_frames=Mock(return_value=True)),
+        }
+        attributes.update(kwargs)
+        return SimpleNamespace(**attributes)
+
+    def wants_any_video_frames(self, controller):
+        return BotController.wants_any_video_frames(controller)
+
+    def test_recorder_bot_wants_frames(self):
+        self.assertTrue(self.wants_any_video_frames(self.controller(PipelineConfiguration.recorder_bot())))
+
+    def test_audio_only_bot_does_not_want_frames_even_if_the_pipeline_takes_video(self):
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.audio_recorder_bot())))
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.pure_transcription_bot())))
+
+    def test_paused_bot_does_not_want_frames(self):
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.recorder_bot(), recording_paused=True)))
+
+    def test_bot_without_a_pipeline_does_not_want_frames(self):
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.recorder_bot(), gstreamer_pipeline=None)))
+
+    def test_pipeline_that_is_not_ready_does_not_want_frames(self):
+        gstreamer_pipeline = Mock(wants_any_video_frames=Mock(return_value=False))
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.recorder_bot(), gstreamer_pipeline=gstreamer_pipeline)))
+
+    def test_rtmp_bot_only_wants_frames_while_the_rtmp_client_is_running(self):
+        self.assertTrue(self.wants_any_video_frames(self.controller(PipelineConfiguration.rtmp_streaming_bot(), rtmp_client=Mock(is_running=True))))
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.rtmp_streaming_bot(), rtmp_client=Mock(is_running=False))))
+        self.assertFalse(self.wants_any_video_frames(self.controller(PipelineConfiguration.rtmp_streaming_bot(), rtmp_client=None)))
+
+
+class TestWebBotAdapterVideoFrameDemand(unittest.TestCase):
+    def setUp(self):
+        self.wants_any_video_frames = True
+        self.add_video_frame_callback = Mock()
+        self.add_mixed_audio_chunk_callback = Mock()
+        self.adapter = WebBotAdapter(
+            display_name="Test Bot",
+            send_message_callback=Mock(),
+            meeting_url="https://meet.google.com/abc-defg-hij",
+            add_video_frame_callback=self.add_video_frame_callback,
+            wants_any_video_frames_callback=lambda: self.wants_any_video_frames,
+            add_audio_chunk_callback=Mock(),
+            add_mixed_audio_chunk_callback=self.add_mixed_audio_chunk_callback,
+            add_encoded_mp4_chunk_callback=Mock(),
+            upsert_caption_callback=Mock(),
+            upsert_chat_message_callback=Mock(),
+            add_participant_event_callback=Mock(),
+            automatic_leave_configuration=Mock(),
+            recording_view=Mock(),
+            should_create_debug_recording=False,
+            start_recording_screen_callback=Mock(),
+            stop_recording_screen_callback=Mock(),
+            video_frame_size=(1280, 720),
+        )
+        self.adapter.driver = Mock()
+
+    def test_frames_are_scaled_and_passed_on_when_wanted(self):
+        self.adapter.process_video_frame(video_message())
+
+        scaled_frame, timestamp = self.add_video_frame_callback.call_args.args
+        self.assertEqual(len(scaled_frame), 1280 * 720 * 3 // 2)
+        self.assertEqual(timestamp, 1234000)
+
+    def test_frames_are_not_scaled_when_nothing_wants_them(self):
+        self.wants_any_video_frames = False
+
+        with patch.object(self.adapter.i420_scaler, "scale") as mock_scale:
+            self.adapter.process_video_frame(video_message())
+
+        mock_scale.assert_not_called()
+        self.add_video_frame_callback.assert_not_called()
+
+    def test_frames_are_not_scaled_while_paused(self):
+        self.adapter.pause_recording()
+
+        with patch.object(self.adapter.i420_scaler, "scale") as mock_scale:
+            self.adapter.process_video_frame(video_message())
+
+        mock_scale.assert_not_called()
+        self.add_video_frame_callback.assert_not_called()
+
+    def test_mixed_audio_does_not_depend_on_video_demand(self):
+        self.wants_any_video_frames = False
+
+        self.adapter.process_mixed_audio_frame(mixed_audio_message([0.5] * 480))
+
+        self.add_mixed_audio_chunk_callback.assert_called_once()
+
+    def test_browser_is_told_when_the_demand_changes(self):
+        self.adapter.pause_recording()
+        self.adapter.resume_recording()
+
+        self.assertEqual(
+            [call.args[0] for call in self.adapter.driver.execute_script.call_args_list],
+            ["window.ws?.setSendVideoFrames(false);", "window.ws?.setSendVideoFrames(true);"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import struct
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+from websockets.sync.client import connect
+from websockets.sync.server import serve
+
+from bots.web_bot_adapter.web_bot_adapter import RAW_AUDIO_MESSAGE_TYPE, RAW_IMAGE_MESSAGE_TYPE, WebBotAdapter
+
+
+def create_adapter():
+    return WebBotAdapter(
+        display_name="Test Bot",
+        send_message_callback=Mock(),
+        meeting_url="https://meet.google.com/abc-defg-hij",
+        add_video_frame_callback=Mock(),
+        wants_any_video_frames_callback=None,
+        add_audio_chunk_callback=Mock(),
+        add_mixed_audio_chunk_callback=Mock(),
+        add_encoded_mp4_chunk_callback=Mock(),
+        upsert_caption_callback=Mock(),
+        upsert_chat_message_callback=Mock(),
+        add_participant_event_callback=Mock(),
+        automatic_leave_configuration=Mock(),
+        recording_view=Mock(),
+        should_create_debug_recording=False,
+        start_recording_screen_callback=Mock(),
+        stop_recording_screen_callback=Mock(),
+        video_frame_size=(1920, 1080),
+    )
+
+
+class TestWebBotAdapterMediaInjection(unittest.TestCase):
+    def setUp(self):
+        self.adapter = create_adapter()
+        self.adapter.driver = Mock()
+
+        self.server = serve(self.adapter.handle_websocket, "localhost", 0, compression=None, max_size=None)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.port = self.server.socket.getsockname()[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server_thread.join(5)
+
+    def connect_browser(self):
+        browser = connect(f"ws://localhost:{self.port}", compression=None, max_size=None)
+        self.wait_for(lambda: self.adapter.browser_websocket is not None)
+        return browser
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_audio_is_sent_over_the_websocket(self):
+        samples = np.array([0, 1, -1, 32767, -32768, 1234], dtype=np.int16)
+
+        with self.connect_browser() as browser:
+            self.adapter.send_raw_audio(samples.tobytes(), 16000)
+            message = browser.recv(timeout=5)
+
+        message_type, sample_rate = struct.unpack_from("<ii", message)
+        self.assertEqual(message_type, RAW_AUDIO_MESSAGE_TYPE)
+        self.assertEqual(sample_rate, 16000)
+        np.testing.assert_array_equal(np.frombuffer(message, dtype=np.int16, offset=8), samples)
+        self.adapter.driver.execute_script.assert_not_called()
+
+    def test_image_is_sent_over_the_websocket(self):
+        image_bytes = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+        with self.connect_browser() as browser:
+            self.adapter.send_raw_image(memoryview(image_bytes))
+            message = browser.recv(timeout=5)
+
+        self.assertEqual(struct.unpack_from("<i", message)[0], RAW_IMAGE_MESSAGE_TYPE)
+        self.assertEqual(message[4:], image_bytes)
+        self.adapter.driver.execute_script.assert_not_called()
+
+    def test_falls_back_to_chromedriver_without_a_websocket(self):
+        self.adapter.send_raw_audio(np.array([1, -2], dtype=np.int16).tobytes(), 8000)
+        self.adapter.send_raw_image(b"\x01\x02")
+
+        audio_call, image_call = self.adapter.driver.execute_script.call_args_list
+        self.assertEqual(audio_call.args, ("window.botOutputManager.playPCMAudio([1, -2], 8000)",))
+        self.assertEqual(image_call.args[1], [1, 2])
+
+    def test_falls_back_to_chromedriver_after_the_browser_disconnects(self):
+        browser = self.connect_browser()
+        browser.close()
+        self.wait_for(lambda: self.adapter.browser_websocket is None)
+
+        self.adapter.send_raw_audio(np.array([5], dtype=np.int16).tobytes(), 8000)
+
+        self.adapter.driver.execute_script.assert_called_once_with("window.botOutputManager.playPCMAudio([5], 8000)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 import uuid
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.http import Http404, HttpRequest
 from django.http.request import QueryDict
 from django.test import TransactionTestCase
+from django.utils import timezone
 
 from accounts.models import User
 from bots.models import (
@@ -296,7 +298,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         settings.CELERY_TASK_ALWAYS_EAGER = True
         settings.CELERY_TASK_EAGER_PROPAGATES = True
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
     def test_webhook_delivery_success(self, mock_post):
         """Test successful webhook delivery"""
         mock_post.return_value.status_code = 200
@@ -324,7 +326,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertEqual(len(attempt.response_body_list), 1)
         self.assertIsNotNone(attempt.succeeded_at)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
     def test_webhook_delivery_failure(self, mock_post):
         """Test webhook delivery failure and retry"""
         mock_post.return_value.status_code = 500
@@ -355,7 +357,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertIsNone(attempt.succeeded_at)
         self.assertEqual(attempt.attempt_count, 3)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
     def test_webhook_delivery_inactive(self, mock_post):
         """Test webhook delivery does not deliver when the subscription is inactive"""
 
@@ -381,7 +383,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertIsNone(attempt.succeeded_at)
         self.assertEqual(attempt.attempt_count, 0)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
     def test_bot_webhook_prioritization(self, mock_post):
         """Test that bot-level webhooks are prioritized over project-level webhooks"""
         from bots.webhook_utils import trigger_webhook
@@ -453,3 +455,157 @@ class WebhookDeliveryTest(TransactionTestCase):
         # Test that triggering a webhook for a transcript update does go through, since it uses the project-level webhook
         num_attempts = trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload=test_payload)
         self.assertEqual(num_attempts, 1)
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhooks.delay")
+    def test_trigger_webhook_fans_out_with_one_insert_and_one_task(self, mock_deliver_webhooks_delay):
+        from bots.webhook_utils import trigger_webhook
+
+        other_subscriptions = [WebhookSubscription.objects.create(project=self.project, url=f"https://example{i}.com/webhook", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE]) for i in range(3)]
+
+        # Look up the bot's subscriptions, look up the project's subscriptions, insert the delivery attempts in one statement (plus BEGIN / COMMIT)
+        with self.assertNumQueries(5):
+            num_attempts = trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"test": "data"})
+
+        self.assertEqual(num_attempts, 4)
+        delivery_attempts = list(WebhookDeliveryAttempt.objects.order_by("id"))
+        self.assertEqual([attempt.webhook_subscription for attempt in delivery_attempts], [self.webhook_subscription] + other_subscriptions)
+        self.assertEqual(len({attempt.idempotency_key for attempt in delivery_attempts}), 4)
+        mock_deliver_webhooks_delay.assert_called_once_with([attempt.id for attempt in delivery_attempts])
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
+    def test_deliver_webhooks_retries_only_failed_deliveries(self, mock_post, mock_deliver_webhook_apply_async):
+        from bots.tasks.deliver_webhook_task import deliver_webhooks
+
+        failing_subscription = WebhookSubscription.objects.create(project=self.project, url="https://failing.example.com/webhook", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        attempts = [WebhookDeliveryAttempt.objects.create(webhook_subscription=subscription, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, idempotency_key=uuid.uuid4(), payload={"test": "data"}) for subscription in [self.webhook_subscription, failing_subscription]]
+
+        def fake_post(url, **kwargs):
+            response = type("Response", (), {})()
+            response.status_code = 500 if url == failing_subscription.url else 200
+            response.text = "response"
+            return response
+
+        mock_post.side_effect = fake_post
+
+        deliver_webhooks.apply(args=[[attempt.id for attempt in attempts]])
+
+        for attempt in attempts:
+            attempt.refresh_from_db()
+        self.assertEqual(attempts[0].status, WebhookDeliveryAttemptStatus.SUCCESS)
+        self.assertEqual(attempts[1].status, WebhookDeliveryAttemptStatus.FAILURE)
+        self.assertEqual(attempts[1].attempt_count, 1)
+        mock_deliver_webhook_apply_async.assert_called_once_with(args=[attempts[1].id], countdown=1)
+
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
+    def test_signing_secret_is_cached_between_deliveries(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+
+        attempts = [WebhookDeliveryAttempt.objects.create(webhook_subscription=self.webhook_subscription, webhook_trigger_type=WebhookTriggerTypes.BOT_STATE_CHANGE, bot=self.bot, idempotency_key=uuid.uuid4(), payload={"test": i}) for i in range(3)]
+
+        with patch.object(WebhookSecret, "get_secret", autospec=True, return_value=b"secret") as mock_get_secret:
+            for attempt in attempts:
+                deliver_webhook.apply(args=[attempt.id])
+
+        self.assertEqual(mock_get_secret.call_count, 1)
+        for call in mock_post.call_args_list:
+            self.assertTrue(verify_signature(call.kwargs["json"], call.kwargs["headers"]["X-Webhook-Signature"], b"secret"))
+
+    def create_batched_delivery_attempts(self, count):
+        return [WebhookDeliveryAttempt.objects.create(webhook_subscription=self.webhook_subscription, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, idempotency_key=uuid.uuid4(), payload={"test": i}) for i in range(count)]
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhooks.delay")
+    def test_batched_subscription_flushes_when_full_or_after_max_wait(self, mock_deliver_webhooks_delay, mock_deliver_webhook_batch_delay, mock_deliver_webhook_batch_apply_async):
+        from bots.webhook_utils import trigger_webhook
+
+        self.webhook_subscription.batch_max_events = 2
+        self.webhook_subscription.batch_max_wait_ms = 500
+        self.webhook_subscription.save()
+
+        # The first event of the batch schedules a flush for max_wait_ms later
+        trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"test": 0})
+        mock_deliver_webhook_batch_apply_async.assert_called_once_with(args=[self.webhook_subscription.id], countdown=0.5)
+        self.webhook_subscription.refresh_from_db()
+        self.assertIsNotNone(self.webhook_subscription.batch_flush_due_at)
+
+        # The event that fills the batch flushes it right away
+        trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"test": 1})
+        mock_deliver_webhook_batch_delay.assert_called_once_with(self.webhook_subscription.id)
+
+        # While a flush is scheduled, new events don't schedule another one
+        trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"test": 2})
+        self.assertEqual(mock_deliver_webhook_batch_apply_async.call_count, 1)
+        self.assertEqual(mock_deliver_webhook_batch_delay.call_count, 1)
+
+        mock_deliver_webhooks_delay.assert_not_called()
+        self.assertEqual(WebhookDeliveryAttempt.objects.filter(status=WebhookDeliveryAttemptStatus.PENDING).count(), 3)
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
+    def test_webhook_batches_are_delivered_in_order_as_one_signed_request(self, mock_post, mock_deliver_webhook_batch_apply_async):
+        from bots.tasks.deliver_webhook_task import deliver_webhook_batch
+
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+        self.webhook_subscription.batch_max_events = 2
+        self.webhook_subscription.save()
+        attempts = self.create_batched_delivery_attempts(5)
+
+        for _ in range(3):
+            deliver_webhook_batch.apply(args=[self.webhook_subscription.id])
+
+        self.assertEqual(mock_post.call_count, 3)
+        batches = [call.kwargs["json"]["events"] for call in mock_post.call_args_list]
+        self.assertEqual([[event["idempotency_key"] for event in batch] for batch in batches], [[str(attempt.idempotency_key) for attempt in attempts[i : i + 2]] for i in range(0, 5, 2)])
+        self.assertEqual(batches[0][0], {"idempotency_key": str(attempts[0].idempotency_key), "bot_id": self.bot.object_id, "bot_metadata": None, "trigger": "transcript.update", "data": {"test": 0}})
+        for call in mock_post.call_args_list:
+            self.assertTrue(verify_signature(call.kwargs["json"], call.kwargs["headers"]["X-Webhook-Signature"], self.webhook_secret.get_secret()))
+
+        # The flushes that left events behind scheduled the next one
+        self.assertEqual(mock_deliver_webhook_batch_apply_async.call_count, 2)
+        for attempt in attempts:
+            attempt.refresh_from_db()
+            self.assertEqual(attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+            self.assertEqual(attempt.attempt_count, 1)
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.webhook_session.post")
+    def test_failed_webhook_batch_is_retried_with_backoff_until_events_run_out_of_attempts(self, mock_post, mock_deliver_webhook_batch_apply_async):
+        from bots.tasks.deliver_webhook_task import deliver_webhook_batch
+
+        mock_post.return_value.status_code = 500
+        mock_post.return_value.text = "Server Error"
+        self.webhook_subscription.batch_max_events = 10
+        self.webhook_subscription.save()
+        old_attempt, new_attempt = self.create_batched_delivery_attempts(2)
+        WebhookDeliveryAttempt.objects.filter(id=old_attempt.id).update(attempt_count=2, last_attempt_at=timezone.now() - timedelta(minutes=1))
+
+        deliver_webhook_batch.apply(args=[self.webhook_subscription.id])
+
+        # The event that had already been tried twice gives up, the other one waits for the retry
+        old_attempt.refresh_from_db()
+        new_attempt.refresh_from_db()
+        self.assertEqual(old_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+        self.assertEqual(old_attempt.attempt_count, 3)
+        self.assertEqual(new_attempt.status, WebhookDeliveryAttemptStatus.PENDING)
+        self.assertEqual(new_attempt.attempt_count, 1)
+        self.assertEqual(mock_deliver_webhook_batch_apply_async.call_args.kwargs["args"], [self.webhook_subscription.id])
+        self.assertAlmostEqual(mock_deliver_webhook_batch_apply_async.call_args.kwargs["countdown"], 2, delta=0.5)
+
+        # A flush before the backoff is over doesn't send anything
+        deliver_webhook_batch.apply(args=[self.webhook_subscription.id])
+        self.assertEqual(mock_post.call_count, 1)
+
+        # Once it is over, the retry only contains the event that is still pending
+        mock_post.return_value.status_code = 200
+        WebhookDeliveryAttempt.objects.filter(id=new_attempt.id).update(last_attempt_at=timezone.now() - timedelta(minutes=1))
+        deliver_webhook_batch.apply(args=[self.webhook_subscription.id])
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual([event["idempotency_key"] for event in mock_post.call_args.kwargs["json"]["events"]], [str(new_attempt.idempotency_key)])
+        new_attempt.refresh_from_db()
+        self.assertEqual(new_attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+        self.assertEqual(new_attempt.attempt_count, 2)
+        self.assertEqual(len(new_attempt.response_body_list), 2)
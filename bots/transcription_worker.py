@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from bots.models import Credentials, TranscriptionProviders, Utterance
+from bots.tasks.process_utterance_task import RetryableTranscriptionFailure, TranscriptionJobPending, transcribe_utterance
+
+logger = logging.getLogger(__name__)
+
+CREDENTIAL_TYPE_FOR_TRANSCRIPTION_PROVIDER = {
+    TranscriptionProviders.DEEPGRAM: Credentials.CredentialTypes.DEEPGRAM,
+    TranscriptionProviders.GLADIA: Credentials.CredentialTypes.GLADIA,
+    TranscriptionProviders.OPENAI: Credentials.CredentialTypes.OPENAI,
+    TranscriptionProviders.ASSEMBLY_AI: Credentials.CredentialTypes.ASSEMBLY_AI,
+    TranscriptionProviders.SARVAM: Credentials.CredentialTypes.SARVAM,
+    TranscriptionProviders.ELEVENLABS: Credentials.CredentialTypes.ELEVENLABS,
+}
+
+
+def create_deepgram_transport(pool_size):
+    import httpx
+
+    class PersistentHTTPTransport(httpx.HTTPTransport):
+        # The Deepgram SDK opens a new httpx.Client for every request and closes the client's transport when it is done.
+        # Ignoring that close keeps the pooled connections open for the next request.
+        def __exit__(self, *args):
+            pass
+
+    return PersistentHTTPTransport(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+
+
+class TranscriptionClients:
+    """
+    Provider clients shared by every utterance that a transcription worker processes.
+    Connections to the providers are pooled, and decrypted credentials are cached for a short time
+    so they aren't looked up and decrypted again for every utterance.
+    """
+
+    def __init__(self, pool_size=10, credentials_ttl_seconds=60):
+        self.pool_size = pool_size
+        self.credentials_ttl_seconds = credentials_ttl_seconds
+
+        self.http_session = requests.Session()
+        http_adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.http_session.mount("https://", http_adapter)
+        self.http_session.mount("http://", http_adapter)
+
+        self._lock = threading.Lock()
+        self._credentials_cache = {}
+        self._deepgram_clients = {}
+        self._deepgram_transport = None
+
+    def get_credentials(self, project_id, credential_type):
+        cache_key = (project_id, credential_type)
+        with self._lock:
+            cached = self._credentials_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        credentials_record = Credentials.objects.filter(project_id=project_id, credential_type=credential_type).first()
+        credentials = credentials_record.get_credentials() if credentials_record else None
+
+        with self._lock:
+            self._credentials_cache[cache_key] = (time.monotonic() + self.credentials_ttl_seconds, credentials)
+        return credentials
+
+    def get_deepgram_client(self, api_key):
+        from deepgram import DeepgramClient
+
+        with self._lock:
+            if api_key not in self._deepgram_clients:
+                self._deepgram_clients[api_key] = DeepgramClient(api_key)
+            return self._deepgram_clients[api_key]
+
+    @property
+    def deepgram_transport(self):
+        with self._lock:
+            if self._deepgram_transport is None:
+                self._deepgram_transport = create_deepgram_transport(self.pool_size)
+            return self._deepgram_transport
+
+    def close(self):
+        self.http_session.close()
+        if self._deepgram_transport is not None:
+            self._deepgram_transport.close()
+
+
+class TranscriptionWorker:
+    """
+    Transcribes pending per participant utterances in batches. Utterances are claimed with
+    SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can run side by side.
+    A claim expires after claim_seconds, so utterances held by a worker that died get picked up again.
+    """
+
+    def __init__(self, batch_size=50, concurrency=8, claim_seconds=600, max_retry_backoff_seconds=600, transcription_clients=None):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.claim_seconds = claim_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.transcription_clients = transcription_clients or TranscriptionClients(pool_size=concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="transcription_worker")
+
+    def claim_pending_utterances(self):
+        now = timezone.now()
+        claimed_until = now + timezone.timedelta(seconds=self.claim_seconds)
+
+        with transaction.atomic():
+            utterances = list(Utterance.objects.filter(source=Utterance.Sources.PER_PARTICIPANT_AUDIO, transcription__isnull=True, failure_data__isnull=True).filter(Q(transcription_claimed_until__isnull=True) | Q(transcription_claimed_until__lte=now)).select_for_update(skip_locked=True, of=("self",)).select_related("recording__bot__project").defer("audio_blob").order_by("id")[: self.batch_size])
+            Utterance.objects.filter(id__in=[utterance.id for utterance in utterances]).update(transcription_claimed_until=claimed_until)
+
+        for utterance in utterances:
+            utterance.transcription_claimed_until = claimed_until
+        return utterances
+
+    def group_by_project_and_provider(self, utterances):
+        utterances_by_project_and_provider = defaultdict(list)
+        for utterance in utterances:
+            utterances_by_project_and_provider[(utterance.recording.bot.project_id, utterance.recording.transcription_provider)].append(utterance)
+        return utterances_by_project_and_provider
+
+    def process_utterance(self, utterance):
+        close_old_connections()
+        try:
+            transcribe_utterance(utterance, self.transcription_clients)
+        except TranscriptionJobPending as e:
+            # Release the utterance until it's time to check on the provider's job again
+            Utterance.objects.filter(id=utterance.id).update(transcription_claimed_until=timezone.now() + timezone.timedelta(seconds=e.retry_in_seconds))
+        except RetryableTranscriptionFailure as e:
+            backoff_seconds = min(2 ** (utterance.transcription_attempt_count - 1), self.max_retry_backoff_seconds)
+            Utterance.objects.filter(id=utterance.id).update(transcription_claimed_until=timezone.now() + timezone.timedelta(seconds=backoff_seconds))
+            logger.info(f"{e}. Retrying in {backoff_seconds} seconds")
+        except Exception:
+            # The claim is left in place, so the utterance is retried once it expires
+            logger.exception(f"Error processing utterance {utterance.id}")
+        finally:
+            close_old_connections()
+
+    def run_once(self):
+        """Claim and transcribe one batch of utterances. Returns the number of utterances that were claimed."""
+        utterances = self.claim_pending_utterances()
+        if not utterances:
+            return 0
+
+        utterances_by_project_and_provider = self.group_by_project_and_provider(utterances)
+        logger.info(f"Claimed {len(utterances)} utterances across {len(utterances_by_project_and_provider)} project / provider pairs")
+
+        for (project_id, transcription_provider), utterances_for_group in utterances_by_project_and_provider.items():
+            # Look up the credentials once for the whole group, so the utterances can share them
+            credential_type = CREDENTIAL_TYPE_FOR_TRANSCRIPTION_PROVIDER.get(transcription_provider)
+            if credential_type:
+                self.transcription_clients.get_credentials(project_id, credential_type)
+
+        futures = [self.executor.submit(self.process_utterance, utterance) for utterances_for_group in utterances_by_project_and_provider.values() for utterance in utterances_for_group]
+        for future in futures:
+            future.result()
+
+        return len(utterances)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        self.transcription_clients.close()
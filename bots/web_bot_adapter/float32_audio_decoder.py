@@ -0,0 +1,40 @@
+import numpy as np
+
+# Clipping to these before scaling by 32768 keeps the samples in the int16 range. 32767 / 32768 is exact in float32.
+MAX_SAMPLE = np.float32(32767 / 32768)
+MIN_SAMPLE = np.float32(-1.0)
+INT16_SCALE = np.float32(32768.0)
+
+
+class Float32AudioDecoder:
+    """
+    Turns the float32 audio frames the browser sends over the websocket into 16-bit PCM. Samples outside [-1, 1)
+    are clipped to the int16 range instead of wrapping around. The frame is read through a view of the message, and the
+    conversion happens in buffers kept per stream, so decoding a frame doesn't allocate anything.
+    The returned array is one of those buffers, so it's only valid until the next frame on the same stream is decoded.
+    Not thread-safe.
+    """
+
+    def __init__(self):
+        # Stream name -> (float32 buffer, int16 buffer)
+        self.buffers = {}
+
+    def _get_buffers(self, stream, sample_count):
+        buffers = self.buffers.get(stream)
+        if buffers is None or len(buffers[0]) != sample_count:
+            buffers = (np.empty(sample_count, dtype=np.float32), np.empty(sample_count, dtype=np.int16))
+            self.buffers[stream] = buffers
+        return buffers
+
+    def decode(self, stream, message, offset):
+        """Decode the float32 samples that start at offset in the message"""
+        sample_count = (len(message) - offset) // 4
+        samples = np.frombuffer(message, np.float32, sample_count, offset)
+        clipped_samples, pcm_samples = self._get_buffers(stream, sample_count)
+
+        # Frames are only a few hundred samples, so the number of NumPy calls matters more than the work in each one
+        np.minimum(samples, MAX_SAMPLE, clipped_samples)
+        np.maximum(clipped_samples, MIN_SAMPLE, clipped_samples)
+        # Scales and converts in one go, truncating towards zero like astype
+        np.multiply(clipped_samples, INT16_SCALE, pcm_samples, casting="unsafe")
+        return pcm_samples
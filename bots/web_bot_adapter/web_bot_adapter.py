@@ -3,6 +3,7 @@ import datetime
 import json
 import logging
 import os
+import struct
 import threading
 import time
 from time import sleep
@@ -15,14 +16,20 @@ from websockets.sync.server import serve
 
 from bots.automatic_leave_configuration import AutomaticLeaveConfiguration
 from bots.bot_adapter import BotAdapter
+from bots.i420_scaler import I420Scaler
 from bots.models import ParticipantEventTypes, RecordingViews
-from bots.utils import half_ceil, scale_i420
+from bots.utils import half_ceil
 
 from .debug_screen_recorder import DebugScreenRecorder
+from .float32_audio_decoder import Float32AudioDecoder
 from .ui_methods import UiCouldNotJoinMeetingWaitingForHostException, UiCouldNotJoinMeetingWaitingRoomTimeoutException, UiIncorrectPasswordException, UiLoginAttemptFailedException, UiLoginRequiredException, UiMeetingNotFoundException, UiRequestToJoinDeniedException, UiRetryableException, UiRetryableExpectedException
 
 logger = logging.getLogger(__name__)
 
+# Message types the adapter sends to the browser over the websocket, continuing the numbering of the ones the browser sends
+RAW_AUDIO_MESSAGE_TYPE = 6
+RAW_IMAGE_MESSAGE_TYPE = 7
+
 
 class WebBotAdapter(BotAdapter):
     def __init__(
@@ -98,11 +105,36 @@ class WebBotAdapter(BotAdapter):
 
         self.recording_paused = False
 
+        self.float32_audio_decoder = Float32AudioDecoder()
+        self.i420_scaler = I420Scaler()
+
+        # The browser's websocket connection, which send_raw_audio and send_raw_image write the media to
+        self.browser_websocket = None
+        self.browser_websocket_lock = threading.Lock()
+
     def pause_recording(self):
         self.recording_paused = True
+        self.update_browser_video_frame_demand()
 
     def resume_recording(self):
         self.recording_paused = False
+        self.update_browser_video_frame_demand()
+
+    def wants_video_frames(self):
+        if self.recording_paused or not self.send_frames:
+            return False
+        if self.add_video_frame_callback is None or self.wants_any_video_frames_callback is None:
+            return False
+        return self.wants_any_video_frames_callback()
+
+    def update_browser_video_frame_demand(self):
+        """Tell the browser whether to send video frames, so it doesn't copy and transfer frames nobody will use"""
+        if not self.driver:
+            return
+        try:
+            self.driver.execute_script(f"window.ws?.setSendVideoFrames({'true' if self.wants_video_frames() else 'false'});")
+        except Exception as e:
+            logger.info(f"Error updating video frame demand in the browser: {e}")
 
     def process_encoded_mp4_chunk(self, message):
         if self.recording_paused:
@@ -138,7 +170,7 @@ class WebBotAdapter(BotAdapter):
             return
 
     def process_video_frame(self, message):
-        if self.recording_paused:
+        if not self.wants_video_frames():
             return
 
         self.last_media_message_processed_time = time.time()
@@ -166,9 +198,8 @@ class WebBotAdapter(BotAdapter):
 
             # Check if len(video_data) does not agree with width and height
             if len(video_data) == expected_video_data_length:  # I420 format uses 1.5 bytes per pixel
-                scaled_i420_frame = scale_i420(video_data, (width, height), self.video_frame_size)
-                if self.wants_any_video_frames_callback() and self.send_frames:
-                    self.add_video_frame_callback(scaled_i420_frame, timestamp * 1000)
+                scaled_i420_frame = self.i420_scaler.scale(video_data, (width, height), self.video_frame_size)
+                self.add_video_frame_callback(scaled_i420_frame, timestamp * 1000)
 
             else:
                 logger.info(f"video data length does not agree with width and height {len(video_data)} {width} {height}")
@@ -179,17 +210,14 @@ class WebBotAdapter(BotAdapter):
 
         self.last_media_message_processed_time = time.time()
         if len(message) > 12:
-            # Convert the float32 audio data to numpy array
-            audio_data = np.frombuffer(message[4:], dtype=np.float32)
-
-            # Convert float32 to PCM 16-bit by multiplying by 32768.0
-            audio_data = (audio_data * 32768.0).astype(np.int16)
+            # Convert the float32 audio data after the message type to PCM 16-bit
+            audio_data = self.float32_audio_decoder.decode("mixed_audio", message, 4)
 
             # Only mark last_audio_message_processed_time if the audio data has at least one non-zero value
             if np.any(audio_data):
                 self.last_audio_message_processed_time = time.time()
 
-            if (self.wants_any_video_frames_callback is None or self.wants_any_video_frames_callback()) and self.send_frames:
+            if self.send_frames:
                 self.add_mixed_audio_chunk_callback(chunk=audio_data.tobytes())
 
     def process_per_participant_audio_frame(self, message):
@@ -202,11 +230,8 @@ class WebBotAdapter(BotAdapter):
             participant_id_length = int.from_bytes(message[4:5], byteorder="little")
             participant_id = message[5 : 5 + participant_id_length].decode("utf-8")
 
-            # Convert the float32 audio data to numpy array
-            audio_data = np.frombuffer(message[(5 + participant_id_length) :], dtype=np.float32)
-
-            # Convert float32 to PCM 16-bit by multiplying by 32768.0
-            audio_data = (audio_data * 32768.0).astype(np.int16)
+            # Convert the float32 audio data after the participant ID to PCM 16-bit
+            audio_data = self.float32_audio_decoder.decode("per_participant_audio", message, 5 + participant_id_length)
 
             self.add_audio_chunk_callback(participant_id, datetime.datetime.utcnow(), audio_data.tobytes())
 
@@ -259,6 +284,9 @@ class WebBotAdapter(BotAdapter):
         # Create frames directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
 
+        with self.browser_websocket_lock:
+            self.browser_websocket = websocket
+
         try:
             for message in websocket:
                 # Get first 4 bytes as message type
@@ -332,6 +360,23 @@ class WebBotAdapter(BotAdapter):
         except Exception as e:
             logger.info(f"Websocket error: {e}")
             raise e
+        finally:
+            with self.browser_websocket_lock:
+                if self.browser_websocket is websocket:
+                    self.browser_websocket = None
+
+    def send_to_browser_websocket(self, message):
+        """Send a binary message to the browser over the websocket. Returns False if the browser isn't connected."""
+        # Held while sending so messages from different threads don't interleave and so the connection can't be swapped out mid-send
+        with self.browser_websocket_lock:
+            if self.browser_websocket is None:
+                return False
+            try:
+                self.browser_websocket.send(message)
+            except Exception as e:
+                logger.info(f"Could not send media to the browser over the websocket: {e}")
+                return False
+        return True
 
     def run_websocket_server(self):
         loop = asyncio.new_event_loop()
@@ -451,7 +496,7 @@ class WebBotAdapter(BotAdapter):
         self.driver = webdriver.Chrome(options=options)
         logger.info(f"web driver server initialized at port {self.driver.service.port}")
 
-        initial_data_code = f"window.initialData = {{websocketPort: {self.websocket_port}, videoFrameWidth: {self.video_frame_size[0]}, videoFrameHeight: {self.video_frame_size[1]}, botName: {json.dumps(self.display_name)}, addClickRipple: {'true' if self.should_create_debug_recording else 'false'}, recordingView: '{self.recording_view}', sendMixedAudio: {'true' if self.add_mixed_audio_chunk_callback else 'false'}, sendPerParticipantAudio: {'true' if self.add_audio_chunk_callback else 'false'}, collectCaptions: {'false' if self.add_audio_chunk_callback else 'true'}}}"
+        initial_data_code = f"window.initialData = {{websocketPort: {self.websocket_port}, videoFrameWidth: {self.video_frame_size[0]}, videoFrameHeight: {self.video_frame_size[1]}, botName: {json.dumps(self.display_name)}, addClickRipple: {'true' if self.should_create_debug_recording else 'false'}, recordingView: '{self.recording_view}', sendMixedAudio: {'true' if self.add_mixed_audio_chunk_callback else 'false'}, sendPerParticipantAudio: {'true' if self.add_audio_chunk_callback else 'false'}, collectCaptions: {'false' if self.add_audio_chunk_callback else 'true'}, sendVideoFrames: {'true' if self.add_video_frame_callback else 'false'}}}"
 
         # Define the CDN libraries needed
         CDN_LIBRARIES = ["https://cdnjs.cloudflare.com/ajax/libs/protobufjs/7.4.0/protobuf.min.js", "https://cdnjs.cloudflare.com/ajax/libs/pako/2.1.0/pako.min.js"]
@@ -609,6 +654,7 @@ class WebBotAdapter(BotAdapter):
         self.send_message_callback({"message": self.Messages.BOT_RECORDING_PERMISSION_GRANTED})
         self.send_frames = True
         self.driver.execute_script("window.ws?.enableMediaSending();")
+        self.update_browser_video_frame_demand()
         self.first_buffer_timestamp_ms_offset = self.driver.execute_script("return performance.timeOrigin;")
 
         if self.start_recording_screen_callback:
@@ -728,6 +774,10 @@ class WebBotAdapter(BotAdapter):
         return self.media_sending_enable_timestamp_ms
 
     def send_raw_image(self, image_bytes):
+        # Send the image over the websocket, so that chromedriver doesn't have to carry it as a JSON list of numbers
+        if self.send_to_browser_websocket(struct.pack("<i", RAW_IMAGE_MESSAGE_TYPE) + image_bytes):
+            return
+
         # If we have a memoryview, convert it to bytes
         if isinstance(image_bytes, memoryview):
             image_bytes = image_bytes.tobytes()
@@ -749,6 +799,10 @@ class WebBotAdapter(BotAdapter):
         :param bytes: Raw audio bytes in PCM format
         :param sample_rate: Sample rate of the audio in Hz
         """
+        # The header is 8 bytes, so the samples stay aligned for an Int16Array on the other end
+        if self.send_to_browser_websocket(struct.pack("<ii", RAW_AUDIO_MESSAGE_TYPE, sample_rate) + bytes):
+            return
+
         if not self.driver:
             print("Cannot send audio - driver not initialized")
             return
@@ -3,6 +3,7 @@ import hashlib
 import hmac
 import json
 import logging
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -36,24 +37,49 @@ def trigger_webhook(webhook_trigger_type, bot=None, calendar=None, payload=None)
             is_active=True,
         )
 
-    delivery_attempts = []
-    for subscription in subscriptions:
-        # Create a webhook delivery attempt record
-        delivery_attempt = WebhookDeliveryAttempt.objects.create(
-            webhook_subscription=subscription,
-            webhook_trigger_type=webhook_trigger_type,
-            idempotency_key=uuid.uuid4(),
-            bot=bot,
-            calendar=calendar,
-            payload=payload,
-        )
-        delivery_attempts.append(delivery_attempt)
+    # One insert and one task for all the subscriptions, rather than one of each per subscription
+    delivery_attempts = WebhookDeliveryAttempt.objects.bulk_create(
+        [
+            WebhookDeliveryAttempt(
+                webhook_subscription=subscription,
+                webhook_trigger_type=webhook_trigger_type,
+                idempotency_key=uuid.uuid4(),
+                bot=bot,
+                calendar=calendar,
+                payload=payload,
+            )
+            for subscription in subscriptions
+        ]
+    )
+
+    from bots.tasks.deliver_webhook_task import deliver_webhooks, enqueue_batched_webhook_delivery
+
+    # Batched subscriptions get this event in their next batch, the rest get it right away
+    unbatched_delivery_attempt_ids = [delivery_attempt.id for delivery_attempt in delivery_attempts if not delivery_attempt.webhook_subscription.is_batched]
+    if unbatched_delivery_attempt_ids:
+        deliver_webhooks.delay(unbatched_delivery_attempt_ids)
+
+    for delivery_attempt in delivery_attempts:
+        if delivery_attempt.webhook_subscription.is_batched:
+            enqueue_batched_webhook_delivery(delivery_attempt.webhook_subscription)
 
-        from bots.tasks.deliver_webhook_task import deliver_webhook
+    return len(delivery_attempts)
 
-        deliver_webhook.delay(delivery_attempt.id)
 
-    return len(delivery_attempts)
+# Every delivery needs the project's signing secret, so keep it around for a short time rather than fetching and decrypting it every time
+WEBHOOK_SECRET_CACHE_TTL_SECONDS = 60
+_webhook_secret_cache = {}
+
+
+def get_webhook_signing_secret(project):
+    cached = _webhook_secret_cache.get(project.id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    active_secret = project.webhook_secrets.filter().order_by("-created_at").first()
+    secret = active_secret.get_secret()
+    _webhook_secret_cache[project.id] = (time.monotonic() + WEBHOOK_SECRET_CACHE_TTL_SECONDS, secret)
+    return secret
 
 
 def sign_payload(payload, secret):
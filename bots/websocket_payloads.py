@@ -1,42 +1,27 @@
 import logging
+import struct
 import time
 from base64 import b64encode
 
 from bots.models import RealtimeTriggerTypes
+from bots.streaming_resampler import StreamingResampler
 
 logger = logging.getLogger(__name__)
 
-
-import audioop
-import logging
-
-logger = logging.getLogger(__name__)
-
-SAMPLE_WIDTH = 2  # 16-bit PCM
-CHANNELS = 1  # mono
-
-
-def _downsample(chunk: bytes, src_rate: int, dst_rate: int) -> bytes:
-    if src_rate == dst_rate:
-        return chunk  # nothing to do
-
-    # state None ⇒ filter state kept inside audioop (per-call ok for small chunks)
-    converted, _ = audioop.ratecv(
-        chunk,  # fragment
-        SAMPLE_WIDTH,  # width
-        CHANNELS,  # nchannels
-        src_rate,  # inrate
-        dst_rate,  # outrate
-        None,  # state
-    )
-    return converted
+# Binary frames are a 16 byte little-endian header followed by the 16-bit PCM audio. The header holds
+# the frame format version (uint8), a reserved byte, the trigger (uint16), the sample rate (uint32) and the timestamp in ms (uint64).
+BINARY_FRAME_VERSION = 1
+BINARY_FRAME_HEADER = struct.Struct("<BBHIQ")
+# Frames whose headers match up to the timestamp hold consecutive audio of the same kind, so they can be sent as one frame
+BINARY_FRAME_STREAM_HEADER_SIZE = 8
 
 
-def mixed_audio_websocket_payload(chunk: bytes, input_sample_rate: int, output_sample_rate: int, bot_object_id: str) -> dict:
+def mixed_audio_websocket_payload(chunk: bytes, resampler: StreamingResampler, bot_object_id: str) -> dict:
     """
     Down-sample (if needed) and package for websocket.
+    The resampler belongs to the websocket's audio stream, so its filter state carries over between chunks.
     """
-    chunk_downsampled = _downsample(chunk, input_sample_rate, output_sample_rate)
+    chunk_downsampled = resampler.process(chunk)
 
     return {
         "trigger": RealtimeTriggerTypes.type_to_api_code(RealtimeTriggerTypes.MIXED_AUDIO_CHUNK),
@@ -44,6 +29,25 @@ def mixed_audio_websocket_payload(chunk: bytes, input_sample_rate: int, output_s
         "data": {
             "chunk": b64encode(chunk_downsampled).decode("ascii"),
             "timestamp_ms": int(time.time() * 1000),
-            "sample_rate": output_sample_rate,
+            "sample_rate": resampler.dst_rate,
         },
     }
+
+
+def mixed_audio_websocket_binary_frame(chunk: bytes, resampler: StreamingResampler) -> bytes:
+    """
+    Down-sample (if needed) and package for websocket as a binary frame, which skips the base64 and JSON encoding.
+    """
+    header = BINARY_FRAME_HEADER.pack(BINARY_FRAME_VERSION, 0, RealtimeTriggerTypes.MIXED_AUDIO_CHUNK, resampler.dst_rate, int(time.time() * 1000))
+    return header + resampler.process(chunk)
+
+
+def can_coalesce_binary_frames(frame: bytes, next_frame: bytes) -> bool:
+    return frame[:BINARY_FRAME_STREAM_HEADER_SIZE] == next_frame[:BINARY_FRAME_STREAM_HEADER_SIZE]
+
+
+def coalesce_binary_frames(frames: list[bytes]) -> bytes:
+    """Join frames into one, which keeps the header (and so the timestamp) of the first frame"""
+    if len(frames) == 1:
+        return frames[0]
+    return b"".join([frames[0]] + [frame[BINARY_FRAME_HEADER.size :] for frame in frames[1:]])
@@ -1,8 +1,6 @@
 import logging
-import os
-import tempfile
 import threading
-import urllib.request
+import time
 
 import gi
 
@@ -10,8 +8,13 @@ gi.require_version("Gst", "1.0")
 gi.require_version("GstApp", "1.0")
 from gi.repository import GLib, GObject, Gst
 
+from bots.media_cache import HttpMediaSource, get_media_cache
+
 logger = logging.getLogger(__name__)
 
+# How many bytes appsrc asks for at a time
+APPSRC_BLOCK_SIZE = 64 * 1024
+
 
 # --------------------------------------------------------------------------- #
 #  Core class                                                                 #
@@ -20,6 +23,10 @@ class MP4Demuxer:
     """
     Stream-demux a remote MP4.
 
+    The MP4 is read through the node's media cache. If it isn't cached yet, it plays while it downloads: qtdemux reads
+    it through an appsrc, and whatever part of the file it asks for, the moov included, is fetched with range requests
+    ahead of the rest.
+
     Parameters
     ----------
     url : str
@@ -28,9 +35,11 @@ class MP4Demuxer:
         Called with (pts_seconds, raw_rgba_frame).
     on_audio_sample : Callable[[float, bytes], None]
         Called with (pts_seconds, raw_pcm_block).
+    media_cache : MediaCache, optional
+        Where the MP4 is cached. Defaults to the node's media cache.
     """
 
-    def __init__(self, url, output_video_dimensions, on_video_sample, on_audio_sample):
+    def __init__(self, url, output_video_dimensions, on_video_sample, on_audio_sample, media_cache=None):
         Gst.init(None)
         self._url = url
         self._video_cb = on_video_sample
@@ -40,33 +49,11 @@ class MP4Demuxer:
         self._loop = GObject.MainLoop()
         self._thread = None
         self._queue_elements = {}  # Store references to queue elements
-        self._temp_file_path = None
-
-        self._download_file()
-        self._build_pipeline()
-
-    # ------------------------------------------------------------------ #
-    #  File download                                                     #
-    # ------------------------------------------------------------------ #
-    def _download_file(self) -> None:
-        """
-        Download the file from URL to a temporary file.
-        """
-        logger.info(f"Downloading MP4 from {self._url}...")
-
-        # Create a temporary file
-        temp_fd, self._temp_file_path = tempfile.mkstemp(suffix=".mp4")
-        os.close(temp_fd)  # Close the file descriptor, we'll use the path
-
-        try:
-            # Download the file
-            urllib.request.urlretrieve(self._url, self._temp_file_path)
-            logger.info(f"Downloaded MP4 to {self._temp_file_path}")
-        except Exception as e:
-            logger.error(f"Error downloading file: {e}")
-            if os.path.exists(self._temp_file_path):
-                os.unlink(self._temp_file_path)
-            raise
+        self._pipeline = None
+        self._media_source = HttpMediaSource(url, media_cache or get_media_cache())
+        self._read_offset = 0
+        self._started_at = None
+        self._first_video_sample_logged = False
 
     # ------------------------------------------------------------------ #
     #  Public control API                                                #
@@ -77,13 +64,31 @@ class MP4Demuxer:
         """
         if self._playing:
             return
-        self._pipeline.set_state(Gst.State.PLAYING)
-        self._thread = threading.Thread(target=self._loop.run, daemon=True)
-        self._thread.start()
         self._playing = True
+        self._started_at = time.monotonic()
+        # Opening the media makes a request, so it happens on the background thread too
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self._media_source.open()
+            self._build_pipeline()
+        except Exception as e:
+            logger.error(f"Error opening MP4 from {self._url}: {e}")
+            self.stop()
+            return
+
+        if not self._playing:
+            # Stopped while opening
+            self._pipeline.set_state(Gst.State.NULL)
+            return
+
+        self._pipeline.set_state(Gst.State.PLAYING)
 
         # Start queue monitoring
         GLib.timeout_add_seconds(10, self._monitor_queue_sizes)
+        self._loop.run()
 
     def stop(self) -> None:
         """
@@ -91,15 +96,15 @@ class MP4Demuxer:
         """
         if not self._playing:
             return
-        self._pipeline.send_event(Gst.Event.new_eos())  # graceful EOS
-        self._pipeline.set_state(Gst.State.NULL)
+        self._playing = False
+        # Wakes up a read that's waiting on the download
+        self._media_source.close()
+        if self._pipeline:
+            self._pipeline.send_event(Gst.Event.new_eos())  # graceful EOS
+            self._pipeline.set_state(Gst.State.NULL)
         self._loop.quit()
-        if self._thread and self._thread.is_alive():
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
             self._thread.join()
-        self._playing = False
-
-        # Clean up temporary file
-        self._cleanup_temp_file()
 
     def is_playing(self) -> bool:
         """
@@ -107,19 +112,6 @@ class MP4Demuxer:
         """
         return self._playing
 
-    def _cleanup_temp_file(self) -> None:
-        """
-        Remove the temporary file if it exists.
-        """
-        if self._temp_file_path and os.path.exists(self._temp_file_path):
-            try:
-                os.unlink(self._temp_file_path)
-                logger.info(f"Cleaned up temporary file: {self._temp_file_path}")
-            except Exception as e:
-                logger.error(f"Error cleaning up temporary file: {e}")
-            finally:
-                self._temp_file_path = None
-
     # ------------------------------------------------------------------ #
     #  Internal helpers                                                  #
     # ------------------------------------------------------------------ #
@@ -127,8 +119,14 @@ class MP4Demuxer:
         """
         Create elements, link them, and attach callbacks.
         """
+        if self._media_source.download_complete and self._media_source.path:
+            source = f"filesrc location={self._media_source.path}"
+        else:
+            source = f"appsrc name=src stream-type=random-access format=bytes size={self._media_source.size if self._media_source.size is not None else -1} blocksize={APPSRC_BLOCK_SIZE}"
+        logger.info(f"Playing MP4 from {self._url} {'from the media cache' if self._media_source.cache_hit else 'while it downloads'}")
+
         launch = f"""
-            filesrc location={self._temp_file_path} ! qtdemux name=d
+            {source} ! qtdemux name=d
 
                 d. ! queue name=video_queue                                 \
                         max-size-buffers=50 max-size-bytes=0 max-size-time=0 \
@@ -159,6 +157,11 @@ class MP4Demuxer:
         self._queue_elements["video_queue"] = self._pipeline.get_by_name("video_queue")
         self._queue_elements["audio_queue"] = self._pipeline.get_by_name("audio_queue")
 
+        src = self._pipeline.get_by_name("src")
+        if src:
+            src.connect("need-data", self._on_need_data)
+            src.connect("seek-data", self._on_seek_data)
+
         # connect data callbacks
         vsink.connect("new-sample", self._on_video_sample)
         asink.connect("new-sample", self._on_audio_sample)
@@ -208,8 +211,31 @@ class MP4Demuxer:
 
         return True  # Continue the timer
 
+    # ------------------------- Source handlers ------------------------- #
+    def _on_need_data(self, src, length) -> None:
+        """Called on appsrc's streaming thread, which waits here until the bytes are downloaded"""
+        try:
+            data = self._media_source.read(self._read_offset, length if length > 0 else APPSRC_BLOCK_SIZE)
+        except Exception as e:
+            logger.error(f"Error reading MP4 from {self._url}: {e}")
+            data = b""
+        if not data:
+            src.emit("end-of-stream")
+            return
+        buf = Gst.Buffer.new_wrapped(data)
+        buf.offset = self._read_offset
+        self._read_offset += len(data)
+        src.emit("push-buffer", buf)
+
+    def _on_seek_data(self, src, offset) -> bool:
+        self._read_offset = offset
+        return True
+
     # ------------------------- Sample handlers ------------------------- #
     def _on_video_sample(self, sink) -> Gst.FlowReturn:
+        if not self._first_video_sample_logged:
+            self._first_video_sample_logged = True
+            logger.info(f"First video frame of {self._url} after {time.monotonic() - self._started_at:.2f} seconds")
         return self._dispatch_sample(sink, self._video_cb)
 
     def _on_audio_sample(self, sink) -> Gst.FlowReturn:
@@ -240,9 +266,3 @@ class MP4Demuxer:
         if t == Gst.MessageType.EOS or t == Gst.MessageType.ERROR:
             # Pipeline finished or hit error – shut down cleanly
             self.stop()
-
-    def __del__(self):
-        """
-        Destructor to ensure cleanup of temporary file.
-        """
-        self._cleanup_temp_file()
@@ -20,7 +20,10 @@ class WebSocketClient {
         VIDEO: 2,
         AUDIO: 3,
         ENCODED_MP4_CHUNK: 4,
-        PER_PARTICIPANT_AUDIO: 5
+        PER_PARTICIPANT_AUDIO: 5,
+        // Sent by the adapter to the browser
+        RAW_AUDIO: 6,
+        RAW_IMAGE: 7
     };
 
     constructor() {
@@ -46,6 +49,12 @@ class WebSocketClient {
         };
 
         this.mediaSendingEnabled = false;
+        // Zoom web bots don't send video frames, but the adapter sets this the same way for every web payload
+        this.sendVideoFrames = window.initialData.sendVideoFrames;
+    }
+
+    setSendVideoFrames(sendVideoFrames) {
+        this.sendVideoFrames = sendVideoFrames;
     }
 
     async enableMediaSending() {
@@ -70,6 +79,13 @@ class WebSocketClient {
                 const jsonData = new TextDecoder().decode(new Uint8Array(data, 4));
                 console.log('Received JSON message:', JSON.parse(jsonData));
                 break;
+            case WebSocketClient.MESSAGE_TYPES.RAW_AUDIO:
+                // Header is the message type and the sample rate, followed by 16-bit PCM samples
+                window.botOutputManager.playPCMAudio(new Int16Array(data, 8), view.getInt32(4, true));
+                break;
+            case WebSocketClient.MESSAGE_TYPES.RAW_IMAGE:
+                window.botOutputManager.displayImage(new Uint8Array(data, 4));
+                break;
             // Add future message type handlers here
             default:
                 console.warn('Unknown message type:', messageType);